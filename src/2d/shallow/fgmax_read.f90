@@ -22,6 +22,7 @@ subroutine fgmax_read(fgmax_unit,ifg)
     
     ! OR if npts==0, instead of the list the next line after npts should be
     !   xy_fname  # path to file containing npts followed by list of points.
+    !   This file can instead be binary, see below.
 
     ! if point_style==1:
     !   npts       # desired number of points on transect
@@ -39,7 +40,16 @@ subroutine fgmax_read(fgmax_unit,ifg)
     !   x4, y4     # fourth corner
     ! if point_style==4:
     !   xy_fname   # a file with topo_type==3 format specifying Z = 0 or 1,
-    !              # with 1 at fgmax points
+    !              # with 1 at fgmax points, or a binary mask file.
+
+    ! Binary point files, written by fgmax_tools.write_fgmax_points_binary
+    ! and fgmax_tools.write_fgmax_mask_binary, are recognized by the 8
+    ! characters at the start of the file, and are read as stream access:
+    !   'FGMAXXY1', npts (int64), x(1:npts), y(1:npts) (float64)
+    ! for point_style==0, or for point_style==4:
+    !   'FGMAXMK1', nx, ny (int64), xll, yll, dx, dy (float64),
+    !   followed by nx*ny mask values (int8), one row of nx values at a time
+    !   going from N to S as in a topo_type==3 file.
 
     use fgmax_module
     use amr_module, only: mxnest
@@ -61,6 +71,10 @@ subroutine fgmax_read(fgmax_unit,ifg)
     real(kind=8), allocatable :: fg_row(:)
     real(kind=8) :: fg_y
     integer :: fg_npts_max, jj
+    character(len=8) :: magic
+    integer(kind=8) :: npts8, nx8, ny8
+    integer(kind=1), allocatable :: mask_row(:)
+    logical :: binary_file
 
     
     fg => FG_fgrids(ifg)   ! point to next element of array of fgrids
@@ -88,14 +102,26 @@ subroutine fgmax_read(fgmax_unit,ifg)
             read(fgmax_unit,*) fname2
             write(6,*) 'Reading fgmax points from '
             write(6,*) '    ',trim(fname2)
-            open(unit=FG_UNIT,file=trim(fname2),status='old')
-            read(FG_UNIT,*) fg%npts
-            write(6,*) 'npts = ',fg%npts
+            call check_binary(fname2, 'FGMAXXY1', binary_file)
+            if (binary_file) then
+                open(unit=FG_UNIT,file=trim(fname2),status='old', &
+                     access='stream',form='unformatted')
+                read(FG_UNIT) magic, npts8
+                fg%npts = int(npts8)
+                write(6,*) 'npts = ',fg%npts,' from binary file'
+                allocate(fg%x(1:fg%npts), fg%y(1:fg%npts))
+                read(FG_UNIT) fg%x(1:fg%npts)
+                read(FG_UNIT) fg%y(1:fg%npts)
+            else
+                open(unit=FG_UNIT,file=trim(fname2),status='old')
+                read(FG_UNIT,*) fg%npts
+                write(6,*) 'npts = ',fg%npts
 
-            allocate(fg%x(1:fg%npts), fg%y(1:fg%npts))
-            do k=1,fg%npts
-                read(FG_UNIT,*) fg%x(k), fg%y(k)
-                enddo
+                allocate(fg%x(1:fg%npts), fg%y(1:fg%npts))
+                do k=1,fg%npts
+                    read(FG_UNIT,*) fg%x(k), fg%y(k)
+                    enddo
+            endif
             close(FG_UNIT)
         endif
 
@@ -161,14 +187,27 @@ subroutine fgmax_read(fgmax_unit,ifg)
         write(6,*) 'Reading fgmax points from '
         write(6,*) '    ',trim(fname2)
         
-        call read_topo_header(fname2,3,fg%nx,fg%ny,fg%xll,fg%yll, &
-                         fg%xhi,fg%yhi,fg%dx,fg%dy)
+        call check_binary(fname2, 'FGMAXMK1', binary_file)
+        if (binary_file) then
+            open(unit=FG_UNIT,file=trim(fname2),status='old', &
+                 access='stream',form='unformatted')
+            read(FG_UNIT) magic, nx8, ny8
+            fg%nx = int(nx8)
+            fg%ny = int(ny8)
+            read(FG_UNIT) fg%xll, fg%yll, fg%dx, fg%dy
+            fg%xhi = fg%xll + (fg%nx-1)*fg%dx
+            fg%yhi = fg%yll + (fg%ny-1)*fg%dy
+            allocate(mask_row(fg%nx))
+        else
+            call read_topo_header(fname2,3,fg%nx,fg%ny,fg%xll,fg%yll, &
+                             fg%xhi,fg%yhi,fg%dx,fg%dy)
 
-        open(unit=FG_UNIT,file=trim(fname2),status='old')
-        ! Skip over header lines read above:
-        do i=1,6
-            read(FG_UNIT,*)
-            enddo
+            open(unit=FG_UNIT,file=trim(fname2),status='old')
+            ! Skip over header lines read above:
+            do i=1,6
+                read(FG_UNIT,*)
+                enddo
+        endif
         
         allocate(fg%index(fg%nx, fg%ny)) ! to store index into list of pts
         allocate(fg_row(fg%nx))          ! temporary for one row
@@ -179,7 +218,12 @@ subroutine fgmax_read(fgmax_unit,ifg)
         fg%index = 0
         do j=1,fg%ny
             jj = fg%ny - j + 1  ! since topo-style file goes from N to S
-            read(FG_UNIT,*) (fg_row(i), i=1,fg%nx)
+            if (binary_file) then
+                read(FG_UNIT) mask_row
+                fg_row = mask_row
+            else
+                read(FG_UNIT,*) (fg_row(i), i=1,fg%nx)
+            endif
             fg_y = fg%yll + (jj-1)*fg%dy
             !write(6,*) '+++ fg_y = ',fg_y
             do i=1,fg%nx
@@ -250,4 +294,26 @@ subroutine fgmax_read(fgmax_unit,ifg)
     !write(6,*) '+++ maxthreads, fg%npts, fg%klist_last: ', maxthreads, &
     !        fg%npts, fg%klist(fg%npts, maxthreads-1)
 
+contains
+
+    subroutine check_binary(fname, magic_expected, binary_file)
+
+        ! Check whether the file fname starts with the characters
+        ! magic_expected, indicating a binary fgmax point file.
+
+        implicit none
+        character(len=*), intent(in) :: fname
+        character(len=8), intent(in) :: magic_expected
+        logical, intent(out) :: binary_file
+        character(len=8) :: magic_found
+        integer :: ios
+
+        open(unit=FG_UNIT,file=trim(fname),status='old', &
+             access='stream',form='unformatted')
+        read(FG_UNIT, iostat=ios) magic_found
+        close(FG_UNIT)
+        binary_file = (ios == 0) .and. (magic_found == magic_expected)
+
+    end subroutine check_binary
+
 end subroutine fgmax_read
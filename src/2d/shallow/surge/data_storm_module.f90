@@ -1,12 +1,18 @@
 ! ==============================================================================
-! model_storm_module 
+! data_storm_module
 !
-! Module contains routines for constructing a wind and pressure field based on a
-! provided set of data files.
+! Module contains routines for setting the wind and pressure fields from
+! gridded data, e.g. written by clawpack.geoclaw.surge.storm.StormFieldWriter.
+!
+! The storm file is an ASCII header giving the data file format, the uniform
+! grid, the number of times, the path to the data file and then a line with
+! the time and storm eye location for each time.  Only the two data times
+! bracketing the requested time are kept in memory, the fields are linearly
+! interpolated in time and bilinearly interpolated in space onto the patch.
 !
 ! ==============================================================================
 !                   Copyright (C) Clawpack Developers 2017
-!  Distributed under the terms of the Berkeley Software Distribution (BSD) 
+!  Distributed under the terms of the Berkeley Software Distribution (BSD)
 !  license
 !                     http://www.opensource.org/licenses/
 ! ==============================================================================
@@ -18,19 +24,54 @@ module data_storm_module
     logical, private :: module_setup = .false.
     logical, private :: DEBUG = .false.
 
-    ! Model storm type definition
+    ! Unit used for reading the data file
+    integer, parameter, private :: data_unit = 702
+
+    ! Tolerance allowed for starting before the first data time
+    real(kind=8), parameter :: TRACKING_TOLERANCE = 1d-10
+
+    ! Data storm type definition
     type data_storm_type
 
-        ! Dummy variable
-        integer :: mine
+        ! Data file format, 1 = binary32, 2 = binary64, 3 = netcdf
+        integer :: file_format
+        character(len=256) :: data_path
+
+        ! Uniform grid the fields are given on
+        integer :: mx, my
+        real(kind=8) :: xlower, ylower, dx, dy
+
+        ! Times of the data and storm eye location at those times
+        integer :: num_times
+        real(kind=8), allocatable :: time(:)
+        real(kind=8), allocatable :: eye_location(:, :)
+        real(kind=8), allocatable :: velocity(:, :)
+
+        ! The two time slices bracketing the current time, the last index is
+        ! the slot, loaded(slot) is the time index in the slot (0 if empty)
+        real(kind=8), allocatable :: wind_u(:, :, :)
+        real(kind=8), allocatable :: wind_v(:, :, :)
+        real(kind=8), allocatable :: pressure(:, :, :)
+        integer :: loaded(2)
+
+#ifdef NETCDF
+        integer :: nc_file, var_ids(3)
+#endif
 
     end type data_storm_type
 
 contains
 
-    ! Setup routine for model storms
+    ! Setup routine for data storms
     subroutine set_storm(storm_data_path, storm, model_type, log_unit)
 
+        use geoclaw_module, only: spherical_distance, coordinate_system
+        use amr_module, only: t0
+#ifdef NETCDF
+        use netcdf
+        use topo_module, only: check_netcdf_error
+#endif
+
         implicit none
 
         ! Subroutine I/O
@@ -38,16 +79,164 @@ contains
         type(data_storm_type), intent(in out) :: storm
         integer, intent(in) :: model_type, log_unit
 
-        stop "Data-derived storm are not yet implemented!"
+        ! Locals
+        integer, parameter :: header_unit = 701
+        integer :: i, io_status
+        real(kind=8) :: x(2), y(2), ds, dt
+        character(len=16) :: file_format
+        character(len=256) :: line
 
         if (.not. module_setup) then
 
+            print *,'Reading storm header file ', storm_data_path
+            open(unit=header_unit, file=storm_data_path, status='old',      &
+                 action='read', iostat=io_status)
+            if (io_status /= 0) then
+                print *, "Error opening storm data file. status = ", io_status
+                stop
+            endif
+
+            read(header_unit, *) file_format
+            read(header_unit, *) storm%mx, storm%my
+            read(header_unit, *) storm%xlower, storm%ylower, storm%dx, storm%dy
+            read(header_unit, *) storm%num_times
+            ! Read the path as a string, list-directed input stops at a "/"
+            read(header_unit, "(a)") line
+            i = index(line, "#")
+            if (i > 0) line = line(1:i - 1)
+            storm%data_path = adjustl(line)
+            read(header_unit, *)
+
+            if (storm%num_times < 2) then
+                print *, "Data storm needs at least two times."
+                stop
+            end if
+
+            allocate(storm%time(storm%num_times))
+            allocate(storm%eye_location(2, storm%num_times))
+            do i=1, storm%num_times
+                read(header_unit, *) storm%time(i), storm%eye_location(:, i)
+            end do
+            close(header_unit)
+
+            ! Data paths are relative to the header
+            if (storm%data_path(1:1) /= "/") then
+                i = index(storm_data_path, "/", back=.true.)
+                storm%data_path = storm_data_path(1:i) // storm%data_path
+            end if
+
+            ! Eye velocity, used for the storm direction
+            allocate(storm%velocity(2, storm%num_times))
+            do i=1, storm%num_times - 1
+                x = storm%eye_location(:, i)
+                y = storm%eye_location(:, i + 1)
+                dt = storm%time(i + 1) - storm%time(i)
+                if (coordinate_system == 2) then
+                    ds = spherical_distance(x(1), 0.5d0 * (x(2) + y(2)), &
+                                            y(1), 0.5d0 * (x(2) + y(2)))
+                    storm%velocity(1, i) = sign(ds / dt, y(1) - x(1))
+                    ds = spherical_distance(0.5d0 * (x(1) + y(1)), x(2), &
+                                            0.5d0 * (x(1) + y(1)), y(2))
+                    storm%velocity(2, i) = sign(ds / dt, y(2) - x(2))
+                else
+                    storm%velocity(:, i) = (y - x) / dt
+                end if
+            end do
+            storm%velocity(:, storm%num_times) =                           &
+                                    storm%velocity(:, storm%num_times - 1)
+
+            if (t0 - storm%time(1) < -TRACKING_TOLERANCE) then
+                print *, "Start time", t0, " is before the first data time"
+                print *, storm%time(1), "."
+                stop
+            endif
+
+            ! Open the data file, it stays open for the whole run
+            select case(trim(file_format))
+                case("binary32")
+                    storm%file_format = 1
+                case("binary64")
+                    storm%file_format = 2
+                case("netcdf")
+                    storm%file_format = 3
+                case default
+                    print *, "Unknown storm data file format ", file_format
+                    stop
+            end select
+
+            if (storm%file_format == 3) then
+#ifdef NETCDF
+                call check_netcdf_error(nf90_open(storm%data_path,          &
+                                                  nf90_nowrite, storm%nc_file))
+                call check_netcdf_error(nf90_inq_varid(storm%nc_file,       &
+                                                "wind_u", storm%var_ids(1)))
+                call check_netcdf_error(nf90_inq_varid(storm%nc_file,       &
+                                                "wind_v", storm%var_ids(2)))
+                call check_netcdf_error(nf90_inq_varid(storm%nc_file,       &
+                                                "pressure", storm%var_ids(3)))
+#else
+                print *, "*** Error: netCDF storm data requires compiling"
+                print *, "           with the NETCDF flag."
+                stop
+#endif
+            else
+                open(unit=data_unit, file=storm%data_path, status='old',    &
+                     action='read', access='stream', form='unformatted',    &
+                     iostat=io_status)
+                if (io_status /= 0) then
+                    print *, "Error opening storm data file ",              &
+                             trim(storm%data_path), ". status = ", io_status
+                    stop
+                endif
+            end if
+
+            allocate(storm%wind_u(storm%mx, storm%my, 2))
+            allocate(storm%wind_v(storm%mx, storm%my, 2))
+            allocate(storm%pressure(storm%mx, storm%my, 2))
+            storm%loaded = 0
+
+            ! Log everything to the surge log file
+            write(log_unit, *) ""
+            write(log_unit, *) "Data storm file format = ", trim(file_format)
+            write(log_unit, *) "  data file = ", trim(storm%data_path)
+            write(log_unit, "('  grid = ',2i6,4e16.7)") storm%mx, storm%my,  &
+                            storm%xlower, storm%ylower, storm%dx, storm%dy
+            write(log_unit, "('Data length = ',i6)") storm%num_times
+            write(log_unit, *) ""
+            write(log_unit, *) "Storm Track"
+            write(log_unit, *) ""
+            do i=1, storm%num_times
+                write(log_unit, "(5e26.16)") storm%time(i),                 &
+                                             storm%eye_location(:, i),      &
+                                             storm%velocity(:, i)
+            end do
+
             module_setup = .true.
         end if
 
     end subroutine set_storm
 
 
+    ! ==========================================================================
+    !  time_index(t, storm)
+    !    Index k such that time(k) <= t < time(k + 1), limited to
+    !    1 <= k < num_times
+    ! ==========================================================================
+    integer pure function time_index(t, storm) result(k)
+
+        implicit none
+
+        ! Input
+        real(kind=8), intent(in) :: t
+        type(data_storm_type), intent(in) :: storm
+
+        do k=1, storm%num_times - 2
+            if (t < storm%time(k + 1)) exit
+        end do
+
+    end function time_index
+
+
     ! ==========================================================================
     !  storm_location(t,storm)
     !    Interpolate location of hurricane in the current time interval
@@ -63,7 +252,15 @@ contains
         ! Output
         real(kind=8) :: location(2)
 
-        stop "Data-derived storm are not yet implemented!"
+        ! Locals
+        integer :: k
+        real(kind=8) :: weight
+
+        k = time_index(t, storm)
+        weight = (t - storm%time(k)) / (storm%time(k + 1) - storm%time(k))
+        weight = min(max(weight, 0.d0), 1.d0)
+        location = storm%eye_location(:, k) + weight                        &
+                        * (storm%eye_location(:, k + 1) - storm%eye_location(:, k))
 
     end function storm_location
 
@@ -79,19 +276,121 @@ contains
         real(kind=8), intent(in) :: t
         type(data_storm_type), intent(in) :: storm
 
-        stop "Data-derived storm are not yet implemented!"
+        ! Locals
+        integer :: k
+        real(kind=8) :: weight, velocity(2)
+
+        k = time_index(t, storm)
+        weight = (t - storm%time(k)) / (storm%time(k + 1) - storm%time(k))
+        weight = min(max(weight, 0.d0), 1.d0)
+        velocity = storm%velocity(:, k) + weight                            &
+                        * (storm%velocity(:, k + 1) - storm%velocity(:, k))
+
+        theta = atan2(velocity(2), velocity(1))
 
     end function storm_direction
 
 
     ! ==========================================================================
-    !  Use the 1980 Holland model to set the storm fields
+    !  load_slices(k, storm)
+    !    Make sure the time slices k and k + 1 are loaded, reusing slice k if
+    !    it was the second slice loaded before (the usual forward stepping)
+    ! ==========================================================================
+    subroutine load_slices(k, storm)
+
+        implicit none
+
+        integer, intent(in) :: k
+        type(data_storm_type), intent(in out) :: storm
+
+        if (storm%loaded(1) == k .and. storm%loaded(2) == k + 1) return
+
+        if (storm%loaded(2) == k) then
+            storm%wind_u(:, :, 1) = storm%wind_u(:, :, 2)
+            storm%wind_v(:, :, 1) = storm%wind_v(:, :, 2)
+            storm%pressure(:, :, 1) = storm%pressure(:, :, 2)
+        else
+            call read_slice(k, 1, storm)
+        end if
+        storm%loaded(1) = k
+        call read_slice(k + 1, 2, storm)
+        storm%loaded(2) = k + 1
+
+    end subroutine load_slices
+
+
+    ! ==========================================================================
+    !  read_slice(k, slot, storm)
+    !    Read the fields at time index k from the data file into slot
+    ! ==========================================================================
+    subroutine read_slice(k, slot, storm)
+
+#ifdef NETCDF
+        use netcdf
+        use topo_module, only: check_netcdf_error
+#endif
+
+        implicit none
+
+        integer, intent(in) :: k, slot
+        type(data_storm_type), intent(in out) :: storm
+
+        ! Locals
+        integer(kind=8) :: record_size, position
+        real(kind=4), allocatable :: buffer(:, :)
+#ifdef NETCDF
+        integer :: n
+#endif
+
+        if (DEBUG) print *, "Reading storm data at t = ", storm%time(k)
+
+        select case(storm%file_format)
+            case(1)
+                record_size = 4_8 * 3_8 * int(storm%mx, 8) * int(storm%my, 8)
+                position = 1_8 + int(k - 1, 8) * record_size
+                allocate(buffer(storm%mx, storm%my))
+                read(data_unit, pos=position) buffer
+                storm%wind_u(:, :, slot) = buffer
+                read(data_unit) buffer
+                storm%wind_v(:, :, slot) = buffer
+                read(data_unit) buffer
+                storm%pressure(:, :, slot) = buffer
+                deallocate(buffer)
+            case(2)
+                record_size = 8_8 * 3_8 * int(storm%mx, 8) * int(storm%my, 8)
+                position = 1_8 + int(k - 1, 8) * record_size
+                read(data_unit, pos=position) storm%wind_u(:, :, slot),     &
+                                              storm%wind_v(:, :, slot),     &
+                                              storm%pressure(:, :, slot)
+            case(3)
+#ifdef NETCDF
+                n = 1
+                call check_netcdf_error(nf90_get_var(storm%nc_file,         &
+                        storm%var_ids(1), storm%wind_u(:, :, slot),         &
+                        start=(/ 1, 1, k /), count=(/ storm%mx, storm%my, n /)))
+                call check_netcdf_error(nf90_get_var(storm%nc_file,         &
+                        storm%var_ids(2), storm%wind_v(:, :, slot),         &
+                        start=(/ 1, 1, k /), count=(/ storm%mx, storm%my, n /)))
+                call check_netcdf_error(nf90_get_var(storm%nc_file,         &
+                        storm%var_ids(3), storm%pressure(:, :, slot),       &
+                        start=(/ 1, 1, k /), count=(/ storm%mx, storm%my, n /)))
+#endif
+        end select
+
+    end subroutine read_slice
+
+
+    ! ==========================================================================
+    !  Set the storm fields from the gridded data, linear interpolation in time
+    !  and bilinear interpolation in space.  Points outside of the data grid
+    !  are set to zero wind and ambient pressure.
     ! ==========================================================================
     subroutine set_HWRF_fields(maux, mbc, mx, my, xlower, ylower,    &
                           dx, dy, t, aux, wind_index,           &
                           pressure_index, storm)
 
-  
+        use geoclaw_module, only: ambient_pressure
+
         implicit none
 
         ! Time of the wind field requested
@@ -106,14 +405,54 @@ contains
         integer, intent(in) :: wind_index, pressure_index
         real(kind=8), intent(inout) :: aux(maux,1-mbc:mx+mbc,1-mbc:my+mbc)
 
-        stop "HWRF data input is not yet implemented!"
+        ! Locals
+        integer :: i, j, k, s, ii, jj
+        real(kind=8) :: x, y, xi, yj, tw, w(2, 2), field(3, 2)
+
+        k = time_index(t, storm)
+        tw = (t - storm%time(k)) / (storm%time(k + 1) - storm%time(k))
+        tw = min(max(tw, 0.d0), 1.d0)
+
+        ! Patches on the same level are filled at the same time by different
+        ! threads, the first one to get here reads the data
+        !$OMP CRITICAL (data_storm_slices)
+        call load_slices(k, storm)
+        !$OMP END CRITICAL (data_storm_slices)
+
+        do j=1-mbc,my+mbc
+            y = ylower + (j - 0.5d0) * dy
+            yj = (y - storm%ylower) / storm%dy + 1.d0
+            jj = min(int(floor(yj)), storm%my - 1)
+            do i=1-mbc,mx+mbc
+                x = xlower + (i - 0.5d0) * dx
+                xi = (x - storm%xlower) / storm%dx + 1.d0
+                ii = min(int(floor(xi)), storm%mx - 1)
+
+                if (xi < 1.d0 .or. xi > storm%mx .or.                       &
+                    yj < 1.d0 .or. yj > storm%my) then
+                    aux(wind_index:wind_index + 1, i, j) = 0.d0
+                    aux(pressure_index, i, j) = ambient_pressure
+                    cycle
+                end if
+
+                ! Bilinear weights
+                w(1, 1) = (ii + 1 - xi) * (jj + 1 - yj)
+                w(2, 1) = (xi - ii) * (jj + 1 - yj)
+                w(1, 2) = (ii + 1 - xi) * (yj - jj)
+                w(2, 2) = (xi - ii) * (yj - jj)
+
+                do s=1, 2
+                    field(1, s) = sum(w * storm%wind_u(ii:ii+1, jj:jj+1, s))
+                    field(2, s) = sum(w * storm%wind_v(ii:ii+1, jj:jj+1, s))
+                    field(3, s) = sum(w * storm%pressure(ii:ii+1, jj:jj+1, s))
+                end do
+
+                aux(wind_index, i, j) = field(1, 1) + tw * (field(1, 2) - field(1, 1))
+                aux(wind_index + 1, i, j) = field(2, 1) + tw * (field(2, 2) - field(2, 1))
+                aux(pressure_index, i, j) = field(3, 1) + tw * (field(3, 2) - field(3, 1))
+            end do
+        end do
 
     end subroutine set_HWRF_fields
 
 end module data_storm_module
-
-
-
-
-
-
@@ -114,7 +114,7 @@ contains
         use model_storm_module, only: set_modified_rankine_fields
         use model_storm_module, only: set_deMaria_fields
 
-        ! use data_storm_module, only: set_data_storm => set_storm
+        use data_storm_module, only: set_data_storm => set_storm
         use data_storm_module, only: set_HWRF_fields
 
         use utility_module, only: get_value_count
@@ -192,7 +192,7 @@ contains
             read(unit,*)
 
             ! Storm Setup
-            read(unit, "(i1)") storm_specification_type
+            read(unit, *) storm_specification_type
             read(unit, *) storm_file_path
 
             close(unit)
@@ -241,9 +241,11 @@ contains
             if (-1 <= storm_specification_type .and.                    &
                       storm_specification_type < 0) then
                 select case(storm_specification_type)
-                    case(1) ! HWRF Data
+                    case(-1) ! Gridded data, e.g. HWRF
                         set_data_fields => set_HWRF_fields
                 end select
+                call set_data_storm(storm_file_path, data_storm,           &
+                                    storm_specification_type, log_unit)
             else if (storm_specification_type < 0) then
                 print *, "Storm specification data type ",               &
                             storm_specification_type, "not available."
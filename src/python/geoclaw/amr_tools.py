@@ -0,0 +1,338 @@
+r"""
+amr_tools module: $CLAW/geoclaw/src/python/geoclaw/amr_tools.py
+
+Tools to work with the AMR output frames written by GeoClaw (the files
+fort.qXXXX, fort.bXXXX and fort.tXXXX), without reading all patches into
+a pyclaw Solution.
+
+The patch headers in fort.qXXXX are read once to build an index of the
+level and extent of every patch in the frame.  The index can then be used
+to find the patches that intersect a region, to read single patches, and to
+sample the solution on a uniform grid from the finest level available at
+each point, reading only the patches that intersect the grid.  For binary
+output the data file is memory mapped, so only the part of each patch that
+is needed is read from disk.
+
+Includes:
+
+- function read_frame_info: Read the fort.tXXXX file of a frame.
+- function output_framenos: Frame numbers for which output exists.
+- class PatchIndex: Index of the patches in one AMR output frame, with
+            methods to read patches and sample on a uniform grid.
+- function uniform_grid: Cell centers of a uniform grid covering an extent.
+
+Usage::
+
+    from clawpack.geoclaw import amr_tools
+
+    pindex = amr_tools.PatchIndex('_output', 10)
+    x, y = amr_tools.uniform_grid([-120,-60,-50,0], 1./60)
+    eta, level = pindex.sample(x, y, components=[3], return_level=True)
+"""
+
+import os
+import numpy
+
+
+def _frame_fname(outdir, code, frameno):
+    return os.path.join(outdir, 'fort.%s%s' % (code, str(frameno).zfill(4)))
+
+
+def read_frame_info(outdir, frameno):
+    """
+    Read the fort.tXXXX file for frame frameno in outdir and return a
+    dictionary with the time t and the values of meqn, ngrids, naux, ndim,
+    nghost and format (e.g. 'ascii' or 'binary64').  Note that for GeoClaw
+    meqn includes eta, which is output as an extra component of q.
+    """
+    info = {'format': 'ascii'}
+    with open(_frame_fname(outdir, 't', frameno)) as tfile:
+        for line in tfile:
+            tokens = line.split()
+            if len(tokens) < 2:
+                continue
+            value, name = tokens[0], tokens[-1]
+            if name == 'time':
+                info['t'] = float(value)
+            elif name == 'format':
+                info['format'] = value
+            else:
+                info[name] = int(value)
+    return info
+
+
+def output_framenos(outdir):
+    """
+    Return a sorted list of the frame numbers for which AMR output exists
+    in outdir, based on the fort.tXXXX files.
+    """
+    import glob
+    framenos = []
+    for fname in glob.glob(os.path.join(outdir, 'fort.t*')):
+        suffix = os.path.basename(fname)[len('fort.t'):]
+        if suffix.isdigit():
+            framenos.append(int(suffix))
+    return sorted(framenos)
+
+
+def uniform_grid(extent, dx, dy=None):
+    """
+    Return 1d arrays x, y of the cell centers of a uniform grid with cell
+    size dx by dy (default dy = dx) covering extent = [x1,x2,y1,y2].
+    The number of cells is rounded, so the cell edges match the extent if
+    it is a multiple of the cell size.
+    """
+    if dy is None:
+        dy = dx
+    x1, x2, y1, y2 = extent
+    nx = max(int(round((x2 - x1) / dx)), 1)
+    ny = max(int(round((y2 - y1) / dy)), 1)
+    x = x1 + dx * (numpy.arange(nx) + 0.5)
+    y = y1 + dy * (numpy.arange(ny) + 0.5)
+    return x, y
+
+
+def _read_patch_header(f):
+    """
+    Read the next patch header from the open file f, returning a dictionary
+    of the values, or None at the end of the file.
+    """
+    header = {}
+    while 'dy' not in header:
+        line = f.readline()
+        if not line:
+            if header:
+                raise IOError('*** incomplete patch header')
+            return None
+        tokens = line.split()
+        if len(tokens) < 2:
+            continue
+        name = tokens[-1].decode()
+        if name in ('xlow', 'ylow', 'dx', 'dy'):
+            header[name] = float(tokens[0].replace(b'D', b'E'))
+        else:
+            header[name] = int(tokens[0])
+    return header
+
+
+class PatchIndex(object):
+
+    """
+    Index of the patches in one AMR output frame, built by reading only the
+    patch headers in fort.qXXXX.
+
+    For each patch p, the arrays grid_number[p], level[p], mx[p], my[p],
+    xlow[p], ylow[p], dx[p], dy[p] give the values from its header, and
+    offset[p] is the position of its data in the data file (fort.bXXXX for
+    binary output, fort.qXXXX for ascii output).
+
+    The data of a patch has shape (my, mx, meqn), the order in which it is
+    stored in the output files, with q[j,i,m] at cell center
+    (xlow + (i+0.5)*dx, ylow + (j+0.5)*dy).
+    """
+
+    def __init__(self, outdir, frameno):
+        self.outdir = outdir
+        self.frameno = frameno
+
+        info = read_frame_info(outdir, frameno)
+        self.t = info['t']
+        self.meqn = info['meqn']
+        self.naux = info.get('naux', 0)
+        self.nghost = info.get('nghost', 0)
+        self.file_format = info['format']
+
+        if self.file_format in ('binary', 'binary64'):
+            self.dtype = numpy.dtype(numpy.float64)
+        elif self.file_format == 'binary32':
+            self.dtype = numpy.dtype(numpy.float32)
+        elif self.file_format == 'ascii':
+            self.dtype = numpy.dtype(numpy.float64)
+        else:
+            raise ValueError('*** Unsupported output format %s' \
+                             % self.file_format)
+
+        if self.file_format == 'ascii':
+            self.data_file = _frame_fname(outdir, 'q', frameno)
+        else:
+            self.data_file = _frame_fname(outdir, 'b', frameno)
+
+        self._read_headers()
+        self._memmap = None
+
+    def _read_headers(self):
+        """
+        Read all patch headers in fort.qXXXX.  For ascii output the data
+        lines are skipped, recording where the data of each patch starts.
+        For binary output the offsets follow from the patch sizes, since
+        each patch is written with nghost ghost cells on each side.
+        """
+        headers = []
+        offsets = []
+        ascii = (self.file_format == 'ascii')
+        offset = 0
+        with open(_frame_fname(self.outdir, 'q', self.frameno), 'rb') as f:
+            while True:
+                header = _read_patch_header(f)
+                if header is None:
+                    break
+                headers.append(header)
+                mx = header['mx']
+                my = header['my']
+                if ascii:
+                    # skip mx*my data lines, with blank lines between rows,
+                    # recording the start of the first data line:
+                    nlines = 0
+                    while nlines < mx*my:
+                        start = f.tell()
+                        line = f.readline()
+                        if not line:
+                            raise IOError('*** incomplete patch data in %s' \
+                                          % self.data_file)
+                        if line.strip():
+                            if nlines == 0:
+                                offsets.append(start)
+                            nlines += 1
+                else:
+                    offsets.append(offset)
+                    offset += self.meqn * (mx + 2*self.nghost) \
+                              * (my + 2*self.nghost) * self.dtype.itemsize
+
+        self.npatches = len(headers)
+        for name in ['grid_number', 'AMR_level', 'mx', 'my']:
+            values = numpy.array([h[name] for h in headers], dtype=int)
+            setattr(self, 'level' if name == 'AMR_level' else name, values)
+        for name in ['xlow', 'ylow', 'dx', 'dy']:
+            setattr(self, name, numpy.array([h[name] for h in headers],
+                                            dtype=float))
+        self.offset = numpy.array(offsets, dtype=numpy.int64)
+
+    @property
+    def xhi(self):
+        return self.xlow + self.mx * self.dx
+
+    @property
+    def yhi(self):
+        return self.ylow + self.my * self.dy
+
+    @property
+    def levels(self):
+        """Sorted list of the AMR levels present in this frame."""
+        return sorted(set(self.level.tolist()))
+
+    def extent(self, level=None):
+        """
+        Return [x1,x2,y1,y2] of the bounding box of all patches, or of the
+        patches at the given level (e.g. level=1 gives the domain).
+        """
+        if level is None:
+            p = numpy.arange(self.npatches)
+        else:
+            p = numpy.nonzero(self.level == level)[0]
+        return [self.xlow[p].min(), self.xhi[p].max(),
+                self.ylow[p].min(), self.yhi[p].max()]
+
+    def resolution(self, level):
+        """Return the cell size (dx, dy) on the given level."""
+        p = numpy.nonzero(self.level == level)[0]
+        if len(p) == 0:
+            raise ValueError('*** No patches at level %i' % level)
+        return self.dx[p[0]], self.dy[p[0]]
+
+    def patches(self, extent=None, level=None):
+        """
+        Return the indices of the patches that intersect the region
+        extent = [x1,x2,y1,y2] (default all patches), optionally only those
+        on the given level, sorted by level.
+        """
+        keep = numpy.ones(self.npatches, dtype=bool)
+        if extent is not None:
+            x1, x2, y1, y2 = extent
+            keep &= (self.xlow < x2) & (self.xhi > x1) \
+                    & (self.ylow < y2) & (self.yhi > y1)
+        if level is not None:
+            keep &= (self.level == level)
+        p = numpy.nonzero(keep)[0]
+        return p[numpy.argsort(self.level[p], kind='stable')]
+
+    def read_patch(self, p):
+        """
+        Return the data of patch p as an array of shape (my, mx, meqn),
+        without ghost cells.  For binary output this is a read-only view of
+        a memory map of the data file, so nothing is read until it is used.
+        """
+        mx = self.mx[p]
+        my = self.my[p]
+        if self.file_format == 'ascii':
+            from itertools import islice
+            with open(self.data_file) as f:
+                f.seek(self.offset[p])
+                lines = islice((line for line in f if line.strip()), mx*my)
+                q = numpy.loadtxt(lines, ndmin=2)
+            return q.reshape((my, mx, self.meqn))
+
+        if self._memmap is None:
+            self._memmap = numpy.memmap(self.data_file, dtype=self.dtype,
+                                        mode='r')
+        ng = self.nghost
+        start = self.offset[p] // self.dtype.itemsize
+        size = self.meqn * (mx + 2*ng) * (my + 2*ng)
+        q = self._memmap[start:start+size].reshape((my + 2*ng, mx + 2*ng,
+                                                    self.meqn))
+        return q[ng:ng+my, ng:ng+mx, :]
+
+    def sample(self, x, y, components=None, return_level=False):
+        """
+        Sample the solution at the cell centers of the grid defined by the
+        1d arrays x and y, using the value in the cell of the finest patch
+        containing each point.
+
+        Only the patches that intersect the grid are read, and of each patch
+        only the rows and columns that contain points.  The patches are
+        processed from the coarsest level up, so finer values overwrite
+        coarser ones.
+
+        :Input:
+         - x, y: 1d arrays of coordinates, e.g. from uniform_grid.
+         - components: list of indices (0-based) of the components of q to
+           return, default all meqn components.
+         - return_level: if True, also return the level used at each point.
+
+        :Output:
+         - q: array of shape (len(y), len(x), len(components)), with NaN at
+           points not in any patch.
+         - level (if return_level): integer array of shape (len(y), len(x)),
+           0 at points not in any patch.
+        """
+        x = numpy.atleast_1d(numpy.asarray(x, dtype=float))
+        y = numpy.atleast_1d(numpy.asarray(y, dtype=float))
+        if components is None:
+            components = list(range(self.meqn))
+        components = list(components)
+
+        q = numpy.full((len(y), len(x), len(components)), numpy.nan)
+        level = numpy.zeros((len(y), len(x)), dtype=int)
+        if len(x) == 0 or len(y) == 0:
+            return (q, level) if return_level else q
+
+        extent = [x.min(), x.max(), y.min(), y.max()]
+        for p in self.patches(extent):
+            # cells of patch p that contain each of the points:
+            i = numpy.floor((x - self.xlow[p]) / self.dx[p]).astype(int)
+            j = numpy.floor((y - self.ylow[p]) / self.dy[p]).astype(int)
+            ii = numpy.nonzero((i >= 0) & (i < self.mx[p]))[0]
+            jj = numpy.nonzero((j >= 0) & (j < self.my[p]))[0]
+            if len(ii) == 0 or len(jj) == 0:
+                continue
+            i = i[ii]
+            j = j[jj]
+            i1, j1 = i.min(), j.min()
+            window = self.read_patch(p)[j1:j.max()+1, i1:i.max()+1, :]
+            window = numpy.asarray(window)[:, :, components]
+            q[jj[:,None], ii[None,:], :] = window[(j-j1)[:,None],
+                                                  (i-i1)[None,:], :]
+            level[jj[:,None], ii[None,:]] = self.level[p]
+
+        if return_level:
+            return q, level
+        return q
@@ -537,6 +537,7 @@ class SurgeData(clawpack.clawutil.data.ClawData):
 
     # Provide some mapping between model names and integers
     storm_spec_dict_mapping = {"HWRF":-1,
+                               'data': -1,
                                None: 0,
                                'holland80': 1,
                                'holland08': 8,
@@ -263,6 +263,81 @@ def rise_fraction(t, rupture_time, rise_time, rise_time_starting=None,
     return rf
 
 
+def read_dtopo_final(path, dtopo_type=None, extent=None):
+    r"""
+    Read only the final time of the dtopo file at *path*, and only the
+    portion covering *extent* = [x1,x2,y1,y2] (plus one more point on each
+    side, when available) if specified.
+
+    For dtopo_type 2 or 3 the lines for earlier times and for rows outside
+    the extent are skipped without being parsed, which is much faster than
+    reading the full file with DTopography.read when the dtopo file has
+    many times or covers a much larger region.  For dtopo_type 1 the full
+    file is read.
+
+    Returns x, y, dZ where dZ[j,i] is the final deformation at (x[i],y[j]),
+    with x and y increasing.
+    """
+
+    import itertools
+
+    if dtopo_type is None:
+        dtopo_type = topotools.determine_topo_type(path, default=3)
+
+    def window(z, z1, z2):
+        # index range covering [z1,z2], including one point beyond:
+        k1 = max(numpy.searchsorted(z, z1, side='right') - 2, 0)
+        k2 = min(numpy.searchsorted(z, z2, side='left') + 2, len(z))
+        return k1, k2
+
+    if dtopo_type == 1:
+        dtopo = DTopography(path, dtopo_type=1)
+        x = dtopo.X[0,:]
+        y = dtopo.Y[:,0]
+        dZ = dtopo.dZ[-1,:,:]
+        if extent is not None:
+            i1, i2 = window(x, extent[0], extent[1])
+            j1, j2 = window(y, extent[2], extent[3])
+            x = x[i1:i2]
+            y = y[j1:j2]
+            dZ = dZ[j1:j2, i1:i2]
+        return x, y, dZ
+
+    elif dtopo_type not in [2,3]:
+        raise ValueError("Only dtopo types 2 and 3 are supported, given %s."
+                         % dtopo_type)
+
+    with open(path) as fid:
+        header = [fid.readline().split()[0] for k in range(9)]
+        mx, my, mt = [int(v) for v in header[:3]]
+        xlower, ylower, t0, dx, dy, dt = [float(v) for v in header[3:]]
+        x = numpy.linspace(xlower, xlower + (mx-1)*dx, mx)
+        y = numpy.linspace(ylower, ylower + (my-1)*dy, my)
+
+        i1, i2 = 0, mx
+        j1, j2 = 0, my
+        if extent is not None:
+            i1, i2 = window(x, extent[0], extent[1])
+            j1, j2 = window(y, extent[2], extent[3])
+
+        # rows in file go from y[my-1] down to y[0] at each time:
+        row1 = my - j2
+        row2 = my - j1
+        if dtopo_type == 3:
+            # my lines with mx values on each
+            skip = (mt-1)*my + row1
+            lines = itertools.islice(fid, skip, skip + row2 - row1)
+            dZ = numpy.loadtxt(lines, usecols=range(i1,i2), ndmin=2)
+        else:
+            # mx*my lines with 1 value on each
+            skip = (mt-1)*mx*my + row1*mx
+            lines = itertools.islice(fid, skip, skip + (row2 - row1)*mx)
+            dZ = numpy.loadtxt(lines, ndmin=1).reshape((row2-row1, mx))
+            dZ = dZ[:, i1:i2]
+
+    return x[i1:i2], y[j1:j2], numpy.flipud(dZ)
+
+
 
 # ==============================================================================
 #  DTopography Base Class
@@ -42,6 +42,8 @@ class FGmaxGrid(object):
                              # when point_style==0, distinct from header file
         self.write_xy_fname = False # controls whether xy_fname is created
                                     # by self.write_input_data, or only header
+        self.xy_binary = False  # write xy_fname in binary format, see
+                                # write_fgmax_points_binary
 
         # Other possible GeoClaw inputs:
         self.x = None
@@ -50,6 +52,8 @@ class FGmaxGrid(object):
         self.Y = None
         self.Z = None  # for topo DEM values if available
         self.fgmax_point = None  # for point_style==4
+        self.ps4_index = None    # (j,i) of each point in 2d arrays, ps 4
+        self.ps4_shape = None    # shape of 2d arrays for point_style==4
         self.force_dry_init = None  # =1 if wet, =0 if dry
         self.dx = None
         self.dy = None
@@ -119,13 +123,7 @@ class FGmaxGrid(object):
             self.npts = npts = int(fgmax_input[7].split()[0])
             if npts == 0:
                 self.xy_fname = fgmax_input[8][1:-2]  # strip quotes
-                xy = numpy.loadtxt(self.xy_fname, skiprows=1)
-                self.X = xy[:,0]
-                self.Y = xy[:,1]
-                if xy.shape[1] > 2:
-                    self.Z = xy[:,2]  # in case DEM values also stored in input file
-                else:
-                    self.Z = None
+                self.X, self.Y, self.Z = read_fgmax_points(self.xy_fname)
                 self.npts = npts = len(self.X)
                 print('Read %i x,y points from \n    %s' % (npts, self.xy_fname))
             else:
@@ -211,11 +209,13 @@ class FGmaxGrid(object):
                 fid.write("'%s'\n" % self.xy_fname)
                 print("points should be in file:")
                 print("   %s" % self.xy_fname)
-                if self.write_xy_fname:
+                if self.write_xy_fname and self.xy_binary:
+                    write_fgmax_points_binary(self.xy_fname, self.X, self.Y)
+                elif self.write_xy_fname:
                     if self.Z is not None:
                         xydata = numpy.vstack([self.X,self.Y,self.Z]).T
                     else:
-                        xydata = numpy.vstack([self.X,self.Y])
+                        xydata = numpy.vstack([self.X,self.Y]).T
                     numpy.savetxt(self.xy_fname, xydata,
                                   header='%8i' % len(self.X),
                                   comments='', fmt='%24.14e')
@@ -355,7 +355,8 @@ class FGmaxGrid(object):
                 raise ValueError('for point_style==4, require xy_fname')
 
     def read_output(self, fgno=None, outdir=None, verbose=True, 
-                    indexing='ij'):
+                    indexing='ij', qois=None, cache=False, ps4_sparse=False,
+                    ps4_map=True):
         r"""
         Read the GeoClaw results on the fgmax grid numbered *fgno*.
         
@@ -367,6 +368,20 @@ class FGmaxGrid(object):
            X[j,i],Y[j,i] corresponds to point x[i],y[j]
         This is useful if you want to save the fgmax results in same format as 
         topofiles, using topotools.Topography.write().
+
+        qois can be a list of the quantities needed, e.g. ['h','s'], in
+        which case only these (and their times) are set, along with X, Y,
+        level, B, which are always set.  Include 'arrival_time' to also
+        set arrival times.  The default qois=None sets everything available.
+
+        If cache is True, the columns read are also saved in a binary file
+        fgmaxNNNN.txt.npz that is used instead of parsing the text file
+        in later calls, as long as the text file is unchanged.  Default is
+        False, so nothing is written to outdir.  See read_fgmax_columns.
+
+        For point_style 4, ps4_sparse is passed to ps4_to_arrays as sparse.
+        If ps4_map is False, ps4_to_arrays is not called and the results
+        are left as 1d arrays, without reading xy_fname.
            
         """
 
@@ -394,18 +409,11 @@ class FGmaxGrid(object):
             raise IOError("File not found: %s" % fname)
 
         print("Reading %s ..." % fname)
-        d = numpy.loadtxt(fname)
-
-        if point_style == 4:
-            self.npts = d.shape[0]
-            print('point_style == 4, found %i points ' % self.npts)
-
+        ncols = fgmax_ncols(fname)
 
         # new format in v5.7.0, includes column for B = topo from aux array
         cols_expected = [7,9,15]
 
-        ncols = d.shape[1]
-
         if ncols not in cols_expected:
             raise IOError("*** Unexpected number of columns %s in file %s" \
                     % (ncols, fname))
@@ -445,6 +453,28 @@ class FGmaxGrid(object):
             ind_hmin_time = 13
             ind_arrival_time = 14
 
+        # columns to read, only for quantities requested:
+        qoi_cols = {'h': (ind_h, ind_h_time),
+                    's': (ind_s, ind_s_time),
+                    'hs': (ind_hs, ind_hs_time),
+                    'hss': (ind_hss, ind_hss_time),
+                    'hmin': (ind_hmin, ind_hmin_time)}
+        if qois is None:
+            qois = list(qoi_cols.keys()) + ['arrival_time']
+        usecols = [ind_x, ind_y, ind_level, ind_B, ind_h]
+        for qoi in qois:
+            if qoi == 'arrival_time':
+                usecols.append(ind_arrival_time)
+            elif qoi not in qoi_cols:
+                raise ValueError("*** Unrecognized qoi %s" % qoi)
+            elif qoi_cols[qoi][0] is not None:
+                usecols += list(qoi_cols[qoi])
+
+        d = read_fgmax_columns(fname, usecols, cache=cache, verbose=verbose)
+
+        if point_style == 4:
+            self.npts = len(d[ind_x])
+            print('point_style == 4, found %i points ' % self.npts)
 
         if point_style in [0,1,4]:
             fg_shape = (self.npts,)
@@ -463,43 +493,40 @@ class FGmaxGrid(object):
             raise NotImplementedError("Not implemented for point_style %s" \
                 % point_style)
 
-        X = numpy.reshape(d[:,0],fg_shape,order=reshape_order)
-        Y = numpy.reshape(d[:,1],fg_shape,order=reshape_order)
-        y0 = 0.5*(Y.min() + Y.max())   # mid-latitude for scaling plots
-        h = numpy.reshape(d[:,ind_h],fg_shape,order=reshape_order)
+        def reshape(ind):
+            return numpy.reshape(d[ind],fg_shape,order=reshape_order)
+
+        X = reshape(ind_x)
+        Y = reshape(ind_y)
+        h = reshape(ind_h)
 
         # AMR level used for each fgmax value:
-        level = numpy.reshape(d[:,ind_level].astype('int'),fg_shape,
-                              order=reshape_order)
+        level = reshape(ind_level).astype('int')
 
         # Set B = topo array
-        B = numpy.reshape(d[:,ind_B],fg_shape,order=reshape_order)
+        B = reshape(ind_B)
 
-        mask = (h < -1e50)  # points that were never set
-        B = ma.masked_where(mask, B)
-        h = ma.masked_where(mask, h)
+        # points that were never set, each field gets its own copy of the mask:
+        mask = (h < -1e50)
+        B = ma.masked_array(B, mask=mask.copy())
+        h = ma.masked_array(h, mask=mask.copy())
 
         def set_q_time(ind_q, ind_q_time):
-            q = numpy.reshape(d[:,ind_q],fg_shape,order=reshape_order)
-            q = ma.masked_where(mask,q)
-            q_time = numpy.reshape(d[:,ind_q_time],fg_shape,order=reshape_order)
-            q_time = ma.masked_where(mask, q_time)
+            q = ma.masked_array(reshape(ind_q), mask=mask.copy())
+            q_time = ma.masked_array(reshape(ind_q_time), mask=mask.copy())
             return q, q_time
 
-        self.h, self.h_time = set_q_time(ind_h, ind_h_time)
-        if ind_s:
-            self.s, self.s_time = set_q_time(ind_s, ind_s_time)
-        if ind_hs:
-            self.hs, self.hs_time = set_q_time(ind_hs, ind_hs_time)
-            self.hss, self.hss_time = set_q_time(ind_hss, ind_hss_time)
-            self.hmin, self.hmin_time = set_q_time(ind_hmin, ind_hmin_time)
-
-        # last column is arrival times:
-        arrival_time = numpy.reshape(d[:,ind_arrival_time],
-                                     fg_shape,order=reshape_order)
-        arrival_time = ma.masked_where(arrival_time < -1e50, arrival_time)
-        arrival_time = ma.masked_where(mask, arrival_time)
-        self.arrival_time = arrival_time
+        for qoi in qois:
+            if qoi in qoi_cols and qoi_cols[qoi][0] is not None:
+                q, q_time = set_q_time(*qoi_cols[qoi])
+                setattr(self, qoi, q)
+                setattr(self, qoi + '_time', q_time)
+
+        if 'arrival_time' in qois:
+            # last column is arrival times:
+            arrival_time = reshape(ind_arrival_time)
+            self.arrival_time = ma.masked_array(arrival_time,
+                                    mask=(mask | (arrival_time < -1e50)))
 
         self.level = level
         self.X = X
@@ -516,11 +543,11 @@ class FGmaxGrid(object):
             else:
                 self.h_onshore = ma.masked_where(self.B0 < 0., self.h)
 
-        if point_style==4:
+        if point_style==4 and ps4_map:
             #print('Returning lists, convert to masked arrays based on input grid')
             #print('   using to_arrays() function')
             try:
-                self.ps4_to_arrays(verbose=verbose)
+                self.ps4_to_arrays(verbose=verbose, sparse=ps4_sparse)
             except:
                 print('*** Problem converting from 1d lists to 2d arrays,\n' \
                       + '    Trying to map onto grid specified by:\n    ', \
@@ -550,14 +577,23 @@ class FGmaxGrid(object):
         y2 = self.Y.max()
         return [x1,x2,y1,y2]
 
-    def ps4_to_arrays(self, verbose=True):
+    def ps4_to_arrays(self, verbose=True, sparse=False):
         """
         for point_style==4, convert lists of fgmax values into masked arrays
         based on the topo_style==3 file self.xy_fname that was used to specify
         the fgmax points in the GeoClaw run.
+
+        The indices of each fgmax point in the 2d arrays are computed only
+        once and stored as self.ps4_index = (j,i), with self.ps4_shape the
+        shape of the 2d arrays.
+
+        If sparse is True, the fgmax values are left as 1d arrays and only
+        the index map is set, which avoids allocating full 2d arrays when
+        the fgmax points are a small fraction of the grid (e.g. a narrow
+        strip along the coast).  Use self.ps4_to_2d(z_1d) to expand any
+        1d array to a 2d masked array when needed.
         """
 
-        from numpy import ma
         assert self.point_style==4, '*** Requires point_style==4'
 
         if self.X.ndim==2 or self.Y.ndim==2:
@@ -571,43 +607,53 @@ class FGmaxGrid(object):
             print('Will map fgmax points onto masked arrays defined by file:')
             print('     %s' % self.xy_fname)
 
-        from clawpack.geoclaw import topotools
-        pts_chosen = topotools.Topography(path=self.xy_fname, topo_type=3)
-        X = pts_chosen.X
-        Y = pts_chosen.Y
-        mask = numpy.logical_not(pts_chosen.Z)
+        X, Y, Z = read_fgmax_mask(self.xy_fname)
         x1 = X.min()
         y1 = Y.min()
 
-        # possible arrays from GeoClaw output to convert:
-        zarrays = ['level','B','h','h_time','s','s_time','hs','hs_time',\
-                   'hss','hss_time','hmin','hmin_time','arrival_time']
-
         dx = X[0,1] - X[0,0]
         dy = Y[1,0] - Y[0,0]
         if verbose:
             print('Deduced dx = %g, dy = %g'  % (dx,dy))
 
+        i = numpy.round((numpy.asarray(x_1d) - x1) / dx).astype(int)
+        j = numpy.round((numpy.asarray(y_1d) - y1) / dy).astype(int)
+        self.ps4_index = (j, i)
+        self.ps4_shape = X.shape
+
+        if sparse:
+            if verbose:
+                print('Keeping 1d arrays, set ps4_index for %i points' \
+                      % len(i))
+            return
+
+        # possible arrays from GeoClaw output to convert:
+        zarrays = ['level','B','h','h_time','s','s_time','hs','hs_time',\
+                   'hss','hss_time','hmin','hmin_time','arrival_time']
+
         for attr in zarrays:
             z_1d = getattr(self, attr, None)
             if z_1d is None:
                 if verbose: print('not converting attribute %s == None' % attr)
             else:
-                Z = ma.masked_array(data=numpy.empty(X.shape), mask=True)
-                for k in range(len(x_1d)):
-                    i = int(round((x_1d[k]-x1)/dx))
-                    j = int(round((y_1d[k]-y1)/dy))
-                    Z[j,i] = z_1d[k]
-                if 0:
-                    if not numpy.alltrue(mask == Z.mask):
-                        print('*** converting to arrays gave unexpected mask for')
-                        print('    Z array =  %s' % attr)
-                setattr(self, attr, Z)
+                setattr(self, attr, self.ps4_to_2d(z_1d))
                 if verbose: print('converted %s to 2d array' % attr)
 
         self.X = X
         self.Y = Y
 
+    def ps4_to_2d(self, z_1d):
+        """
+        for point_style==4, after calling self.ps4_to_arrays, expand a 1d
+        array z_1d of values at the fgmax points to a 2d masked array,
+        masked at grid points that are not fgmax points (or where z_1d is
+        masked).
+        """
+        Z = ma.masked_array(data=numpy.zeros(self.ps4_shape,
+                                             dtype=numpy.asarray(z_1d).dtype),
+                            mask=True)
+        Z[self.ps4_index] = z_1d
+        return Z
 
 
     def interp_dz(self,dtopo_path,dtopo_type):
@@ -616,17 +662,32 @@ class FGmaxGrid(object):
         a specified dtopo file.
         Also calculates B0 = B - dz, attempting to recover the pre-event
         topography from the GeoClaw run topography stored in B.
+
+        Only the final time and the part of the dtopo file covering the
+        fgmax points is read.  dz is computed by bilinear interpolation,
+        which is done separably in x and y when X,Y are a rectangular grid,
+        and is set to 0 outside the dtopo extent.
         """
         from clawpack.geoclaw import dtopotools
-        from scipy.interpolate import RegularGridInterpolator
-
-        dtopo = dtopotools.DTopography(dtopo_path, dtopo_type=dtopo_type)
-        x1d = dtopo.X[0,:]
-        y1d = dtopo.Y[:,0]
-        dtopo_func = RegularGridInterpolator((x1d,y1d), dtopo.dZ[-1,:,:].T,
-                        method='linear', bounds_error=False, fill_value=0.)
-        dz = dtopo_func(list(zip(numpy.ravel(self.X), numpy.ravel(self.Y))))
-        self.dz = numpy.reshape(dz, self.X.shape)
+
+        X = numpy.asarray(self.X)
+        Y = numpy.asarray(self.Y)
+        extent = [X.min(), X.max(), Y.min(), Y.max()]
+        x1d, y1d, dZ = dtopotools.read_dtopo_final(dtopo_path, dtopo_type,
+                                                    extent=extent)
+
+        if X.ndim == 2 and (X[0,:] == X[-1,:]).all() \
+                       and (Y[:,0] == Y[:,-1]).all():
+            # indexing='xy', X[j,i],Y[j,i] corresponds to point x[i],y[j]
+            dz = _bilinear_grid(x1d, y1d, dZ, X[0,:], Y[:,0])
+        elif X.ndim == 2 and (X[:,0] == X[:,-1]).all() \
+                         and (Y[0,:] == Y[-1,:]).all():
+            # indexing='ij', X[i,j],Y[i,j] corresponds to point x[i],y[j]
+            dz = _bilinear_grid(x1d, y1d, dZ, X[:,0], Y[0,:]).T
+        else:
+            dz = _bilinear_points(x1d, y1d, dZ, X.ravel(), Y.ravel())
+
+        self.dz = numpy.reshape(dz, X.shape)
         print('Over fgmax extent, min(dz) = %.2f m, max(dz) = %.2f m' \
              % (dz.min(), dz.max()))
 
@@ -634,6 +695,255 @@ class FGmaxGrid(object):
         # self.B0 = self.B - self.dz
 
 
+def _bilinear_weights(z1d, zq):
+    """
+    For each value in zq, return the index k of the interval
+    [z1d[k], z1d[k+1]] containing it, the fraction alpha of the way
+    through the interval, and a boolean array that is False outside
+    [z1d[0], z1d[-1]].
+    """
+    if len(z1d) == 1:
+        k = numpy.zeros(zq.shape, dtype=int)
+        return k, numpy.zeros(zq.shape), zq == z1d[0]
+    k = numpy.searchsorted(z1d, zq, side='right') - 1
+    k = numpy.clip(k, 0, len(z1d) - 2)
+    alpha = (zq - z1d[k]) / (z1d[k+1] - z1d[k])
+    inside = (zq >= z1d[0]) & (zq <= z1d[-1])
+    return k, alpha, inside
+
+
+def _bilinear_grid(x1d, y1d, Z, xq, yq):
+    """
+    Bilinear interpolation of Z[j,i] at (x1d[i],y1d[j]) to the grid of
+    points xq[i], yq[j], done separably, returning an array of shape
+    (len(yq), len(xq)) that is 0 outside the extent of x1d, y1d.
+    """
+    i, ax, inx = _bilinear_weights(x1d, xq)
+    j, ay, iny = _bilinear_weights(y1d, yq)
+    i2 = numpy.minimum(i + 1, len(x1d) - 1)
+    j2 = numpy.minimum(j + 1, len(y1d) - 1)
+    # interpolate in y to rows at yq, then in x:
+    Zy = (1 - ay)[:,None] * Z[j,:] + ay[:,None] * Z[j2,:]
+    Zq = (1 - ax)[None,:] * Zy[:,i] + ax[None,:] * Zy[:,i2]
+    Zq[~iny, :] = 0.
+    Zq[:, ~inx] = 0.
+    return Zq
+
+
+def _bilinear_points(x1d, y1d, Z, xq, yq):
+    """
+    Bilinear interpolation of Z[j,i] at (x1d[i],y1d[j]) to the points
+    (xq[k],yq[k]), returning 0 outside the extent of x1d, y1d.
+    """
+    i, ax, inx = _bilinear_weights(x1d, xq)
+    j, ay, iny = _bilinear_weights(y1d, yq)
+    i2 = numpy.minimum(i + 1, len(x1d) - 1)
+    j2 = numpy.minimum(j + 1, len(y1d) - 1)
+    Zq = (1 - ay) * ((1 - ax) * Z[j,i] + ax * Z[j,i2]) \
+         + ay * ((1 - ax) * Z[j2,i] + ax * Z[j2,i2])
+    return numpy.where(inx & iny, Zq, 0.)
+
+
+# Binary files of fgmax points start with one of these strings,
+# see fgmax_read.f90:
+fgmax_points_magic = b'FGMAXXY1'    # for point_style==0
+fgmax_mask_magic = b'FGMAXMK1'      # for point_style==4
+
+
+def fgmax_file_magic(fname):
+    """
+    Return the first 8 bytes of the file fname, which is fgmax_points_magic
+    or fgmax_mask_magic for binary files of fgmax points.
+    """
+    with open(fname, 'rb') as f:
+        return f.read(8)
+
+
+def write_fgmax_points_binary(fname, x, y):
+    """
+    Write the list of fgmax points x,y for point_style==0 to the binary
+    file fname, which can be used as xy_fname in place of a text file.
+    The file contains fgmax_points_magic, npts as an int64, and then the
+    x and y arrays as float64.
+    """
+    x = numpy.asarray(x, dtype=numpy.float64).ravel()
+    y = numpy.asarray(y, dtype=numpy.float64).ravel()
+    assert x.shape == y.shape, '*** x and y must have the same length'
+    with open(fname, 'wb') as f:
+        f.write(fgmax_points_magic)
+        numpy.array([len(x)], dtype=numpy.int64).tofile(f)
+        x.tofile(f)
+        y.tofile(f)
+
+
+def write_fgmax_mask_binary(fname, x, y, Z):
+    """
+    Write the fgmax points for point_style==4 to the binary file fname,
+    which can be used as xy_fname in place of a topo_type==3 file.
+    x, y are the equally spaced (increasing) grid coordinates and
+    Z[j,i] is nonzero if (x[i],y[j]) is an fgmax point, e.g. the
+    attributes x, y, Z of the topotools.Topography used to make
+    a topo_type==3 file.
+
+    The file contains fgmax_mask_magic, nx, ny as int64, x[0], y[0], dx, dy
+    as float64, and the mask as nx*ny int8 values in the same order as in
+    a topo_type==3 file (rows from N to S).
+    """
+    Z = numpy.asarray(Z)
+    ny, nx = Z.shape
+    assert len(x) == nx and len(y) == ny, '*** shape of Z does not match x,y'
+    dx = (x[-1] - x[0]) / (nx - 1)
+    dy = (y[-1] - y[0]) / (ny - 1)
+    with open(fname, 'wb') as f:
+        f.write(fgmax_mask_magic)
+        numpy.array([nx, ny], dtype=numpy.int64).tofile(f)
+        numpy.array([x[0], y[0], dx, dy], dtype=numpy.float64).tofile(f)
+        numpy.flipud(Z != 0).astype(numpy.int8).tofile(f)
+
+
+def read_fgmax_points(fname):
+    """
+    Read a file of fgmax points for point_style==0, either a text file with
+    npts on the first line and then x, y (and possibly Z) on each line,
+    or a binary file written by write_fgmax_points_binary.
+    Returns X, Y, Z with Z = None if not in the file.
+    """
+    if fgmax_file_magic(fname) == fgmax_points_magic:
+        with open(fname, 'rb') as f:
+            f.seek(8)
+            npts = int(numpy.fromfile(f, dtype=numpy.int64, count=1)[0])
+            xy = numpy.fromfile(f, dtype=numpy.float64, count=2*npts)
+        return xy[:npts], xy[npts:], None
+
+    xy = numpy.loadtxt(fname, skiprows=1)
+    if xy.shape[1] > 2:
+        Z = xy[:,2]  # in case DEM values also stored in input file
+    else:
+        Z = None
+    return xy[:,0], xy[:,1], Z
+
+
+def read_fgmax_mask(fname):
+    """
+    Read a file specifying fgmax points for point_style==4, either a
+    topo_type==3 file or a binary file written by write_fgmax_mask_binary.
+    Returns X, Y, Z as 2d arrays with Y increasing with the row index,
+    as for topotools.Topography, and Z nonzero at fgmax points.
+    """
+    if fgmax_file_magic(fname) == fgmax_mask_magic:
+        with open(fname, 'rb') as f:
+            f.seek(8)
+            nx, ny = numpy.fromfile(f, dtype=numpy.int64, count=2)
+            x1, y1, dx, dy = numpy.fromfile(f, dtype=numpy.float64, count=4)
+            Z = numpy.fromfile(f, dtype=numpy.int8, count=nx*ny)
+        Z = numpy.flipud(Z.reshape((ny, nx)))
+        x = x1 + dx*numpy.arange(nx)
+        y = y1 + dy*numpy.arange(ny)
+        X, Y = numpy.meshgrid(x, y)
+        return X, Y, Z
+
+    from clawpack.geoclaw import topotools
+    pts_chosen = topotools.Topography(path=fname, topo_type=3)
+    return pts_chosen.X, pts_chosen.Y, pts_chosen.Z
+
+
+def fgmax_ncols(fname):
+    """
+    Return the number of columns in the fgmax output file fname.
+    """
+    with open(fname) as f:
+        return len(f.readline().split())
+
+
+def read_fgmax_columns(fname, usecols=None, cache=False, chunksize=1000000,
+                       verbose=True):
+    """
+    Read columns of the fgmax output file fname (e.g. fgmax0001.txt),
+    returning a dictionary of 1D arrays indexed by column number.
+
+    usecols is a list of the column numbers needed, by default all columns.
+    Only these columns are parsed and only these arrays are created.
+
+    The file is parsed in chunks of chunksize lines, so the full text is
+    never held in memory.  If cache is True, the columns parsed are also
+    saved in the binary file fname + '.npz' (if the directory is writable),
+    along with the modification time and size of fname.  Later calls load
+    the requested columns from this file instead, provided fname has not
+    changed, which is much faster for large fgmax grids.  Columns missing
+    from the cache are parsed from fname and added to the cache.
+    """
+
+    import itertools
+
+    ncols = fgmax_ncols(fname)
+    if usecols is None:
+        usecols = list(range(ncols))
+    usecols = sorted(set(usecols))
+
+    cache_fname = fname + '.npz'
+    stat = os.stat(fname)
+    key = numpy.array([stat.st_mtime_ns, stat.st_size], dtype=numpy.int64)
+
+    cached = {}
+    others = {}
+    if cache and os.path.isfile(cache_fname):
+        try:
+            with numpy.load(cache_fname) as npz:
+                if numpy.array_equal(npz['key'], key):
+                    # only the columns needed are read from the npz file:
+                    names = ['col%i' % k for k in usecols]
+                    cached = {k: npz[name] for k,name in zip(usecols, names)
+                              if name in npz.files}
+                    if len(cached) < len(usecols):
+                        # kept to write them back with the new columns:
+                        others = {name: npz[name] for name in npz.files
+                                  if name.startswith('col')
+                                  and name not in names}
+                elif verbose:
+                    print('Ignoring out of date cache %s' % cache_fname)
+        except (OSError, KeyError, ValueError):
+            if verbose:
+                print('Ignoring unreadable cache %s' % cache_fname)
+        if verbose and cached:
+            print('Reading cached columns from %s' % cache_fname)
+
+    parsecols = [k for k in usecols if k not in cached]
+    if len(parsecols) == 0:
+        return {k: cached[k] for k in usecols}
+
+    chunks = {k: [] for k in parsecols}
+    with open(fname) as f:
+        while True:
+            lines = list(itertools.islice(f, chunksize))
+            if len(lines) == 0:
+                break
+            d = numpy.loadtxt(lines, usecols=parsecols, ndmin=2)
+            for n,k in enumerate(parsecols):
+                chunks[k].append(d[:,n])
+    columns = {k: numpy.concatenate(chunks[k]) for k in parsecols}
+
+    if cache:
+        # write to a temporary file and rename, in case of parallel readers:
+        arrays = dict(others)
+        arrays.update({'col%i' % k: v for k,v in cached.items()})
+        arrays.update({'col%i' % k: columns[k] for k in parsecols})
+        tmp_fname = '%s.%i.tmp' % (cache_fname, os.getpid())
+        try:
+            with open(tmp_fname, 'wb') as f:
+                numpy.savez(f, key=key, **arrays)
+            os.replace(tmp_fname, cache_fname)
+            if verbose:
+                print('Created cache %s' % cache_fname)
+        except OSError:
+            if verbose:
+                print('*** Could not write cache %s' % cache_fname)
+            if os.path.isfile(tmp_fname):
+                os.remove(tmp_fname)
+
+    columns.update({k: cached[k] for k in usecols if k in cached})
+    return {k: columns[k] for k in usecols}
+
+
 def adjust_fgmax_1d(x1_desired, x2_desired, x1_domain, dx):
     """
     Adjust the upper and lower limits of a grid so that equally spaced
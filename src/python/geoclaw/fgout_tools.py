@@ -14,6 +14,15 @@ Includes:
 - function make_fgout_fcn_xyt: Takes 2 FGoutFrame objects and produces an
             interpolating function that can be evaluated for any (x,y,t)
             at intermediate times.
+- class FGoutInterpPlan: Precomputed cell indices and weights for
+            interpolating any fgout frame to a fixed (or slowly moving)
+            set of points.
+- class FGoutMaxReducer: Streaming max, time of max and arrival time
+            computed from fgout frames, convertible to an FGmaxGrid.
+- function reduce_fgout_frames: Apply FGoutMaxReducer to many frames,
+            optionally in parallel over disjoint frame ranges.
+- function write_fgout_gauges: Write time series at points, e.g. from
+            FGoutGrid.extract_points, as synthetic gauge files.
 - function write_netcdf: Write a specified set of qoi's from a list of
             fgout frames, as a single netCDF file
 - function read_netcdf: Read a netCDF file and return a list of fgout frames,
@@ -216,6 +225,97 @@ class FGoutFrame(object):
             self._hss = self.h * self.s**2
         return self._hss
 
+    def compute(self, qois, dtype=None, out=None):
+        """
+        Compute several quantities of interest together, e.g.
+
+            u, v, s, hss = fgframe.compute(['u','v','s','hss'])
+
+        The velocities are computed only once, with a single wet mask
+        h > self.drytol (velocities are set to 0 elsewhere), and derived
+        quantities are computed in place rather than via temporary arrays.
+        This is more efficient than using the properties u, v, s, hss
+        separately, e.g. in plotting loops over many frames.
+
+        qois can include 'u', 'v', 's', 'hs', 'hss' and any other attribute
+        such as 'h', 'hu', 'eta', 'B', which are returned as views of q
+        when possible.
+
+        dtype can be set to e.g. numpy.float32 to reduce memory.  The default
+        None gives float64 and then the computed u, v, s, hss are also
+        stored so that accessing the properties later does not recompute them.
+
+        out can be a dictionary of preallocated arrays (with the shape of h)
+        indexed by qoi names, e.g. from a previous call, in which case those
+        results are written into the arrays provided.
+
+        Returns a list of arrays in the same order as qois.
+        """
+
+        if out is None:
+            out = {}
+        float_dtype = numpy.dtype(float) if dtype is None else numpy.dtype(dtype)
+        derived = ['u', 'v', 's', 'hs', 'hss']
+        need_uv = any([qoi in derived for qoi in qois])
+
+        def buffer(name):
+            if name in out:
+                return out[name]
+            return numpy.empty(self.h.shape, dtype=float_dtype)
+
+        results = {}
+        if need_uv:
+            h = self.h
+            wet = h > self.drytol
+            for name, hq in [('u', self.hu), ('v', self.hv)]:
+                q = buffer(name)
+                q.fill(0.)
+                numpy.divide(hq, h, out=q, where=wet, casting='same_kind')
+                results[name] = q
+            u = results['u']
+            v = results['v']
+
+            if 's' in qois or 'hs' in qois or 'hss' in qois:
+                # s**2 is needed for s, hs and hss:
+                ss = buffer('hss') if 'hss' in qois else \
+                     numpy.empty(h.shape, dtype=float_dtype)
+                numpy.multiply(u, u, out=ss)
+                ss += v*v
+                if 's' in qois or 'hs' in qois:
+                    s = buffer('s')
+                    numpy.sqrt(ss, out=s)
+                    results['s'] = s
+                    if 'hs' in qois:
+                        hs = buffer('hs')
+                        numpy.multiply(h, s, out=hs, casting='same_kind')
+                        results['hs'] = hs
+                if 'hss' in qois:
+                    numpy.multiply(ss, h, out=ss, casting='same_kind')
+                    results['hss'] = ss
+
+            if dtype is None and not out:
+                # keep for later use of properties:
+                self._u = u
+                self._v = v
+                if 's' in results:
+                    self._s = results['s']
+                if 'hss' in results:
+                    self._hss = results['hss']
+
+        output = []
+        for qoi in qois:
+            if qoi in results:
+                output.append(results[qoi])
+            else:
+                q = getattr(self, qoi)
+                if qoi in out:
+                    out[qoi][...] = q
+                    q = out[qoi]
+                elif dtype is not None:
+                    q = q.astype(float_dtype, copy=False)
+                output.append(q)
+        return output
+
     @property
     def huc(self):
         """huc - Boussinesq correction to hu"""
@@ -760,6 +860,131 @@ class FGoutGrid(object):
         return fgout_frame
 
 
+    def frame_time(self, frameno):
+        """
+        Read the time of a frame from the fgoutXXXX.tYYYY file, without
+        reading the frame data.
+        """
+        fname = os.path.join(self.outdir, 'fgout%s.t%s' \
+                    % (str(self.fgno).zfill(4), str(frameno).zfill(4)))
+        with open(fname) as filep:
+            t = float(filep.readline().split()[0])
+        return t
+
+
+    def output_framenos(self):
+        """
+        Return a sorted list of the frame numbers for which output exists in
+        self.outdir, based on the fgoutXXXX.tYYYY files.
+        """
+        import glob
+        prefix = 'fgout%s.t' % str(self.fgno).zfill(4)
+        framenos = []
+        for fname in glob.glob(os.path.join(self.outdir, prefix + '*')):
+            suffix = os.path.basename(fname)[len(prefix):]
+            if suffix.isdigit():
+                framenos.append(int(suffix))
+        return sorted(framenos)
+
+
+    def frame_data(self, frameno):
+        """
+        Return the q values of a frame as an array of shape (ny, nx, nqout),
+        the order in which they are stored in binary output files.
+        For binary output this is a read-only memory map of the file,
+        so only the values actually accessed are read from disk.
+        For ascii output the full frame is read.
+        """
+        if self.output_format[:6] == 'binary':
+            if self.output_format == 'binary32':
+                dtype = numpy.float32
+            else:
+                dtype = numpy.float64
+            fname = os.path.join(self.outdir, 'fgout%s.b%s' \
+                    % (str(self.fgno).zfill(4), str(frameno).zfill(4)))
+            # Fortran array q(nqout,mx,my) written with access='stream':
+            return numpy.memmap(fname, dtype=dtype, mode='r',
+                                shape=(self.ny, self.nx, len(self.q_out_vars)))
+        else:
+            return self.read_frame(frameno).q.T
+
+
+    def extract_points(self, x, y, framenos=None, qois=['h','hu','hv','eta'],
+                       method='nearest', verbose=True):
+        """
+        Extract time series of the qois at the points (x,y) from a sequence
+        of fgout frames, e.g. to compare with tide gauges.
+
+        For binary output, only the cells needed for interpolating to the
+        points are read from each frame, using a memory map of the file.
+        For ascii output the full frames must be read.
+
+        :Input:
+         - x, y: floats or equal-length 1D arrays of point locations.
+         - framenos: list of frame numbers, default is all frames
+           1, 2, ..., self.nout.
+         - qois: list of strings, any attributes of FGoutFrame, e.g.
+           'h', 'hu', 'hv', 'eta', 'B', 'u', 'v', 's', 'hss'.
+         - method: 'nearest' or 'linear', as in make_fgout_fcn_xy.
+
+        :Output:
+         - t: array of frame times, shape (nt,)
+         - qoi_arrays: dictionary indexed by the strings in qois, each an
+           array with shape (npts, nt).
+        """
+
+        if framenos is None:
+            framenos = range(1, self.nout+1)
+        framenos = list(framenos)
+
+        plan = FGoutInterpPlan(self, x, y, method=method)
+
+        # cells needed and the corresponding indices into the compressed
+        # list of cells:
+        cells = numpy.unique(plan.index)
+        cell_index = numpy.searchsorted(cells, plan.index)
+        i_cells = cells // self.ny
+        j_cells = cells % self.ny
+
+        # small fgout grid holding only the needed cells, so that any qoi
+        # defined for FGoutFrame can be evaluated on them:
+        cells_grid = FGoutGrid(fgno=self.fgno, outdir=self.outdir,
+                               output_format=self.output_format,
+                               qmap=self.qmap)
+        cells_grid.q_out_vars = self.q_out_vars
+        cells_grid.drytol = self.drytol
+
+        t = numpy.empty(len(framenos))
+        qoi_arrays = {}
+        for qoi in qois:
+            qoi_arrays[qoi] = numpy.empty((plan.npts, len(framenos)))
+
+        for k,frameno in enumerate(framenos):
+            if self.output_format[:6] == 'binary':
+                qmm = self.frame_data(frameno)
+                qcells = numpy.array(qmm[j_cells, i_cells, :].T, dtype=float)
+                del qmm
+                t[k] = self.frame_time(frameno)
+            else:
+                fgframe = self.read_frame(frameno)
+                qcells = fgframe.q[:, i_cells, j_cells]
+                t[k] = fgframe.t
+
+            fgcells = FGoutFrame(cells_grid, frameno)
+            fgcells.t = t[k]
+            fgcells.q = qcells[:,:,numpy.newaxis]
+            for qoi in qois:
+                qc = getattr(fgcells, qoi)[:,0]
+                qout = (qc[cell_index] * plan.weights).sum(axis=0)
+                qout[numpy.logical_not(plan.inside)] = plan.fill_value
+                qoi_arrays[qoi][:,k] = qout
+
+        if verbose:
+            print('Extracted %i points from %i frames of fgout grid %i' \
+                  % (plan.npts, len(framenos), self.fgno))
+        return t, qoi_arrays
+
+
 # ========================
 # Functions for interpolating from fgout grid to arbitrary points,
 # useful for example if using velocity field to model particle/debris motion
@@ -885,6 +1110,478 @@ def make_fgout_fcn_xyt(fgout1, fgout2, qoi, method_xy='nearest',
 
     return fgout_fcn
 
+
+class FGoutInterpPlan(object):
+
+    """
+    Precomputed interpolation from an fgout grid to a set of points (x,y).
+
+    The cell indices and weights needed for 'nearest' or 'linear' (bilinear)
+    interpolation are computed once, and can then be applied to any frame
+    on the same fgout grid with a single gather and weighted sum, rather
+    than creating a new RegularGridInterpolator for every frame and qoi.
+    This is useful for extracting synthetic gauges or tracking particles,
+    where the same points (or points that move slowly) are evaluated at
+    many times.
+
+    As in make_fgout_fcn_xy, the values are interpolated between cell
+    centers, and points outside the extent of the cell centers give
+    fill_value, or raise ValueError if bounds_error is True.
+
+    Usage::
+
+        plan = FGoutInterpPlan(fgout_grid, x, y, method='linear')
+        for fgframe in fgframes:
+            h = plan.interp(fgframe, 'h')   # 1D array, one value per point
+            u,v = plan.interp(fgframe, ['u','v'])
+
+        plan.update(xnew, ynew)  # if the points have moved
+    """
+
+    def __init__(self, fgout_grid, x, y, method='linear',
+                 bounds_error=False, fill_value=numpy.nan):
+        """
+        fgout_grid can be an FGoutGrid or an FGoutFrame, it is only used to
+        determine the cell centers fgout_grid.x and fgout_grid.y.
+        """
+
+        if method not in ['nearest', 'linear']:
+            raise ValueError("method must be 'nearest' or 'linear'")
+
+        self.method = method
+        self.bounds_error = bounds_error
+        self.fill_value = fill_value
+
+        self.x_centers = numpy.asarray(fgout_grid.x)
+        self.y_centers = numpy.asarray(fgout_grid.y)
+        self.nx = len(self.x_centers)
+        self.ny = len(self.y_centers)
+        self.dx = (self.x_centers[-1] - self.x_centers[0]) / max(self.nx-1, 1)
+        self.dy = (self.y_centers[-1] - self.y_centers[0]) / max(self.ny-1, 1)
+
+        self.x = None
+        self.y = None
+        self.i = None           # lower-left cell index in x for each point
+        self.j = None           # lower-left cell index in y for each point
+        self.index = None       # flat indices into (nx,ny) array, per corner
+        self.weights = None     # interpolation weights, per corner
+        self.inside = None      # True for points inside grid
+
+        self.set_points(x, y)
+
+    @property
+    def npts(self):
+        return len(self.x)
+
+    def _locate(self, x, y):
+        """
+        Return lower-left cell indices i,j, fractional offsets ax,ay within
+        the cell and the inside mask for points x,y.
+        """
+        tol = 1e-10
+        if self.nx > 1:
+            xi = (x - self.x_centers[0]) / self.dx
+        else:
+            xi = numpy.zeros(x.shape)
+        if self.ny > 1:
+            yj = (y - self.y_centers[0]) / self.dy
+        else:
+            yj = numpy.zeros(y.shape)
+
+        inside = (xi >= -tol) & (xi <= self.nx-1+tol) \
+                 & (yj >= -tol) & (yj <= self.ny-1+tol)
+
+        if self.method == 'nearest':
+            i = numpy.floor(xi + 0.5)
+            j = numpy.floor(yj + 0.5)
+            imax = self.nx - 1
+            jmax = self.ny - 1
+        else:
+            i = numpy.floor(xi)
+            j = numpy.floor(yj)
+            imax = max(self.nx - 2, 0)
+            jmax = max(self.ny - 2, 0)
+
+        # points that are not inside get clipped indices, but are filled later
+        i = numpy.clip(numpy.nan_to_num(i), 0, imax).astype(numpy.intp)
+        j = numpy.clip(numpy.nan_to_num(j), 0, jmax).astype(numpy.intp)
+        ax = numpy.clip(xi - i, 0., 1.)
+        ay = numpy.clip(yj - j, 0., 1.)
+        return i, j, ax, ay, inside
+
+    def _corners(self, i, j, ax, ay):
+        """
+        Return flat indices and weights of shape (ncorners, npts).
+        """
+        if self.method == 'nearest':
+            index = (i*self.ny + j)[numpy.newaxis,:]
+            weights = numpy.ones(index.shape)
+        else:
+            i1 = numpy.minimum(i+1, self.nx-1)
+            j1 = numpy.minimum(j+1, self.ny-1)
+            index = numpy.vstack((i*self.ny + j, i1*self.ny + j,
+                                  i*self.ny + j1, i1*self.ny + j1))
+            weights = numpy.vstack(((1-ax)*(1-ay), ax*(1-ay),
+                                    (1-ax)*ay, ax*ay))
+        return index, weights
+
+    def _check_bounds(self, inside):
+        if self.bounds_error and not inside.all():
+            raise ValueError('*** %i points are outside the fgout grid' \
+                             % numpy.logical_not(inside).sum())
+
+    def set_points(self, x, y):
+        """
+        Compute cell indices and weights for all points x,y (floats or
+        equal-length 1D arrays).
+        """
+        x = numpy.atleast_1d(numpy.asarray(x, dtype=float)).copy()
+        y = numpy.atleast_1d(numpy.asarray(y, dtype=float)).copy()
+        assert x.shape == y.shape, '*** x and y must have the same shape'
+
+        i, j, ax, ay, inside = self._locate(x, y)
+        self._check_bounds(inside)
+        self.x = x
+        self.y = y
+        self.i = i
+        self.j = j
+        self.inside = inside
+        self.index, self.weights = self._corners(i, j, ax, ay)
+
+    def update(self, x, y, moved=None):
+        """
+        Update the plan after the points have moved to x,y, which have the
+        same length as the original points.
+
+        If moved is given (a boolean mask or array of point indices), only
+        those points are recomputed and x,y may be given either for all
+        points or only for the moved points.
+
+        Only the points that moved into a different cell need new indices,
+        the number of such points is returned.
+        """
+        x = numpy.atleast_1d(numpy.asarray(x, dtype=float))
+        y = numpy.atleast_1d(numpy.asarray(y, dtype=float))
+
+        if moved is None:
+            k = numpy.arange(self.npts)
+        else:
+            k = numpy.asarray(moved)
+            if k.dtype == bool:
+                k = numpy.nonzero(k)[0]
+        if len(x) == self.npts:
+            x = x[k]
+            y = y[k]
+        assert len(x) == len(k), '*** x,y do not match moved points'
+
+        i, j, ax, ay, inside = self._locate(x, y)
+        self._check_bounds(inside)
+
+        changed = (i != self.i[k]) | (j != self.j[k])
+        self.x[k] = x
+        self.y[k] = y
+        self.i[k] = i
+        self.j[k] = j
+        self.inside[k] = inside
+        index, weights = self._corners(i, j, ax, ay)
+        kc = k[changed]
+        self.index[:,kc] = index[:,changed]
+        self.weights[:,k] = weights
+        return changed.sum()
+
+    def interp_array(self, q):
+        """
+        Apply the plan to an array q whose last two dimensions are (nx,ny),
+        e.g. a single qoi from one frame, or fgout_frame.q with shape
+        (nvars,nx,ny), or a stack of frames with shape (nframes,nx,ny).
+
+        Returns an array with shape q.shape[:-2] + (npts,).
+        """
+        q = numpy.asarray(q)
+        err_msg = '*** q must have trailing shape (nx,ny) = (%i,%i)' \
+                  % (self.nx, self.ny)
+        assert q.shape[-2:] == (self.nx, self.ny), err_msg
+        qflat = q.reshape(q.shape[:-2] + (self.nx*self.ny,))
+        qout = (qflat[..., self.index] * self.weights).sum(axis=-2)
+        if not self.inside.all():
+            qout[..., numpy.logical_not(self.inside)] = self.fill_value
+        return qout
+
+    def interp(self, fgout, qoi):
+        """
+        Interpolate the qoi (e.g. 'h', 'u' or 'v') from the FGoutFrame fgout
+        to the points.  If qoi is a list of strings, a list of arrays
+        is returned.
+        """
+        if isinstance(qoi, str):
+            return self.interp_array(getattr(fgout, qoi))
+        return [self.interp_array(getattr(fgout, name)) for name in qoi]
+
+
+class FGoutMaxReducer(object):
+
+    """
+    Streaming computation of fgmax-style quantities from fgout frames:
+    the maximum of each qoi and the time it was attained, the minimum depth
+    hmin if requested, and the arrival time, over a subregion of the fgout
+    grid and a range of times that need not match any fgmax grid used in
+    the GeoClaw run.
+
+    Frames are processed one at a time with update(), so only the running
+    max arrays are kept in memory.  Reducers for disjoint sets of frames
+    can be combined with merge(), see reduce_fgout_frames for a parallel
+    version.  The result can be converted to an FGmaxGrid with
+    to_fgmax_grid(), so the fgmax plotting tools can be used.
+
+    :Input:
+     - fgout_grid: FGoutGrid with grid info set, e.g. by
+       read_fgout_grids_data().
+     - qois: list of qois to track the maximum of, any attribute of
+       FGoutFrame such as 'h', 's', 'hss', 'eta'.  Include 'hmin'
+       to track the minimum depth.
+     - extent: [x1,x2,y1,y2] subregion, default is the full fgout grid.
+     - tstart, tend: only frames with tstart <= t <= tend are used.
+     - arrival_tol, sea_level: the arrival time is the first time when
+       h > drytol and eta > sea_level + arrival_tol, as in GeoClaw fgmax.
+    """
+
+    def __init__(self, fgout_grid, qois=['h','s','hss','eta'], extent=None,
+                 tstart=-numpy.inf, tend=numpy.inf, arrival_tol=1e-2,
+                 sea_level=0.):
+
+        self.fgout_grid = fgout_grid
+        self.qois = list(qois)
+        self.tstart = tstart
+        self.tend = tend
+        self.arrival_tol = arrival_tol
+        self.sea_level = sea_level
+
+        x = fgout_grid.x
+        y = fgout_grid.y
+        if extent is None:
+            i1, i2, j1, j2 = 0, len(x), 0, len(y)
+        else:
+            # cell centers within the extent:
+            i1 = numpy.searchsorted(x, extent[0])
+            i2 = numpy.searchsorted(x, extent[1], side='right')
+            j1 = numpy.searchsorted(y, extent[2])
+            j2 = numpy.searchsorted(y, extent[3], side='right')
+        self.islice = slice(i1, i2)
+        self.jslice = slice(j1, j2)
+        shape = (i2-i1, j2-j1)
+
+        self.nframes = 0
+        self.qmax = {}
+        self.tmax = {}
+        for qoi in self.qois:
+            if qoi == 'hmin':
+                self.qmax[qoi] = numpy.full(shape, numpy.inf)
+            else:
+                self.qmax[qoi] = numpy.full(shape, -numpy.inf)
+            self.tmax[qoi] = numpy.full(shape, numpy.nan)
+        self.arrival_time = numpy.full(shape, numpy.nan)
+        self.B = None
+        self.B_time = -numpy.inf
+
+    def update(self, fgframe):
+        """
+        Update the running max, min and arrival times with a frame.
+        """
+        t = fgframe.t
+        if (t < self.tstart) or (t > self.tend):
+            return
+        ij = (self.islice, self.jslice)
+
+        for qoi in self.qois:
+            if qoi == 'hmin':
+                q = fgframe.h[ij]
+                new = q < self.qmax[qoi]
+            else:
+                q = getattr(fgframe, qoi)[ij]
+                new = q > self.qmax[qoi]
+            self.qmax[qoi][new] = q[new]
+            self.tmax[qoi][new] = t
+
+        h = fgframe.h[ij]
+        arrived = (h > self.fgout_grid.drytol) \
+                  & (fgframe.eta[ij] > self.sea_level + self.arrival_tol) \
+                  & numpy.isnan(self.arrival_time)
+        self.arrival_time[arrived] = t
+
+        if t > self.B_time:
+            self.B = numpy.array(fgframe.B[ij])
+            self.B_time = t
+        self.nframes += 1
+
+    def update_frames(self, framenos, verbose=False):
+        """
+        Read the frames in framenos one at a time and update with each.
+        """
+        for frameno in framenos:
+            fgframe = self.fgout_grid.read_frame(frameno)
+            self.update(fgframe)
+            if verbose:
+                print('FGoutMaxReducer: processed frame %i at t = %.3f' \
+                      % (frameno, fgframe.t))
+
+    def merge(self, other):
+        """
+        Combine with a reducer for a different set of frames on the same
+        subregion, updating self.  Ties in the max keep the earlier time.
+        """
+        for qoi in self.qois:
+            if qoi == 'hmin':
+                new = (other.qmax[qoi] < self.qmax[qoi]) \
+                      | ((other.qmax[qoi] == self.qmax[qoi]) \
+                         & (other.tmax[qoi] < self.tmax[qoi]))
+            else:
+                new = (other.qmax[qoi] > self.qmax[qoi]) \
+                      | ((other.qmax[qoi] == self.qmax[qoi]) \
+                         & (other.tmax[qoi] < self.tmax[qoi]))
+            self.qmax[qoi][new] = other.qmax[qoi][new]
+            self.tmax[qoi][new] = other.tmax[qoi][new]
+
+        self.arrival_time = numpy.fmin(self.arrival_time, other.arrival_time)
+        if other.B_time > self.B_time:
+            self.B = other.B
+            self.B_time = other.B_time
+        self.nframes += other.nframes
+        return self
+
+    def to_fgmax_grid(self):
+        """
+        Return an FGmaxGrid with point_style 2 and indexing 'ij' (as in
+        FGmaxGrid.read_output) holding the results.  Each qoi sets the
+        FGmaxGrid attributes of the same name and the time of the max,
+        e.g. fg.h and fg.h_time.  The AMR level is set to 0.
+        """
+        from clawpack.geoclaw import fgmax_tools
+
+        fg = fgmax_tools.FGmaxGrid()
+        fg.point_style = 2
+        fg.fgno = self.fgout_grid.fgno
+        fg.outdir = self.fgout_grid.outdir
+        fg.arrival_tol = self.arrival_tol
+        fg.tstart_max = self.tstart
+        fg.tend_max = self.tend
+
+        fg.x = self.fgout_grid.x[self.islice]
+        fg.y = self.fgout_grid.y[self.jslice]
+        fg.nx = len(fg.x)
+        fg.ny = len(fg.y)
+        fg.x1, fg.x2 = fg.x[0], fg.x[-1]
+        fg.y1, fg.y2 = fg.y[0], fg.y[-1]
+        fg.X, fg.Y = numpy.meshgrid(fg.x, fg.y, indexing='ij')
+
+        # points never updated (no frames in time range) are masked:
+        mask = numpy.isnan(self.tmax[self.qois[0]]) if self.qois \
+               else numpy.zeros(fg.X.shape, dtype=bool)
+        fg.level = numpy.zeros(fg.X.shape, dtype=int)
+        if self.B is not None:
+            fg.B = ma.masked_where(mask, self.B)
+        for qoi in self.qois:
+            setattr(fg, qoi, ma.masked_where(mask, self.qmax[qoi]))
+            setattr(fg, qoi + '_time', ma.masked_where(mask, self.tmax[qoi]))
+        fg.arrival_time = ma.masked_invalid(self.arrival_time)
+        return fg
+
+
+def _reduce_frame_range(args):
+    """
+    Worker for reduce_fgout_frames, must be at module level for pickling.
+    """
+    fgout_grid, framenos, kwargs = args
+    reducer = FGoutMaxReducer(fgout_grid, **kwargs)
+    reducer.update_frames(framenos)
+    reducer.fgout_grid = None   # do not pickle back the grid
+    return reducer
+
+
+def reduce_fgout_frames(fgout_grid, framenos, nprocs=1, **kwargs):
+    """
+    Compute fgmax-style quantities from fgout frames framenos, see
+    FGoutMaxReducer for the keyword arguments.
+
+    If nprocs > 1 the frames are split into nprocs disjoint ranges that are
+    processed in parallel with a multiprocessing Pool, and the partial
+    results are merged.
+
+    Returns the merged FGoutMaxReducer, use its to_fgmax_grid() method
+    to obtain an FGmaxGrid.
+    """
+    framenos = list(framenos)
+    if nprocs <= 1 or len(framenos) < 2:
+        reducer = FGoutMaxReducer(fgout_grid, **kwargs)
+        reducer.update_frames(framenos)
+        return reducer
+
+    from multiprocessing import Pool
+
+    # plotdata is recreated as needed in each process:
+    fgout_grid._plotdata = None
+    chunks = numpy.array_split(numpy.array(framenos), nprocs)
+    tasks = [(fgout_grid, list(chunk), kwargs) for chunk in chunks
+             if len(chunk) > 0]
+    with Pool(processes=nprocs) as pool:
+        reducers = pool.map(_reduce_frame_range, tasks)
+
+    reducer = reducers[0]
+    for other in reducers[1:]:
+        reducer.merge(other)
+    reducer.fgout_grid = fgout_grid
+    return reducer
+
+
+def write_fgout_gauges(t, x, y, qoi_arrays, gaugenos=None, outdir='.',
+                       qois=['h','hu','hv','eta'], verbose=True):
+    """
+    Write time series extracted from fgout frames, e.g. by
+    FGoutGrid.extract_points, as synthetic gauge files gaugeNNNNN.txt
+    in the same ascii layout as GeoClaw gauge output, so they can be read
+    and plotted with the usual gauge tools.
+
+    :Input:
+     - t: array of times, shape (nt,)
+     - x, y: arrays of gauge locations, shape (npts,)
+     - qoi_arrays: dictionary of arrays with shape (npts, nt)
+     - gaugenos: list of gauge numbers, default 1, 2, ..., npts.
+     - outdir: directory for the gauge files.
+     - qois: the qois written as columns after level and time, normally
+       h, hu, hv and eta, the quantities in GeoClaw gauge output.
+       If 'eta' is included it should be last.
+
+    The AMR level column is set to 0, as for fgout output.
+    """
+
+    x = numpy.atleast_1d(x)
+    y = numpy.atleast_1d(y)
+    npts = len(x)
+    if gaugenos is None:
+        gaugenos = range(1, npts+1)
+
+    os.makedirs(outdir, exist_ok=True)
+
+    nq = len([qoi for qoi in qois if qoi != 'eta'])
+    q_column = '[' + ''.join(['%3i' % (m+1) for m in range(nq)]) + '],'
+    header = '# gauge_id= %i location=( %17.10E %17.10E ) num_var= %2i\n' \
+           + '# Synthetic gauge from fgout frames\n' \
+           + '# level, time, q%s eta, aux[]\n' % q_column \
+           + '# file format ascii, time series follow in this file\n'
+
+    for k,gaugeno in enumerate(gaugenos):
+        data = numpy.zeros((len(t), len(qois)+2))
+        data[:,1] = t
+        for m,qoi in enumerate(qois):
+            data[:,m+2] = qoi_arrays[qoi][k,:]
+        fname = os.path.join(outdir, 'gauge%s.txt' % str(gaugeno).zfill(5))
+        with open(fname, 'w') as gfile:
+            gfile.write(header % (gaugeno, x[k], y[k], len(qois)))
+            numpy.savetxt(gfile, data, fmt=['%5.2d'] + (len(qois)+1)*['%15.7E'],
+                          delimiter='')
+        if verbose:
+            print('Created %s' % fname)
+
+
 # ===============================
 # Functions for writing a set of fgout frames as a netCDF file, and
 # reading such a file:
@@ -0,0 +1,417 @@
+r"""
+gauge_tools module: $CLAW/geoclaw/src/python/geoclaw/gauge_tools.py
+
+Tools to read the output of many gauges at once.
+
+The gauge files gaugeXXXXX.txt (and gaugeXXXXX.bin for binary output) in an
+output directory are read, optionally in parallel, and packed into a
+GaugeData object holding all time series in a few contiguous (ragged)
+arrays.  The result is cached in outdir so that reopening the same gauges
+only requires reading one .npz file, and only gauges whose files changed
+since the cache was written are read again.
+
+Includes:
+
+- function gauge_numbers: Gauge numbers for which output exists.
+- function read_gauge: Read the header and data of a single gauge.
+- class GaugeData: Time series of many gauges as ragged arrays, with
+            methods to extract single gauges and convert to xarray.
+- function load_gauges: Read all (or some) gauges in an output directory,
+            optionally in parallel and using a cache.
+
+Usage::
+
+    from clawpack.geoclaw import gauge_tools
+
+    gauges = gauge_tools.load_gauges('_output', nprocs=4)
+    gauge = gauges.gauge(1001)   # a pyclaw GaugeSolution
+    ds = gauges.to_xarray()      # dimensions (gauge, time)
+"""
+
+import os
+import numpy
+
+# names of the components of q in GeoClaw gauge output:
+_qnames = {1: 'h', 2: 'hu', 3: 'hv'}
+
+cache_name = 'gauges_cache.npz'
+
+
+def _gauge_fname(outdir, gaugeno, ext):
+    return os.path.join(outdir, 'gauge%s.%s' % (str(gaugeno).zfill(5), ext))
+
+
+def gauge_numbers(outdir):
+    """
+    Return a sorted list of the gauge numbers for which output exists in
+    outdir, based on the gaugeXXXXX.txt files.
+    """
+    import glob
+    gaugenos = []
+    for fname in glob.glob(os.path.join(outdir, 'gauge*.txt')):
+        number = os.path.basename(fname)[len('gauge'):-len('.txt')]
+        if number.isdigit():
+            gaugenos.append(int(number))
+    return sorted(gaugenos)
+
+
+def _file_key(outdir, gaugeno):
+    """
+    Modification times and sizes of the .txt and .bin files of a gauge,
+    used to check if a cached gauge is up to date.
+    """
+    key = []
+    for ext in ['txt', 'bin']:
+        fname = _gauge_fname(outdir, gaugeno, ext)
+        if os.path.isfile(fname):
+            stat = os.stat(fname)
+            key += [stat.st_mtime_ns, stat.st_size]
+        else:
+            key += [0, 0]
+    return numpy.array(key, dtype=numpy.int64)
+
+
+def _varnames(columns_line, num_var):
+    """
+    Names of the output variables from the header line
+    '# level, time, q[  1  2  3], eta, aux[]' written by gauges_module.f90.
+    """
+    import re
+    match = re.search(r'q\[([\d\s]*)\],\s*eta,\s*aux\[([\d\s]*)\]',
+                      columns_line)
+    if match is None:
+        if num_var == 4:
+            return ['h', 'hu', 'hv', 'eta']
+        return ['q%i' % (m+1) for m in range(num_var)]
+    names = [_qnames.get(int(m), 'q%s' % m) for m in match.group(1).split()]
+    names.append('eta')
+    names += ['aux%s' % m for m in match.group(2).split()]
+    if len(names) != num_var:
+        names = ['q%i' % (m+1) for m in range(num_var)]
+    return names
+
+
+def read_gauge(outdir, gaugeno):
+    """
+    Read the header and data of gauge gaugeno in outdir.
+
+    Returns a dictionary with the gauge number, location x, y, gauge type
+    gtype ('stationary' or 'lagrangian'), list of varnames, and arrays
+    level, t and q, where q has shape (num_var, ntimes).  The data is read
+    from the .txt file for ascii output or the .bin file for binary output,
+    as written by gauges_module.f90.
+    """
+    fname = _gauge_fname(outdir, gaugeno, 'txt')
+    with open(fname) as gauge_file:
+        tokens = gauge_file.readline().split()
+        gauge_id = int(tokens[2])
+        x = float(tokens[4])
+        y = float(tokens[5])
+        num_var = int(tokens[-1])
+        header = [gauge_file.readline() for k in range(3)]
+
+    if gauge_id != gaugeno:
+        raise ValueError('*** gauge_id %i in %s does not match' \
+                         % (gauge_id, fname))
+
+    gtype = 'stationary'
+    if 'lagrangian' in header[0].lower():
+        gtype = 'lagrangian'
+    varnames = _varnames(header[1], num_var)
+    if 'binary32' in header[2]:
+        file_format = 'binary32'
+    elif 'binary' in header[2]:
+        file_format = 'binary64'
+    else:
+        file_format = 'ascii'
+
+    nrows = num_var + 2
+    if file_format == 'ascii':
+        import warnings
+        with warnings.catch_warnings():
+            # no warning if gauge has no data yet:
+            warnings.simplefilter('ignore', UserWarning)
+            data = numpy.loadtxt(fname, comments='#', ndmin=2)
+        data = data.reshape((-1, nrows))
+    else:
+        dtype = numpy.float32 if file_format == 'binary32' else numpy.float64
+        bin_fname = _gauge_fname(outdir, gaugeno, 'bin')
+        if os.path.isfile(bin_fname):
+            data = numpy.fromfile(bin_fname, dtype=dtype)
+        else:
+            data = numpy.empty(0, dtype=dtype)
+        if len(data) % nrows != 0:
+            raise ValueError('*** unexpected number of values in %s' \
+                             % bin_fname)
+        # Fortran array (nrows, ntimes) written with access='stream':
+        data = data.reshape((-1, nrows))
+
+    return {'gaugeno': gaugeno, 'x': x, 'y': y, 'gtype': gtype,
+            'varnames': varnames,
+            'level': data[:,0].astype(int),
+            't': numpy.array(data[:,1], dtype=float),
+            'q': numpy.array(data[:,2:].T, dtype=float)}
+
+
+class GaugeData(object):
+
+    """
+    Time series of many gauges stored as contiguous ragged arrays.
+
+    The times, levels and values of all gauges are concatenated, with the
+    data of gaugenos[k] in t[offsets[k]:offsets[k+1]], level[...] and
+    q[:, ...], where q has one row for each name in varnames.  The arrays
+    gaugenos, x, y and gtype have one entry per gauge.
+    """
+
+    def __init__(self, records=None):
+        self.gaugenos = numpy.zeros(0, dtype=int)
+        self.x = numpy.zeros(0)
+        self.y = numpy.zeros(0)
+        self.gtype = numpy.zeros(0, dtype='U10')
+        self.varnames = []
+        self.row_size = numpy.zeros(0, dtype=int)
+        self.t = numpy.zeros(0)
+        self.level = numpy.zeros(0, dtype=int)
+        self.q = numpy.zeros((0, 0))
+        if records is not None:
+            self._pack(records)
+
+    @property
+    def offsets(self):
+        return numpy.hstack([0, numpy.cumsum(self.row_size)])
+
+    @property
+    def num_gauges(self):
+        return len(self.gaugenos)
+
+    def _pack(self, records):
+        """Pack a list of dictionaries returned by read_gauge."""
+        varnames = [r['varnames'] for r in records]
+        if any(names != varnames[0] for names in varnames):
+            raise ValueError('*** gauges have different output variables, ' \
+                             + 'load them separately')
+        self.varnames = list(varnames[0]) if records else []
+        self.gaugenos = numpy.array([r['gaugeno'] for r in records],
+                                    dtype=int)
+        self.x = numpy.array([r['x'] for r in records], dtype=float)
+        self.y = numpy.array([r['y'] for r in records], dtype=float)
+        self.gtype = numpy.array([r['gtype'] for r in records], dtype='U10')
+        self.row_size = numpy.array([len(r['t']) for r in records],
+                                    dtype=int)
+        nvars = len(self.varnames)
+        self.t = numpy.hstack([numpy.zeros(0)] + [r['t'] for r in records])
+        self.level = numpy.hstack([numpy.zeros(0, dtype=int)]
+                                  + [r['level'] for r in records])
+        self.q = numpy.hstack([numpy.zeros((nvars, 0))]
+                              + [r['q'] for r in records])
+
+    def _records(self):
+        """Inverse of _pack, with views of the ragged arrays."""
+        offsets = self.offsets
+        records = []
+        for k in range(self.num_gauges):
+            rows = slice(offsets[k], offsets[k+1])
+            records.append({'gaugeno': int(self.gaugenos[k]),
+                            'x': self.x[k], 'y': self.y[k],
+                            'gtype': str(self.gtype[k]),
+                            'varnames': self.varnames,
+                            'level': self.level[rows], 't': self.t[rows],
+                            'q': self.q[:,rows]})
+        return records
+
+    def index(self, gaugeno):
+        """Return the index k of gauge gaugeno in self.gaugenos."""
+        k = numpy.nonzero(self.gaugenos == gaugeno)[0]
+        if len(k) == 0:
+            raise ValueError('*** gauge %s not loaded' % gaugeno)
+        return k[0]
+
+    def gauge(self, gaugeno):
+        """
+        Return the data of gauge gaugeno as a pyclaw GaugeSolution, with
+        attributes t, level and q that are views of the ragged arrays.
+        """
+        from clawpack.pyclaw.gauges import GaugeSolution
+        k = self.index(gaugeno)
+        rows = slice(self.offsets[k], self.offsets[k+1])
+        gauge = GaugeSolution()
+        gauge.id = int(gaugeno)
+        gauge.location = (self.x[k], self.y[k])
+        gauge.gtype = str(self.gtype[k])
+        gauge.level = self.level[rows]
+        gauge.t = self.t[rows]
+        gauge.q = self.q[:,rows]
+        return gauge
+
+    def subset(self, gaugenos):
+        """Return a new GaugeData with only the gauges in gaugenos."""
+        records = self._records()
+        return GaugeData([records[self.index(gaugeno)]
+                          for gaugeno in gaugenos])
+
+    def save(self, fname, keys=None):
+        """
+        Save to the .npz file fname, which can be reloaded with
+        GaugeData.load(fname).  keys are the file keys of each gauge,
+        used by load_gauges to check the cache.
+        """
+        arrays = {'gaugenos': self.gaugenos, 'x': self.x, 'y': self.y,
+                  'gtype': self.gtype, 'varnames': numpy.array(self.varnames),
+                  'row_size': self.row_size, 't': self.t,
+                  'level': self.level, 'q': self.q}
+        if keys is not None:
+            arrays['keys'] = keys
+        numpy.savez(fname, **arrays)
+
+    @classmethod
+    def load(cls, fname):
+        """Load GaugeData saved with the save method."""
+        gauges = cls()
+        with numpy.load(fname) as npz:
+            for name in ['gaugenos', 'x', 'y', 'gtype', 'row_size', 't',
+                         'level', 'q']:
+                setattr(gauges, name, npz[name])
+            gauges.varnames = [str(name) for name in npz['varnames']]
+        return gauges
+
+    def to_xarray(self, ragged=False):
+        """
+        Return an xarray Dataset with the gauge data.
+
+        By default the dimensions are (gauge, time), where time is the
+        union of the output times of all gauges (the same as the times of
+        each gauge if all gauges were output at the same times), with NaN
+        (and level 0) where a gauge has no output at a time.
+
+        If ragged is True, the data is instead stored as a CF contiguous
+        ragged array with dimension obs, with row_size giving the number
+        of times of each gauge, which avoids padding if gauges were output
+        at very different times.
+        """
+        import xarray
+
+        gauge_coords = {'gauge': ('gauge', self.gaugenos),
+                        'x': ('gauge', self.x), 'y': ('gauge', self.y)}
+        attrs = {'description': 'GeoClaw gauge output'}
+
+        if ragged:
+            data_vars = {'row_size': ('gauge', self.row_size,
+                                      {'sample_dimension': 'obs'}),
+                         'gtype': ('gauge', self.gtype),
+                         't': ('obs', self.t, {'units': 'seconds'}),
+                         'level': ('obs', self.level)}
+            for m, name in enumerate(self.varnames):
+                data_vars[name] = ('obs', self.q[m])
+            return xarray.Dataset(data_vars, coords=gauge_coords,
+                                  attrs=attrs)
+
+        time = numpy.unique(self.t)
+        offsets = self.offsets
+        shape = (self.num_gauges, len(time))
+        q = numpy.full((len(self.varnames),) + shape, numpy.nan)
+        level = numpy.zeros(shape, dtype=int)
+        for k in range(self.num_gauges):
+            rows = slice(offsets[k], offsets[k+1])
+            j = numpy.searchsorted(time, self.t[rows])
+            q[:, k, j] = self.q[:, rows]
+            level[k, j] = self.level[rows]
+
+        data_vars = {'gtype': ('gauge', self.gtype),
+                     'level': (('gauge', 'time'), level)}
+        for m, name in enumerate(self.varnames):
+            data_vars[name] = (('gauge', 'time'), q[m])
+        coords = dict(gauge_coords)
+        coords['time'] = ('time', time, {'units': 'seconds'})
+        return xarray.Dataset(data_vars, coords=coords, attrs=attrs)
+
+
+def _read_gauges(args):
+    """
+    Worker for load_gauges, must be at module level for pickling.
+    """
+    outdir, gaugenos = args
+    return [read_gauge(outdir, gaugeno) for gaugeno in gaugenos]
+
+
+def load_gauges(outdir, gaugenos='all', nprocs=1, cache=True, verbose=False):
+    """
+    Read gauge output from outdir and return a GaugeData object.
+
+    :Input:
+     - outdir: output directory containing gaugeXXXXX.txt files.
+     - gaugenos: list of gauge numbers, or 'all' for all gauges found.
+     - nprocs: if > 1, gauges are read in parallel with a multiprocessing
+       Pool with this many processes.
+     - cache: if True, use and update the cache file
+       outdir/gauges_cache.npz.  Gauges in the cache are only read again
+       if their .txt or .bin file changed since it was written.
+    """
+    if isinstance(gaugenos, str) and gaugenos == 'all':
+        gaugenos = gauge_numbers(outdir)
+    gaugenos = [int(gaugeno) for gaugeno in gaugenos]
+    keys = {gaugeno: _file_key(outdir, gaugeno) for gaugeno in gaugenos}
+
+    cached = {}
+    cache_fname = os.path.join(outdir, cache_name)
+    if cache and os.path.isfile(cache_fname):
+        try:
+            cached_gauges = GaugeData.load(cache_fname)
+            with numpy.load(cache_fname) as npz:
+                cached_keys = npz['keys']
+        except (OSError, KeyError, ValueError):
+            cached_gauges = GaugeData()
+            cached_keys = None
+        for k, record in enumerate(cached_gauges._records()):
+            gaugeno = record['gaugeno']
+            if numpy.array_equal(cached_keys[k], _file_key(outdir, gaugeno)):
+                cached[gaugeno] = record
+        if verbose:
+            print('Using %i gauges from cache %s' % (len(cached), cache_fname))
+
+    to_read = [gaugeno for gaugeno in gaugenos if gaugeno not in cached]
+    records = {}
+    if nprocs > 1 and len(to_read) > 1:
+        from multiprocessing import Pool
+        groups = numpy.array_split(numpy.array(to_read), nprocs)
+        tasks = [(outdir, list(group)) for group in groups if len(group) > 0]
+        with Pool(processes=nprocs) as pool:
+            for group_records in pool.map(_read_gauges, tasks):
+                for record in group_records:
+                    records[record['gaugeno']] = record
+    else:
+        for record in _read_gauges((outdir, to_read)):
+            records[record['gaugeno']] = record
+    if verbose:
+        print('Read %i gauges from %s' % (len(to_read), outdir))
+
+    if cache and len(to_read) > 0:
+        # keep gauges in the cache that were not requested this time:
+        all_records = dict(cached)
+        all_records.update(records)
+        all_gaugenos = sorted(all_records.keys())
+        try:
+            all_gauges = GaugeData([all_records[g] for g in all_gaugenos])
+            all_keys = numpy.array([_file_key(outdir, g)
+                                    for g in all_gaugenos])
+        except ValueError:
+            # gauges with different variables, only cache those requested:
+            all_gaugenos = sorted(records.keys())
+            all_gauges = GaugeData([records[g] for g in all_gaugenos])
+            all_keys = numpy.array([keys[g] for g in all_gaugenos])
+        # write to a temporary file and rename, in case of parallel readers:
+        tmp_fname = '%s.%i.tmp' % (cache_fname, os.getpid())
+        try:
+            with open(tmp_fname, 'wb') as f:
+                all_gauges.save(f, keys=all_keys)
+            os.replace(tmp_fname, cache_fname)
+            if verbose:
+                print('Updated cache %s' % cache_fname)
+        except OSError:
+            if verbose:
+                print('*** Could not write cache %s' % cache_fname)
+            if os.path.isfile(tmp_fname):
+                os.remove(tmp_fname)
+
+    records.update(cached)
+    return GaugeData([records[gaugeno] for gaugeno in gaugenos])
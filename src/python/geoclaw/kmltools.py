@@ -24,9 +24,11 @@ the full 8 digits if you want it transparent).
  - fgout2kml - create a kml outline for each fgout grid specified in setrun
  - make_input_data_kmls - make kml files for many things specified in setrun
  - pcolorcells_for_kml - version of pcolormesh with appropriate dpi and size
+ - rgbacells_for_kml - faster png for pcolorcells_for_kml without a figure
  - png2kml - create kml file wrapping a png figure to be viewed on GE
  - kml_build_colorbar - create a colorbar to display on GE
  - topo2kmz - create kmz file showing onshore and offshore topography
+ - cells2superoverlay - create tiled multi-resolution kml for large grids
  - transect2kml - create kml file showing a set of points on a transect
  - kml_header - used internally
  - kml_footer - used internally
@@ -34,6 +36,9 @@ the full 8 digits if you want it transparent).
  - kml_gauge - used internally
  - kml_png - used internally
  - kml_cb - used internally
+ - kml_lod_region - used internally
+ - kml_network_link - used internally
+ - kml_tile - used internally
 """
 
 try:
@@ -1052,6 +1057,56 @@ def make_input_data_kmls(rundata=None, combined=False):
         dtopo2kml(dtopo_file_name, dtopo_type)
         
 
+def _cell_edges(X, Y, Z):
+    """
+    Return 1d arrays xedge, yedge of the cell edges and the cell sizes dx, dy
+    for data Z on the grid X,Y of cell centers or edges, as described in
+    pcolorcells_for_kml.
+    """
+
+    import numpy as np
+
+    # If X is 2d extract proper 1d slice:
+    if X.ndim == 1:
+        x = X
+    elif X.ndim == 2:
+        if X[0,0] == X[0,1]:
+            x = X[:,0]
+        else:
+            x = X[0,:]
+            
+    # If Y is 2d extract proper 1d slice:
+    if Y.ndim == 1:
+        y = Y
+    elif Y.ndim == 2:
+        if Y[0,0] == Y[0,1]:
+            y = Y[:,0]
+        else:
+            y = Y[0,:]                    
+
+    dx = x[1]-x[0]
+    dy = y[1]-y[0]
+    if len(x) == Z.shape[1]:
+        # cell centers, so xedge should be expanded by dx/2 on each end:
+        xedge = np.arange(x[0]-0.5*dx, x[-1]+dx, dx)
+    elif len(x) == Z.shape[1]+1:
+        # assume x already contains edge values
+        xedge = x
+    else:
+        raise ValueError('x has unexpected length')
+
+    if len(y) == Z.shape[0]:
+        # cell centers, so xedge should be expanded by dx/2 on each end:
+        yedge = np.arange(y[0]-0.5*dy, y[-1]+dy, dy)
+    elif len(y) == Z.shape[0]+1:
+        # assume x already contains edge values
+        yedge = y
+    else:
+        raise ValueError('y has unexpected length')
+
+    return xedge, yedge, dx, dy
+
+
 def pcolorcells_for_kml(X, Y, Z, png_filename=None, dpc=2, max_inches=15., 
                         verbose=True, **kwargs):
     
@@ -1108,46 +1163,8 @@ def pcolorcells_for_kml(X, Y, Z, png_filename=None, dpc=2, max_inches=15.,
     """
 
     from matplotlib import pyplot as plt
-    import numpy as np
-    
-    # If X is 2d extract proper 1d slice:
-    if X.ndim == 1:
-        x = X
-    elif X.ndim == 2:
-        if X[0,0] == X[0,1]:
-            x = X[:,0]
-        else:
-            x = X[0,:]
-            
-    # If Y is 2d extract proper 1d slice:
-    if Y.ndim == 1:
-        y = Y
-    elif Y.ndim == 2:
-        if Y[0,0] == Y[0,1]:
-            y = Y[:,0]
-        else:
-            y = Y[0,:]                    
 
-    dx = x[1]-x[0]
-    dy = y[1]-y[0]
-    if len(x) == Z.shape[1]:
-        # cell centers, so xedge should be expanded by dx/2 on each end:
-        xedge = np.arange(x[0]-0.5*dx, x[-1]+dx, dx)
-    elif len(x) == Z.shape[1]+1:
-        # assume x already contains edge values
-        xedge = x
-    else:
-        raise ValueError('x has unexpected length')
-
-    if len(y) == Z.shape[0]:
-        # cell centers, so xedge should be expanded by dx/2 on each end:
-        yedge = np.arange(y[0]-0.5*dy, y[-1]+dy, dy)
-    elif len(y) == Z.shape[0]+1:
-        # assume x already contains edge values
-        yedge = y
-    else:
-        raise ValueError('y has unexpected length')
-        
+    xedge, yedge, dx, dy = _cell_edges(X, Y, Z)
 
     x1 = xedge[0];  x2 = xedge[-1]
     y1 = yedge[0];  y2 = yedge[-1]
@@ -1204,6 +1221,148 @@ def pcolorcells_for_kml(X, Y, Z, png_filename=None, dpc=2, max_inches=15.,
     return fig, ax, png_extent, kml_dpi
         
 
+def _png_chunk(tag, data):
+    """Return a png chunk with its length and checksum"""
+    import struct, zlib
+    return struct.pack('>I', len(data)) + tag + data \
+           + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+
+def _write_png_cells(png_filename, rgba, dpc, dpi, compress_level=6):
+    """
+    Write an RGBA png file in which each cell of rgba (uint8 array of shape
+    (rows, columns, 4), first row at the top) is dpc by dpc pixels.
+
+    Since the dpc pixel rows of a cell row are the same, only the first is
+    stored with the "Sub" filter and the others with the "Up" filter, which
+    gives zero bytes.  Each first row is compressed separately, ending with
+    a full flush so that the deflate blocks do not refer to earlier data,
+    and the zero rows are compressed only once and the same blocks are
+    repeated after every first row.  So the work is proportional to dpc,
+    not dpc**2, and the full image is never built in memory.
+    """
+    import struct, zlib
+    import numpy as np
+
+    rows, columns = rgba.shape[:2]
+    line = np.repeat(rgba, dpc, axis=1).reshape(rows, -1)
+    first = np.empty((rows, 1 + line.shape[1]), dtype=np.uint8)
+    first[:, 0] = 1     # Sub: difference with the pixel to the left
+    first[:, 1:] = line
+    first[:, 5:] -= line[:, :-4]
+    # Up: difference with the row above, all zero
+    up = (b'\x02' + bytes(line.shape[1])) * (dpc - 1)
+
+    # raw deflate blocks, concatenated in a zlib stream:
+    def deflate(compressor, data):
+        return compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH)
+
+    compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15)
+    up_blocks = deflate(zlib.compressobj(compress_level, zlib.DEFLATED, -15),
+                        up) if dpc > 1 else b''
+    idat = [b'\x78\x9c']
+    adler = 1
+    for row in first:
+        row = row.tobytes()
+        idat.append(deflate(compressor, row))
+        idat.append(up_blocks)
+        adler = zlib.adler32(up, zlib.adler32(row, adler))
+    idat.append(compressor.flush())
+    idat.append(struct.pack('>I', adler & 0xffffffff))
+
+    ppm = int(round(dpi / 0.0254))   # pixels per meter
+    with open(png_filename, 'wb') as png_file:
+        png_file.write(b'\x89PNG\r\n\x1a\n')
+        png_file.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB',
+                       columns*dpc, rows*dpc, 8, 6, 0, 0, 0)))
+        png_file.write(_png_chunk(b'pHYs', struct.pack('>IIB', ppm, ppm, 1)))
+        png_file.write(_png_chunk(b'IDAT', b''.join(idat)))
+        png_file.write(_png_chunk(b'IEND', b''))
+
+
+def _cmap_norm(cmap, norm, vmin, vmax):
+    """Return the colormap and norm to use, as pcolormesh would"""
+    from matplotlib import pyplot as plt
+    from matplotlib import colors
+
+    if cmap is None or isinstance(cmap, str):
+        cmap = plt.get_cmap(cmap)
+    if norm is None:
+        norm = colors.Normalize(vmin=vmin, vmax=vmax)
+    return cmap, norm
+
+
+def _cell_colors(Z, cmap, norm):
+    """
+    Return the colors of the cells of Z as an array of uint8 of shape
+    Z.shape + (4,), masked and NaN cells get the "bad" color of cmap.
+    """
+    import numpy as np
+
+    rgba = cmap(norm(np.ma.masked_invalid(Z)), bytes=True)
+    # fully transparent cells are white as in the transparent figure:
+    rgba[rgba[:, :, 3] == 0, :3] = 255
+    return rgba
+
+
+def rgbacells_for_kml(X, Y, Z, png_filename=None, dpc=2, max_inches=15.,
+                      verbose=True, cmap=None, norm=None, vmin=None,
+                      vmax=None, compress_level=6):
+
+    """
+    Create the same png file as pcolorcells_for_kml, but by applying the
+    colormap to Z directly and writing the png file with each grid cell
+    replicated to dpc by dpc pixels, without creating a matplotlib figure.
+    This is much faster and uses less memory for large grids or many frames.
+
+    X,Y,Z, dpc and max_inches are as in pcolorcells_for_kml, but dpc must be
+    an integer.  Z may be a masked array, masked cells (and NaN values) get
+    the "bad" color of the colormap, which by default is fully transparent.
+
+    cmap and norm (or vmin and vmax) specify the colors as for pcolormesh.
+
+    If png_filename is not None then a png file is written, with the same
+    dimensions and dpi as in pcolorcells_for_kml.  compress_level is the
+    zlib compression level, from 0 (none) to 9; lower is faster but gives
+    larger files.
+
+    This function returns `rgba, png_extent, kml_dpi` where rgba is an array
+    of shape (y_cells, x_cells, 4) of uint8 with the colors of the cells as
+    they appear in the png file, i.e. with the first row at the north edge.
+    The `png_extent` is needed in construcing a kml file to display the
+    png file on Google Earth, e.g. using the function `png2kml` in this
+    module.
+    """
+
+    xedge, yedge, dx, dy = _cell_edges(X, Y, Z)
+
+    cmap, norm = _cmap_norm(cmap, norm, vmin, vmax)
+
+    # colors of the cells, rows ordered from north to south as in the image:
+    rgba = _cell_colors(Z, cmap, norm)
+    if dy > 0:
+        rgba = rgba[::-1, :, :]
+    if dx < 0:
+        rgba = rgba[:, ::-1, :]
+
+    if int(dpc) != dpc or dpc < 1:
+        raise ValueError('dpc must be a positive integer')
+    dpc = int(dpc)
+    y_cells, x_cells = Z.shape
+    kml_dpi = max(int(round(dpc * max(x_cells, y_cells) / max_inches)), 16)
+
+    if verbose:
+        print('Image has %i by %i grid cells of uniform color, %i by %i pixels'\
+              % (x_cells, y_cells, dpc*x_cells, dpc*y_cells))
+
+    if png_filename is not None:
+        _write_png_cells(png_filename, rgba, dpc, kml_dpi, compress_level)
+        if verbose:
+            print('Created ',png_filename)
+
+    png_extent = [xedge[0], xedge[-1], yedge[0], yedge[-1]]
+    return rgba, png_extent, kml_dpi
+
 
 def kml_png(mapping):
     """
@@ -1247,6 +1406,69 @@ def kml_cb(mapping):
 
     return kml_text
 
+def kml_lod_region(mapping):
+    """
+    Create text for a Region with level of detail limits in pixels
+    """
+
+    kml_text = """
+<Region>
+  <LatLonAltBox>
+    <north>{y2:.9f}</north>
+    <south>{y1:.9f}</south>
+    <east>{x2:.9f}</east>
+    <west>{x1:.9f}</west>
+  </LatLonAltBox>
+  <Lod>
+    <minLodPixels>{min_lod_pixels:d}</minLodPixels>
+    <maxLodPixels>{max_lod_pixels:d}</maxLodPixels>
+  </Lod>
+</Region>
+""".format(**mapping)
+
+    return kml_text
+
+def kml_network_link(mapping):
+    """
+    Create text for a NetworkLink to a kml file, loaded when its Region
+    (if mapping['region'] is not empty) becomes active
+    """
+
+    kml_text = """
+<NetworkLink>
+<name>{name:s}</name>
+{region:s}
+<Link>
+  <href>{href:s}</href>
+  <viewRefreshMode>onRegion</viewRefreshMode>
+</Link>
+</NetworkLink>
+""".format(**mapping)
+
+    return kml_text
+
+def kml_tile(mapping):
+    """
+    Create text for a super-overlay tile, drawn above coarser tiles
+    """
+
+    kml_text = """
+<GroundOverlay>
+<drawOrder>{draw_order:d}</drawOrder>
+<Icon>
+  <href>{png_file:s}</href>
+</Icon>
+<LatLonBox>
+  <north>{y2:.9f}</north>
+  <south>{y1:.9f}</south>
+  <east>{x2:.9f}</east>
+  <west>{x1:.9f}</west>
+</LatLonBox>
+</GroundOverlay>
+""".format(**mapping)
+
+    return kml_text
+
 radio_style_text = """
 <Style id="folderStyle">
 <ListStyle>
@@ -1388,7 +1610,8 @@ def kml_build_colorbar(cb_filename, cmap, cmin=None, cmax=None,
 
 
 def topo2kmz(topo, zlim=(-20,20), mask_outside_zlim=True, sea_level=0., 
-             name='topo', force_dry=None, close_figs=True):
+             name='topo', force_dry=None, close_figs=True, tile_cells=None,
+             nprocs=1):
 
     """
     Create kmz file showing onshore and offshore topography as separate layers.
@@ -1405,7 +1628,11 @@ def topo2kmz(topo, zlim=(-20,20), mask_outside_zlim=True, sea_level=0.,
      - *sea_level* is the break between water and land colors
      - *name* is used in the kml menu and file name
      - *force_dry* is currently not used 
-     - *close_figs* to close the pyplot figures after making png files
+     - *close_figs* to close the pyplot figure of the colorbar
+     - *tile_cells* if not None, each layer is a super-overlay of tiles
+       with at most tile_cells by tile_cells cells, see cells2superoverlay,
+       rather than a single png file.  Use this for very large DEMs.
+     - *nprocs* number of processes used to write the tiles
 
     :Future:
     If `force_dry` is an array of the same shape as `topo.Z` then another png
@@ -1419,7 +1646,6 @@ def topo2kmz(topo, zlim=(-20,20), mask_outside_zlim=True, sea_level=0.,
     from numpy import ma
     from clawpack.visclaw import colormaps
     import zipfile
-    import matplotlib.pyplot as plt
     
     assert force_dry is None, 'force_dry not yet implemented'
     
@@ -1451,43 +1677,72 @@ def topo2kmz(topo, zlim=(-20,20), mask_outside_zlim=True, sea_level=0.,
     print('Will put png and kml files in %s' % kml_dir)
     
     Z_land = ma.masked_where(Z<sea_level, Z)
-    png_filename = '%s/%s_land.png' % (kml_dir, name)
-    fig,ax,png_extent,kml_dpi = pcolorcells_for_kml(topo.X, topo.Y, 
-                                         Z_land, png_filename=png_filename,
-                                         dpc=2, cmap=cmap_topo, norm=norm_topo)
-    if close_figs:
-        plt.close(fig)
-
     Z_water = ma.masked_where(Z>=sea_level, Z)
-    png_filename = '%s/%s_water.png' % (kml_dir, name)
-    fig,ax,png_extent,kml_dpi = pcolorcells_for_kml(topo.X, topo.Y, 
-                                         Z_water, png_filename=png_filename,
-                                         dpc=2, cmap=cmap_topo, norm=norm_topo)
-
-    if close_figs:
-        plt.close(fig)
 
     kml_build_colorbar('%s/colorbar.png' % kml_dir, cmap_topo, 
                                 cmin=zlim[0], cmax=zlim[1], label='meters', 
                                 title='topo', extend=cbar_extend,
                                 close_figs=close_figs)
 
-        
-    png_files=['%s_water.png' % name, '%s_land.png' % name]
-    png_names=['%s_water' % name,'%s_land' % name]
-    cb_files = ['colorbar.png']
-    cb_names = ['colorbar_topo']
-
-    name = '%s_topo' % name
-    fname = os.path.join(kml_dir, name+'.kml')
-    png2kml(png_extent, png_files=png_files, png_names=png_names, 
-                     name=name, fname=fname,
-                     radio_style=False,
-                     cb_files=cb_files, cb_names=cb_names)
+    if tile_cells is not None:
+        # super-overlay for each layer, linked from the main kml file:
+        layer_names = []
+        for layer, Z_layer in [('water', Z_water), ('land', Z_land)]:
+            if ma.getmaskarray(Z_layer).all():
+                continue
+            layer_names.append('%s_%s' % (name, layer))
+            cells2superoverlay(topo.X, topo.Y, Z_layer, name=layer_names[-1],
+                               kml_dir=kml_dir, tile_cells=tile_cells, dpc=2,
+                               cmap=cmap_topo, norm=norm_topo, nprocs=nprocs)
+
+        name = '%s_topo' % name
+        fname = os.path.join(kml_dir, name+'.kml')
+        kml_text = kml_header(name) + "<name>%s</name>\n" % name \
+                   + "<open>1</open>\n"
+        for layer_name in layer_names:
+            kml_text = kml_text + kml_network_link({'name': layer_name,
+                                    'region': '',
+                                    'href': layer_name + '.kml'})
+        kml_text = kml_text + kml_cb({'name': 'colorbar_topo',
+                                      'cb_file': 'colorbar.png',
+                                      'xfrac': 0.025, 'yfrac': 0.05})
+        kml_text = kml_text + kml_footer()
+        with open(fname, 'w') as kml_file:
+            kml_file.write(kml_text)
+        print('Created ', fname)
+
+    else:
+        png_filename = '%s/%s_land.png' % (kml_dir, name)
+        rgba,png_extent,kml_dpi = rgbacells_for_kml(topo.X, topo.Y, 
+                                         Z_land, png_filename=png_filename,
+                                         dpc=2, cmap=cmap_topo, norm=norm_topo)
+
+        png_filename = '%s/%s_water.png' % (kml_dir, name)
+        rgba,png_extent,kml_dpi = rgbacells_for_kml(topo.X, topo.Y, 
+                                         Z_water, png_filename=png_filename,
+                                         dpc=2, cmap=cmap_topo, norm=norm_topo)
+
+        png_files=['%s_water.png' % name, '%s_land.png' % name]
+        png_names=['%s_water' % name,'%s_land' % name]
+        cb_files = ['colorbar.png']
+        cb_names = ['colorbar_topo']
+
+        name = '%s_topo' % name
+        fname = os.path.join(kml_dir, name+'.kml')
+        png2kml(png_extent, png_files=png_files, png_names=png_names, 
+                         name=name, fname=fname,
+                         radio_style=False,
+                         cb_files=cb_files, cb_names=cb_names)
 
     savedir = os.getcwd()
     os.chdir(kml_dir)
-    files = glob.glob('*.kml') + glob.glob('*.png')
+    # the main kml file goes first, Google Earth opens the first one:
+    files = [os.path.basename(fname)]
+    files = files + [f for f in glob.glob('*.kml') if f not in files] \
+            + glob.glob('*.png')
+    if tile_cells is not None:
+        for layer_name in layer_names:
+            files = files + sorted(glob.glob('%s_files/*' % layer_name))
     print('kmz file will include:')
     for file in files:
         print('    %s' % os.path.split(file)[-1])
@@ -1499,6 +1754,207 @@ def topo2kmz(topo, zlim=(-20,20), mask_outside_zlim=True, sea_level=0.,
         print('Created %s' % os.path.abspath(fname_kmz))
     os.chdir(savedir)
 
+def _coarsen_cells(Z, coarsen):
+    """
+    Return the masked array Z coarsened by a factor 2 in each direction,
+    with the value of each coarse cell the 'mean', 'max' or 'min' of the
+    unmasked fine cells it contains.  Odd dimensions are padded.
+    """
+    import numpy as np
+
+    ny, nx = Z.shape
+    padded = np.ma.masked_all((ny + ny % 2, nx + nx % 2))
+    padded[:ny, :nx] = Z
+    blocks = padded.reshape(padded.shape[0]//2, 2, padded.shape[1]//2, 2)
+    if coarsen == 'mean':
+        return blocks.mean(axis=(1, 3))
+    elif coarsen == 'max':
+        return blocks.max(axis=(1, 3))
+    elif coarsen == 'min':
+        return blocks.min(axis=(1, 3))
+    raise ValueError("coarsen must be 'mean', 'max' or 'min'")
+
+
+def _render_tiles(args):
+    """
+    Write the png files of a list of tiles (png_path, Z), must be at module
+    level for pickling by a multiprocessing Pool.
+    """
+    tiles, cmap, norm, dpc, dpi = args
+    for png_path, Z in tiles:
+        _write_png_cells(png_path, _cell_colors(Z, cmap, norm), dpc, dpi)
+
+
+def cells2superoverlay(X, Y, Z, name='overlay', kml_dir='.', tile_cells=256,
+                       dpc=2, cmap=None, norm=None, vmin=None, vmax=None,
+                       coarsen='mean', min_lod_pixels=128, nprocs=1,
+                       kmz=False, verbose=True):
+
+    """
+    Create a super-overlay for very large grids, so that Google Earth only
+    loads the tiles needed at the current view and zoom level, rather than
+    one png file for the whole grid as in rgbacells_for_kml and png2kml.
+
+    The tiles form a quadtree: the finest level has the data of Z in tiles
+    of at most tile_cells by tile_cells cells, and each coarser level has Z
+    coarsened by another factor 2 in each direction, up to a single tile
+    for the whole grid.  Each tile is a png file of at most dpc*tile_cells
+    pixels on a side and a kml file with a Region, whose Lod makes the tile
+    visible once it covers min_lod_pixels pixels on the screen, and
+    NetworkLinks to its (up to 4) children.  Tiles that are entirely masked
+    are omitted.  If the number of cells is not a multiple of a power of 2,
+    the last coarse cells of a coarser level extend slightly beyond the grid.
+
+    :Input:
+     - *X,Y,Z* the data as in pcolorcells_for_kml.
+     - *name* is used in the kml menu and file names.
+     - *kml_dir* directory where `name.kml` is written, with the tiles in
+       the subdirectory `name_files`.
+     - *tile_cells* maximum number of cells on a side of each tile.
+     - *dpc*, *cmap*, *norm*, *vmin*, *vmax* as in rgbacells_for_kml.  If
+       norm has no limits they are set from all of Z, so all tiles use the
+       same colors.
+     - *coarsen* 'mean', 'max' or 'min' of the cells combined on coarser
+       levels, e.g. 'max' for fgmax values.
+     - *min_lod_pixels* size on the screen when a tile is shown.
+     - *nprocs* if > 1, the png files are written in parallel with a
+       multiprocessing Pool.
+     - *kmz* if True the kml and png files are also packaged into
+       `name.kmz` in kml_dir.
+
+    Returns the path of the kml (or kmz) file created.
+    """
+
+    import os
+    import copy
+    import numpy as np
+
+    xedge, yedge, dx, dy = _cell_edges(X, Y, Z)
+    Z = np.ma.masked_invalid(Z)
+
+    # orient Z so rows go north and columns go east:
+    if xedge[-1] < xedge[0]:
+        Z = Z[:, ::-1]
+    if yedge[-1] < yedge[0]:
+        Z = Z[::-1, :]
+    x1 = min(xedge[0], xedge[-1])
+    y1 = min(yedge[0], yedge[-1])
+    dx = abs(dx)
+    dy = abs(dy)
+
+    if Z.mask.all():
+        raise ValueError('*** All values of Z are masked')
+
+    # the same colors on all levels, without changing the caller's norm:
+    cmap, norm = _cmap_norm(cmap, copy.copy(norm), vmin, vmax)
+    norm.autoscale_None(Z)
+
+    # Z on each level, pyramid[0] fits in one tile:
+    pyramid = [Z]
+    while max(pyramid[0].shape) > tile_cells:
+        pyramid.insert(0, _coarsen_cells(pyramid[0], coarsen))
+    num_levels = len(pyramid)
+
+    tile_dir = '%s_files' % name
+    os.makedirs(os.path.join(kml_dir, tile_dir), exist_ok=True)
+    dpi = max(int(round(dpc * tile_cells / 15.)), 16)
+
+    def tile_data(level, i, j):
+        return pyramid[level][j*tile_cells:(j+1)*tile_cells,
+                              i*tile_cells:(i+1)*tile_cells]
+
+    def tile_extent(level, i, j, shape):
+        factor = 2**(num_levels - 1 - level)
+        return {'x1': x1 + i*tile_cells*factor*dx,
+                'x2': x1 + (i*tile_cells + shape[1])*factor*dx,
+                'y1': y1 + j*tile_cells*factor*dy,
+                'y2': y1 + (j*tile_cells + shape[0])*factor*dy}
+
+    tiles = []
+    stack = [(0, 0, 0)]
+    while stack:
+        level, i, j = stack.pop()
+        Zt = tile_data(level, i, j)
+        tile_name = '%i_%i_%i' % (level, i, j)
+        mapping = tile_extent(level, i, j, Zt.shape)
+        mapping['min_lod_pixels'] = min_lod_pixels if level > 0 else 0
+        mapping['max_lod_pixels'] = -1
+        mapping['draw_order'] = level
+        mapping['png_file'] = tile_name + '.png'
+
+        kml_text = kml_header(tile_name) + kml_lod_region(mapping) \
+                   + kml_tile(mapping)
+
+        if level < num_levels - 1:
+            ny, nx = pyramid[level+1].shape
+            for jc in [2*j, 2*j+1]:
+                for ic in [2*i, 2*i+1]:
+                    if ic*tile_cells >= nx or jc*tile_cells >= ny:
+                        continue
+                    Zc = tile_data(level+1, ic, jc)
+                    if np.ma.getmaskarray(Zc).all():
+                        continue
+                    child = tile_extent(level+1, ic, jc, Zc.shape)
+                    child['min_lod_pixels'] = min_lod_pixels
+                    child['max_lod_pixels'] = -1
+                    child['region'] = kml_lod_region(child)
+                    child['name'] = '%i_%i_%i' % (level+1, ic, jc)
+                    child['href'] = child['name'] + '.kml'
+                    kml_text = kml_text + kml_network_link(child)
+                    stack.append((level+1, ic, jc))
+
+        kml_text = kml_text + kml_footer()
+        with open(os.path.join(kml_dir, tile_dir, tile_name + '.kml'),
+                  'w') as kml_file:
+            kml_file.write(kml_text)
+
+        # png rows go from north to south:
+        tiles.append((os.path.join(kml_dir, tile_dir, tile_name + '.png'),
+                      Zt[::-1, :]))
+
+    if verbose:
+        print('Writing %i tiles on %i levels in %s' \
+              % (len(tiles), num_levels, os.path.join(kml_dir, tile_dir)))
+
+    if nprocs > 1 and len(tiles) > 1:
+        from multiprocessing import Pool
+        groups = np.array_split(np.arange(len(tiles)), nprocs)
+        tasks = [([tiles[k] for k in group], cmap, norm, dpc, dpi)
+                 for group in groups if len(group) > 0]
+        with Pool(processes=nprocs) as pool:
+            pool.map(_render_tiles, tasks)
+    else:
+        _render_tiles((tiles, cmap, norm, dpc, dpi))
+
+    # top level kml file linking to the root tile:
+    mapping = tile_extent(0, 0, 0, pyramid[0].shape)
+    mapping['min_lod_pixels'] = 0
+    mapping['max_lod_pixels'] = -1
+    mapping['region'] = kml_lod_region(mapping)
+    mapping['name'] = name
+    mapping['href'] = '%s/0_0_0.kml' % tile_dir
+    fname = os.path.join(kml_dir, name + '.kml')
+    with open(fname, 'w') as kml_file:
+        kml_file.write(kml_header(name) + kml_network_link(mapping)
+                       + kml_footer())
+    if verbose:
+        print('Created ', fname)
+
+    if kmz:
+        import zipfile
+        fname_kmz = os.path.join(kml_dir, name + '.kmz')
+        with zipfile.ZipFile(fname_kmz, 'w') as zip:
+            zip.write(fname, name + '.kml')
+            for (png_path, Zt) in tiles:
+                for path in [png_path, png_path[:-4] + '.kml']:
+                    zip.write(path, os.path.relpath(path, kml_dir))
+        if verbose:
+            print('Created ', fname_kmz)
+        return fname_kmz
+
+    return fname
+
+
 def transect2kml(xtrans, ytrans, fname='transect.kml'):
     """
     Create a kml file for points with long,lat specified by xtrans,ytrans.
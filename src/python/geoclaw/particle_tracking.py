@@ -0,0 +1,305 @@
+r"""
+particle_tracking module: $CLAW/geoclaw/src/python/geoclaw/particle_tracking.py
+
+Tools to advect many passive particles (e.g. a simple model of floating
+debris) through the velocity field saved on an fgout grid at a sequence
+of output times.
+
+The velocities u,v are interpolated bilinearly in space and linearly in time
+between consecutive fgout frames, using a single
+fgout_tools.FGoutInterpPlan that is updated as the particles move, rather
+than creating interpolating functions at every step.  Only two frames are
+held in memory at any time, so long fgout sequences can be processed.
+
+Includes:
+
+- class ParticleTrajectories: array-backed store for particle positions
+            at each fgout frame time, optionally as memory-mapped .npy files.
+- class ParticleTracker: advect particles through a sequence of fgout
+            frames with RK2 or RK4 time stepping.
+
+Usage::
+
+    from clawpack.geoclaw import fgout_tools, particle_tracking
+
+    fgout_grid = fgout_tools.FGoutGrid(1, '_output')
+    fgout_grid.read_fgout_grids_data()
+
+    tracker = particle_tracking.ParticleTracker(fgout_grid, x0, y0,
+                                                method='RK4', nsubsteps=4)
+    traj = tracker.run(framenos=range(1,101), path='_particles')
+    # traj.x[k,:], traj.y[k,:] are the positions at time traj.t[k]
+"""
+
+import os
+import numpy
+
+from clawpack.geoclaw import fgout_tools
+
+# particle status values stored in ParticleTrajectories.status:
+ACTIVE = 0      # moving with the flow
+DRY = 1         # at a dry location, not moving (may move again later)
+OUT = 2         # left the fgout grid, frozen at last position inside
+
+
+class ParticleTrajectories(object):
+
+    """
+    Store the positions of npts particles at ntimes output times.
+
+    The arrays t (ntimes,), x,y (ntimes,npts) and status (ntimes,npts)
+    are preallocated, either in memory or, if path is given, as
+    memory-mapped .npy files t.npy, x.npy, y.npy, status.npy in
+    directory path, so that very large sets of trajectories need not fit
+    in memory.  Use ParticleTrajectories.load(path) to reopen them.
+    """
+
+    def __init__(self, npts=0, ntimes=0, path=None, dtype='f8'):
+        self.npts = npts
+        self.ntimes = ntimes
+        self.path = path
+        self.nstored = 0   # number of times stored so far
+
+        if path is None:
+            self.t = numpy.empty(ntimes)
+            self.x = numpy.empty((ntimes,npts), dtype=dtype)
+            self.y = numpy.empty((ntimes,npts), dtype=dtype)
+            self.status = numpy.empty((ntimes,npts), dtype=numpy.int8)
+        else:
+            from numpy.lib.format import open_memmap
+            os.makedirs(path, exist_ok=True)
+            self.t = open_memmap(os.path.join(path, 't.npy'), mode='w+',
+                                 dtype='f8', shape=(ntimes,))
+            self.x = open_memmap(os.path.join(path, 'x.npy'), mode='w+',
+                                 dtype=dtype, shape=(ntimes,npts))
+            self.y = open_memmap(os.path.join(path, 'y.npy'), mode='w+',
+                                 dtype=dtype, shape=(ntimes,npts))
+            self.status = open_memmap(os.path.join(path, 'status.npy'),
+                                 mode='w+', dtype=numpy.int8,
+                                 shape=(ntimes,npts))
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Open trajectories previously stored in directory path.
+        """
+        traj = cls()
+        traj.path = path
+        traj.t = numpy.load(os.path.join(path, 't.npy'), mmap_mode=mmap_mode)
+        traj.x = numpy.load(os.path.join(path, 'x.npy'), mmap_mode=mmap_mode)
+        traj.y = numpy.load(os.path.join(path, 'y.npy'), mmap_mode=mmap_mode)
+        traj.status = numpy.load(os.path.join(path, 'status.npy'),
+                                 mmap_mode=mmap_mode)
+        traj.ntimes, traj.npts = traj.x.shape
+        traj.nstored = traj.ntimes
+        return traj
+
+    def append(self, t, x, y, status):
+        """
+        Store positions x,y and status of all particles at time t.
+        """
+        k = self.nstored
+        if k >= self.ntimes:
+            raise ValueError('*** ParticleTrajectories is full, ntimes = %i' \
+                             % self.ntimes)
+        self.t[k] = t
+        self.x[k,:] = x
+        self.y[k,:] = y
+        self.status[k,:] = status
+        self.nstored += 1
+
+    def flush(self):
+        """
+        Flush memory-mapped arrays to disk.
+        """
+        for a in [self.t, self.x, self.y, self.status]:
+            if isinstance(a, numpy.memmap):
+                a.flush()
+
+
+class ParticleTracker(object):
+
+    """
+    Advect particles through a sequence of fgout frames.
+
+    :Input:
+     - fgout_grid: FGoutGrid with the grid info already set, e.g. by
+       fgout_grid.read_fgout_grids_data(), used to read frames.
+     - x0, y0: 1D arrays with initial particle locations.
+     - method: 'RK2' (midpoint) or 'RK4' time stepping.
+     - nsubsteps: number of time steps taken between consecutive frames.
+     - drytol: particles where the interpolated depth h < drytol do not
+       move (status DRY).  Defaults to fgout_grid.drytol.
+     - method_xy: 'linear' (bilinear, default) or 'nearest' interpolation
+       in space.
+
+    Particles that would leave the extent of the fgout cell centers are
+    frozen at their last position and given status OUT.
+    """
+
+    def __init__(self, fgout_grid, x0, y0, method='RK2', nsubsteps=1,
+                 drytol=None, method_xy='linear'):
+
+        if method.upper() not in ['RK2', 'RK4']:
+            raise ValueError("method must be 'RK2' or 'RK4'")
+        self.fgout_grid = fgout_grid
+        self.method = method.upper()
+        self.nsubsteps = nsubsteps
+        if drytol is None:
+            drytol = fgout_grid.drytol
+        self.drytol = drytol
+
+        self.x = numpy.array(x0, dtype=float).ravel()
+        self.y = numpy.array(y0, dtype=float).ravel()
+        assert self.x.shape == self.y.shape, '*** x0,y0 must have same shape'
+
+        # a single interpolation plan, updated as particles move:
+        self.plan = fgout_tools.FGoutInterpPlan(fgout_grid, self.x, self.y,
+                                                method=method_xy)
+        self.status = numpy.where(self.plan.inside, ACTIVE, OUT) \
+                           .astype(numpy.int8)
+
+        # u,v,h at the two frames bracketing the current time,
+        # stacked as an array of shape (6,nx,ny):
+        self._uvh = None
+        self._t1 = None
+        self._t2 = None
+
+    @property
+    def npts(self):
+        return len(self.x)
+
+    def _frames(self, framenos=None, frames=None):
+        """
+        Generator returning FGoutFrames one at a time, either read from
+        self.fgout_grid for each frameno or taken from the list frames.
+        """
+        if frames is not None:
+            for fgframe in frames:
+                yield fgframe
+        else:
+            for frameno in framenos:
+                yield self.fgout_grid.read_frame(frameno)
+
+    def _set_interval(self, fgframe1, fgframe2):
+        """
+        Store u,v,h from two consecutive frames for interpolation in time.
+        """
+        self._t1 = fgframe1.t
+        self._t2 = fgframe2.t
+        self._uvh = numpy.array(fgframe1.compute(['u','v','h']) +
+                                fgframe2.compute(['u','v','h']))
+
+    def velocity(self, x, y, t):
+        """
+        Return u,v interpolated to the points x,y (arrays of length npts)
+        at time t between the two current frames.  Velocities are 0 at dry
+        points and NaN at points outside the grid.
+        """
+        self.plan.update(x, y)
+        vals = self.plan.interp_array(self._uvh)
+        alpha = (t - self._t1) / (self._t2 - self._t1)
+        u = (1-alpha)*vals[0] + alpha*vals[3]
+        v = (1-alpha)*vals[1] + alpha*vals[4]
+        h = (1-alpha)*vals[2] + alpha*vals[5]
+        dry = h < self.drytol
+        u[dry] = 0.
+        v[dry] = 0.
+        return u, v
+
+    def step(self, t, dt):
+        """
+        Take one time step of size dt from time t, updating self.x, self.y
+        and self.status.
+        """
+        x = self.x
+        y = self.y
+        moving = (self.status != OUT)
+
+        def vel(xs, ys, ts):
+            u, v = self.velocity(xs, ys, ts)
+            u[~moving] = 0.
+            v[~moving] = 0.
+            return u, v
+
+        if self.method == 'RK2':
+            u1, v1 = vel(x, y, t)
+            u2, v2 = vel(x + 0.5*dt*u1, y + 0.5*dt*v1, t + 0.5*dt)
+            xnew = x + dt*u2
+            ynew = y + dt*v2
+        else:
+            u1, v1 = vel(x, y, t)
+            u2, v2 = vel(x + 0.5*dt*u1, y + 0.5*dt*v1, t + 0.5*dt)
+            u3, v3 = vel(x + 0.5*dt*u2, y + 0.5*dt*v2, t + 0.5*dt)
+            u4, v4 = vel(x + dt*u3, y + dt*v3, t + dt)
+            xnew = x + dt/6. * (u1 + 2*u2 + 2*u3 + u4)
+            ynew = y + dt/6. * (v1 + 2*v2 + 2*v3 + v4)
+
+        # particles whose path left the grid give NaN, freeze these:
+        out = moving & ~(numpy.isfinite(xnew) & numpy.isfinite(ynew))
+        self.plan.update(numpy.where(out, x, xnew), numpy.where(out, y, ynew))
+        out = out | (moving & ~self.plan.inside)
+        keep = out | ~moving
+        self.x = numpy.where(keep, x, xnew)
+        self.y = numpy.where(keep, y, ynew)
+        self.status[out] = OUT
+
+        # flag particles that are currently stranded on dry land:
+        self.plan.update(self.x, self.y)
+        h = self.plan.interp_array(self._uvh[[2,5]])
+        alpha = (t + dt - self._t1) / (self._t2 - self._t1)
+        self._set_dry((1-alpha)*h[0] + alpha*h[1])
+
+    def _set_dry(self, h):
+        """
+        Set status DRY or ACTIVE for particles not OUT, based on the depth
+        h interpolated to the particle locations.
+        """
+        still = (self.status != OUT)
+        self.status[still] = numpy.where(h[still] < self.drytol, DRY, ACTIVE)
+
+    def run(self, framenos=None, frames=None, path=None, dtype='f8',
+            verbose=True):
+        """
+        Advect the particles from the time of the first frame to the time of
+        the last frame and return a ParticleTrajectories object with the
+        positions at each frame time.
+
+        Either framenos (frame numbers to read with fgout_grid.read_frame,
+        one at a time) or frames (a list of FGoutFrame objects already read)
+        must be given.  If path is not None the trajectories are stored in
+        memory-mapped files in that directory.
+        """
+
+        if frames is None:
+            framenos = list(framenos)
+            ntimes = len(framenos)
+        else:
+            ntimes = len(frames)
+
+        traj = ParticleTrajectories(self.npts, ntimes, path=path, dtype=dtype)
+
+        fgframe1 = None
+        for fgframe2 in self._frames(framenos, frames):
+            if fgframe1 is None:
+                self.plan.update(self.x, self.y)
+                self._set_dry(self.plan.interp(fgframe2, 'h'))
+                traj.append(fgframe2.t, self.x, self.y, self.status)
+                fgframe1 = fgframe2
+                continue
+
+            self._set_interval(fgframe1, fgframe2)
+            dt = (fgframe2.t - fgframe1.t) / self.nsubsteps
+            for n in range(self.nsubsteps):
+                self.step(fgframe1.t + n*dt, dt)
+            traj.append(fgframe2.t, self.x, self.y, self.status)
+
+            if verbose:
+                print('Tracked %i particles to t = %.3f, %i active, %i out' \
+                      % (self.npts, fgframe2.t, (self.status==ACTIVE).sum(),
+                         (self.status==OUT).sum()))
+            fgframe1 = fgframe2
+
+        traj.flush()
+        self._uvh = None
+        return traj
@@ -0,0 +1,313 @@
+r"""
+ptha_tools module: $CLAW/geoclaw/src/python/geoclaw/ptha_tools.py
+
+Tools for probabilistic tsunami hazard assessment (PTHA) based on the
+fgmax output of many GeoClaw runs, one for each scenario in an ensemble,
+each with a weight (probability or annual rate).
+
+The fgmax results of each run are read once and added to per-point
+weighted histograms of each quantity of interest, so the runs never need
+to be in memory together.  Partial results for disjoint sets of runs can
+be merged, which is used to process runs in parallel.
+
+Includes:
+
+- class HazardAccumulator: weighted per-point histograms of fgmax
+            quantities, with methods to compute exceedance probabilities,
+            hazard curves, percentiles and hazard maps.
+- function aggregate_fgmax_runs: read the fgmax output from many run
+            directories, optionally in parallel, into a HazardAccumulator.
+
+Usage::
+
+    from clawpack.geoclaw import fgmax_tools, ptha_tools
+
+    fg = fgmax_tools.FGmaxGrid()
+    fg.read_fgmax_grids_data(1, 'fgmax_grids.data')
+
+    hazard = ptha_tools.aggregate_fgmax_runs(fg, outdirs, weights,
+                                             qois=['h','s'], nprocs=8)
+    levels, P = hazard.hazard_curves('h')   # P[k,...] = Prob(h > levels[k])
+    h_map = hazard.hazard_map('h', 0.01)    # h exceeded with probability 0.01
+    hazard.save('hazard.npz')
+"""
+
+import numpy
+from numpy import ma
+
+# default exceedance levels, 20 per decade from 1 cm (or cm/s) to 10 km:
+default_levels = numpy.logspace(-2, 4, 121)
+
+
+class HazardAccumulator(object):
+
+    """
+    Weighted per-point histograms of fgmax quantities of interest over
+    an ensemble of runs.
+
+    :Input:
+     - qois: list of FGmaxGrid attributes to accumulate, e.g. 'h','s','hss'.
+     - levels: increasing exceedance levels, either a single array used for
+       all qois or a dictionary indexed by qoi.  Default default_levels.
+
+    For each qoi, self.hist[qoi] has shape (nlevels+1, npts), where
+    hist[qoi][k,p] is the total weight of the runs with
+    levels[k-1] < q <= levels[k] at point p (with levels[-1] = -inf and
+    levels[nlevels] = inf).  Masked values (points never wet) count as 0.
+    The weighted sum and the maximum over runs are also accumulated.
+
+    The fgmax arrays are flattened, and results are reshaped to
+    self.shape, the shape of the FGmaxGrid arrays.
+    """
+
+    def __init__(self, qois=['h','s','hss'], levels=None):
+        self.qois = list(qois)
+        if levels is None:
+            levels = default_levels
+        if not isinstance(levels, dict):
+            levels = {qoi: levels for qoi in self.qois}
+        self.levels = {qoi: numpy.asarray(levels[qoi], dtype=float)
+                       for qoi in self.qois}
+        for qoi in self.qois:
+            assert (numpy.diff(self.levels[qoi]) > 0).all(), \
+                   '*** levels must be increasing for %s' % qoi
+
+        self.shape = None
+        self.npts = None
+        self.X = None
+        self.Y = None
+        self.hist = {}
+        self.qsum = {}
+        self.qmax = {}
+        self.total_weight = 0.
+        self.nruns = 0
+
+    def _allocate(self, fg):
+        """
+        Allocate the arrays on the first update, based on fgmax grid fg.
+        """
+        self.shape = fg.X.shape
+        self.npts = fg.X.size
+        self.X = numpy.array(fg.X)
+        self.Y = numpy.array(fg.Y)
+        for qoi in self.qois:
+            nlevels = len(self.levels[qoi])
+            self.hist[qoi] = numpy.zeros((nlevels+1, self.npts))
+            self.qsum[qoi] = numpy.zeros(self.npts)
+            self.qmax[qoi] = numpy.zeros(self.npts)
+
+    def update(self, fg, weight=1.):
+        """
+        Add the fgmax results in FGmaxGrid fg (after fg.read_output) for one
+        run with the given weight.
+        """
+        if self.shape is None:
+            self._allocate(fg)
+        elif fg.X.shape != self.shape:
+            raise ValueError('*** fgmax grid has shape %s, expected %s' \
+                             % (fg.X.shape, self.shape))
+
+        ipts = numpy.arange(self.npts)
+        for qoi in self.qois:
+            q = getattr(fg, qoi, None)
+            if q is None:
+                raise ValueError('*** fgmax grid has no values for %s' % qoi)
+            q = ma.filled(q, 0.).ravel()
+            # bin k has levels[k-1] < q <= levels[k], each point is in
+            # exactly one bin so the pairs (k, ipts) are distinct:
+            k = numpy.searchsorted(self.levels[qoi], q, side='left')
+            self.hist[qoi][k, ipts] += weight
+            self.qsum[qoi] += weight * q
+            numpy.maximum(self.qmax[qoi], q, out=self.qmax[qoi])
+        self.total_weight += weight
+        self.nruns += 1
+
+    def merge(self, other):
+        """
+        Merge the results of another HazardAccumulator for a disjoint set of
+        runs into this one.
+        """
+        if other.shape is None:
+            return
+        if self.shape is None:
+            self._allocate(other)
+        elif other.shape != self.shape:
+            raise ValueError('*** cannot merge, shapes %s and %s differ' \
+                             % (other.shape, self.shape))
+        for qoi in self.qois:
+            if not numpy.array_equal(other.levels[qoi], self.levels[qoi]):
+                raise ValueError('*** cannot merge, levels differ for %s' % qoi)
+            self.hist[qoi] += other.hist[qoi]
+            self.qsum[qoi] += other.qsum[qoi]
+            numpy.maximum(self.qmax[qoi], other.qmax[qoi], out=self.qmax[qoi])
+        self.total_weight += other.total_weight
+        self.nruns += other.nruns
+
+    def exceedance(self, qoi, normalize=True):
+        """
+        Return an array of shape (nlevels,) + self.shape with the total
+        weight of runs where qoi > levels[k] at each point.  If normalize is
+        True this is divided by the total weight, giving probabilities.
+        Use normalize=False if the weights are annual rates, for example.
+        """
+        hist = self.hist[qoi]
+        # reversed cumulative sum over bins k+1, k+2, ...:
+        exceed = numpy.cumsum(hist[:0:-1], axis=0)[::-1]
+        if normalize:
+            exceed = exceed / self.total_weight
+        return exceed.reshape((len(self.levels[qoi]),) + self.shape)
+
+    def hazard_curves(self, qoi, normalize=True):
+        """
+        Return levels and exceedance(qoi, normalize), so that
+        P[:,...] is the hazard curve at each point.
+        """
+        return self.levels[qoi], self.exceedance(qoi, normalize)
+
+    def mean(self, qoi):
+        """
+        Return the weighted mean of qoi at each point.
+        """
+        return (self.qsum[qoi] / self.total_weight).reshape(self.shape)
+
+    def max(self, qoi):
+        """
+        Return the maximum of qoi over all runs at each point.
+        """
+        return self.qmax[qoi].reshape(self.shape)
+
+    def percentile(self, qoi, p):
+        """
+        Return the weighted p-th percentile (0 <= p <= 100) of qoi at each
+        point, estimated from the histograms by linear interpolation of the
+        cumulative distribution between levels.  Values below levels[0]
+        are returned as 0 and values above levels[-1] as the maximum over
+        all runs.
+        """
+        levels = self.levels[qoi]
+        # cdf[k,:] = Prob(q <= levels[k]):
+        cdf = numpy.cumsum(self.hist[qoi][:-1], axis=0) / self.total_weight
+        frac = p / 100.
+        # index of first level with cdf >= frac, with tolerance for roundoff:
+        m = (cdf < frac - 1e-12).sum(axis=0)
+        ipts = numpy.arange(self.npts)
+        q = numpy.zeros(self.npts)
+
+        above = (m == len(levels))
+        q[above] = self.qmax[qoi][above]
+
+        inside = (m > 0) & ~above
+        mi = m[inside]
+        ii = ipts[inside]
+        c1 = cdf[mi-1, ii]
+        c2 = cdf[mi, ii]
+        alpha = numpy.divide(frac - c1, c2 - c1, out=numpy.ones(len(mi)),
+                             where=(c2 > c1))
+        q[inside] = levels[mi-1] + alpha*(levels[mi] - levels[mi-1])
+        return q.reshape(self.shape)
+
+    def hazard_map(self, qoi, probability):
+        """
+        Return the value of qoi exceeded with the given probability at
+        each point, i.e. the (1-probability) percentile.
+        """
+        return self.percentile(qoi, 100.*(1. - probability))
+
+    def save(self, fname):
+        """
+        Save the accumulated histograms and grid to the .npz file fname,
+        which can be reloaded with HazardAccumulator.load(fname).
+        """
+        arrays = {'qois': numpy.array(self.qois),
+                  'shape': numpy.array(self.shape),
+                  'X': self.X, 'Y': self.Y,
+                  'total_weight': self.total_weight, 'nruns': self.nruns}
+        for qoi in self.qois:
+            arrays['levels_%s' % qoi] = self.levels[qoi]
+            arrays['hist_%s' % qoi] = self.hist[qoi]
+            arrays['qsum_%s' % qoi] = self.qsum[qoi]
+            arrays['qmax_%s' % qoi] = self.qmax[qoi]
+        numpy.savez(fname, **arrays)
+
+    @classmethod
+    def load(cls, fname):
+        """
+        Load a HazardAccumulator saved with the save method.
+        """
+        with numpy.load(fname) as npz:
+            qois = [str(qoi) for qoi in npz['qois']]
+            levels = {qoi: npz['levels_%s' % qoi] for qoi in qois}
+            hazard = cls(qois, levels)
+            hazard.shape = tuple(int(n) for n in npz['shape'])
+            hazard.npts = int(numpy.prod(hazard.shape))
+            hazard.X = npz['X']
+            hazard.Y = npz['Y']
+            hazard.total_weight = float(npz['total_weight'])
+            hazard.nruns = int(npz['nruns'])
+            for qoi in qois:
+                hazard.hist[qoi] = npz['hist_%s' % qoi]
+                hazard.qsum[qoi] = npz['qsum_%s' % qoi]
+                hazard.qmax[qoi] = npz['qmax_%s' % qoi]
+        return hazard
+
+
+def _aggregate_runs(args):
+    """
+    Worker for aggregate_fgmax_runs, must be at module level for pickling.
+    """
+    import copy
+    fg_template, outdirs, weights, qois, levels, read_kwargs, verbose = args
+    hazard = HazardAccumulator(qois, levels)
+    for outdir, weight in zip(outdirs, weights):
+        fg = copy.copy(fg_template)
+        fg.read_output(outdir=outdir, qois=qois, verbose=False, **read_kwargs)
+        hazard.update(fg, weight)
+        if verbose:
+            print('Added fgmax results from %s with weight %g' \
+                  % (outdir, weight))
+    return hazard
+
+
+def aggregate_fgmax_runs(fg, outdirs, weights=None, qois=['h','s','hss'],
+                         levels=None, nprocs=1, verbose=False, **read_kwargs):
+    """
+    Read the fgmax results from each directory in outdirs and accumulate
+    them in a HazardAccumulator, which is returned.
+
+    :Input:
+     - fg: FGmaxGrid with the input data set (e.g. by
+       fg.read_fgmax_grids_data), used as a template for reading the
+       output of every run.
+     - outdirs: list of output directories, one per run.
+     - weights: list of weights for the runs, default all 1.
+     - qois, levels: passed to HazardAccumulator.
+     - nprocs: if > 1, the runs are split into nprocs groups that are
+       processed in parallel with a multiprocessing Pool, and the partial
+       results are merged.
+     - read_kwargs: other keyword arguments for fg.read_output, e.g.
+       cache=True to save the columns read in a cache file in each outdir.
+    """
+    outdirs = list(outdirs)
+    if weights is None:
+        weights = numpy.ones(len(outdirs))
+    weights = numpy.asarray(weights, dtype=float)
+    if len(weights) != len(outdirs):
+        raise ValueError('*** weights and outdirs must have the same length')
+
+    if nprocs <= 1 or len(outdirs) < 2:
+        return _aggregate_runs((fg, outdirs, weights, qois, levels,
+                                read_kwargs, verbose))
+
+    from multiprocessing import Pool
+
+    groups = numpy.array_split(numpy.arange(len(outdirs)), nprocs)
+    tasks = [(fg, [outdirs[k] for k in group], weights[group], qois,
+              levels, read_kwargs, verbose) for group in groups
+             if len(group) > 0]
+    with Pool(processes=nprocs) as pool:
+        partial = pool.map(_aggregate_runs, tasks)
+
+    hazard = partial[0]
+    for other in partial[1:]:
+        hazard.merge(other)
+    return hazard
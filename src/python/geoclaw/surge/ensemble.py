@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+
+r"""
+Module for ensembles of synthetic storm tracks
+
+An ensemble holds N storms that share the times of their track as stacked
+arrays with one row per member, so that perturbations and missing value
+fills are applied to all members at once, and the GeoClaw (or ATCF) storm
+files of all members can be written in parallel.  A typical workflow for
+perturbing a best-track storm would be::
+
+    storm = clawpack.geoclaw.surge.storm.Storm("my_storm.txt",
+                                                file_format='ATCF')
+    ensemble = StormEnsemble.from_storm(storm, 1000)
+    rng = numpy.random.default_rng(1234)
+    ensemble = ensemble.perturb(cross_track=rng.normal(0, 50e3, 1000),
+                                forward_speed=rng.uniform(0.8, 1.2, 1000),
+                                max_wind_speed=rng.uniform(0.9, 1.1, 1000),
+                                max_wind_radius=rng.uniform(0.8, 1.2, 1000))
+    paths = ensemble.write("storms/storm_{:04d}.storm", nprocs=8)
+
+Times are in seconds relative to *time_offset*, the *reference_time* of
+forward speed changes defaults to the time offset (often landfall).
+"""
+
+import os
+import datetime
+import warnings
+
+import numpy as np
+
+from clawpack.geoclaw.data import Rearth
+import clawpack.geoclaw.surge.storm as storm_module
+from clawpack.geoclaw.surge.storm import Storm
+
+# Fields given at each time for each member, eye_location is in addition
+fields = ["max_wind_speed", "max_wind_radius", "central_pressure",
+          "storm_radius"]
+
+
+class StormEnsemble(object):
+    r"""
+    Ensemble of storms sharing the times of their track
+
+    :Attributes:
+     - *t* (ndarray(nt)) Times in seconds relative to *time_offset*.
+     - *time_offset* (datetime.datetime or float) Time the times are
+       relative to, written in the header of the GeoClaw storm files.
+     - *eye_location* (ndarray(N, nt, 2)) Longitude and latitude of the eye
+       of each member.
+     - *max_wind_speed*, *max_wind_radius*, *central_pressure*,
+       *storm_radius* (ndarray(N, nt)) Storm data of each member, in the
+       units of :class:`~clawpack.geoclaw.surge.storm.Storm`.  Missing
+       values are NaN.
+     - *names* (list) Name of each member.
+
+    :Initialization:
+     1. From a storm replicated *N* times, see :meth:`from_storm`.
+     2. From a list of storms with the same times, see :meth:`from_storms`.
+     3. Directly from arrays, fields given per time are broadcast to all
+        members.
+    """
+
+    def __init__(self, t, eye_location, max_wind_speed, max_wind_radius,
+                 central_pressure, storm_radius, time_offset=0.0, names=None):
+
+        self.t = np.asarray(t, dtype=float)
+        self.eye_location = np.asarray(eye_location, dtype=float)
+        if self.eye_location.ndim == 2:
+            self.eye_location = self.eye_location[None, :, :]
+        num_members = self.eye_location.shape[0]
+        shape = (num_members, len(self.t))
+        if self.eye_location.shape != shape + (2,):
+            raise ValueError("Eye locations have shape %s, expected %s."
+                             % (self.eye_location.shape, shape + (2,)))
+        for (name, value) in zip(fields, [max_wind_speed, max_wind_radius,
+                                          central_pressure, storm_radius]):
+            value = np.broadcast_to(np.asarray(value, dtype=float), shape)
+            setattr(self, name, value.copy())
+        self.time_offset = time_offset
+        if names is None:
+            names = ["member_%s" % str(k).zfill(4) for k in range(num_members)]
+        self.names = list(names)
+
+    def __len__(self):
+        return self.eye_location.shape[0]
+
+    def __repr__(self):
+        return '<{}.{} with {} members and {} times at {}>'.format(
+            self.__class__.__module__, self.__class__.__name__,
+            len(self), len(self.t), hex(id(self)))
+
+    @classmethod
+    def from_storm(cls, storm, num_members, names=None):
+        r"""Ensemble of *num_members* copies of *storm*
+
+        Repeated times are dropped as in
+        :meth:`~clawpack.geoclaw.surge.storm.Storm.write_geoclaw`.
+        """
+
+        t, time_offset = _storm_seconds(storm)
+        keep = np.ones(len(t), dtype=bool)
+        keep[1:] = t[1:] != t[:-1]
+        location = np.asarray(storm.eye_location, dtype=float)[keep]
+        data = [np.asarray(getattr(storm, name), dtype=float)[keep]
+                for name in fields]
+        return cls(t[keep], np.broadcast_to(location,
+                                            (num_members,) + location.shape),
+                   *data, time_offset=time_offset, names=names)
+
+    @classmethod
+    def from_storms(cls, storms, names=None):
+        r"""Ensemble of *storms*, which must all have the same times"""
+
+        times = [_storm_seconds(storm) for storm in storms]
+        t, time_offset = times[0]
+        for (other, _) in times[1:]:
+            if other.shape != t.shape or np.any(other != t):
+                raise ValueError("Storms of an ensemble need the same times.")
+        if names is None:
+            names = [storm.name if isinstance(storm.name, str)
+                     else "member_%s" % str(k).zfill(4)
+                     for (k, storm) in enumerate(storms)]
+        return cls(t, np.stack([storm.eye_location for storm in storms]),
+                   *[np.stack([getattr(storm, name) for storm in storms])
+                     for name in fields],
+                   time_offset=time_offset, names=names)
+
+    def copy(self):
+        r"""Copy of the ensemble, the arrays are copied"""
+        return StormEnsemble(self.t, self.eye_location.copy(),
+                             *[getattr(self, name) for name in fields],
+                             time_offset=self.time_offset, names=self.names)
+
+    def storm(self, member):
+        r"""Member *member* as a :class:`~clawpack.geoclaw.surge.storm.Storm`"""
+
+        storm = Storm()
+        if isinstance(self.time_offset, datetime.datetime):
+            storm.t = np.datetime64(self.time_offset, 'us') \
+                      + np.round(self.t * 1e6).astype('timedelta64[us]')
+        else:
+            storm.t = self.t + self.time_offset
+        storm.time_offset = self.time_offset
+        storm.eye_location = self.eye_location[member].copy()
+        for name in fields:
+            setattr(storm, name, getattr(self, name)[member].copy())
+        storm.name = self.names[member]
+        return storm
+
+    def fill(self, fill_dict=None):
+        r"""Fill missing values (NaNs) of all members at once
+
+        :Input:
+         - *fill_dict* (dict) Values to fill with for each field, either a
+           number or a function `my_func(t, ensemble)` returning values that
+           broadcast to shape (N, nt).  The default for `storm_radius` is
+           500 km as in
+           :meth:`~clawpack.geoclaw.surge.storm.Storm.write_geoclaw`.
+
+        :Output:
+         - (StormEnsemble) The ensemble, which is modified in place.
+        """
+
+        fill = {"storm_radius": 500e3}
+        if fill_dict is not None:
+            fill.update(fill_dict)
+        for (name, value) in fill.items():
+            data = getattr(self, name)
+            missing = np.isnan(data)
+            if not np.any(missing):
+                continue
+            if callable(value):
+                value = value(self.t, self)
+            value = np.broadcast_to(np.asarray(value, dtype=float), data.shape)
+            data[missing] = value[missing]
+        return self
+
+    def perturb(self, cross_track=0.0, forward_speed=1.0, max_wind_speed=1.0,
+                max_wind_radius=1.0, pressure_deficit=1.0, storm_radius=1.0,
+                reference_time=0.0, ambient_pressure=101.3e3,
+                coordinate_system=2, earth_radius=Rearth):
+        r"""Perturbed ensemble
+
+        Each perturbation is a number, an array with a value per member or
+        an array of shape (N, nt) with a value per member and time.
+
+        :Input:
+         - *cross_track* (float) Offset of the track in meters perpendicular
+           to the direction of motion, positive to the right of the motion.
+         - *forward_speed* (float) Factor for the forward speed.  The track
+           and intensity of a member at time *t* are those at
+           *reference_time* + *forward_speed* * (*t* - *reference_time*),
+           times falling outside of the track are NaN.
+         - *max_wind_speed*, *max_wind_radius*, *storm_radius* (float)
+           Factors for these fields.
+         - *pressure_deficit* (float) Factor for the difference between
+           *ambient_pressure* and the central pressure.
+         - *coordinate_system*, *earth_radius* (optional) Values as in
+           GeoClawData, used to convert *cross_track* to degrees.
+
+        :Output:
+         - (StormEnsemble) New perturbed ensemble.
+        """
+
+        shape = (len(self), len(self.t))
+        ensemble = self.copy()
+
+        # Forward speed changes, interpolating every member at its own times
+        forward_speed = _member_values(forward_speed, shape)
+        if np.any(forward_speed != 1.0):
+            tau = reference_time + forward_speed * (self.t - reference_time)
+            i = np.clip(np.searchsorted(self.t, tau), 1, len(self.t) - 1)
+            weight = (tau - self.t[i - 1]) / (self.t[i] - self.t[i - 1])
+            outside = (tau < self.t[0]) | (tau > self.t[-1])
+            rows = np.arange(shape[0])[:, None]
+            for name in ["eye_location"] + fields:
+                data = getattr(ensemble, name)
+                w = weight if data.ndim == 2 else weight[..., None]
+                data = data[rows, i - 1] + w * (data[rows, i]
+                                                - data[rows, i - 1])
+                data[outside] = np.nan
+                setattr(ensemble, name, data)
+
+        # Cross-track offsets, normal to the motion estimated with centered
+        # differences of the track
+        cross_track = _member_values(cross_track, shape)
+        if np.any(cross_track != 0.0):
+            location = ensemble.eye_location
+            if coordinate_system == 2:
+                scale = np.radians(earth_radius) * np.stack(
+                            [np.cos(np.radians(location[..., 1])),
+                             np.ones(shape)], axis=-1)
+            else:
+                scale = np.ones(location.shape)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                motion = np.gradient(location, self.t, axis=1) * scale
+                speed = np.sqrt(np.sum(motion**2, axis=-1))
+                normal = np.stack([motion[..., 1], -motion[..., 0]], axis=-1) \
+                         / speed[..., None]
+            normal[~(speed > 0.0)] = 0.0
+            ensemble.eye_location = location + cross_track[..., None] \
+                                               * normal / scale
+
+        ensemble.max_wind_speed *= _member_values(max_wind_speed, shape)
+        ensemble.max_wind_radius *= _member_values(max_wind_radius, shape)
+        ensemble.storm_radius *= _member_values(storm_radius, shape)
+        ensemble.central_pressure = ambient_pressure \
+                - _member_values(pressure_deficit, shape) \
+                * (ambient_pressure - ensemble.central_pressure)
+
+        return ensemble
+
+    def write(self, path, file_format="geoclaw", nprocs=1, fill_dict=None,
+              skip=True, force=False, **kwargs):
+        r"""Write a storm file for each member
+
+        :Input:
+         - *path* (string) Path of the files, formatted with the member index,
+           e.g. "storm_{:04d}.storm".  Directories are created as needed.
+         - *file_format* (string) "geoclaw" or "atcf".
+         - *nprocs* (int) If > 1, the members are split into *nprocs* groups
+           written in parallel with a multiprocessing Pool.
+         - *fill_dict* (dict) Fill values applied to all members before
+           writing, see :meth:`fill`.  The ensemble is not modified.
+         - *skip* (bool) Skip times with missing values in a member, as in
+           :meth:`~clawpack.geoclaw.surge.storm.Storm.write_geoclaw`.
+         - *force* (bool) Write missing values rather than raising an
+           exception when *skip* is `False`.
+         - *kwargs* Passed to the ATCF writer, *basin* (default "AL"),
+           *cyclone_number* (default 1) and *tech* (default "BEST").
+
+        :Output:
+         - (list) Paths of the files written.
+        """
+
+        file_format = file_format.lower()
+        if file_format not in ["geoclaw", "atcf"]:
+            raise ValueError("File format %s not available." % file_format)
+        if file_format == "atcf" and \
+                not isinstance(self.time_offset, datetime.datetime):
+            raise ValueError("ATCF files need a datetime time_offset.")
+
+        ensemble = self.copy().fill(fill_dict)
+        valid = ~np.isnan(ensemble.eye_location).any(axis=-1)
+        for name in fields:
+            valid &= ~np.isnan(getattr(ensemble, name))
+        if not skip and not force and not np.all(valid):
+            member, n = np.argwhere(~valid)[0]
+            raise ValueError(("Member {} has a NaN at time {} and will not "
+                              + "be written.  If you want to fill in the "
+                              + "value provide a fill value or set "
+                              + "`force=True`.").format(member, self.t[n]))
+        if not skip:
+            valid[:] = True
+
+        paths = [path.format(member) for member in range(len(self))]
+        for directory in set(os.path.dirname(p) for p in paths):
+            if len(directory) > 0:
+                os.makedirs(directory, exist_ok=True)
+
+        # Rows of each member: t, lon, lat, then the fields
+        data = np.concatenate([np.broadcast_to(self.t, valid.shape)[..., None],
+                               ensemble.eye_location]
+                              + [getattr(ensemble, name)[..., None]
+                                 for name in fields], axis=-1)
+        groups = [(paths[k], data[k][valid[k]]) for k in range(len(self))]
+        args = (file_format, self.time_offset,
+                dict({"cyclone_number": 1}, **kwargs))
+
+        if nprocs > 1 and len(groups) > 1:
+            from multiprocessing import Pool
+            splits = np.array_split(np.arange(len(groups)), nprocs)
+            with Pool(processes=nprocs) as pool:
+                pool.map(_write_members,
+                         [([groups[k] for k in split], args)
+                          for split in splits if len(split) > 0])
+        else:
+            _write_members((groups, args))
+
+        return paths
+
+
+def _storm_seconds(storm):
+    r"""Times of *storm* in seconds relative to its time offset, and the time
+    offset, as written by Storm.write_geoclaw"""
+
+    time_offset = storm.time_offset
+    if storm.t.dtype.kind == 'M':
+        if not isinstance(time_offset, datetime.datetime):
+            time_offset = storm_module._as_datetime(storm.t[0])
+        t = (storm.t - np.datetime64(time_offset, 'us')) \
+            / np.timedelta64(1, 's')
+    else:
+        if time_offset is None:
+            time_offset = 0.0
+        t = np.asarray(storm.t, dtype=float) - time_offset
+    return t, time_offset
+
+
+def _member_values(value, shape):
+    r"""Broadcast a perturbation given per ensemble, member or member and time
+    to *shape*"""
+    value = np.asarray(value, dtype=float)
+    if value.ndim == 1:
+        value = value[:, None]
+    return np.broadcast_to(value, shape)
+
+
+def _write_members(args):
+    r"""Write the files of a group of members, rows are t, lon, lat,
+    max_wind_speed, max_wind_radius, central_pressure, storm_radius"""
+
+    groups, (file_format, time_offset, kwargs) = args
+    for (path, rows) in groups:
+        if file_format == "geoclaw":
+            text = storm_module._geoclaw_block(rows, time_offset)
+        else:
+            t = np.datetime64(time_offset, 'us') \
+                + np.round(rows[:, 0] * 1e6).astype('timedelta64[us]')
+            text = storm_module._atcf_block(t, rows[:, 1:3], *rows[:, 3:].T,
+                                            **kwargs)
+        storm_module._write_text(path, text)
@@ -14,6 +14,7 @@ Plotting routines for storm surge simulations with GeoClaw
 from __future__ import absolute_import
 from __future__ import print_function
 
+import os
 import warnings
 
 import numpy as np
@@ -48,34 +49,131 @@ surge_data = geodata.SurgeData()
 # ==============================
 #  Track Plotting Functionality
 # ==============================
+class TrackFile(object):
+    """Incremental reader of a fort.track file
+
+    The byte offset of the data read so far is kept so that each call to
+    `update` only parses the lines appended since, storing them in a
+    preallocated array that grows as needed.  Only complete lines are read
+    so a line being written is picked up by the next update.  If the file
+    is replaced (e.g. by a new run) it is read again from the start, which is
+    detected by the file becoming shorter than the offset, a change of inode,
+    or the last line read no longer being found just before the offset.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.num_rows = 0
+        self._buffer = None
+        self._inode = None
+        self._last_line = b''
+
+    @property
+    def data(self):
+        """Rows read so far, None if nothing has been read"""
+        if self._buffer is None:
+            return None
+        return self._buffer[:self.num_rows]
+
+    def update(self):
+        """Read the lines appended since the last update, returns the number
+        of new rows"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return 0
+        if stat.st_size < self.offset or (self.offset > 0
+                                          and stat.st_ino != self._inode):
+            self.__init__(self.path)
+        if stat.st_size == self.offset:
+            return 0
+
+        with open(self.path, 'rb') as track_file:
+            # Check that the data read so far is still there
+            if self.offset > 0:
+                track_file.seek(self.offset - len(self._last_line))
+                if track_file.read(len(self._last_line)) != self._last_line:
+                    self.__init__(self.path)
+            self._inode = stat.st_ino
+            track_file.seek(self.offset)
+            chunk = track_file.read(stat.st_size - self.offset)
+        end = chunk.rfind(b'\n') + 1
+        if end == 0:
+            return 0
+        chunk = chunk[:end]
+        self.offset += end
+        self._last_line = chunk[chunk.rfind(b'\n', 0, end - 1) + 1:]
+
+        values = chunk.split()
+        if len(values) == 0:
+            return 0
+        if self._buffer is None:
+            num_columns = len(next(line for line in chunk.split(b'\n')
+                                   if line.strip()).split())
+            self._buffer = np.empty((max(len(values) // num_columns, 64),
+                                     num_columns))
+        rows = np.array(values, dtype=float).reshape(-1,
+                                                     self._buffer.shape[1])
+
+        # Grow the buffer geometrically so appending stays cheap
+        if self.num_rows + rows.shape[0] > self._buffer.shape[0]:
+            buffer = np.empty((max(2 * self._buffer.shape[0],
+                                   self.num_rows + rows.shape[0]),
+                               self._buffer.shape[1]))
+            buffer[:self.num_rows] = self._buffer[:self.num_rows]
+            self._buffer = buffer
+        self._buffer[self.num_rows:self.num_rows + rows.shape[0]] = rows
+        self.num_rows += rows.shape[0]
+        return rows.shape[0]
+
+
+# Readers shared by all track_data objects for the same file
+_track_files = {}
+
+
+def _track_file(path):
+    """Shared TrackFile for *path*"""
+    key = os.path.abspath(path)
+    if key not in _track_files:
+        _track_files[key] = TrackFile(path)
+    return _track_files[key]
+
+
 class track_data(object):
-    """Read in storm track data from run output"""
+    """Read in storm track data from run output
+
+    The data is read with a `TrackFile` shared by all track_data objects for
+    the same path, so callbacks such as `surge_afteraxes` and `storm_radius`
+    (and objects created again when setplot is rerun) only parse lines that
+    have been appended to the file since it was last read.
+    """
 
     def __init__(self, path=None):
         if path is None:
             path = "fort.track"
 
-        try:
-            self._path = path
-            self._data = np.loadtxt(self._path)
-        except:
-            self._data = None
+        self._path = path
+        self._track_file = _track_file(path)
+        self._track_file.update()
+
+    @property
+    def _data(self):
+        return self._track_file.data
 
     def get_track(self, frame):
         """Return storm location for frame requested"""
 
-        # If data was not load successfully return None
-        if self._data is None or len(self._data.shape) < 2:
-            return None, None, None
-
-        # If it appears that our data is not long enough, try reloading file
-        if self._data.shape[0] < frame + 1:
-            self._data = np.loadtxt(self._path)
+        # If it appears that our data is not long enough, read what has been
+        # appended to the file
+        if self._track_file.num_rows < frame + 1:
+            self._track_file.update()
 
             # Check to make sure that this fixed the problem
-            if self._data.shape[0] < frame + 1:
-                warnings.warn(f" *** WARNING *** Could not find track data",
-                               " for frame {frame}.")
+            if self._track_file.num_rows < frame + 1:
+                if self._data is not None:
+                    warnings.warn(" *** WARNING *** Could not find track data"
+                                  f" for frame {frame}.")
                 return None, None, None
 
         return self._data[frame, 1:]
@@ -176,9 +274,7 @@ def surge_afteraxes(current_data, track, land_fall=0.0, plot_direction=False,
         if plot_track:
             # TO DO: Could add categorization but really should use storm object
             # for this
-            for i in range(1, track._data.shape[0]):
-                ax.plot(track._data[i-1:i+1, 1], track._data[i-1:i+1, 2], 
-                        track_style)
+            ax.plot(track._data[:, 1], track._data[:, 2], track_style)
         
     days_figure_title(current_data, land_fall=land_fall, new_time=new_time)
 
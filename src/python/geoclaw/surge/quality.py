@@ -1,30 +1,110 @@
-"""Module for QA/QC on GEOCLAW model outputs."""
+"""Module for QA/QC on GEOCLAW model outputs.
+
+The output frames are read with :class:`clawpack.geoclaw.amr_tools.PatchIndex`
+so that only the patch headers are scanned and only the patches needed (e.g.
+AMR level 1 or touching the domain boundary) are read.  Frames can be processed
+in parallel with *nprocs* > 1.
+"""
 
-from glob import glob
 from os.path import join
-from clawpack.pyclaw import Solution
 import numpy as np
 
+from clawpack.geoclaw import amr_tools
+
 
 class InstabilityError(Exception):
     pass
 
 
+def _last_framenos(model_output_dir, frames_to_check):
+    """Return the last *frames_to_check* frame numbers in the output"""
+    framenos = amr_tools.output_framenos(model_output_dir)
+    if len(framenos) == 0:
+        raise IOError("*** No output frames found in %s" % model_output_dir)
+    return framenos[-frames_to_check:]
+
+
+def _map_frames(worker, framenos, args, nprocs):
+    """
+    Apply *worker* to (framenos, *args), splitting the frames into *nprocs*
+    groups processed in parallel with a multiprocessing Pool if nprocs > 1.
+    Returns the list of the results for each group.
+    """
+    if nprocs <= 1 or len(framenos) < 2:
+        return [worker((framenos,) + args)]
+
+    from multiprocessing import Pool
+
+    chunks = np.array_split(np.array(framenos), nprocs)
+    tasks = [(list(chunk),) + args for chunk in chunks if len(chunk) > 0]
+    with Pool(processes=nprocs) as pool:
+        return pool.map(worker, tasks)
+
+
+def _absmax(values):
+    """Maximum magnitude ignoring NaNs, -inf if there are no values"""
+    return np.fmax.reduce(np.abs(values), axis=None, initial=-np.inf)
+
+
+def _region_sums(args):
+    """
+    Worker for quality_check, must be at module level for pickling.
+    Returns the sum and number of the values of eta in the cells deeper than
+    min_depth in each region, as arrays of shape (len(framenos), len(regions)).
+    """
+    framenos, model_output_dir, regions, min_depth, max_level = args
+    sums = np.zeros((len(framenos), len(regions)))
+    counts = np.zeros((len(framenos), len(regions)), dtype=int)
+    for k, frameno in enumerate(framenos):
+        pindex = amr_tools.PatchIndex(model_output_dir, frameno)
+        for n, r in enumerate(regions):
+            for p in pindex.patches([r[0], r[2], r[1], r[3]]):
+                if pindex.level[p] > max_level:
+                    continue
+
+                # rows and columns of the cell centers within the region
+                x = pindex.xlow[p] + (np.arange(pindex.mx[p]) + 0.5) \
+                    * pindex.dx[p]
+                y = pindex.ylow[p] + (np.arange(pindex.my[p]) + 0.5) \
+                    * pindex.dy[p]
+                i1 = np.searchsorted(x, r[0], side='left')
+                i2 = np.searchsorted(x, r[2], side='right')
+                j1 = np.searchsorted(y, r[1], side='left')
+                j2 = np.searchsorted(y, r[3], side='right')
+                if i1 >= i2 or j1 >= j2:
+                    continue
+
+                q = np.asarray(pindex.read_patch(p)[j1:j2, i1:i2, :])
+                eta = q[:, :, 3]
+                topo = eta - q[:, :, 0]
+
+                # only count deep cells
+                eta = eta[(topo < -min_depth) & ~np.isnan(eta)]
+                sums[k, n] += eta.sum()
+                counts[k, n] += eta.size
+    return sums, counts
+
+
 def quality_check(model_output_dir,
                   regions_to_check=[[-81, 22, -40, 55],  # atlantic
                                     [-100, 15, -82, 32],  # gulf
                                     [-88.5, 13.25, -70, 19.75]],  # carribean
                   frames_to_check=4,
                   mean_tol_abs=.01,
-                  min_depth=300):
+                  min_depth=300,
+                  max_level=1,
+                  nprocs=1):
     """Run a simple check to flag runs that were potentially numerically unstable.
     This function looks through the final *frames_to_check* frames of a model output
-    and checks all cells in AMR level 1 that are below *min_depth* and 
-    fall within each region in the *regions_to_check* list (which are intended 
+    and checks all cells in AMR level 1 that are below *min_depth* and
+    fall within each region in the *regions_to_check* list (which are intended
     to encompass individual basins). If the absolute value of the mean surface height
-    for these cells, which should not really have much surge, is above/mean_tol_abs, 
+    for these cells, which should not really have much surge, is above/mean_tol_abs,
     it raises an error.
 
+    Only the patches at levels <= *max_level* that intersect a region are read,
+    and the mean is accumulated as a running sum and count per region.
+
     :Input:
     - *model_output_dir* (str) Path to the output directory for a given model
     - *regions_to_check* (list of lists of floats) A list of 4-element lists
@@ -32,16 +112,17 @@ def quality_check(model_output_dir,
     - *frames_to_check* (int) The number of final frames of the model output to check
     - *mean_tol_abs* (float) Model is flagged if the absolute value of the mean surface
         height within any region in *regions_to_check* is above this value (meters).
-    - *min_depth* (float) Only cells that are below *min_depth* (meters) are checked, in 
+    - *min_depth* (float) Only cells that are below *min_depth* (meters) are checked, in
         order to avoid including cells that potentially should have large surge values.
+    - *max_level* (int) Highest AMR level included in the check.  Default is 1.
+    - *nprocs* (int) If > 1 the frames are split into *nprocs* groups that are
+        read in parallel with a multiprocessing Pool.
 
     :Raises:
     - InstabilityError if the model is flagged as potentially unstable in one of the regions.
     """
 
-    # find which frame is last
-    output_files = glob(join(model_output_dir, 'fort.b*'))
-    last_frame = int(output_files[-1].split('/')[-1][-4:])
+    framenos = _last_framenos(model_output_dir, frames_to_check)
 
     # get sl_init
     with open(join(model_output_dir, 'geoclaw.data'), 'r') as f:
@@ -49,149 +130,114 @@ def quality_check(model_output_dir,
             if '=: sea_level' in l:
                 sl_init = float(l.strip().split()[0])
 
-    # bring in solution
-    soln = Solution()
-    for frame in range(last_frame-frames_to_check+1, last_frame+1):
-        soln.read(frame, path=model_output_dir,
-                  file_format='binary', read_aux=False)
-
-        for r in regions_to_check:
-            all_vals = np.array([])
-            for s in soln.states:
-
-                # only looking at lowest AMR level
-                if s.patch.level > 1:
-                    continue
-
-                x = s.grid.c_centers[0]
-                y = s.grid.c_centers[1]
-                eta = s.q[3, :, :]
-                topo = eta - s.q[0, :, :]
+    regions = [list(r) for r in regions_to_check]
+    results = _map_frames(_region_sums, framenos,
+                          (model_output_dir, regions, min_depth, max_level),
+                          nprocs)
+    sums = np.vstack([s for (s, c) in results])
+    counts = np.vstack([c for (s, c) in results])
+
+    for k in range(len(framenos)):
+        for n, r in enumerate(regions):
+            if counts[k, n] > 0:
+                # adjust for sl_init
+                mean = sums[k, n] / counts[k, n] - sl_init
+                if abs(mean) > mean_tol_abs:
+                    raise InstabilityError("Model possibly unstable due to large magnitude deep "
+                                           "ocean surge at end of run ({:.1f} cm in region {})".format(
+                                               mean*100, r))
 
-                # only count
-                eta = np.where(topo < (-min_depth), eta, np.nan)
-                in_reg = eta[np.ix_((x[:, 0] >= r[0]) & (x[:, 0] <= r[2]),
-                             (y[0, :] >= r[1]) & (y[0, :] <= r[3]))]
-                all_vals = np.concatenate([all_vals, in_reg.flatten()])
 
-            # adjust for sl_init
-            all_vals = all_vals - sl_init
+def _boundary_maxs(args):
+    """
+    Worker for get_max_boundary_fluxes, must be at module level for
+    pickling.  Returns an array of shape (3, 4) with the running maxima of
+    the normal fluxes and currents at the W, E, N and S boundaries and of
+    the magnitudes of hu, hv, u and v over the patches read.
+    """
+    framenos, model_output_dir, domain, max_level, boundary_only = args
+    xl, xu, yl, yu = domain
+    maxs = np.full((3, 4), -np.inf)
+    for frameno in framenos:
+        pindex = amr_tools.PatchIndex(model_output_dir, frameno)
+        for p in range(pindex.npatches):
+            if max_level is not None and pindex.level[p] > max_level:
+                continue
 
-            if all_vals.shape[0] > 0:
-                if abs(np.nanmean(all_vals)) > mean_tol_abs:
-                    raise InstabilityError("Model possibly unstable due to large magnitude deep "
-                                           "ocean surge at end of run ({:.1f} cm in region {})".format(
-                                               np.nanmean(all_vals)*100, r))
+            # get rounding error tolerance
+            edge_tol = pindex.dx[p] * .001
+            edges = [abs(pindex.xlow[p] - xl) < edge_tol,
+                     abs(pindex.xhi[p] - xu) < edge_tol,
+                     abs(pindex.yhi[p] - yu) < edge_tol,
+                     abs(pindex.ylow[p] - yl) < edge_tol]
+            if boundary_only and not any(edges):
+                continue
+
+            # for binary output only the slices used are read from the file
+            q = pindex.read_patch(p)
+            sides = [q[:, :1, :], q[:, -1:, :], q[-1:, :, :], q[:1, :, :]]
+            if not boundary_only:
+                q = np.asarray(q)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    currents = q[:, :, 1:3] / q[:, :, :1]
+                maxs[2] = np.fmax(maxs[2], [_absmax(q[:, :, 1]),
+                                            _absmax(q[:, :, 2]),
+                                            _absmax(currents[:, :, 0]),
+                                            _absmax(currents[:, :, 1])])
+
+            for n, (on_edge, side) in enumerate(zip(edges, sides)):
+                if not on_edge:
+                    continue
+                # normal component is hu on the W and E boundaries, hv on N, S
+                m = 1 if n < 2 else 2
+                side = np.asarray(side)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    current = side[:, :, m] / side[:, :, 0]
+                maxs[0, n] = np.fmax(maxs[0, n], _absmax(side[:, :, m]))
+                maxs[1, n] = np.fmax(maxs[1, n], _absmax(current))
+    return maxs
 
 
 def get_max_boundary_fluxes(model_output_dir, max_refinement_depth_to_check=None,
-                            frames_to_check=1):
+                            frames_to_check=1, boundary_only=False, nprocs=1):
     """A common cause of instability is a persistant normal flux at the boundary.
     This code checks the last frame(s) of a model output and returns the maximum
-    magnitude normal fluxes and currents at each boundary, as well as the maximum 
+    magnitude normal fluxes and currents at each boundary, as well as the maximum
     magnitude fluxes and currents observed within the entire domain.
 
     :Input:
     - *model_output_dir* (str) Path to the output directory for a given model
-    - *max_refinement_depth_to_check* (int or None, optional) How many refinement levels to 
+    - *max_refinement_depth_to_check* (int or None, optional) How many refinement levels to
         loop through to find max values. Runs quicker when just checking level 1, but
         you may find higher max values at higher refinement levels. None (default)
         means check all levels
     - *frames_to_check* (int) How many of the last output frames to check for max. Default
         is just one.
+    - *boundary_only* (bool) If True only the patches touching the domain boundary
+        are read, and of those only the boundary rows and columns for binary output.
+        The *domain_maxs* are then not computed and are not returned.
+    - *nprocs* (int) If > 1 the frames are split into *nprocs* groups that are
+        read in parallel with a multiprocessing Pool.
     """
 
-    # find which frame is last
-    output_files = glob(join(model_output_dir, 'fort.q*'))
-    frames = [int(i.split('/')[-1][-4:]) for i in output_files]
-    last_frame = max(frames)
+    framenos = _last_framenos(model_output_dir, frames_to_check)
 
-    # get domain and file format
+    # get domain
     with open(join(model_output_dir, 'claw.data'), 'r') as f:
         for l in f:
             if '=: lower' in l:
                 xl, yl = [float(i) for i in l.strip().split()[:2]]
             elif '=: upper' in l:
                 xu, yu = [float(i) for i in l.strip().split()[:2]]
-            elif '=: output_format' in l:
-                of = int(l.strip().split()[0]) - 1
-    file_format = ['ascii', 'netcdf', 'binary'][of]
-
-    maxhxl = -np.inf
-    maxhyl = -np.inf
-    maxcurrxl = -np.inf
-    maxcurryl = -np.inf
-    maxhxu = -np.inf
-    maxhyu = -np.inf
-    maxcurrxu = -np.inf
-    maxcurryu = -np.inf
-    maxhx_overall = -np.inf
-    maxhy_overall = -np.inf
-    maxcurrx_overall = -np.inf
-    maxcurry_overall = -np.inf
-
-    for f in range(last_frame+1-frames_to_check, last_frame+1):
-
-        soln = Solution()
-        soln.read(f, path=model_output_dir,
-                  file_format=file_format, read_aux=False)
-
-        for s in soln.states:
-
-            # only looking at lowest AMR levels
-            if max_refinement_depth_to_check is not None:
-                if s.patch.level > max_refinement_depth_to_check:
-                    continue
 
-            # get rounding error tolerance
-            delta = s.grid.dimensions[0].delta
-            edge_tol = delta * .001
-
-            x = s.grid.c_centers[0]
-            xedges = s.grid.c_nodes[0]
-            y = s.grid.c_centers[1]
-            yedges = s.grid.c_nodes[1]
-
-            eta = s.q[3, :, :]
-            h = s.q[0, :, :]
-            hx = s.q[1, :, :]
-            curr_x = hx / h
-            hy = s.q[2, :, :]
-            curr_y = hy / h
-            topo = eta - s.q[0, :, :]
-            maxhx_overall = np.nanmax([np.abs(hx).max(), maxhx_overall])
-            maxhy_overall = np.nanmax([np.abs(hy).max(), maxhy_overall])
-            maxcurrx_overall = np.nanmax(
-                [np.nanmax(np.abs(curr_x)), maxcurrx_overall])
-            maxcurry_overall = np.nanmax(
-                [np.nanmax(np.abs(curr_y)), maxcurry_overall])
-
-            if abs(xedges[0, 0] - xl) < edge_tol:
-                maxhxl = np.nanmax([maxhxl, np.nanmax(np.abs(hx[0, :]))])
-                maxcurrxl = np.nanmax(
-                    [maxcurrxl, np.nanmax(np.abs(curr_x[0, :]))])
-            if abs(xedges[-1, 0] - xu) < edge_tol:
-                maxhxu = np.nanmax([maxhxu, np.nanmax(np.abs(hx[-1, :]))])
-                maxcurrxu = np.nanmax(
-                    [maxcurrxu, np.nanmax(np.abs(curr_x[-1, :]))])
-            if abs(yedges[0, 0] - yl) < edge_tol:
-                maxhyl = np.nanmax([maxhyl, np.nanmax(np.abs(hy[:, 0]))])
-                maxcurryl = np.nanmax(
-                    [maxcurryl, np.nanmax(np.abs(curr_y[:, 0]))])
-            if abs(yedges[0, -1] - yu) < edge_tol:
-                maxhyu = np.nanmax([maxhyu, np.nanmax(np.abs(hy[:, -1]))])
-                maxcurryu = np.nanmax(
-                    [maxcurryu, np.nanmax(np.abs(curr_y[:, -1]))])
-
-    return ({'max_normal_fluxes': {'W': maxhxl,
-                                   'E': maxhxu,
-                                   'N': maxhyu,
-                                   'S': maxhyl},
-             'max_normal_currents': {'W': maxcurrxl,
-                                     'E': maxcurrxu,
-                                     'N': maxcurryu,
-                                     'S': maxcurryl},
-             'domain_maxs': {'hu': maxhx_overall,
-                             'hv': maxhy_overall,
-                             'u': maxcurrx_overall,
-                             'v': maxcurry_overall}})
+    results = _map_frames(_boundary_maxs, framenos,
+                          (model_output_dir, (xl, xu, yl, yu),
+                           max_refinement_depth_to_check, boundary_only),
+                          nprocs)
+    maxs = np.fmax.reduce(results, axis=0)
+
+    maxes = {'max_normal_fluxes': dict(zip('WENS', maxs[0])),
+             'max_normal_currents': dict(zip('WENS', maxs[1]))}
+    if not boundary_only:
+        maxes['domain_maxs'] = dict(zip(['hu', 'hv', 'u', 'v'], maxs[2]))
+    return maxes
@@ -23,12 +23,12 @@ workflow in a `setrun.py` file would do the following:
 
 :Formats Supported:
     - GeoClaw (fully)
-    - ATCF (reading only)
-    - HURDAT (reading only)
+    - ATCF (fully, best track columns up to the storm name)
+    - HURDAT (fully)
     - IBTrACS (reading only)
-    - JMA (reading only)
+    - JMA (fully)
     - IMD (planned)
-    - tcvitals (reading only)
+    - tcvitals (fully)
 """
 
 import warnings
@@ -36,11 +36,13 @@ import sys
 import os
 import argparse
 import datetime
+import io
 
 import numpy as np
 import pandas as pd
 
 import clawpack.geoclaw.units as units
+from clawpack.geoclaw.data import Rearth
 
 # =============================================================================
 #  Common acronyms across formats
@@ -98,6 +100,29 @@ hurdat_special_entries = {"L": "landfall",
                           "G": "genesis",
                           "T": "additional track point"}
 
+# ATCF a-deck and b-deck columns
+# see https://www.nrlmry.navy.mil/atcf_web/docs/database/new/abdeck.txt
+ATCF_columns = ["BASIN", "CY", "YYYYMMDDHH", "TECHNUM", "TECH", "TAU",
+                "LAT", "LON", "VMAX", "MSLP", "TY",
+                "RAD", "WINDCODE", "RAD1", "RAD2", "RAD3", "RAD4",
+                "POUTER", "ROUTER", "RMW", "GUSTS", "EYE", "SUBREGION",
+                "MAXSEAS", "INITIALS", "DIR", "SPEED", "STORMNAME", "DEPTH",
+                "SEAS", "SEASCODE", "SEAS1", "SEAS2", "SEAS3", "SEAS4",
+                "USERDEFINE1", "userdata1",
+                "USERDEFINE2", "userdata2",
+                "USERDEFINE3", "userdata3",
+                "USERDEFINE4", "userdata4",
+                "USERDEFINE5", "userdata5"]
+
+# IBTrACS agencies in the default order of preference, see Storm.read_ibtracs
+IBTrACS_agencies = ['wmo', 'usa', 'tokyo', 'newdelhi', 'reunion', 'bom', 'nadi',
+                    'wellington', 'cma', 'hko', 'ds824', 'td9636', 'td9635',
+                    'neumann', 'mlc']
+
+# IBTrACS agencies that correspond to the 'usa_*' variables
+IBTrACS_usa_agencies = [b'atcf', b'hurdat_atl', b'hurdat_epa', b'jtwc_ep',
+                        b'nhc_working_bt', b'tcvightals', b'tcvitals']
+
 
 # Warning for formats that have yet to have a default way to determine crticial
 # radii from the input data
@@ -119,6 +144,140 @@ class NoDataError(ValueError):
     pass
 
 
+def _as_times(t):
+    r"""Convert times to a datetime64[us] array for dates or a float array"""
+    if t is None:
+        return None
+    t = np.atleast_1d(np.asarray(t))
+    if t.dtype.kind == 'O' and len(t) > 0 and \
+            not isinstance(t[0], (datetime.datetime, np.datetime64)):
+        return t.astype(float)
+    if t.dtype.kind in 'OM':
+        return t.astype('datetime64[us]')
+    return t.astype(float)
+
+
+def _as_datetime(t):
+    r"""Convert a datetime64 or pandas Timestamp to a datetime, other values
+    are returned unchanged"""
+    if isinstance(t, np.datetime64):
+        return t.astype('datetime64[us]').astype(datetime.datetime)
+    if isinstance(t, pd.Timestamp):
+        return t.to_pydatetime()
+    return t
+
+
+def _missing(values):
+    r"""Mask of the missing *values*, NaN or negative (e.g. -1 in IBTrACS)"""
+    with np.errstate(invalid='ignore'):
+        return np.isnan(values) | (values < 0)
+
+
+def _write_text(path, text):
+    r"""Write *text* to *path*, removing a partially written file on errors"""
+    try:
+        with open(path, "w") as data_file:
+            data_file.write(text)
+    except Exception as e:
+        if os.path.exists(path):
+            os.remove(path)
+        raise e
+
+
+def _format_block(line, columns):
+    r"""Format the rows given by *columns* with the format *line* all at
+    once rather than line by line"""
+    num_rows = len(columns[0])
+    if num_rows == 0:
+        return ""
+    rows = np.empty((num_rows, len(columns)), dtype=object)
+    for (k, column) in enumerate(columns):
+        rows[:, k] = column
+    return (line * num_rows) % tuple(rows.ravel())
+
+
+def _geoclaw_block(data, time_offset):
+    r"""GeoClaw storm file contents for the rows of *data*, with columns t,
+    longitude, latitude, max_wind_speed, max_wind_radius, central_pressure
+    and storm_radius"""
+    if isinstance(time_offset, datetime.datetime):
+        header = f"{len(data)}\n{time_offset.isoformat()}\n\n"
+    else:
+        header = f"{len(data)}\n{str(time_offset)}\n\n"
+    line = " ".join(["%19.8e"] * 7) + "\n"
+    return header + (line * len(data)) % tuple(np.ravel(data))
+
+
+def _date_parts(t):
+    r"""Year, month, day, hour and minute of datetime64 times"""
+    t = np.asarray(t, dtype='datetime64[m]')
+    year = t.astype('datetime64[Y]')
+    month = t.astype('datetime64[M]')
+    day = t.astype('datetime64[D]')
+    hour = t.astype('datetime64[h]')
+    return (year.astype(int) + 1970,
+            (month - year).astype(int) + 1,
+            (day - month).astype(int) + 1,
+            (hour - day).astype(int),
+            (t - hour).astype(int))
+
+
+def _missing_int(values, missing):
+    r"""Round to integers, NaNs are replaced by *missing*"""
+    values = np.round(np.asarray(values, dtype=float))
+    return np.where(np.isnan(values), missing,
+                    np.nan_to_num(values)).astype(int)
+
+
+def _basin_code(basin, basins, default):
+    r"""Code of *basin* in *basins*, *basin* may be the code or its name"""
+    if basin in basins.keys():
+        return basin
+    for (code, name) in basins.items():
+        if basin == name:
+            return code
+    return default
+
+
+def _cyclone_number(ID):
+    r"""Cyclone number from a storm ID, 0 if it is not a number"""
+    try:
+        return int(ID)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _atcf_block(t, eye_location, max_wind_speed, max_wind_radius,
+                central_pressure, storm_radius, basin="AL", cyclone_number=0,
+                tech="BEST", classification="XX", name=""):
+    r"""ATCF b-deck lines with the columns up to STORMNAME, missing values are
+    written as 0 as expected by :func:`read_atcf_dataframe`"""
+
+    year, month, day, hour, _ = _date_parts(t)
+    lon = _missing_int(np.asarray(eye_location)[:, 0] * 10.0, 0)
+    lat = _missing_int(np.asarray(eye_location)[:, 1] * 10.0, 0)
+    num_rows = len(lon)
+    line = "%s, %02i, %04i%02i%02i%02i,   , %s,   0, %4i%s, %5i%s, %3i, " \
+           "%4i, %2s,   0,    ,    0,    0,    0,    0,     , %4i, %4i, " \
+           "  0,   0,    ,   0,    ,   0,   0, %10s,\n"
+    return _format_block(line,
+                [np.full(num_rows, basin, dtype=object),
+                 np.full(num_rows, cyclone_number), year, month, day, hour,
+                 np.full(num_rows, tech, dtype=object),
+                 np.abs(lat), np.where(lat >= 0, "N", "S"),
+                 np.abs(lon), np.where(lon >= 0, "E", "W"),
+                 _missing_int(units.convert(max_wind_speed, 'm/s', 'knots'),
+                              0),
+                 _missing_int(units.convert(central_pressure, 'Pa', 'mbar'),
+                              0),
+                 np.broadcast_to(np.asarray(classification, dtype=object),
+                                 (num_rows,)),
+                 _missing_int(units.convert(storm_radius, 'm', 'nmi'), 0),
+                 _missing_int(units.convert(max_wind_radius, 'm', 'nmi'), 0),
+                 np.broadcast_to(np.asarray(name, dtype=object),
+                                 (num_rows,))])
+
+
 # =============================================================================
 #  Basic storm class
 class Storm(object):
@@ -137,10 +296,11 @@ class Storm(object):
     *TODO:*  Add description of unit handling
 
     :Attributes:
-     - *t* (list(float) or list(datetime.datetiem)) Contains the time at which
-       each entry of the other arrays are at.  These are expected to
-       be *datetime* objects. Note that when written some formats require
-       a *time_offset* to be set.
+     - *t* (ndarray(:)) Contains the time at which each entry of the other
+       arrays are at.  Dates are stored as *datetime64[us]*, lists of
+       *datetime* objects assigned to *t* are converted, other times are
+       stored as floats.  Note that when written some formats require a
+       *time_offset* to be set.
      - *eye_location* (ndarray(:, :)) location of the eye of the storm. Default
        units are in signed decimal longitude and latitude.
      - *max_wind_speed* (ndarray(:)) Maximum wind speed.  Default units are
@@ -153,7 +313,8 @@ class Storm(object):
        closed iso-bar of pressure.  Default units are meters.
      - *time_offset* (datetime.datetime) A date time that as an offset for the
        simulation time.  This will default to the beginning of the first of
-       the year that the first time point is found in.
+       the year that the first time point is found in.  *datetime64* values
+       are converted to *datetime*.
      - *wind_speeds* (ndarray(:, :)) Wind speeds defined in every record, such
        as 34kt, 50kt, 64kt, etc and their radii. Default units are
        meters/second and meters.
@@ -207,12 +368,30 @@ class Storm(object):
 
     # ==========================================================================
     #  Basic object support
+    @property
+    def t(self):
+        r"""Times of the storm data, a datetime64[us] or float array"""
+        return self._t
+
+    @t.setter
+    def t(self, value):
+        self._t = _as_times(value)
+
+    @property
+    def time_offset(self):
+        r"""Time offset, a datetime, float or None"""
+        return self._time_offset
+
+    @time_offset.setter
+    def time_offset(self, value):
+        self._time_offset = _as_datetime(value)
+
     def __str__(self):
         r""""""
         output = f"Name: {self.name}\n"
-        if isinstance(self.t[0], datetime.datetime):
-            output += f"Dates: {self.t[0].isoformat()}"
-            output += f" - {self.t[-1].isoformat()}"
+        if self.t.dtype.kind == 'M':
+            output += f"Dates: {_as_datetime(self.t[0]).isoformat()}"
+            output += f" - {_as_datetime(self.t[-1]).isoformat()}"
         else:
             output += f"Dates: {self.t[0]} - {self.t[-1]}"
         return output
@@ -293,9 +472,8 @@ class Storm(object):
         self.eye_location = np.empty((num_forecasts, 2))
         assert(num_casts == num_forecasts)
         if isinstance(self.time_offset, datetime.datetime):
-            self.t = np.array([self.time_offset
-                               + datetime.timedelta(seconds=data[i, 0])
-                               for i in range(num_forecasts)])
+            self.t = np.datetime64(self.time_offset, 'us') \
+                     + np.round(data[:, 0] * 1e6).astype('timedelta64[us]')
         else:
             self.t = data[:, 0]
         self.eye_location[:, 0] = data[:, 1]
@@ -309,85 +487,42 @@ class Storm(object):
         r"""Read in a ATCF formatted storm file
 
         ATCF format has storm stored individually so there is no support for
-        multiple storms in a particular file.
+        multiple storms in a particular file, use :func:`read_atcf_storms` to
+        split an archive with many storms or forecast cycles.
 
         :Input:
          - *path* (string) Path to the file to be read.
          - *verbose* (bool) Output more info regarding reading.
         """
 
-        # See here for the ATCF format documentation:
-        #   https://www.nrlmry.navy.mil/atcf_web/docs/database/new/abdeck.txt
+        self._set_atcf_data(read_atcf_dataframe(path))
 
-        # Slightly more robust converter for ATCF data fields that can be
-        # missing
-        def num_converter(x):
-            if isinstance(x, str):
-                if len(x.strip()) == 0:
-                    # Only whitespace
-                    return np.nan
-                else:
-                    # Assume this is still a number
-                    return float(x)
-            elif x is None:
-                return np.nan
-            return float(x)
-
-        df = pd.read_csv(path, engine="python", sep=",+", names=[
-            "BASIN", "CY", "YYYYMMDDHH", "TECHNUM", "TECH", "TAU",
-            "LAT", "LON", "VMAX", "MSLP", "TY",
-            "RAD", "WINDCODE", "RAD1", "RAD2", "RAD3", "RAD4",
-            "POUTER", "ROUTER", "RMW", "GUSTS", "EYE", "SUBREGION",
-            "MAXSEAS", "INITIALS", "DIR", "SPEED", "STORMNAME", "DEPTH",
-            "SEAS", "SEASCODE", "SEAS1", "SEAS2", "SEAS3", "SEAS4",
-            "USERDEFINE1", "userdata1",
-            "USERDEFINE2", "userdata2",
-            "USERDEFINE3", "userdata3",
-            "USERDEFINE4", "userdata4",
-            "USERDEFINE5", "userdata5",
-        ],
-            converters={
-                "YYYYMMDDHH": lambda d: datetime.datetime(
-                    int(d[1:5]), int(d[5:7]), int(d[7:9]), int(d[9:11])),
-                "TAU": lambda d: datetime.timedelta(hours=int(d)),
-                "LAT": lambda d: (-.1 if d[-1] == "S" else .1) * int(d.strip("NS ")),
-                "LON": lambda d: (-.1 if d[-1] == "W" else .1) * int(d.strip("WE ")),
-                "RAD": num_converter,
-                "RAD": num_converter,
-                "RAD1": num_converter,
-                "RAD2": num_converter,
-                "RAD3": num_converter,
-                "RAD4": num_converter,
-                "ROUTER": num_converter,
-                "RMW": num_converter,
-                "STORMNAME": lambda d: (d.strip() if isinstance(d, str) else d)
-        },
-            dtype={
-                "BASIN": str,
-                "CY": int,
-                "VMAX": float,
-                "MSLP": float,
-                "TY": str
-        })
+    def _set_atcf_data(self, df):
+        r"""Set the storm data from the rows of a single storm in a
+        DataFrame returned by :func:`read_atcf_dataframe`.
+        """
+
+        if len(df) == 0:
+            raise NoDataError(missing_necessary_data_warning_str)
 
         # Grab data regarding basin and cyclone number from first row
-        self.basin = ATCF_basins[df["BASIN"][0]]
-        self.ID = df["CY"][0]
+        self.basin = ATCF_basins[df["BASIN"].iloc[0]]
+        self.ID = int(df["CY"].iloc[0])
 
         # Keep around the name as an array
         self.name = df["STORMNAME"].to_numpy()
 
         # Take forecast period TAU into consideration
-        df['DATE'] = df["YYYYMMDDHH"] + df["TAU"]
+        df = df.assign(DATE=df["YYYYMMDDHH"] + df["TAU"])
         df = df[["DATE", "TAU", "TY", "LAT", "LON", "VMAX", "MSLP",
                  "ROUTER", "RMW", "RAD", "RAD1", "RAD2", "RAD3", "RAD4", ]]
-        df = df.sort_values(by=["DATE", "TAU"]).reset_index(drop=True)
+        df = df.sort_values(by=["DATE", "TAU"], kind="stable")
 
-        # For each DATE, choose best (smallest TAU) available data
-        for c in ["LAT", "LON", "VMAX", "MSLP", "ROUTER", "RMW",
-                  "RAD", "RAD1", "RAD2", "RAD3", "RAD4"]:
-            df[c] = df[c].where(df[c] != 0, np.nan)  # value 0 means NaN
-            df[c] = df.groupby("DATE")[c].bfill()
+        # For each DATE, choose best (smallest TAU) available data, the
+        # first non-missing value in each column
+        columns = ["LAT", "LON", "VMAX", "MSLP", "ROUTER", "RMW",
+                   "RAD", "RAD1", "RAD2", "RAD3", "RAD4"]
+        df[columns] = df[columns].where(df[columns] != 0)  # 0 means NaN
         df = df.groupby("DATE").first()
 
         # Wind profile (occasionally missing for older ATCF storms)
@@ -398,7 +533,7 @@ class Storm(object):
         df = df.dropna(how="any", subset=["LAT", "LON"])
 
         # Create time
-        self.t = list(df.index.to_pydatetime())
+        self.t = df.index.to_numpy()
 
         # Classification, note that this is not the category of the storm
         self.classification = df["TY"].to_numpy()
@@ -459,7 +594,7 @@ class Storm(object):
         num_lines = len(data_block)
 
         # Parse data block
-        self.t = []
+        t = []
         self.event = np.empty(num_lines, dtype=str)
         self.classification = np.empty(num_lines, dtype=str)
         self.eye_location = np.empty((num_lines, 2))
@@ -474,11 +609,11 @@ class Storm(object):
             data = [value.strip() for value in line.split(",")]
 
             # Create time
-            self.t.append(datetime.datetime(int(data[0][:4]),
-                                            int(data[0][4:6]),
-                                            int(data[0][6:8]),
-                                            int(data[1][:2]),
-                                            int(data[1][2:])))
+            t.append(datetime.datetime(int(data[0][:4]),
+                                       int(data[0][4:6]),
+                                       int(data[0][6:8]),
+                                       int(data[1][:2]),
+                                       int(data[1][2:])))
 
             # If an event is occuring record it.  If landfall then use as an
             # offset.   Note that if there are multiple landfalls the last one
@@ -486,7 +621,7 @@ class Storm(object):
             if len(data[2].strip()) > 0:
                 self.event[i] = data[2].strip()
                 if self.event[i].upper() == "L":
-                    self.time_offset = self.t[i]
+                    self.time_offset = t[i]
 
             # Classification, note that this is not the category of the storm
             self.classification[i] = data[3]
@@ -510,23 +645,10 @@ class Storm(object):
             warnings.warn(missing_data_warning_str)
             self.max_wind_radius[i] = -1
             self.storm_radius[i] = -1
+        self.t = t
 
     def read_ibtracs(self, path, sid=None, storm_name=None, year=None, start_date=None,
-                     agency_pref=['wmo',
-                                  'usa',
-                                  'tokyo',
-                                  'newdelhi',
-                                  'reunion',
-                                  'bom',
-                                  'nadi',
-                                  'wellington',
-                                  'cma',
-                                  'hko',
-                                  'ds824',
-                                  'td9636',
-                                  'td9635',
-                                  'neumann',
-                                  'mlc']):
+                     agency_pref=IBTrACS_agencies):
         r"""Read in IBTrACS formatted storm file
 
         This reads in the netcdf-formatted IBTrACS v4 data. You must either pass
@@ -538,8 +660,12 @@ class Storm(object):
         still missing, the other agencies are checked in order of *agency_pref* to
         see if any more non-missing values are available.
 
+        To read many storms from the same file, use an :class:`IBTrACS` object
+        as *path* (or its `read_storms` method), so that the file is only
+        opened and indexed once.
+
         :Input:
-         - *path* (string) Path to the file to be read.
+         - *path* (string or IBTrACS) Path to the file to be read.
          - *sid* (string, optional) IBTrACS-supplied unique track identifier.
              Either *sid* OR *storm_name* and *year* must not be None.
          - *storm_name* (string, optional) name of storm of interest
@@ -559,167 +685,17 @@ class Storm(object):
              value error is risen.
         """
 
-        # imports that you don't need for other read functions
+        if isinstance(path, IBTrACS):
+            ibtracs = path
+        else:
+            ibtracs = IBTrACS(path)
         try:
-            import xarray as xr
-        except ImportError as e:
-            print("IBTrACS currently requires xarray to work.")
-            raise e
-
-        # only allow one method for specifying storms
-        if (sid is not None) and ((storm_name is not None) or (year is not None)):
-            raise ValueError(
-                'Cannot specify both *sid* and *storm_name* or *year*.')
-
-        with xr.open_dataset(path) as ds:
-
-            # match on sid
-            if sid is not None:
-                match = ds.sid == sid.encode()
-            # or match on storm_name and year
-            else:
-                storm_name = storm_name.upper()
-                # in case storm is unnamed
-                if storm_name.upper() in ['UNNAMED', 'NO-NAME']:
-                    storm_name = 'NOT_NAMED'
-                storm_match = (ds.name == storm_name.encode())
-                year_match = (ds.time.dt.year == year).any(dim='date_time')
-                match = storm_match & year_match
-            ds = ds.sel(storm=match).squeeze()
-
-            # occurs if we have 0 or >1 matching storms
-            if 'storm' in ds.dims.keys():
-                if ds.storm.shape[0] == 0:
-                    raise ValueError('Storm/year not found in provided file')
-                else:
-                    # see if a date was provided for multiple unnamed storms
-                    assert start_date is not None, ValueError(
-                        'Multiple storms identified and no start_date specified.')
-
-                    start_times = ds.time.isel(date_time=0)
-                    start_date = np.datetime64(start_date)
-
-                    # find storm with start date closest to provided
-                    storm_ix = abs(start_times - start_date).argmin()
-                    ds = ds.isel(storm=storm_ix).squeeze()
-                    assert 'storm' not in ds.dims.keys()
-
-            # cut down dataset to only non-null times
-            valid_t = ds.time.notnull()
-            if valid_t.sum() == 0:
-                raise ValueError('No valid wind speeds found for this storm.')
-            ds = ds.sel(date_time=valid_t)
-
-            # list of the agencies that correspond to 'usa_*' variables
-            usa_agencies = [b'atcf', b'hurdat_atl', b'hurdat_epa', b'jtwc_ep',
-                            b'nhc_working_bt', b'tcvightals', b'tcvitals']
-
-            # Create mapping from wmo_ or usa_agency
-            # to the appropriate variable
-            agency_map = {b'': agency_pref.index('wmo')}
-            # account for multiple usa agencies
-            for a in usa_agencies:
-                agency_map[a] = agency_pref.index('usa')
-            # map all other agencies to themselves
-            for i in [a for a in agency_pref if a not in ['wmo', 'usa']]:
-                agency_map[i.encode('utf-8')] = agency_pref.index(i)
-
-            # fill in usa as provider if usa_agency is
-            # non-null when wmo_agency is null
-            provider = ds.wmo_agency.where(ds.wmo_agency != b'', ds.usa_agency)
-
-            # get index into from agency that is wmo_provider
-            def map_val_to_ix(a):
-                def func(x): return agency_map[x]
-                return xr.apply_ufunc(func, a, vectorize=True)
-            pref_agency_ix = map_val_to_ix(provider)
-
-            # GET MAX WIND SPEED and PRES
-            pref_vals = {}
-            for v in ['wind', 'pres']:
-                all_vals = ds[['{}_{}'.format(i, v) for i in agency_pref]].to_array(
-                    dim='agency')
-
-                # get wmo value
-                val_pref = ds['wmo_'+v]
-
-                # fill this value in as a second-best
-                pref_2 = all_vals.isel(agency=pref_agency_ix)
-                val_pref = val_pref.fillna(pref_2)
-
-                # now use the agency_pref order to fill in
-                # any remaining values as third best
-                best_ix = all_vals.notnull().argmax(dim='agency')
-                pref_3 = all_vals.isel(agency=best_ix)
-                val_pref = val_pref.fillna(pref_3)
-
-                # add to dict
-                pref_vals[v] = val_pref
-
-            # THESE CANNOT BE MISSING SO DROP
-            # IF EITHER MISSING
-            valid = pref_vals['wind'].notnull() & pref_vals['pres'].notnull()
-            if not valid.any():
-                raise NoDataError(missing_necessary_data_warning_str)
-            ds = ds.sel(date_time=valid)
-            for i in ['wind', 'pres']:
-                pref_vals[i] = pref_vals[i].sel(date_time=valid)
-
-            # GET RMW and ROCI
-            # (these can be missing)
-            for r in ['rmw', 'roci']:
-                order = ['{}_{}'.format(i, r) for i in agency_pref if
-                         '{}_{}'.format(i, r) in ds.data_vars.keys()]
-                vals = ds[order].to_array(dim='agency')
-                best_ix = vals.notnull().argmax(dim='agency')
-                val_pref = vals.isel(agency=best_ix)
-                pref_vals[r] = val_pref
-
-            # CONVERT TO GEOCLAW FORMAT
-
-            # assign basin to be the basin where track originates
-            # in case track moves across basins
-            self.basin = ds.basin.values[0].astype(str)
-            self.name = ds.name.astype(str).item()
-            self.ID = ds.sid.astype(str).item()
-
-            # convert datetime64 to datetime.datetime
-            self.t = []
-            for d in ds.time:
-                t = d.dt
-                self.t.append(datetime.datetime(t.year, t.month,
-                                                t.day, t.hour, t.minute, t.second))
-
-            # events
-            self.event = ds.usa_record.values.astype(str)
-
-            # time offset
-            if (self.event == 'L').any():
-                # if landfall, use last landfall
-                self.time_offset = np.array(self.t)[self.event == 'L'][-1]
-            else:
-                # if no landfall, use last time of storm
-                self.time_offset = self.t[-1]
-
-            # Classification, note that this is not the category of the storm
-            self.classification = ds.usa_status.values
-            self.eye_location = np.array([ds.lon, ds.lat]).T
-
-            # Intensity information - for now, including only common, basic intensity
-            # info.
-            # TODO: add more detailed info for storms that have it
-            self.max_wind_speed = units.convert(
-                pref_vals['wind'], 'knots', 'm/s').where(pref_vals['wind'].notnull(), -1).values
-            self.central_pressure = units.convert(pref_vals['pres'], 'mbar', 'Pa').where(
-                pref_vals['pres'].notnull(), -1).values
-            self.max_wind_radius = units.convert(pref_vals['rmw'], 'nmi', 'm').where(
-                pref_vals['rmw'].notnull(), -1).values
-            self.storm_radius = units.convert(pref_vals['roci'], 'nmi', 'm').where(
-                pref_vals['roci'].notnull(), -1).values
-
-            # warn if you have missing vals for RMW or ROCI
-            if (self.max_wind_radius.max()) == -1 or (self.storm_radius.max() == -1):
-                warnings.warn(missing_data_warning_str)
+            index = ibtracs.find(sid=sid, storm_name=storm_name, year=year,
+                                 start_date=start_date)
+            ibtracs._read_batch([index], agency_pref, [self])
+        finally:
+            if ibtracs is not path:
+                ibtracs.close()
 
     def read_jma(self, path, verbose=False):
         r"""Read in JMA formatted storm file
@@ -752,7 +728,7 @@ class Storm(object):
         assert(num_lines == len(data_block))
 
         # Parse data block
-        self.t = []
+        t = []
         self.event = np.empty(num_lines, dtype=str)
         self.classification = np.empty(num_lines, dtype=str)
         self.eye_location = np.empty((num_lines, 2))
@@ -766,10 +742,10 @@ class Storm(object):
             data = [value.strip() for value in line.split()]
 
             # Create time
-            self.t.append(datetime.datetime(int(data[0][:2]),
-                                            int(data[0][2:4]),
-                                            int(data[0][4:6]),
-                                            int(data[0][6:])))
+            t.append(datetime.datetime(int(data[0][:2]),
+                                       int(data[0][2:4]),
+                                       int(data[0][4:6]),
+                                       int(data[0][6:])))
 
             # Classification, note that this is not the category of the storm
             self.classification[i] = int(data[1])
@@ -788,6 +764,7 @@ class Storm(object):
             warnings.warn(missing_data_warning_str)
             self.max_wind_radius[i] = -1
             self.storm_radius[i] = -1
+        self.t = t
 
     def read_imd(self, path, verbose=False):
         r"""Extract relevant hurricane data from IMD file
@@ -827,7 +804,7 @@ class Storm(object):
         #  max_wind_radius  - convert from km to m - 1000.0
         #  Central_pressure - convert from mbar to Pa - 100.0
         #  Radius of last isobar contour - convert from km to m - 1000.0
-        self.t = []
+        t = []
         self.classification = np.empty(num_lines, dtype=str)
         self.eye_location = np.empty((num_lines, 2))
         self.max_wind_speed = np.empty(num_lines)
@@ -846,10 +823,10 @@ class Storm(object):
                 self.ID = int(data[1][:2])
 
             # Create time
-            self.t.append(datetime.datetime(int(data[3][0:4]),
-                                            int(data[3][4:6]),
-                                            int(data[3][6:]),
-                                            int(data[4][:2])))
+            t.append(datetime.datetime(int(data[3][0:4]),
+                                       int(data[3][4:6]),
+                                       int(data[3][6:]),
+                                       int(data[4][:2])))
 
             # Parse eye location - longitude/latitude order
             if data[5][-1] == 'N':
@@ -867,6 +844,7 @@ class Storm(object):
                 float(data[9]), 'mbar', 'Pa')
             self.max_wind_radius[i] = units.convert(float(data[13]), 'km', 'm')
             self.storm_radius[i] = units.convert(float(data[11]), 'km', 'm')
+        self.t = t
 
     # =========================================================================
     # Write Routines
@@ -901,17 +879,20 @@ class Storm(object):
 
         :Input:
          - *path* (string) Path to the file to be written.
-         - *skip* (bool) Skip a time if NaNs are found and are not replaced.  
-            Default is `True`.
+         - *skip* (bool) Skip a time if missing values are found and are not
+            replaced.  Default is `True`.
          - *force* (bool) Force output of storm even if there is missing data.
             Default is `False`.
          - *verbose* (bool) Print out additional information when writing.
             Default is `False`.
          - *fill_dict* (dict) Dictionary of functions to use to fill in missing
-            data represented by NaNs.  The keys are the field to be filled and
+            data represented by NaNs or negative values (e.g. the -1 used by
+            `read_ibtracs` and `fill_rad_w_other_source`).  The keys are the field to be filled and
             the function signature should be `my_func(t, storm)` where t is the
-            time of the forecast and `storm` is the storm object.  If the
-            field remains a NaN or a function is not provided these lines will
+            time of the forecast and `storm` is the storm object.  A number
+            may be given instead of a function to fill all missing values of
+            the field at once.  If the
+            field remains missing or a function is not provided these lines will
             be assumed redundant and will be ommitted.  Note that the older 
             keyword arguments are put in this dictionary.  Currently the one
             default function is for `storm_radius`, which sets the value to 
@@ -919,225 +900,194 @@ class Storm(object):
         """
 
         # If a filling function is not provided we will provide some defaults
-        fill_dict.update({"storm_radius": lambda t, storm: 500e3})
+        fill = {"storm_radius": 500e3}
+        fill.update(fill_dict)
         # Handle older interface that had specific fill functions
-        if "max_wind_radius_fill" in kwargs.keys():
-            fill_dict.update(
-                {"max_wind_radius": kwargs['max_wind_radius_fill']})
-        if "storm_radius_fill" in kwargs.keys():
-            fill_dict.update({"storm_radius": kwargs['storm_radius_fill']})
-
-        # Loop through each line of data and if the line is valid, perform the
-        # necessary work to write it out.  Otherwise either raise an exception
-        # or skip it
-        num_casts = 0
-        data = []
-        for n in range(len(self.t)):
-            if self.t[n] == self.t[n - 1]:
-                # Skip this time
-                continue
+        if kwargs.get("max_wind_radius_fill", None) is not None:
+            fill["max_wind_radius"] = kwargs['max_wind_radius_fill']
+        if kwargs.get("storm_radius_fill", None) is not None:
+            fill["storm_radius"] = kwargs['storm_radius_fill']
 
-            # Check each value we need for this time to make sure it is valid
-            valid = True
-            for name in ["max_wind_speed", "central_pressure",
-                         "max_wind_radius", "storm_radius"]:
-                if np.isnan(getattr(self, name)[n]):
-                    if name in fill_dict.keys():
-                        # Fill value with function provided
-                        getattr(self, name)[n] = fill_dict[name](
-                            self.t[n], self)
-                    elif skip:
-                        # Skip this line
-                        valid = False
-                        if verbose:
-                            # Just warn that a NaN was found but continue
-                            msg = ("*** WARNING:  The value {} at {} is a " +
-                                   "NaN. Skipping this line.")
-                            warnings.warn(msg.format(name, self.t[n]))
-                    elif not force:
-                        # If we are not asked to force to write raise an
-                        # exception given the NaN
-                        msg = ("The value {} at {} is a NaN and the storm " +
-                               "will not be written in GeoClaw format.  If " +
-                               "you want to fill in the value provide a " +
-                               "function or set `force=True`.")
-                        raise ValueError(msg.format(name, self.t[n]))
-            if not valid:
+        # Fill missing values and find the valid times, all at once except
+        # for calling the fill functions
+        t = self.t
+        keep = np.ones(len(t), dtype=bool)
+        keep[1:] = t[1:] != t[:-1]
+        names = ["max_wind_speed", "central_pressure", "max_wind_radius",
+                 "storm_radius"]
+        missing = {}
+        for name in names:
+            values = np.asarray(getattr(self, name), dtype=float)
+            setattr(self, name, values)
+            missing[name] = keep & _missing(values)
+            fill_value = fill.get(name, None)
+            if fill_value is None or not np.any(missing[name]):
                 continue
-
-            # Succeeded, add this time to the output
-            num_casts += 1
-            data.append(np.empty(7))
-
-            # If we do not have a time offset use the first valid row as the
-            # offset time
-            if self.time_offset is None:
-                self.time_offset = self.t[n]
-
-            # Time
-            if not isinstance(self.time_offset, float):
-                data[-1][0] = (self.t[n] - self.time_offset).total_seconds()
+            if callable(fill_value):
+                for n in np.flatnonzero(missing[name]):
+                    values[n] = fill_value(_as_datetime(t[n]), self)
             else:
-                data[-1][0] = self.t[n] - self.time_offset
-            # Eye-location
-            data[-1][1:3] = self.eye_location[n, :]
-            # Max wind speed
-            data[-1][3] = self.max_wind_speed[n]
-            # Max wind radius
-            data[-1][4] = self.max_wind_radius[n]
-            # Central pressure
-            data[-1][5] = self.central_pressure[n]
-            # Outer storm radius
-            data[-1][6] = self.storm_radius[n]
+                values[missing[name]] = fill_value
+            missing[name] = keep & _missing(values)
+
+        invalid = np.zeros(len(t), dtype=bool)
+        for name in names:
+            invalid |= missing[name]
+        if np.any(invalid):
+            if skip:
+                # Skip these lines
+                if verbose:
+                    # Just warn that a NaN was found but continue
+                    msg = ("*** WARNING:  The value {} at {} is a " +
+                           "NaN. Skipping this line.")
+                    for n in np.flatnonzero(invalid):
+                        for name in names:
+                            if missing[name][n]:
+                                warnings.warn(msg.format(name, t[n]))
+                keep &= ~invalid
+            elif not force:
+                # If we are not asked to force to write raise an
+                # exception given the NaN
+                n = np.flatnonzero(invalid)[0]
+                name = [name for name in names if missing[name][n]][0]
+                msg = ("The value {} at {} is a NaN and the storm " +
+                       "will not be written in GeoClaw format.  If " +
+                       "you want to fill in the value provide a " +
+                       "function or set `force=True`.")
+                raise ValueError(msg.format(name, t[n]))
+
+        # If we do not have a time offset use the first valid row as the
+        # offset time
+        if self.time_offset is None and np.any(keep):
+            self.time_offset = t[keep][0]
+
+        data = np.column_stack([self._seconds(t[keep]),
+                                self.eye_location[keep, 0],
+                                self.eye_location[keep, 1],
+                                self.max_wind_speed[keep],
+                                self.max_wind_radius[keep],
+                                self.central_pressure[keep],
+                                self.storm_radius[keep]])
 
         # Write out file
-        format_string = ("{:19,.8e} " * 7)[:-1] + "\n"
-        try:
-            with open(path, "w") as data_file:
-                # Write header
-                data_file.write(f"{num_casts}\n")
-                if isinstance(self.time_offset, datetime.datetime):
-                    data_file.write(f"{self.time_offset.isoformat()}\n\n")
-                else:
-                    data_file.write(f"{str(self.time_offset)}\n\n")
-
-                # Write data lines
-                for line in data:
-                    data_file.write(format_string.format(*line))
-
-        except Exception as e:
-            # If an exception occurs clean up a partially generated file
-            if os.path.exists(path):
-                os.remove(path)
-            raise e
+        _write_text(path, _geoclaw_block(data, self.time_offset))
+
+    def _seconds(self, t):
+        r"""Times *t* in seconds relative to the time offset"""
+        if t.dtype.kind == 'M':
+            return (t - np.datetime64(self.time_offset, 'us')) \
+                   / np.timedelta64(1, 's')
+        return t - self.time_offset
+
+    def _dates(self, file_format):
+        r"""Times as datetime64, which the formats other than GeoClaw need"""
+        if self.t.dtype.kind != 'M':
+            raise ValueError("Writing %s files requires the times to be "
+                             "dates." % file_format)
+        return self.t
+
+    def _per_time(self, value, default):
+        r"""Attribute *value* as an array with one string per time, arrays
+        not matching the times (e.g. ATCF names per line read) use their
+        last value"""
+        def as_str(item):
+            if item is None or (isinstance(item, float) and np.isnan(item)):
+                return str(default)
+            return str(item)
+
+        if value is not None and not isinstance(value, str) and \
+                np.ndim(value) > 0:
+            if len(value) == len(self.t):
+                return np.array([as_str(item) for item in value],
+                                dtype=object)
+            value = value[-1] if len(value) > 0 else None
+        return np.full(len(self.t), as_str(value), dtype=object)
 
     def write_atcf(self, path, verbose=False):
         r"""Write out a ATCF formatted storm file
 
+        Only the best track columns up to the storm name are written, missing
+        values are written as 0.  Times are written to the hour.
+
         :Input:
          - *path* (string) Path to the file to be written.
          - *verbose* (bool) Print out additional information when writing.
         """
-        raise NotImplementedError(("Writing out ATCF files is not implemented ",
-                                   "yet but is planned for a future release."))
-        try:
-            with open(path, 'w') as data_file:
-                for n in range(len(self.t)):
-                    data_file.write("".join((", " * 2,
-                                             "%s" % seconds2date(self.t[n]),
-                                             ", " * 4,
-                                             "%s" % (int(self.eye_location[n, 0] *
-                                                         10.0)),
-                                             ", ",
-                                             "%s" % (int(self.eye_location[n, 1] *
-                                                         10.0)),
-                                             ", ",
-                                             "%s" % self.max_wind_speed[n],
-                                             ", ",
-                                             "%s" % self.central_pressure[n],
-                                             ", ",
-                                             ", " * 8,
-                                             "%s" % self.storm_radius[n],
-                                             ", ",
-                                             "%s" % self.max_wind_radius[n],
-                                             ", " * 10,
-                                             "\n")))
-        except Exception as e:
-            # Remove possiblly partially generated file if not successful
-            if os.path.exists(path):
-                os.remove(path)
-            raise e
+
+        _write_text(path, _atcf_block(self._dates("ATCF"), self.eye_location,
+                        self.max_wind_speed, self.max_wind_radius,
+                        self.central_pressure, self.storm_radius,
+                        basin=_basin_code(self.basin, ATCF_basins, "AL"),
+                        cyclone_number=_cyclone_number(self.ID),
+                        classification=self._per_time(self.classification,
+                                                      "XX"),
+                        name=self._per_time(self.name, "")))
 
     def write_hurdat(self, path, verbose=False):
         r"""Write out a HURDAT formatted storm file
 
+        Missing wind speeds are written as -99 and pressures as -999, the
+        wind radii columns are not available and are written as -999.
+
         :Input:
          - *path* (string) Path to the file to be written.
          - *verbose* (bool) Print out additional information when writing.
         """
-        raise NotImplementedError(("Writing out hurdat files is not ",
-                                   "implemented yet but is planned for a ",
-                                   "future release."))
-        try:
-            with open(path, 'w') as data_file:
-                data_file.write('%s %s %s' % ("Date", "Hurricane Name",
-                                              "Indicator"))
-                for n in range(self.t.shape[0]):
-
-                    latitude = float(self.eye_location[n, 0])
-                    longitude = float(self.eye_location[n, 1])
 
-                    # Convert latitude to proper Hurdat format e.g 12.0N
-                    if latitude > 0:
-                        latitude = str(np.abs(latitude)) + 'N'
-                    else:
-                        latitude = str(np.abs(latitude)) + 'S'
-
-                    # Convert longitude to proper Hurdat format e.g 12.0W
-                    if longitude > 0:
-                        longitude = str(np.abs(longitude)) + 'E'
-                    else:
-                        longitude = str(np.abs(longitude)) + 'W'
-
-                    data_file.write("".join(("%s" % self.seconds2date(
-                        self.t[n])[0:-2],
-                        "%s00" % self.seconds2date(
-                        self.t[n])[-2:],
-                        ", " * 3,
-                        "%s" % (latitude),
-                        ", ",
-                        "%s" % (longitude),
-                        ", ",
-                        "%s" % self.max_wind_speed[n],
-                        ", ",
-                        "%s" % self.central_pressure[n],
-                        ", ",
-                        "%s" % self.storm_radius[n],
-                        ", ",
-                        "%s" % self.max_wind_radius[n],
-                        ", " * 10,
-                        "\n")))
-        except Exception as e:
-            # Remove possiblly partially generated file if not successful
-            if os.path.exists(path):
-                os.remove(path)
-            raise e
+        t = self._dates("HURDAT")
+        year, month, day, hour, minute = _date_parts(t)
+        lon, lat = self.eye_location[:, 0], self.eye_location[:, 1]
+        wind = _missing_int(units.convert(self.max_wind_speed, 'm/s',
+                                          'knots'), -99)
+        pressure = _missing_int(units.convert(self.central_pressure, 'Pa',
+                                              'mbar'), -999)
+        name = self.name if isinstance(self.name, str) else \
+               str(self._per_time(self.name, "UNNAMED")[-1])
+
+        header = "%s%s%04i, %18s, %6i,\n" % (
+                        _basin_code(self.basin, ATCF_basins, "AL"),
+                        str(_cyclone_number(self.ID)).zfill(2), year[0],
+                        name, len(t))
+        line = "%04i%02i%02i, %02i%02i, %1s, %2s, %4.1f%s, %5.1f%s, %3i, " \
+               "%4i," + " -999," * 12 + "\n"
+        _write_text(path, header + _format_block(line,
+                        [year, month, day, hour, minute,
+                         self._per_time(self.event, " "),
+                         self._per_time(self.classification, "  "),
+                         np.abs(lat), np.where(lat >= 0, "N", "S"),
+                         np.abs(lon), np.where(lon >= 0, "E", "W"),
+                         wind, pressure]))
 
     def write_jma(self, path, verbose=False):
         r"""Write out a JMA formatted storm file
 
+        Missing wind speeds and pressures are written as 0.
+
         :Input:
          - *path* (string) Path to the file to be written.
          - *verbose* (bool) Print out additional information when writing.
         """
-        raise NotImplementedError(("Writing out JMA files is not implemented ",
-                                   "yet but is planned for a future release."))
-        try:
-            with open(path, 'w') as data_file:
-                for n in range(self.t.shape[0]):
-                    data_file.write("".join(("%s" % self.seconds2date(self.t[n]),
-                                             " " * 4,
-                                             "%s" % (int(self.eye_location[n, 0] *
-                                                         10.0)),
-                                             ", ",
-                                             "%s" % (int(self.eye_location[n, 1] *
-                                                         10.0)),
-                                             ", ",
-                                             "%s" % self.max_wind_speed[n],
-                                             ", ",
-                                             "%s" % self.central_pressure[n],
-                                             ", ",
-                                             ", " * 8,
-                                             "%s" % self.storm_radius[n],
-                                             ", ",
-                                             "%s" % self.max_wind_radius[n],
-                                             ", " * 10,
-                                             "\n")))
-        except Exception as e:
-            # Remove possiblly partially generated file if not successful
-            if os.path.exists(path):
-                os.remove(path)
-            raise e
+
+        t = self._dates("JMA")
+        year, month, day, hour, _ = _date_parts(t)
+        lat = _missing_int(self.eye_location[:, 1] * 10.0, 0)
+        lon = _missing_int(self.eye_location[:, 0] * 10.0, 0)
+        pressure = _missing_int(units.convert(self.central_pressure, 'Pa',
+                                              'hPa'), 0)
+        wind = _missing_int(units.convert(self.max_wind_speed, 'm/s',
+                                          'knots'), 0)
+        grade = [value if value.isdigit() else "0" for value in
+                 self._per_time(self.classification, "0")]
+        ID = "%4s" % ("" if self.ID is None else str(self.ID)[-4:])
+        name = self.name if isinstance(self.name, str) else \
+               str(self._per_time(self.name, "")[-1])
+
+        header = "66666 %s %3i       %s 0 0 %-20s\n" % (ID, len(t), ID,
+                                                         name[:20])
+        line = "%02i%02i%02i%02i 002 %1s %03i %04i %4i     %03i\n"
+        _write_text(path, header + _format_block(line,
+                        [year % 100, month, day, hour, grade, lat, lon,
+                         pressure, wind]))
 
     def write_imd(self, path, verbose=False):
         r"""Write out an IMD formatted storm file
@@ -1152,14 +1102,38 @@ class Storm(object):
     def write_tcvitals(self, path, verbose=False):
         r"""Write out an TCVITALS formatted storm file
 
+        The storm motion, environmental pressure and wind radii are not
+        available and are written as missing (-99 or -999).
+
         :Input:
          - *path* (string) Path to the file to be written.
          - *verbose* (bool) Print out additional information when writing.
          """
 
-        raise NotImplementedError(("Writing in TCVITALS files is not",
-                                   "implemented yet but is planned for a ",
-                                   "future release."))
+        t = self._dates("TCVITALS")
+        year, month, day, hour, minute = _date_parts(t)
+        lon, lat = self.eye_location[:, 0], self.eye_location[:, 1]
+        basin = _basin_code(self.basin, TCVitals_Basins, "L")
+        name = np.array([value.replace(" ", "_")[:9] for value in
+                         self._per_time(self.name, "UNKNOWN")], dtype=object)
+
+        line = "NHC  %02i%s %-9s %04i%02i%02i %02i%02i %03i%s %04i%s " \
+               "-99 -99 %04i -999 %04i %02i %03i -999 -999 -999 -999 M\n"
+        _write_text(path, _format_block(line,
+                        [np.full(len(t), _cyclone_number(self.ID)),
+                         np.full(len(t), basin, dtype=object), name,
+                         year, month, day, hour, minute,
+                         _missing_int(np.abs(lat) * 10.0, 0),
+                         np.where(lat >= 0, "N", "S"),
+                         _missing_int(np.abs(lon) * 10.0, 0),
+                         np.where(lon >= 0, "E", "W"),
+                         _missing_int(units.convert(self.central_pressure,
+                                                    'Pa', 'mbar'), -999),
+                         _missing_int(units.convert(self.storm_radius,
+                                                    'm', 'km'), -999),
+                         _missing_int(self.max_wind_speed, -9),
+                         _missing_int(units.convert(self.max_wind_radius,
+                                                    'm', 'km'), -99)]))
 
     # ================
     #  Track Plotting
@@ -1379,48 +1353,1209 @@ class Storm(object):
             return category
 
 
+# =============================================================================
+#  IBTrACS database handle
+class IBTrACS(object):
+    r"""
+    Reusable handle to an IBTrACS v4 netCDF file
+
+    The file is opened once and an index from *sid*, name and year to the
+    storms in the file is built in memory, so that many storms can be looked
+    up and read without searching the whole file each time.  Storms are read
+    in batches, loading all variables of a batch at once and choosing the
+    preferred agency values for all of them with array operations::
+
+        with IBTrACS("IBTrACS.ALL.v04r00.nc") as ibtracs:
+            storms = ibtracs.read_storms(ibtracs.find_all(year=2005))
+            ike = ibtracs.read_storm(storm_name="IKE", year=2008)
+
+    :Attributes:
+     - *ds* (xarray.Dataset) The open dataset.
+     - *sid*, *name* (ndarray(:)) Identifier and name of each storm.
+     - *first_year*, *last_year* (ndarray(:)) Years of the first and last
+       valid times of each storm.
+     - *start_time* (ndarray(:)) First time of each storm.
+
+    :Input:
+     - *path* (string) Path to the IBTrACS file.
+    """
+
+    def __init__(self, path):
+
+        # imports that you don't need for other read functions
+        try:
+            import xarray as xr
+        except ImportError as e:
+            print("IBTrACS currently requires xarray to work.")
+            raise e
+
+        self.path = path
+        self.ds = xr.open_dataset(path)
+
+        self.sid = self.ds.sid.values.astype(str)
+        self.name = self.ds.name.values.astype(str)
+        time = self.ds.time.values
+        valid = ~np.isnat(time)
+        years = time.astype('datetime64[Y]').astype(np.int64) + 1970
+        self.first_year = np.where(valid, years, np.iinfo(np.int64).max).min(axis=1)
+        self.last_year = np.where(valid, years, np.iinfo(np.int64).min).max(axis=1)
+        self.start_time = time[:, 0]
+
+        self._sid_index = {sid: n for (n, sid) in enumerate(self.sid)}
+        self._name_index = {}
+        for (n, name) in enumerate(self.name):
+            self._name_index.setdefault(name, []).append(n)
+
+    def close(self):
+        r"""Close the dataset"""
+        self.ds.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self.sid)
+
+    def find_all(self, storm_name=None, year=None):
+        r"""Return the indices of all storms with name *storm_name* (if not
+        None) that have a valid time in *year* (if not None), which can also
+        be a list of years.
+        """
+        if storm_name is None:
+            match = np.ones(len(self), dtype=bool)
+        else:
+            storm_name = storm_name.upper()
+            # in case storm is unnamed
+            if storm_name in ['UNNAMED', 'NO-NAME']:
+                storm_name = 'NOT_NAMED'
+            match = np.zeros(len(self), dtype=bool)
+            match[self._name_index.get(storm_name, [])] = True
+        if year is not None:
+            in_years = np.zeros(len(self), dtype=bool)
+            for y in np.atleast_1d(year):
+                in_years |= (self.first_year <= y) & (self.last_year >= y)
+            match &= in_years
+        return np.flatnonzero(match)
+
+    def find(self, sid=None, storm_name=None, year=None, start_date=None):
+        r"""Return the index of the storm with *sid*, or with *storm_name* and
+        *year*, see :meth:`Storm.read_ibtracs`.
+
+        :Raises:
+         - *ValueError* If there is no matching storm, or several matching
+             storms and no *start_date*.
+        """
+
+        # only allow one method for specifying storms
+        if (sid is not None) and ((storm_name is not None) or (year is not None)):
+            raise ValueError(
+                'Cannot specify both *sid* and *storm_name* or *year*.')
+
+        if sid is not None:
+            if sid not in self._sid_index:
+                raise ValueError('Storm/year not found in provided file')
+            return self._sid_index[sid]
+
+        matches = self.find_all(storm_name=storm_name, year=year)
+        if len(matches) == 0:
+            raise ValueError('Storm/year not found in provided file')
+        elif len(matches) > 1:
+            # see if a date was provided for multiple unnamed storms
+            if start_date is None:
+                raise ValueError(
+                    'Multiple storms identified and no start_date specified.')
+            # find storm with start date closest to provided
+            start_times = self.start_time[matches]
+            start_date = np.datetime64(start_date)
+            return matches[np.abs(start_times - start_date).argmin()]
+        return matches[0]
+
+    def read_storm(self, sid=None, storm_name=None, year=None,
+                   start_date=None, agency_pref=IBTrACS_agencies):
+        r"""Return the :class:`Storm` found by :meth:`find`"""
+        index = self.find(sid=sid, storm_name=storm_name, year=year,
+                          start_date=start_date)
+        return self.read_storms([index], agency_pref=agency_pref)[0]
+
+    def read_storms(self, storms, agency_pref=IBTrACS_agencies,
+                    batch_size=500, skip_missing=False):
+        r"""Read many storms
+
+        :Input:
+         - *storms* (list) Indices of storms (e.g. from :meth:`find_all`) or
+           their *sid*.
+         - *agency_pref* (list, optional) See :meth:`Storm.read_ibtracs`.
+         - *batch_size* (int) Number of storms loaded into memory at once.
+         - *skip_missing* (bool) If True, storms with no valid data are left
+           out instead of raising an exception.
+
+        :Output:
+         - (list) The :class:`Storm` objects, in the same order as *storms*.
+        """
+        indices = [self._sid_index[n] if isinstance(n, str) else int(n)
+                   for n in storms]
+        result = []
+        for start in range(0, len(indices), batch_size):
+            batch = indices[start:start + batch_size]
+            storm_list = [Storm() for n in batch]
+            valid = self._read_batch(batch, agency_pref, storm_list,
+                                     skip_missing=skip_missing)
+            result += [storm for (storm, ok) in zip(storm_list, valid) if ok]
+        return result
+
+    def _read_batch(self, indices, agency_pref, storms, skip_missing=False):
+        r"""Set the data of the Storm objects in *storms* from the storms
+        with *indices*.  Returns a list of flags, False for storms skipped
+        because they have no valid data.
+        """
+
+        ds = self.ds.isel(storm=np.asarray(indices))
+        variables = ['basin', 'wmo_agency', 'usa_agency', 'usa_record',
+                     'usa_status', 'wmo_wind', 'wmo_pres']
+        for v in ['wind', 'pres', 'rmw', 'roci']:
+            variables += ['{}_{}'.format(i, v) for i in agency_pref]
+        data = {name: ds[name].values for name in set(variables)
+                if name in ds.variables}
+        for name in ['time', 'lat', 'lon']:
+            data[name] = ds[name].values
+        valid_t = ~np.isnat(data['time'])
+
+        missing = np.full(valid_t.shape, np.nan,
+                          dtype=data['wmo_wind'].dtype)
+
+        # Create mapping from wmo_ or usa_agency
+        # to the appropriate variable
+        agency_map = {b'': agency_pref.index('wmo')}
+        # account for multiple usa agencies
+        for a in IBTrACS_usa_agencies:
+            agency_map[a] = agency_pref.index('usa')
+        # map all other agencies to themselves
+        for i in [a for a in agency_pref if a not in ['wmo', 'usa']]:
+            agency_map[i.encode('utf-8')] = agency_pref.index(i)
+
+        # fill in usa as provider if usa_agency is
+        # non-null when wmo_agency is null
+        provider = np.where(data['wmo_agency'] != b'', data['wmo_agency'],
+                            data['usa_agency'])
+
+        # index of the agency that is wmo provider, mapping each distinct
+        # provider once
+        providers, inverse = np.unique(provider[valid_t], return_inverse=True)
+        pref_agency_ix = np.zeros(valid_t.shape, dtype=int)
+        pref_agency_ix[valid_t] = np.array(
+            [agency_map[a] for a in providers], dtype=int)[inverse.ravel()]
+
+        def first_valid(all_vals):
+            # value of the first agency with a non-missing value
+            best_ix = np.argmax(~np.isnan(all_vals), axis=0)
+            return np.take_along_axis(all_vals, best_ix[None, ...], axis=0)[0]
+
+        # GET MAX WIND SPEED and PRES
+        pref_vals = {}
+        for v in ['wind', 'pres']:
+            all_vals = np.array([data.get('{}_{}'.format(i, v), missing)
+                                 for i in agency_pref])
+
+            # get wmo value
+            val_pref = data['wmo_' + v]
+
+            # fill this value in as a second-best
+            pref_2 = np.take_along_axis(all_vals, pref_agency_ix[None, ...],
+                                        axis=0)[0]
+            val_pref = np.where(np.isnan(val_pref), pref_2, val_pref)
+
+            # now use the agency_pref order to fill in
+            # any remaining values as third best
+            pref_3 = first_valid(all_vals)
+            pref_vals[v] = np.where(np.isnan(val_pref), pref_3, val_pref)
+
+        # GET RMW and ROCI
+        # (these can be missing)
+        for r in ['rmw', 'roci']:
+            all_vals = np.array([data['{}_{}'.format(i, r)] for i in agency_pref
+                                 if '{}_{}'.format(i, r) in data]
+                                + [missing])
+            pref_vals[r] = first_valid(all_vals)
+
+        # THESE CANNOT BE MISSING SO DROP
+        # IF EITHER MISSING
+        valid = valid_t & ~np.isnan(pref_vals['wind']) \
+                & ~np.isnan(pref_vals['pres'])
+
+        flags = []
+        for (n, (index, storm)) in enumerate(zip(indices, storms)):
+            keep = valid[n]
+            if not keep.any():
+                if skip_missing:
+                    flags.append(False)
+                    continue
+                if not valid_t[n].any():
+                    raise ValueError('No valid wind speeds found for this storm.')
+                raise NoDataError(missing_necessary_data_warning_str)
+            flags.append(True)
+
+            # CONVERT TO GEOCLAW FORMAT
+
+            # assign basin to be the basin where track originates
+            # in case track moves across basins
+            storm.basin = data['basin'][n][keep][0].astype(str)
+            storm.name = str(self.name[index])
+            storm.ID = str(self.sid[index])
+
+            storm.t = data['time'][n][keep].astype('datetime64[s]')
+
+            # events
+            storm.event = data['usa_record'][n][keep].astype(str)
+
+            # time offset
+            if (storm.event == 'L').any():
+                # if landfall, use last landfall
+                storm.time_offset = storm.t[storm.event == 'L'][-1]
+            else:
+                # if no landfall, use last time of storm
+                storm.time_offset = storm.t[-1]
+
+            # Classification, note that this is not the category of the storm
+            storm.classification = data['usa_status'][n][keep]
+            storm.eye_location = np.array([data['lon'][n][keep],
+                                           data['lat'][n][keep]]).T
+
+            # Intensity information - for now, including only common, basic intensity
+            # info.
+            # TODO: add more detailed info for storms that have it
+            wind, pres, rmw, roci = [pref_vals[v][n][keep]
+                                     for v in ['wind', 'pres', 'rmw', 'roci']]
+            storm.max_wind_speed = np.where(np.isnan(wind), -1,
+                                            units.convert(wind, 'knots', 'm/s'))
+            storm.central_pressure = np.where(np.isnan(pres), -1,
+                                              units.convert(pres, 'mbar', 'Pa'))
+            storm.max_wind_radius = np.where(np.isnan(rmw), -1,
+                                             units.convert(rmw, 'nmi', 'm'))
+            storm.storm_radius = np.where(np.isnan(roci), -1,
+                                          units.convert(roci, 'nmi', 'm'))
+
+            # warn if you have missing vals for RMW or ROCI
+            if (storm.max_wind_radius.max()) == -1 or (storm.storm_radius.max() == -1):
+                warnings.warn(missing_data_warning_str)
+
+        return flags
+
+
 # =============================================================================
 # Model field construction - Models supported are
 #  - Holland 1980 ('HOLLAND_1980') [1]
-#  - Holland 2010 ('HOLLAND_2010') [2]
-#  - Chavas, Lin, Emmanuel ('CLE_2015') [3]
-# *TODO* - Add citations
+#  - Holland 2008 ('HOLLAND_2008') [2]
+#  - Holland 2010 ('HOLLAND_2010') [3]
+#  - Chavas, Lin, Emmanuel ('CLE_2015') [4]
+#  - SLOSH ('SLOSH') [5]
+#  - Rankine ('RANKINE') [6]
+#  - Modified Rankine ('MODIFIED_RANKINE') [7]
+#  - DeMaria ('DEMARIA') [8]
+# These follow the implementations in model_storm_module.f90, evaluated with
+# NumPy over all times and grid points at once.
 
 # Dictionary of models.  Keys are function names, values are the proper name
 # and a citation to the model
 _supported_models = {"holland_1980": ["Holland 1980", "Holland, G. J. An Analytic Model of the Wind and Pressure Profiles in Hurricanes. Monthly Weather Review 108, 1212-1218 (1980)."],
+                     "holland_2008": ["Holland 2008", "Holland, G. J. A Revised Hurricane Pressure-Wind Model. Monthly Weather Review 136, 3432-3445 (2008)."],
                      "holland_2010": ["Holland 2010", "Holland, G. J., Belanger, J. I. & Fritz, A. A Revised Model for Radial Profiles of Hurricane Winds. Monthly Weather Review 138, 4393-4393 (2010)."],
-                     "cle_2015": ["Chavas, Lin, Emmanuel 2015", "Chavas, D. R., Lin, N. & Emanuel, K. A Model for the Complete Radial Structure of the Tropical Cyclone Wind Field. Part I: Comparison with Observed Structure*. https://doi.org.ezproxy.cul.columbia.edu/10.1175/JAS-D-15-0014.1 72, 3647-3662 (2015)."]}
+                     "cle_2015": ["Chavas, Lin, Emmanuel 2015", "Chavas, D. R., Lin, N. & Emanuel, K. A Model for the Complete Radial Structure of the Tropical Cyclone Wind Field. Part I: Comparison with Observed Structure*. https://doi.org.ezproxy.cul.columbia.edu/10.1175/JAS-D-15-0014.1 72, 3647-3662 (2015)."],
+                     "slosh": ["SLOSH", "Jelesnianski, C. P., Chen, J. & Shaffer, W. A. SLOSH: Sea, Lake, and Overland Surges from Hurricanes. NOAA Technical Report NWS 48 (1992)."],
+                     "rankine": ["Rankine", "Rankine vortex, see e.g. Holton, J. R. An Introduction to Dynamic Meteorology (2004)."],
+                     "modified_rankine": ["Modified Rankine", "Mallen, K. J., Montgomery, M. T. & Wang, B. Reexamining the Near-Core Radial Structure of the Tropical Cyclone Primary Circulation: Implications for Vortex Resiliency. Journal of the Atmospheric Sciences 62, 408-425 (2005)."],
+                     "demaria": ["DeMaria", "DeMaria, M. Tropical Cyclone Track Prediction with a Barotropic Spectral Model. Monthly Weather Review 115, 2346-2357 (1987)."]}
+
+# Constants used by the models, see model_storm_module.f90
+atmos_boundary_layer = 0.9   # Conversion of surface to gradient winds
+sampling_time = 0.88         # Conversion from 1 min to 10 min winds
+RAMP_WIDTH = 100e3           # Width of the ramp to ambient at the storm radius
+TRACKING_TOLERANCE = 1e-10   # Allowed time before the start of the track
+omega = 2.0 * np.pi / 86164.2    # Angular velocity of the earth
+
+
+def _track_seconds(storm, t):
+    r"""Convert the storm track times and the times *t* to seconds relative
+    to the storm's *time_offset*, as in the GeoClaw storm file"""
+
+    track_t = np.asarray(storm.t)
+    t = np.atleast_1d(np.asarray(t))
+    if track_t.dtype.kind in 'OM':
+        offset = storm.time_offset
+        if offset is None or isinstance(offset, float):
+            offset = storm.t[0]
+        offset = np.datetime64(offset, 'us')
+        track_t = (track_t.astype('datetime64[us]') - offset) \
+                  / np.timedelta64(1, 's')
+        if t.dtype.kind in 'OM':
+            t = (t.astype('datetime64[us]') - offset) / np.timedelta64(1, 's')
+    elif isinstance(storm.time_offset, float):
+        track_t = track_t - storm.time_offset
+    return track_t.astype(float), t.astype(float)
+
+
+def _spherical_distance(x1, y1, x2, y2, earth_radius):
+    r"""Great circle distance between points in degrees (haversine)"""
+    dx = np.radians(x2 - x1)
+    dy = np.radians(y2 - y1)
+    return earth_radius * 2.0 * np.arcsin(np.sqrt(np.sin(0.5 * dy)**2
+                + np.cos(np.radians(y1)) * np.cos(np.radians(y2))
+                * np.sin(0.5 * dx)**2))
+
+
+def coriolis(y, coordinate_system=2, theta_0=0.0):
+    r"""Coriolis parameter at *y* as computed in geoclaw_module.f90
+
+    For *coordinate_system* 1 a beta-plane approximation is used about
+    *theta_0* and *y* is in meters, for *coordinate_system* 2 *y* is the
+    latitude in degrees.
+    """
+    y = np.asarray(y, dtype=float)
+    if coordinate_system == 1:
+        theta = np.radians(y / 111e3) + theta_0
+        return 2.0 * omega * (np.sin(theta_0) + (theta - theta_0)
+                              * np.cos(theta_0))
+    elif coordinate_system == 2:
+        return 2.0 * omega * np.sin(np.radians(y))
+    return np.zeros(y.shape)
+
+
+def storm_parameters(storm, t, coordinate_system=2, earth_radius=Rearth):
+    r"""Interpolate the storm data to the times *t*
 
+    Vectorized version of `get_storm_data` in model_storm_module.f90.  The
+    storm data is linearly interpolated in time, and after the last time of
+    the track the storm keeps its last intensity and moves with its last
+    velocity.  Consecutive repeated times are skipped as in
+    :meth:`Storm.write_geoclaw`.
 
-# In the case where the field is not rotationally symmetric then the r value
-# defines the x and y axis extents.
-def construct_fields(storm, r, t, model="holland_1980"):
-    r""""""
+    :Input:
+     - *storm* (Storm) Storm with complete data, e.g. as read from a GeoClaw
+       storm file.
+     - *t* (array) Times, either datetimes or seconds relative to the storm's
+       *time_offset*.
+     - *coordinate_system* (int) 1 for cartesian, 2 for latitude-longitude.
+     - *earth_radius* (float) Radius of the earth in meters.
+
+    :Output:
+     - (dict) Arrays with a value for each time for the keys *location*
+       and *velocity* (shape (nt, 2)) and *max_wind_radius*,
+       *max_wind_speed*, *central_pressure*, *storm_radius* and
+       *central_pressure_change* (shape (nt,)).
+    """
+
+    track_t, t = _track_seconds(storm, t)
+    keep = np.ones(len(track_t), dtype=bool)
+    keep[1:] = track_t[1:] != track_t[:-1]
+    track_t = track_t[keep]
+    location = np.asarray(storm.eye_location, dtype=float)[keep]
+    data = {name: np.asarray(getattr(storm, name), dtype=float)[keep]
+            for name in ["max_wind_radius", "max_wind_speed",
+                         "central_pressure", "storm_radius"]}
+    if len(track_t) < 2:
+        raise ValueError("Storm needs at least two track times.")
+
+    # Storm velocity and pressure change, as in set_storm
+    x, y = location[:-1], location[1:]
+    dt = np.diff(track_t)
+    velocity = np.empty(location.shape)
+    if coordinate_system == 2:
+        y_mid = 0.5 * (x[:, 1] + y[:, 1])
+        ds = _spherical_distance(x[:, 0], y_mid, y[:, 0], y_mid, earth_radius)
+        velocity[:-1, 0] = np.copysign(ds / dt, y[:, 0] - x[:, 0])
+        x_mid = 0.5 * (x[:, 0] + y[:, 0])
+        ds = _spherical_distance(x_mid, x[:, 1], x_mid, y[:, 1], earth_radius)
+        velocity[:-1, 1] = np.copysign(ds / dt, y[:, 1] - x[:, 1])
+    else:
+        velocity[:-1] = (y - x) / dt[:, None]
+    velocity[-1] = velocity[-2]
+    data["central_pressure_change"] = np.append(
+                    np.diff(data["central_pressure"]) / dt, 0.0)
+    data["central_pressure_change"][-1] = data["central_pressure_change"][-2]
+
+    if np.any(t < track_t[0] - TRACKING_TOLERANCE):
+        raise ValueError("Times requested before the start of the track.")
+
+    # Linear interpolation between track times
+    i = np.clip(np.searchsorted(track_t, t, side='right'), 1,
+                len(track_t) - 1)
+    weight = ((t - track_t[i - 1]) / (track_t[i] - track_t[i - 1]))
+    after = t > track_t[-1]
+    weight[after] = 1.0
+    params = {name: value[i - 1] + weight * (value[i] - value[i - 1])
+              for (name, value) in data.items()}
+    params["velocity"] = velocity[i - 1] \
+                         + weight[:, None] * (velocity[i] - velocity[i - 1])
+    params["location"] = location[i - 1] \
+                         + weight[:, None] * (location[i] - location[i - 1])
+
+    # Past the end of the track the storm moves with constant velocity
+    if np.any(after):
+        dt = (t[after] - track_t[-1])[:, None]
+        if coordinate_system == 2:
+            scale = np.radians(earth_radius) \
+                    * np.array([np.cos(np.radians(location[-1, 1])), 1.0])
+            params["location"][after] = location[-1] \
+                                        + dt * velocity[-1] / scale
+        else:
+            params["location"][after] = location[-1] + dt * velocity[-1]
+
+    return params
+
+
+def _adjust_max_wind(velocity, mws, convert_height):
+    r"""Remove the translational speed from the maximum wind speed, bounding
+    it at 0, and optionally convert to gradient winds (adjust_max_wind)"""
+    trans_speed = np.sqrt(velocity[..., 0]**2 + velocity[..., 1]**2)
+    mod_mws = mws - trans_speed
+    slow = mod_mws < 0
+    velocity = velocity.copy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        velocity[slow] *= (mws[slow] / trans_speed[slow])[:, None]
+    mod_mws = np.maximum(mod_mws, 0.0)
+    if convert_height:
+        mod_mws = mod_mws / atmos_boundary_layer
+    return velocity, mod_mws
+
+
+def _pressure_diff(Pc, ambient_pressure):
+    r"""Central pressure deficit, limited below at 100 Pa"""
+    return np.maximum(ambient_pressure - Pc, 100.0)
+
+
+def _holland_b(mod_mws, dp, rho_air):
+    r"""Holland B parameter limited to [1, 2.5]"""
+    return np.clip(rho_air * np.exp(1.0) * mod_mws**2 / dp, 1.0, 2.5)
+
+
+def _holland_b_2008(dp, dpdt, slat, velocity):
+    r"""Holland 2008 B parameter limited to [1, 2.5], in the same units as
+    model_storm_module.f90"""
+    trans_speed = np.sqrt(velocity[..., 0]**2 + velocity[..., 1]**2)
+    x = 0.6 * (1.0 - dp / 215.0)
+    B = -4.4e-5 * dp**2 + 0.01 * dp + 0.03 * dpdt - 0.014 * np.abs(slat) \
+        + 0.15 * trans_speed**x + 1.0
+    return np.clip(B, 1.0, 2.5)
+
+
+def _holland_pressure(Pc, r, dp, mwr, B):
+    r"""Holland pressure profile (set_pressure)"""
+    with np.errstate(divide='ignore', over='ignore'):
+        ratio = (mwr / r)**B
+    return np.where(ratio > 100, Pc, Pc + dp * np.exp(-np.minimum(ratio, 100)))
+
+
+def _post_process(wind, pressure, r, theta, north, radius, velocity, mod_mws,
+                  convert_height, ambient_pressure):
+    r"""Add the translational velocity, convert to 10 m and 10 min winds and
+    ramp the fields to ambient at the storm radius
+    (post_process_wind_estimate)"""
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.where(mod_mws > 0, np.abs(wind) / mod_mws, 0.0)
+    if convert_height:
+        wind = wind * atmos_boundary_layer
+    wind = wind * sampling_time
+
+    sign = np.where(north, 1.0, -1.0)
+    wind_u = -sign * wind * np.sin(theta) + scale * velocity[..., 0]
+    wind_v = sign * wind * np.cos(theta) + scale * velocity[..., 1]
+
+    ramp = 0.5 * (1.0 - np.tanh((r - radius) / RAMP_WIDTH))
+    pressure = ambient_pressure + (pressure - ambient_pressure) * ramp
+    return wind_u * ramp, wind_v * ramp, pressure
+
+
+def _holland_1980_fields(p, r, theta, y, north, c):
+    convert_height = True
+    velocity, mod_mws = _adjust_max_wind(p["velocity"], p["max_wind_speed"],
+                                         convert_height)
+    dp = _pressure_diff(p["central_pressure"], c["ambient_pressure"])
+    B = _holland_b(mod_mws, dp, c["rho_air"])
+    mwr, Pc, B, dp, mod_mws = [_expand(v) for v in [p["max_wind_radius"],
+                               p["central_pressure"], B, dp, mod_mws]]
+    f = np.abs(coriolis(y, c["coordinate_system"], c["theta_0"]))
+
+    pressure = _holland_pressure(Pc, r, dp, mwr, B)
+    with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+        ratio = (mwr / r)**B
+        wind = np.sqrt(ratio * np.exp(1.0 - ratio) * mod_mws**2
+                       + (r * f)**2 / 4.0) - r * f / 2.0
+    wind = np.where(ratio > 100, 0.0, wind)
+    return _post_process(wind, pressure, r, theta, north,
+                         _expand(p["storm_radius"]), _expand(velocity),
+                         mod_mws, convert_height, c["ambient_pressure"])
+
+
+def _holland_2008_fields(p, r, theta, y, north, c):
+    convert_height = False
+    dp = _pressure_diff(p["central_pressure"], c["ambient_pressure"])
+    B = _holland_b_2008(dp, p["central_pressure_change"], p["location"][:, 1],
+                        p["velocity"])
+    # Use estimated mws instead of recorded mws
+    mod_mws = np.sqrt(B / (c["rho_air"] * np.exp(1.0)) * dp)
+    mwr, Pc, B, dp, mod_mws = [_expand(v) for v in [p["max_wind_radius"],
+                               p["central_pressure"], B, dp, mod_mws]]
+    f = coriolis(y, c["coordinate_system"], c["theta_0"])
+
+    pressure = _holland_pressure(Pc, r, dp, mwr, B)
+    with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+        ratio = (mwr / r)**B
+        wind = np.sqrt(ratio * np.exp(1.0 - ratio) * mod_mws**2
+                       + (r * f)**2 / 4.0) - r * f / 2.0
+    wind = np.where(ratio > 100, 0.0, wind)
+    return _post_process(wind, pressure, r, theta, north,
+                         _expand(p["storm_radius"]), _expand(p["velocity"]),
+                         mod_mws, convert_height, c["ambient_pressure"])
+
+
+def _holland_2010_fields(p, r, theta, y, north, c):
+    convert_height = False
+    dp = _pressure_diff(p["central_pressure"], c["ambient_pressure"])
+    B = _holland_b_2008(dp, p["central_pressure_change"], p["location"][:, 1],
+                        p["velocity"])
+    # Use estimated mws instead of recorded mws
+    mod_mws = np.sqrt(B / (c["rho_air"] * np.exp(1.0)) * dp)
+
+    # Wind speed of 10 m/s assumed at a radius of 500 km
+    vn = 10.0
+    rn = 500e3
+    dg = (p["max_wind_radius"] / rn)**B
+    rg = dg * np.exp(1.0 - dg)
+    xn = np.log(vn / p["max_wind_speed"]) / np.log(rg)
+
+    mwr, Pc, B, dp, mod_mws, xn = [_expand(v) for v in
+                                   [p["max_wind_radius"],
+                                    p["central_pressure"], B, dp, mod_mws, xn]]
+    pressure = _holland_pressure(Pc, r, dp, mwr, B)
+    xx = np.where(r <= mwr, 0.5, 0.5 + (r - mwr) * (xn - 0.5) / (rn - mwr))
+    with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+        ratio = (mwr / r)**B
+        wind = mod_mws * (ratio * np.exp(1.0 - ratio))**xx
+    wind = np.where(ratio > 100, 0.0, wind)
+    return _post_process(wind, pressure, r, theta, north,
+                         _expand(p["storm_radius"]), _expand(p["velocity"]),
+                         mod_mws, convert_height, c["ambient_pressure"])
+
+
+def _slosh_fields(p, r, theta, y, north, c):
+    velocity, mod_mws = _adjust_max_wind(p["velocity"], p["max_wind_speed"],
+                                         True)
+    dp = _pressure_diff(p["central_pressure"], c["ambient_pressure"])
+    B = _holland_b(mod_mws, dp, c["rho_air"])
+    mwr, mws, Pc, B, dp = [_expand(v) for v in [p["max_wind_radius"],
+                           p["max_wind_speed"], p["central_pressure"], B, dp]]
+    velocity = _expand(velocity)
+
+    pressure = _holland_pressure(Pc, r, dp, mwr, B)
+    wind = (2.0 * mws * mwr * r) / (mwr**2 + r**2)
+
+    # SLOSH has its own addition of the translational velocity and no ramp
+    trans = mwr * r / (mwr**2 + r**2)
+    sign = np.where(north, 1.0, -1.0)
+    wind_u = -sign * wind * np.sin(theta) + trans * velocity[..., 0]
+    wind_v = sign * wind * np.cos(theta) + trans * velocity[..., 1]
+    return wind_u, wind_v, pressure
+
+
+def _rankine_fields(p, r, theta, y, north, c, alpha=None):
+    convert_height = True
+    velocity, mod_mws = _adjust_max_wind(p["velocity"], p["max_wind_speed"],
+                                         convert_height)
+    dp = _pressure_diff(p["central_pressure"], c["ambient_pressure"])
+    B = _holland_b(mod_mws, dp, c["rho_air"])
+    if alpha is None:
+        alpha = np.ones(B.shape)
+    mwr, mws, Pc, B, dp, mod_mws, alpha = [_expand(v) for v in
+                                           [p["max_wind_radius"],
+                                            p["max_wind_speed"],
+                                            p["central_pressure"], B, dp,
+                                            mod_mws, alpha]]
+
+    pressure = _holland_pressure(Pc, r, dp, mwr, B)
+    with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+        ratio = (mwr / r)**B
+        wind = np.where(r < mwr, mws * (r / mwr), mws * (mwr / r)**alpha)
+    wind = np.where(ratio > 100, 0.0, wind)
+    return _post_process(wind, pressure, r, theta, north,
+                         _expand(p["storm_radius"]), _expand(velocity),
+                         mod_mws, convert_height, c["ambient_pressure"])
+
+
+def _modified_rankine_fields(p, r, theta, y, north, c):
+    # Decay parameter from Mallen, Montgomery and Wang 2005
+    mws = p["max_wind_speed"]
+    alpha = np.where(mws < 30.0, 0.31, np.where(mws > 50.0, 0.48, 0.35))
+    return _rankine_fields(p, r, theta, y, north, c, alpha=alpha)
+
+
+def _demaria_fields(p, r, theta, y, north, c):
+    convert_height = True
+    velocity, mod_mws = _adjust_max_wind(p["velocity"], p["max_wind_speed"],
+                                         convert_height)
+    dp = _pressure_diff(p["central_pressure"], c["ambient_pressure"])
+    B = _holland_b(mod_mws, dp, c["rho_air"])
+    mwr, Pc, B, dp, mod_mws = [_expand(v) for v in [p["max_wind_radius"],
+                               p["central_pressure"], B, dp, mod_mws]]
+
+    pressure = _holland_pressure(Pc, r, dp, mwr, B)
+    wind = mod_mws * (r / mwr) * np.exp(1.0 - r / mwr)
+    return _post_process(wind, pressure, r, theta, north,
+                         _expand(p["storm_radius"]), _expand(velocity),
+                         mod_mws, convert_height, c["ambient_pressure"])
+
+
+# CLE 2015 model
+#
+# The outer solution M(r) of the angular momentum, integrated inwards from
+# the radius r_0 where the wind vanishes, only depends on r_0 through
+# M = f r_0**2 m(r / r_0, chi f r_0).  The function m is integrated once for
+# a table of values of chi f r_0, with the same scheme as integrate_m_out in
+# model_storm_module.f90, so that the searches for the merge radius r_a and
+# r_0 can be done for all times at once by interpolating in the table.
+CLE_resolution = 2000
+_cle_chi = 1.0
+_cle_table = None
+
+
+def _cle_outer_table():
+    r"""Table of the normalized outer solution m(s, q) for s = r / r_0 from 1
+    down to 0 and log-spaced q = chi f r_0"""
+    global _cle_table
+    if _cle_table is None:
+        s = 1.0 - np.arange(CLE_resolution + 1) / CLE_resolution
+        log_q = np.linspace(-2.0, 3.0, 321)
+        q = 10**log_q
+        ds = 1.0 / CLE_resolution
+        m = np.empty((len(s), len(q)))
+        m[0] = 0.5
+        m[1] = 0.5 * s[1]**2 + s[1] * (1.0 - s[1])
+        with np.errstate(over='ignore', invalid='ignore'):
+            for k in range(2, len(s)):
+                m[k] = m[k - 1] - q * ds * (m[k - 1] - 0.5 * s[k]**2)**2 \
+                                  / (1.0 - s[k]**2)
+        _cle_table = (log_q, m)
+    return _cle_table
+
+
+def _cle_m_out(f, r_0, r):
+    r"""Outer angular momentum at radius r for the profile vanishing at r_0"""
+    log_q, m = _cle_outer_table()
+    s = np.clip(r / r_0, 0.0, 1.0)
+    x = (1.0 - s) * CLE_resolution
+    k = np.minimum(np.floor(x).astype(int), CLE_resolution - 1)
+    wk = x - k
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_q_r = np.clip(np.log10(_cle_chi * f * r_0), log_q[0], log_q[-1])
+    y = (log_q_r - log_q[0]) / (log_q[1] - log_q[0])
+    j = np.minimum(np.floor(y).astype(int), len(log_q) - 2)
+    wj = y - j
+    value = (1 - wk) * ((1 - wj) * m[k, j] + wj * m[k, j + 1]) \
+            + wk * ((1 - wj) * m[k + 1, j] + wj * m[k + 1, j + 1])
+    return f * r_0**2 * value
+
+
+def _cle_v_a(f, r_m, v_m, r_a):
+    r"""Inner model wind speed at r_a (evaluate_v_a with alpha = 1)"""
+    ratio = (r_a / r_m)**2
+    v_a = (2.0 * ratio / (1.0 + ratio)) * (0.5 * f * r_m**2 + r_m * v_m)
+    return (v_a - 0.5 * f * r_a**2) / r_a
+
+
+def _cle_solve_r_0(f, r_a, v_a, r_guess, tol=0.1, max_iterations=200):
+    r"""Radius r_0 at which the outer solution matches the angular momentum
+    of the inner model at r_a (solve_r_0), for arrays of parameters"""
+    M_a = 0.5 * f * r_a**2 + r_a * v_a
+    r_0 = r_guess.copy()
+    r_step = r_guess.copy()
+    growing = np.ones(r_0.shape, dtype=bool)
+    active = np.ones(r_0.shape, dtype=bool)
+    for iteration in range(max_iterations):
+        if not active.any():
+            break
+        low = _cle_m_out(f, r_0, r_a) - M_a < 0
+        grow = active & low
+        shrink = active & ~low
+        r_step[shrink] /= 2.0
+        r_step[grow & ~growing] /= 2.0
+        growing[shrink] = False
+        r_0 = np.where(grow, r_0 + r_step, np.where(shrink, r_0 - r_step, r_0))
+        active &= r_step >= tol
+    return r_0
+
+
+def _cle_parameters(f, r_m, v_m, tol=0.1, max_iterations=200):
+    r"""Merge radius r_a and outer radius r_0 of the CLE profile
+    (solve_hurricane_wind_parameters), for arrays of parameters"""
+    r_a = 2.0 * r_m
+    r_0 = 5.0 * r_m
+    r_step = r_a.copy()
+    active = np.ones(r_a.shape, dtype=bool)
+    for iteration in range(max_iterations):
+        if not active.any():
+            break
+        v_a = _cle_v_a(f, r_m, v_m, r_a)
+        negative = active & (v_a < 0)
+        r_step[negative] /= 2.0
+        r_a[negative] -= r_step[negative]
+
+        n = active & ~negative
+        r_0[n] = _cle_solve_r_0(f[n], r_a[n], v_a[n], r_0[n], tol=tol)
+        M_a = 0.5 * f[n] * r_a[n]**2 + r_a[n] * v_a[n]
+        slope_difference = 2.0 * M_a / r_a[n] \
+                           / (1.0 + (r_a[n] / r_m[n])**2) \
+                           - _cle_chi * (r_a[n] * v_a[n])**2 \
+                             / (r_0[n]**2 - r_a[n]**2)
+        decrease = np.zeros(r_a.shape, dtype=bool)
+        decrease[n] = slope_difference < 0
+        r_step[decrease] /= 2.0
+        r_a = np.where(decrease, r_a - r_step, np.where(n, r_a + r_step, r_a))
+        active &= ~(n & (r_step < tol))
+    return r_a, r_0
+
+
+def _cle_profiles(f, r_m, v_m, pressure_deficit, Pc):
+    r"""Wind and pressure profiles of the CLE model on CLE_resolution points
+    from the center to r_0, for arrays of parameters"""
+    r_a, r_0 = _cle_parameters(f, r_m, v_m)
+    res = CLE_resolution
+    dr = r_0 / (res - 1)
+    R = np.arange(res) * dr[:, None]
+    f, r_m, v_m, r_a, r_0 = [v[:, None] for v in [f, r_m, v_m, r_a, r_0]]
+    out_res = np.ceil((res - 1) * (r_0 - r_a) / r_0)
+    inner = np.arange(res) < res - out_res
+    with np.errstate(divide='ignore', invalid='ignore'):
+        v = np.where(inner, _cle_v_a(f, r_m, v_m, R),
+                     (_cle_m_out(f, r_0, R) - 0.5 * f * R**2) / R)
+        v[:, 0] = 0.0
+        # Pressure from the gradient wind equation, normalized to Pc and the
+        # ambient pressure
+        dp = v**2 / R + f * v
+    dp[:, 0] = 0.0
+    p = np.cumsum(dp, axis=1)
+    p = pressure_deficit[:, None] * p / p[:, -1:] + Pc[:, None]
+    return dr, v, p
+
+
+def _cle_2015_fields(p, r, theta, y, north, c):
+    f = np.abs(coriolis(p["location"][:, 1], c["coordinate_system"],
+                        c["theta_0"]))
+    dr, v_vec, p_vec = _cle_profiles(f, p["max_wind_radius"],
+                                     p["max_wind_speed"],
+                                     c["ambient_pressure"]
+                                     - p["central_pressure"],
+                                     p["central_pressure"])
+
+    res = CLE_resolution
+    shape = r.shape
+    r = r.reshape(shape[0], -1)
+    x = r / dr[:, None]
+    index = np.minimum(np.floor(x).astype(int), res - 1)
+    factor = x - index
+    inside = index < res - 1
+    index = np.minimum(index, res - 2)
+    wind = (1 - factor) * np.take_along_axis(v_vec, index, axis=1) \
+           + factor * np.take_along_axis(v_vec, index + 1, axis=1)
+    pressure = (1 - factor) * np.take_along_axis(p_vec, index, axis=1) \
+               + factor * np.take_along_axis(p_vec, index + 1, axis=1)
+    wind = np.where(inside, wind, 0.0).reshape(shape)
+    pressure = np.where(inside, pressure, c["ambient_pressure"]).reshape(shape)
+
+    sign = np.where(north, 1.0, -1.0)
+    wind_u = -sign * atmos_boundary_layer * wind * np.sin(theta)
+    wind_v = sign * atmos_boundary_layer * wind * np.cos(theta)
+    return wind_u, wind_v, pressure
+
+
+def _expand(value):
+    r"""Add grid dimensions to an array of values per time"""
+    return np.asarray(value)[:, None, None]
+
+
+def construct_fields(storm, x, y, t, model="holland_1980",
+                     coordinate_system=2, rho_air=1.15,
+                     ambient_pressure=101.3e3, earth_radius=Rearth,
+                     theta_0=0.0, rotation_override=0, chunk_size=None):
+    r"""Evaluate the wind and pressure fields of a parametric storm model
+
+    The fields are the ones the GeoClaw Fortran code sets from the storm
+    file written by :meth:`Storm.write_geoclaw`, evaluated at the cell
+    centers of a grid for a set of times.  All points are evaluated at once
+    with NumPy, in chunks of times to limit the memory needed for
+    temporaries.
 
-    if model.lower() not in _supported_models.keys():
+    :Input:
+     - *storm* (Storm) Storm with complete data, e.g. as read from a GeoClaw
+       storm file.
+     - *x*, *y* (array(nx), array(ny)) Coordinates of the grid points.
+     - *t* (array(nt)) Times, either datetimes or seconds relative to the
+       storm's *time_offset*.
+     - *model* (string) One of the models in :func:`available_models`.
+     - *coordinate_system*, *rho_air*, *ambient_pressure*, *earth_radius*,
+       *theta_0* (optional) Values as in GeoClawData.
+     - *rotation_override* (int) As in SurgeData, 0 for rotation based on
+       the hemisphere, 1 for northern and 2 for southern hemisphere rotation.
+     - *chunk_size* (int) Number of times evaluated at once, by default
+       chosen so that a chunk has about 4 million points.
+
+    :Output:
+     - *wind_u*, *wind_v*, *pressure* (array(nt, ny, nx)) Wind velocity
+       components in m/s and pressure in Pa.
+    """
+
+    model = model.lower()
+    if model not in _supported_models.keys():
         raise ValueError("Model %s not available." % model)
+    field_func = getattr(sys.modules[__name__], "_%s_fields" % model)
+
+    x = np.atleast_1d(np.asarray(x, dtype=float))
+    y = np.atleast_1d(np.asarray(y, dtype=float))
+    params = storm_parameters(storm, t, coordinate_system=coordinate_system,
+                              earth_radius=earth_radius)
+    nt = len(params["max_wind_speed"])
+    if chunk_size is None:
+        chunk_size = max(1, 2**22 // max(1, len(x) * len(y)))
+
+    constants = {"coordinate_system": coordinate_system, "rho_air": rho_air,
+                 "ambient_pressure": ambient_pressure, "theta_0": theta_0}
+
+    Y, X = y[None, :, None], x[None, None, :]
+    if rotation_override == 1:
+        north = np.ones((1, 1, 1), dtype=bool)
+    elif rotation_override == 2:
+        north = np.zeros((1, 1, 1), dtype=bool)
+    else:
+        north = Y >= 0.0
+
+    wind_u = np.empty((nt, len(y), len(x)))
+    wind_v = np.empty((nt, len(y), len(x)))
+    pressure = np.empty((nt, len(y), len(x)))
+    for start in range(0, nt, chunk_size):
+        chunk = slice(start, min(start + chunk_size, nt))
+        p = {name: value[chunk] for (name, value) in params.items()}
+        sx = _expand(p["location"][:, 0])
+        sy = _expand(p["location"][:, 1])
+        if coordinate_system == 2:
+            r = _spherical_distance(X, Y, sx, sy, earth_radius)
+        else:
+            r = np.sqrt((X - sx)**2 + (Y - sy)**2)
+        theta = np.arctan2(Y - sy, X - sx)
+        (wind_u[chunk], wind_v[chunk], pressure[chunk]) = field_func(
+                                            p, r, theta, Y, north, constants)
 
-    return getattr(sys.modules[__name__], model.lower())(storm, x, t)
+    return wind_u, wind_v, pressure
 
 
 # Specific implementations
-def holland_1980(storm, r, t):
-    r""""""
-    raise NotImplementedError("Holland 1980 model has not been implemeted.")
-    return None, None
+def holland_1980(storm, x, y, t, **kwargs):
+    r"""Holland 1980 fields, see :func:`construct_fields`"""
+    return construct_fields(storm, x, y, t, model="holland_1980", **kwargs)
 
 
-def holland_2010(storm, r, t):
-    r""""""
-    raise NotImplementedError("Holland 2010 model has not been implemeted.")
-    return None, None
+def holland_2008(storm, x, y, t, **kwargs):
+    r"""Holland 2008 fields, see :func:`construct_fields`"""
+    return construct_fields(storm, x, y, t, model="holland_2008", **kwargs)
 
 
-def cle_2015(storm, r, t):
-    r""""""
-    raise NotImplementedError("CLE 2015 model has not been implemeted.")
-    return None, None
+def holland_2010(storm, x, y, t, **kwargs):
+    r"""Holland 2010 fields, see :func:`construct_fields`"""
+    return construct_fields(storm, x, y, t, model="holland_2010", **kwargs)
+
+
+def cle_2015(storm, x, y, t, **kwargs):
+    r"""Chavas, Lin and Emmanuel 2015 fields, see :func:`construct_fields`"""
+    return construct_fields(storm, x, y, t, model="cle_2015", **kwargs)
+
+
+def slosh(storm, x, y, t, **kwargs):
+    r"""SLOSH fields, see :func:`construct_fields`"""
+    return construct_fields(storm, x, y, t, model="slosh", **kwargs)
+
+
+def rankine(storm, x, y, t, **kwargs):
+    r"""Rankine vortex fields, see :func:`construct_fields`"""
+    return construct_fields(storm, x, y, t, model="rankine", **kwargs)
+
+
+def modified_rankine(storm, x, y, t, **kwargs):
+    r"""Modified Rankine vortex fields, see :func:`construct_fields`"""
+    return construct_fields(storm, x, y, t, model="modified_rankine",
+                            **kwargs)
+
+
+def demaria(storm, x, y, t, **kwargs):
+    r"""DeMaria fields, see :func:`construct_fields`"""
+    return construct_fields(storm, x, y, t, model="demaria", **kwargs)
+
+
+# =============================================================================
+# Gridded storm forcing - Wind and pressure fields on a uniform grid at a
+# sequence of times, read by data_storm_module.f90 when the storm
+# specification type is -1 ('data' in SurgeData).  The storm file is a short
+# ASCII header, e.g.
+#
+#     binary32                 # file_format
+#     361 241                  # mx my
+#     -100.0 15.0 0.1 0.1      # xlower ylower dx dy
+#     97                       # num_times
+#     storm_fields.bin         # data file
+#
+#     t eye_x eye_y            # one line per time
+#
+# and the fields are in a separate data file.  For binary files each time is
+# the record u(mx, my), v(mx, my), p(mx, my) in Fortran order, in single or
+# double precision.  For netCDF files the variables wind_u, wind_v and
+# pressure have dimensions (time, y, x).  A relative data file path is taken
+# relative to the directory of the header.
+
+_field_formats = {"binary32": np.float32, "binary64": np.float64,
+                  "netcdf": None}
+
+
+class StormFieldWriter(object):
+    r"""Write gridded wind and pressure fields one time at a time
+
+    The fields of each time are appended to the data file as they are given
+    so that only one time needs to be in memory, and the header listing the
+    times is written by :meth:`close`.  The fields may come from a
+    parametric model, see :func:`write_storm_fields`, or from the output of
+    an atmospheric model interpolated to a uniform grid.  Use as::
+
+        with StormFieldWriter("storm_fields.storm", x, y) as writer:
+            for (t, u, v, p) in fields:
+                writer.write(t, u, v, p)
+
+    :Input:
+     - *path* (path) Path to the header file, this is the *storm_file* given
+       to SurgeData.
+     - *x*, *y* (array(nx), array(ny)) Uniformly spaced coordinates of the
+       grid points.
+     - *file_format* (string) One of "binary32", "binary64" or "netcdf".
+     - *data_path* (path) Path to the data file, by default *path* with the
+       extension ".bin" or ".nc".
+    """
+
+    def __init__(self, path, x, y, file_format="binary32", data_path=None):
+
+        file_format = file_format.lower()
+        if file_format not in _field_formats.keys():
+            raise ValueError("File format %s not available." % file_format)
+        self.path = path
+        self.file_format = file_format
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        if self.x.size < 2 or self.y.size < 2:
+            raise ValueError("The grid needs at least two points in x and y.")
+        for coord in (self.x, self.y):
+            if not np.allclose(np.diff(coord), coord[1] - coord[0]):
+                raise ValueError("Grid coordinates must be uniformly spaced.")
+
+        if data_path is None:
+            extension = {"netcdf": ".nc"}.get(file_format, ".bin")
+            data_path = os.path.splitext(path)[0] + extension
+        self.data_path = data_path
+        self.t = []
+        self.eye_location = []
+
+        if file_format == "netcdf":
+            import netCDF4
+            self._data_file = netCDF4.Dataset(data_path, 'w')
+            self._data_file.createDimension('time', None)
+            self._data_file.createDimension('y', len(self.y))
+            self._data_file.createDimension('x', len(self.x))
+            for (name, values) in [('x', self.x), ('y', self.y)]:
+                var = self._data_file.createVariable(name, 'f8', (name,))
+                var[:] = values
+            self._data_file.createVariable('time', 'f8', ('time',))
+            self._data_file['time'].units = 'seconds'
+            for (name, units) in [('wind_u', 'm/s'), ('wind_v', 'm/s'),
+                                  ('pressure', 'Pa')]:
+                var = self._data_file.createVariable(name, 'f4',
+                                                     ('time', 'y', 'x'))
+                var.units = units
+        else:
+            self._data_file = open(data_path, 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, t, wind_u, wind_v, pressure, eye_location=None):
+        r"""Append the fields at time *t*
+
+        :Input:
+         - *t* (float) Time in seconds, as used by GeoClaw.
+         - *wind_u*, *wind_v*, *pressure* (array(ny, nx)) Wind velocity
+           components in m/s and pressure in Pa at the grid points.
+         - *eye_location* (array(2)) Location of the storm used for
+           refinement and the track output, by default the location of the
+           minimum pressure.
+        """
+
+        if self._data_file is None:
+            raise ValueError("Writer has already been closed.")
+        if len(self.t) > 0 and t <= self.t[-1]:
+            raise ValueError("Times must be increasing, %s <= %s."
+                             % (t, self.t[-1]))
+        shape = (len(self.y), len(self.x))
+        fields = [np.asarray(field, dtype=float) for field in
+                  (wind_u, wind_v, pressure)]
+        for field in fields:
+            if field.shape != shape:
+                raise ValueError("Fields have shape %s, expected %s."
+                                 % (field.shape, shape))
+        if eye_location is None:
+            j, i = np.unravel_index(np.argmin(fields[2]), shape)
+            eye_location = (self.x[i], self.y[j])
+
+        if self.file_format == "netcdf":
+            n = len(self.t)
+            self._data_file['time'][n] = t
+            for (name, field) in zip(['wind_u', 'wind_v', 'pressure'], fields):
+                self._data_file[name][n, :, :] = field
+        else:
+            np.stack(fields).astype(_field_formats[self.file_format]) \
+                            .tofile(self._data_file)
+        self.t.append(float(t))
+        self.eye_location.append(np.asarray(eye_location, dtype=float))
+
+    def close(self):
+        r"""Close the data file and write the header"""
+
+        if self._data_file is None:
+            return
+        self._data_file.close()
+        self._data_file = None
+
+        data_path = self.data_path
+        if (os.path.dirname(os.path.abspath(data_path))
+                == os.path.dirname(os.path.abspath(self.path))):
+            data_path = os.path.basename(data_path)
+        dx = (self.x[-1] - self.x[0]) / (len(self.x) - 1)
+        dy = (self.y[-1] - self.y[0]) / (len(self.y) - 1)
+        with open(self.path, 'w') as header:
+            header.write("%s  # file_format\n" % self.file_format)
+            header.write("%i %i  # mx my\n" % (len(self.x), len(self.y)))
+            header.write("%.16e %.16e %.16e %.16e  # xlower ylower dx dy\n"
+                         % (self.x[0], self.y[0], dx, dy))
+            header.write("%i  # num_times\n" % len(self.t))
+            header.write("%s  # data file\n" % data_path)
+            header.write("\n")
+            for (t, eye) in zip(self.t, self.eye_location):
+                header.write("%.16e %.16e %.16e\n" % (t, eye[0], eye[1]))
+
+
+class StormFields(object):
+    r"""Gridded wind and pressure fields written by :class:`StormFieldWriter`
+
+    Reads the header on creation, the fields are read from the data file when
+    requested.
+
+    :Attributes:
+     - *x*, *y* (array(nx), array(ny)) Coordinates of the grid points.
+     - *t* (array(nt)) Times in seconds.
+     - *eye_location* (array(nt, 2)) Location of the storm at each time.
+     - *file_format* (string) Format of the data file.
+     - *data_path* (path) Path to the data file.
+    """
+
+    def __init__(self, path):
+
+        with open(path, 'r') as header:
+            lines = [line.split('#')[0].split() for line in header]
+        self.file_format = lines[0][0].lower()
+        if self.file_format not in _field_formats.keys():
+            raise ValueError("File format %s not available." % self.file_format)
+        mx, my = (int(value) for value in lines[1][:2])
+        xlower, ylower, dx, dy = (float(value) for value in lines[2][:4])
+        num_times = int(lines[3][0])
+        self.data_path = lines[4][0]
+        if not os.path.isabs(self.data_path):
+            self.data_path = os.path.join(os.path.dirname(path),
+                                          self.data_path)
+        self.x = xlower + dx * np.arange(mx)
+        self.y = ylower + dy * np.arange(my)
+        track = np.array([line[:3] for line in lines[6:6 + num_times]],
+                         dtype=float).reshape(num_times, 3)
+        self.t = track[:, 0]
+        self.eye_location = track[:, 1:]
+
+    def read(self, index):
+        r"""Read the fields at the time *index*
+
+        :Output:
+         - *wind_u*, *wind_v*, *pressure* (array(ny, nx))
+        """
+
+        shape = (len(self.y), len(self.x))
+        if self.file_format == "netcdf":
+            import netCDF4
+            with netCDF4.Dataset(self.data_path, 'r') as data:
+                return tuple(np.asarray(data[name][index, :, :], dtype=float)
+                             for name in ['wind_u', 'wind_v', 'pressure'])
+        dtype = np.dtype(_field_formats[self.file_format])
+        count = 3 * shape[0] * shape[1]
+        fields = np.fromfile(self.data_path, dtype=dtype, count=count,
+                             offset=index * count * dtype.itemsize)
+        return tuple(fields.astype(float).reshape((3,) + shape))
+
+    def fields(self, t):
+        r"""Fields at time *t* interpolated linearly between the two
+        bracketing times, as done in data_storm_module.f90
+
+        Times outside of the range of the data use the first or last fields.
+        """
+
+        k = int(np.clip(np.searchsorted(self.t, t, side='right'), 1,
+                        len(self.t) - 1))
+        weight = np.clip((t - self.t[k - 1]) / (self.t[k] - self.t[k - 1]),
+                         0.0, 1.0)
+        return tuple(f0 + weight * (f1 - f0) for (f0, f1) in
+                     zip(self.read(k - 1), self.read(k)))
+
+
+def write_storm_fields(path, storm, x, y, t, model="holland_1980",
+                       file_format="binary32", data_path=None,
+                       chunk_size=None, **kwargs):
+    r"""Write the fields of a parametric model as gridded storm forcing
+
+    The fields are evaluated with :func:`construct_fields` a chunk of times
+    at a time and written with :class:`StormFieldWriter`, the eye location is
+    the interpolated track of *storm*.
+
+    :Input:
+     - *path* (path) Path to the header file.
+     - *storm* (Storm) Storm with complete data.
+     - *x*, *y*, *t*, *model* See :func:`construct_fields`.
+     - *file_format*, *data_path* See :class:`StormFieldWriter`.
+     - *chunk_size* (int) Number of times evaluated and written at once, by
+       default chosen so that a chunk has about 4 million points.
+     - *kwargs* Passed to :func:`construct_fields`.
+    """
+
+    x = np.atleast_1d(np.asarray(x, dtype=float))
+    y = np.atleast_1d(np.asarray(y, dtype=float))
+    t = np.atleast_1d(np.asarray(t))
+    seconds = _track_seconds(storm, t)[1]
+    location = storm_parameters(storm, t,
+                    coordinate_system=kwargs.get("coordinate_system", 2),
+                    earth_radius=kwargs.get("earth_radius", Rearth))["location"]
+    if chunk_size is None:
+        chunk_size = max(1, 2**22 // (len(x) * len(y)))
+
+    with StormFieldWriter(path, x, y, file_format=file_format,
+                          data_path=data_path) as writer:
+        for start in range(0, len(t), chunk_size):
+            chunk = slice(start, min(start + chunk_size, len(t)))
+            fields = construct_fields(storm, x, y, t[chunk], model=model,
+                                      **kwargs)
+            for (n, k) in enumerate(range(len(t))[chunk]):
+                writer.write(seconds[k], fields[0][n], fields[1][n],
+                             fields[2][n], eye_location=location[k])
 
 
 # =============================================================================
@@ -1471,50 +2606,123 @@ def fill_rad_w_other_source(t, storm_targ, storm_fill, var, interp_kwargs={}):
         ...     max_wind_radius_fill = fill_mwr)
     """
 
-    try:
-        import xarray as xr
-    except ImportError as e:
-        print("fill_rad_w_other_source currently requires xarray to work.")
-        raise e
+    value = fill_radii_w_other_source(storm_targ, storm_fill, var, t=[t],
+                                      interp_kwargs=interp_kwargs)
+    return value[0]
+
+
+def _fill_times(t):
+    r"""Times as floats in seconds, datetimes are taken since the epoch"""
+    t = np.atleast_1d(np.asarray(t))
+    if t.dtype.kind in 'OM':
+        return (t.astype('datetime64[us]') - np.datetime64(0, 'us')) \
+               / np.timedelta64(1, 's')
+    return t.astype(float)
+
+
+def _fill_source(storm, var):
+    r"""Sorted unique times and values of *var* in *storm* usable for
+    filling, values <= 0 (e.g. -1) are missing and for repeated times the
+    first valid value is used"""
+    t = _fill_times(storm.t)
+    values = np.asarray(getattr(storm, var), dtype=float)
+    valid = values > 0
+    t, values = t[valid], values[valid]
+    order = np.argsort(t, kind='stable')
+    t, first = np.unique(t[order], return_index=True)
+    return t, values[order][first]
+
+
+def _fill_interp(source_t, source_values, t, interp_kwargs):
+    r"""Linear interpolation of the source to *t*, NaN outside of the source
+    times unless *interp_kwargs* for scipy's interp1d say otherwise"""
+    if len(source_t) == 0:
+        return np.full(len(t), np.nan)
+    if len(interp_kwargs) == 0:
+        return np.interp(t, source_t, source_values, left=np.nan,
+                         right=np.nan)
+    from scipy.interpolate import interp1d
+    kwargs = {"bounds_error": False, "fill_value": np.nan}
+    kwargs.update(interp_kwargs)
+    if len(source_t) == 1:
+        return np.where(t == source_t[0], source_values[0], np.nan)
+    return interp1d(source_t, source_values, **kwargs)(t)
+
+
+def fill_radii_w_other_source(storm_targ, storm_fill,
+                              var=("max_wind_radius", "storm_radius"),
+                              t=None, interp_kwargs={}):
+    r"""Fill all missing radii of *storm_targ* with values from another
+    source at once
+
+    Batched version of :func:`fill_rad_w_other_source`.  The valid values of
+    *storm_fill* and *storm_targ* are collected once per variable and
+    interpolated to all the times with missing values together.  Times where
+    *storm_fill* can not be interpolated use the interpolated values of
+    *storm_targ*, and if that also fails -1.  Call this before
+    :meth:`Storm.write_geoclaw` rather than passing per time fill functions.
 
-    fill_da = xr.DataArray(getattr(storm_fill, var),
-                           coords={'t': getattr(storm_fill, 't')},
-                           dims=('t',))
+    :Input:
+    - *storm_targ* (:py:class:`clawpack.geoclaw.storm.Storm`) storm
+        that has missing values you want to fill
+    - *storm_fill* (:py:class:`clawpack.geoclaw.storm.Storm`) storm
+        that has non-missing values you want to use to fill *storm_targ*
+    - *var* (str or tuple) Variables to fill, 'max_wind_radius' and/or
+        'storm_radius'
+    - *t* (list) If given, the values at these times are returned and
+        *storm_targ* is not modified.
+    - *interp_kwargs* (dict) Additional keywords passed to scipy's
+        interpolator.
 
-    # convert -1 to nan
-    fill_da = fill_da.where(fill_da > 0, np.nan)
+    :Returns:
+    - (ndarray) Filled values of *var* at the missing times of
+        *storm_targ*, or at *t* if given, which are also set in
+        *storm_targ*.  If *var* is a tuple a dict with an array for each
+        variable is returned.
 
-    # if not all missing, try using storm_fill to fill
-    if fill_da.notnull().any():
+    :Examples:
 
-        # remove duplicates
-        fill_da = fill_da.groupby('t').first()
+    .. code-block:: python
 
-        # remove NaNs
-        fill_da = fill_da.dropna('t')
+        >>> storm_ibtracs = Storm(file_format='IBTrACS', path='path_to_ibtracs.nc',
+        ...     sid='2018300N26315')
 
-        # interpolate to point
-        fill_interp = fill_da.interp(t=[t], kwargs=interp_kwargs).item()
+        >>> storm_atcf = Storm(file_format='ATCF', path='path_to_atcf.dat')
 
-        # try replacing with storm_fill
-        # (assuming atcf has more data points than ibtracs)
-        if not np.isnan(fill_interp):
-            return fill_interp
+        >>> fill_radii_w_other_source(storm_ibtracs, storm_atcf)
 
-    # next, try just interpolating other ibtracs values
-    targ_da = xr.DataArray(getattr(storm_targ, var),
-                           coords={'t': getattr(storm_targ, 't')},
-                           dims=('t',))
-    targ_da = targ_da.where(targ_da > 0, np.nan)
-    if targ_da.notnull().any():
-        targ_da = targ_da.groupby('t').first()
-        targ_da = targ_da.dropna('t')
-        targ_interp = targ_da.interp(t=[t], kwargs=interp_kwargs).item()
-        if not np.isnan(targ_interp):
-            return targ_interp
+        >>> storm_ibtracs.write(file_format = 'geoclaw',
+        ...     path = 'out_path.storm')
+    """
 
-    # if nothing worked, return the missing value (-1)
-    return -1
+    if not isinstance(var, str):
+        return {name: fill_radii_w_other_source(storm_targ, storm_fill, name,
+                                                t=t,
+                                                interp_kwargs=interp_kwargs)
+                for name in var}
+
+    targ_values = np.asarray(getattr(storm_targ, var), dtype=float)
+    if t is None:
+        missing = np.flatnonzero(np.isnan(np.asarray(targ_values,
+                                                     dtype=float)))
+        times = _fill_times(storm_targ.t)[missing]
+    else:
+        times = _fill_times(t)
+
+    # First try storm_fill, then the other values of storm_targ
+    values = _fill_interp(*_fill_source(storm_fill, var), times,
+                          interp_kwargs)
+    still_missing = np.isnan(values)
+    if np.any(still_missing):
+        values[still_missing] = _fill_interp(*_fill_source(storm_targ, var),
+                                             times[still_missing],
+                                             interp_kwargs)
+    values[np.isnan(values)] = -1
+
+    if t is None:
+        targ_values[missing] = values
+        setattr(storm_targ, var, targ_values)
+    return values
 
 
 # =============================================================================
@@ -1539,40 +2747,123 @@ def available_models():
     return output
 
 
+def read_atcf_dataframe(path):
+    r"""Read an ATCF a-deck or b-deck file into a pandas DataFrame
+
+    All rows of the file are read at once with the C parser of pandas, and
+    the dates, forecast periods and locations are decoded with vectorized
+    operations.  Only the columns up to STORMNAME are read, missing values
+    are NaN.
+
+    :Input:
+     - *path* (string) Path to the file to be read.
+
+    :Output:
+     - (pandas.DataFrame) Columns named as in *ATCF_columns*, with
+       YYYYMMDDHH as datetime64, TAU as timedelta64, LAT and LON in signed
+       decimal degrees and the other numerical columns as floats.
+    """
+
+    with open(path, 'rb') as data_file:
+        data = data_file.read()
+
+    # Number of fields in the longest line, so that pandas accepts lines of
+    # different lengths
+    chars = np.frombuffer(data, dtype=np.uint8)
+    line_ends = np.flatnonzero(chars == ord("\n"))
+    if len(chars) > 0 and chars[-1] != ord("\n"):
+        line_ends = np.append(line_ends, len(chars) - 1)
+    if len(line_ends) == 0:
+        raise NoDataError(missing_necessary_data_warning_str)
+    commas = np.cumsum(chars == ord(","))[line_ends]
+    num_fields = int(np.diff(commas, prepend=0).max()) + 1
+
+    num_columns = min(num_fields, ATCF_columns.index("STORMNAME") + 1)
+    names = ATCF_columns[:num_columns] \
+            + ["EXTRA%s" % n for n in range(num_fields - num_columns)]
+    strings = ["BASIN", "TECH", "LAT", "LON", "TY",
+               "WINDCODE", "SUBREGION", "INITIALS", "STORMNAME"]
+    dtype = {name: (str if name in strings else float)
+             for name in names[:num_columns]}
+    dtype["YYYYMMDDHH"] = np.int64
+
+    df = pd.read_csv(io.BytesIO(data), header=None, names=names,
+                     usecols=range(num_columns), sep=",", engine="c",
+                     skipinitialspace=True, index_col=False, dtype=dtype,
+                     keep_default_na=False, na_values=[""])
+    for name in ATCF_columns[num_columns:ATCF_columns.index("STORMNAME") + 1]:
+        df[name] = None if name in strings else np.nan
+
+    for name in ["BASIN", "TECH", "TY", "STORMNAME"]:
+        df[name] = df[name].str.strip()
+    date = df["YYYYMMDDHH"].to_numpy()
+    df["YYYYMMDDHH"] = pd.to_datetime({"year": date // 1000000,
+                                       "month": date // 10000 % 100,
+                                       "day": date // 100 % 100,
+                                       "hour": date % 100})
+    df["TAU"] = pd.to_timedelta(df["TAU"], unit="h")
+    df["LAT"] = _atcf_coordinate(df["LAT"], "S")
+    df["LON"] = _atcf_coordinate(df["LON"], "W")
+
+    return df
+
+
+def _atcf_coordinate(values, negative):
+    r"""Decode ATCF latitudes or longitudes such as "172N" or "370W" in
+    tenths of degrees, using the bytes of the strings rather than converting
+    each string separately.  Values with no digits are returned as NaN.
+    """
+    values = values.fillna("").to_numpy().astype("S8")
+    chars = values.view(np.uint8).reshape((len(values), 8))
+    is_digit = (chars >= ord("0")) & (chars <= ord("9"))
+    number = np.zeros(len(values))
+    for n in range(chars.shape[1]):
+        number = np.where(is_digit[:, n],
+                          10 * number + (chars[:, n] - ord("0")), number)
+    # hemisphere is the last character that is not blank:
+    last = np.where(chars > ord(" "), np.arange(8), 0).max(axis=1)
+    sign = np.where(chars[np.arange(len(values)), last] == ord(negative),
+                    -0.1, 0.1)
+    return np.where(is_digit.any(axis=1), sign * number, np.nan)
+
+
+def read_atcf_storms(path, group_by=("BASIN", "CY")):
+    r"""Read an ATCF archive with many storms or forecast cycles
+
+    The file is read once with :func:`read_atcf_dataframe` and split into
+    one :class:`Storm` per distinct value of the *group_by* columns.
+
+    :Input:
+     - *path* (string) Path to the file to be read.
+     - *group_by* (tuple) ATCF columns that identify a storm, by default
+       basin and cyclone number.  Use ("YYYYMMDDHH", "TECH") to split an
+       a-deck into forecast cycles and techniques.
+
+    :Output:
+     - (dict) Storm objects with keys the tuple of *group_by* values, with
+       dates as strings YYYYMMDDHH.
+    """
+
+    df = read_atcf_dataframe(path)
+    storms = {}
+    for key, rows in df.groupby(list(group_by), sort=False, dropna=False):
+        key = tuple(value.strftime("%Y%m%d%H") if isinstance(value, pd.Timestamp)
+                    else value for value in key)
+        storms[key] = Storm()
+        storms[key]._set_atcf_data(rows)
+    return storms
+
+
 def make_multi_structure(path):
     r"""Create a dictionary of Storm objects for ATCF files with multiple storm tracks in them
+
+    The dictionary has keys the forecast cycle YYYYMMDDHH, with values
+    dictionaries of Storm objects with keys the technique TECH.
     """
-    with open(path, 'r') as f:
-        lines = f.readlines()
-        curTime = "test"
-        curTrack = "test"
-        os.mkdir("Clipped_ATCFs")
-        stormDict = {}
-        for line in lines:
-            lineArr = line.split(", ")
-            if curTime in lineArr[2]:
-                if curTrack in lineArr[4]:
-                    fileWrite.writelines(line)
-                else:
-                    fileWrite.close()
-                    stormDict[curTime].update({curTrack: Storm(path=os.path.join(os.path.expandvars(
-                        os.getcwd()), "Clipped_ATCFs", curTime, curTrack), file_format="ATCF")})
-                    curTrack = lineArr[4]
-                    fileWrite = open("Clipped_ATCFs/" +
-                                     curTime + "/" + curTrack, 'w')
-                    fileWrite.writelines(line)
-            else:
-                if curTime != "test":
-                    fileWrite.close()
-                    stormDict[curTime].update({curTrack: Storm(path=os.path.join(os.path.expandvars(
-                        os.getcwd()), "Clipped_ATCFs", curTime, curTrack), file_format="ATCF")})
-                curTime = lineArr[2]
-                curTrack = lineArr[4]
-                stormDict[curTime] = {}
-                os.mkdir("Clipped_ATCFs/" + curTime)
-                fileWrite = open("Clipped_ATCFs/" +
-                                 curTime + "/" + curTrack, 'w')
-                fileWrite.writelines(line)
+    stormDict = {}
+    storms = read_atcf_storms(path, group_by=("YYYYMMDDHH", "TECH"))
+    for (curTime, curTrack), storm in storms.items():
+        stormDict.setdefault(curTime, {})[curTrack] = storm
     return stormDict
 
 
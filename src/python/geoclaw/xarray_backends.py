@@ -1,10 +1,14 @@
 r"""
 xarray backends module: $CLAW/geoclaw/src/python/geoclaw/xarray_backends.py
 
-Xarray backends for GeoClaw fixed grids and fgmax grids.
-
-These only work for point_style = 2 (uniform regular) and have a dependency on
-xarray and rioxarray. Xarray provides the core datastructure and rioxarray
+Xarray backends for GeoClaw fixed grids, fgmax grids, AMR output frames and
+gauges.
+
+FGOutBackend and FGMaxBackend work for point_style = 2 (uniform regular), and
+FGMaxBackend also for point_style = 0, 1, or 4 as a set of points. AMRBackend
+gives the AMR output (fort.qXXXX, fort.bXXXX, fort.tXXXX) on a uniform grid,
+and GaugeBackend the output of all gauges (see gauge_tools.load_gauges).
+These have a dependency on xarray and rioxarray. Xarray provides the core datastructure and rioxarray
 provides an interface to rasterio, used to assign geospatial projection
 information.
 
@@ -19,6 +23,11 @@ Includes:
 
 - class FGMaxBackend: Xarray backend for fgmax grids.
 - class FGOutBackend: Xarray backend for fgout grids.
+- class FGOutBackendArray: Lazily indexed fgout variable used by FGOutBackend.
+- class FGMaxBackendArray: Lazily masked fgmax variable used by FGMaxBackend.
+- class AMRBackend: Xarray backend for AMR output frames on a uniform grid.
+- class AMRBackendArray: Lazily regridded AMR variable used by AMRBackend.
+- class GaugeBackend: Xarray backend for gauge output.
 
 Usage:
 
@@ -44,6 +53,16 @@ Usage:
     # ds is now an xarray object. It can be interacted with directly or written to netcdf using
     ds.write_netcdf('filename.nc')
 
+    # All frames of a fgout grid can be opened at once by omitting the
+    # extension. No frame data is read until it is used, so this is fast
+    # even for thousands of frames, and selecting e.g. one time or a small
+    # region only reads that part of the output.  With dask installed,
+    # chunks={'time': 1} gives one chunk per frame.
+
+    ds = xr.open_dataset('_output/fgout0001', engine=FGOutBackend,
+                         backend_kwargs={'qmap': 'geoclaw'})
+    eta = ds.eta.sel(time=3600., method='nearest')
+
     # A 'qmap' backend_kwargs is required as it indicates the qmap used for
     # selecting elements of q to include in fgout. See
     # https://www.clawpack.org/dev/fgout.html#specifying-q-out-vars
@@ -55,11 +74,37 @@ Usage:
     filename = "_output/fgmax0001.txt"
     ds = xr.open_dataset(filename, engine=FGMaxBackend, backend_kwargs={'epsg':epsg_code})
 
+    # An example of AMR output, sampled on a uniform grid from the finest
+    # level available at each point.  Provide fort.qXXXX (or fort.bXXXX or
+    # fort.tXXXX) for one frame, or the output directory for all frames.
+    # Only the patch headers are read when opening, and selecting a time
+    # and region only reads the patches that intersect that region.
+    ds = xr.open_dataset('_output', engine=AMRBackend,
+                         backend_kwargs={'extent': [-120, -60, -50, 0],
+                                         'level': 3})
+    eta = ds.eta.sel(time=3600., method='nearest')
+
+    # The grid has the resolution of AMR level `level` (default 1) unless
+    # dx (and dy) are given, and covers the domain unless extent is given.
+
+    # An example of gauge output, all gauges in the output directory (or
+    # those in backend_kwargs 'gaugenos') with dimensions (gauge, time).
+    # The gauges are cached in _output/gauges_cache.npz, so reopening is fast.
+    ds = xr.open_dataset('_output', engine=GaugeBackend,
+                         backend_kwargs={'nprocs': 4})
+
 
 Dimensions:
 
-Files opened with FGOutBackend will have dimensions (time, y, x).
-Files opened with FGMaxBackend will have dimensions (y, x).
+Files opened with FGOutBackend or AMRBackend will have dimensions (time, y, x).
+Files opened with GaugeBackend will have dimensions (gauge, time), or (gauge,)
+and (obs,) with ragged=True.
+Files opened with FGMaxBackend will have dimensions (y, x), or (point,) with
+coordinates x(point), y(point) for point_style 0, 1, or 4.
+
+Data is not copied or reoriented when opening files, and values are only
+masked when they are accessed.  For fgmax files, variables listed in
+drop_variables are not read from the file at all.
 
 Variable naming:
 
@@ -139,8 +184,9 @@ except ImportError:
         "rioxarray and xarray are required to use the FGOutBackend and FGMaxBackend"
     )
 
-from clawpack.geoclaw import fgmax_tools, fgout_tools
-from xarray.backends import BackendEntrypoint
+from clawpack.geoclaw import amr_tools, fgmax_tools, fgout_tools, gauge_tools
+from xarray.backends import BackendArray, BackendEntrypoint
+from xarray.core import indexing
 
 _qunits = {
     "h": "meters",
@@ -162,18 +208,78 @@ space_unit = "meters"
 nodata = np.nan
 
 
-def _prepare_var(data, mask, dims, units, nodata, long_name):
-    "Reorient array into the format xarray expects and generate the mapping."
-    if mask is not None:
-        data[mask] = nodata
-    data = data.T
-    data = np.flipud(data)
-    mapping = (
-        dims,
-        data,
-        {"units": units, "_FillValue": nodata, "long_name": long_name},
-    )
-    return mapping
+def _int_to_slice(key, n):
+    "Replace an integer index by a slice of length 1, to keep dimensions."
+    if isinstance(key, (int, np.integer)):
+        key = int(key) % n
+        return slice(key, key + 1), True
+    return key, False
+
+
+class FGOutBackendArray(BackendArray):
+    """
+    Lazily indexed array of one variable over a sequence of fgout frames,
+    with dimensions (time, y, x) and y decreasing.
+
+    Frame data is only read when the array is indexed, and only for the
+    frames selected.  For binary output, the file of each frame is memory
+    mapped so that only the part of the frame selected in x and y is read.
+    """
+
+    def __init__(self, fgout_grid, framenos, varname, dry_tolerance=None):
+        self.fgout_grid = fgout_grid
+        self.framenos = np.asarray(framenos)
+        self.varname = varname
+        self.k = fgout_grid.q_out_vars.index(fgout_grid.qmap[varname])
+
+        # mask where h < dry_tolerance, if h or eta-B is available:
+        q_out_vars = fgout_grid.q_out_vars
+        qmap = fgout_grid.qmap
+        h_available = (qmap.get("h") in q_out_vars) or (
+            (qmap.get("eta") in q_out_vars) and (qmap.get("B") in q_out_vars)
+        )
+        if (varname in ("B", "eta")) or (dry_tolerance is None) or not h_available:
+            dry_tolerance = None
+        self.dry_tolerance = dry_tolerance
+
+        self.shape = (len(self.framenos), fgout_grid.ny, fgout_grid.nx)
+        self.dtype = np.dtype(float)
+
+    def __getitem__(self, key):
+        return indexing.explicit_indexing_adapter(
+            key,
+            self.shape,
+            indexing.IndexingSupport.BASIC,
+            self._raw_indexing_method,
+        )
+
+    def _raw_indexing_method(self, key):
+        tkey, ykey, xkey = key
+        ykey, y_scalar = _int_to_slice(ykey, self.shape[1])
+        xkey, x_scalar = _int_to_slice(xkey, self.shape[2])
+
+        framenos = self.framenos[tkey]
+        data = np.stack(
+            [self._read(int(frameno), ykey, xkey) for frameno in np.atleast_1d(framenos)]
+        )
+        if np.ndim(framenos) == 0:
+            data = data[0]
+        squeeze = tuple(0 if scalar else slice(None) for scalar in (y_scalar, x_scalar))
+        return data[(Ellipsis,) + squeeze]
+
+    def _read(self, frameno, ykey, xkey):
+        "Read the part of one frame selected by ykey, xkey, as (ny, nx)."
+        # rows are stored from S to N, flip to give y decreasing:
+        q = self.fgout_grid.frame_data(frameno)[::-1][ykey, xkey]
+        if self.dry_tolerance is None:
+            return np.array(q[..., self.k], dtype=float)
+
+        q = np.array(q, dtype=float)
+        values = q[..., self.k]
+        fgout = fgout_tools.FGoutFrame(self.fgout_grid, frameno)
+        fgout.q = np.moveaxis(q, -1, 0)
+        values[fgout.h < self.dry_tolerance] = nodata
+        return values
 
 
 class FGOutBackend(BackendEntrypoint):
@@ -181,7 +287,7 @@ class FGOutBackend(BackendEntrypoint):
 
     def open_dataset(
         self,
-        filename,  # path to fgout file.
+        filename,  # path to fgout file, or fgoutXXXX for all frames.
         qmap="geoclaw",  # qmap value for FGoutGrid ('geoclaw', 'dclaw', or 'geoclaw-bouss')
         epsg=None,  # epsg code
         dry_tolerance=0.001,
@@ -191,6 +297,9 @@ class FGOutBackend(BackendEntrypoint):
         # used only if h or eta-B is available based on q_out_vars.
         # if dry_tolerance = None, no masking is applied to any variable.
         drop_variables=None,  # name of any elements of q to drop.
+        framenos=None,
+        # frame numbers to include when filename is of the form fgoutXXXX,
+        # default is all frames found in the output directory.
     ):
 
         if drop_variables is None:
@@ -198,53 +307,42 @@ class FGOutBackend(BackendEntrypoint):
 
         full_path = os.path.abspath(filename)
         filename = os.path.basename(full_path)
-        outdir = os.path.basename(os.path.dirname(full_path))
+        outdir = os.path.dirname(full_path)
 
         # filename has the format fgoutXXXX.qYYYY (ascii)
         # or fgoutXXXX.bYYYY (binary)
         # where XXXX is the fixed grid number and YYYY is the frame
-        # number.
-        type_code = filename.split(".")[-1][0]
+        # number, or the format fgoutXXXX to open all frames.
         fgno = int(filename.split(".")[0][-4:])
-        frameno = int(filename.split(".")[-1][-4:])
-        if type_code == "q":  # TODO, is this correct?
-            output_format = "ascii"
-        elif type_code == "b":
-            output_format = "binary32"  # format of fgout grid output
-        else:
-            raise ValueError("Invalid FGout output format. Must be ascii or binary.")
+        if "." in filename:
+            type_code = filename.split(".")[-1][0]
+            if type_code not in ("q", "b"):
+                raise ValueError("Invalid FGout output format. Must be ascii or binary.")
+            framenos = [int(filename.split(".")[-1][1:])]
 
-        fgout_grid = fgout_tools.FGoutGrid(
-            fgno=fgno, outdir=outdir, output_format=output_format, qmap=qmap
-        )
+        fgout_grid = fgout_tools.FGoutGrid(fgno=fgno, outdir=outdir, qmap=qmap)
 
         if fgout_grid.point_style != 2:
             raise ValueError("FGOutBackend only works with fg.point_style=2")
 
+        # sets output_format, q_out_vars and the grid:
         fgout_grid.read_fgout_grids_data()
-        fgout = fgout_grid.read_frame(frameno)
 
-        time = fgout.t
+        if framenos is None:
+            framenos = fgout_grid.output_framenos()
+        if len(framenos) == 0:
+            raise ValueError("No fgout frames found for fgno=%i in %s" % (fgno, outdir))
+
+        # only the small .t files are read here, frames are read lazily:
+        time = np.array([fgout_grid.frame_time(frameno) for frameno in framenos])
+
         # both come in ascending. flip to give expected order.
-        x = fgout.x
-        y = np.flipud(fgout.y)
-        nj = len(x)
-        ni = len(y)
-
-        # mask based on dry tolerance
-        if dry_tolerance is not None:
-            try:
-                mask = fgout.h < dry_tolerance
-                # internally fgout_tools will try fgou.eta-fgout.B if h is not present.
-            except AttributeError:
-                print("FGOutBackend: No h, eta, or B. No mask applied.")
-                mask = np.ones((nj, ni), dtype=bool)
+        x = fgout_grid.x
+        y = np.flipud(fgout_grid.y)
 
         # create data_vars dictionary
         data_vars = {}
-        for i, i_var in enumerate(fgout_grid.q_out_vars):
-
-            # construct variable
+        for i_var in fgout_grid.q_out_vars:
 
             # Find the varname in fgout.qmap associated with
             # q_out_vars[i]
@@ -253,30 +351,14 @@ class FGOutBackend(BackendEntrypoint):
                 if i_var == index:
                     varname = name
 
-            # construct xarray dataset if varname not in drop vars.
+            # construct xarray variable if varname not in drop vars.
             if varname not in drop_variables:
-
-                Q = fgout.q[i, :, :]
-
-                # mask all but eta based on h presence.
-                if (varname not in ("B", "eta")) and dry_tolerance is not None:
-                    Q[mask] = nodata
-
-                # to keep xarray happy, need to transpose and flip ud.
-                Q = Q.T
-                Q = np.flipud(Q)
-                Q = Q.reshape((1, ni, nj))  # reshape to add a time dimension.
-
-                data_array_attrs = {"units": _qunits[varname], "_FillValue": nodata}
-
-                data_vars[varname] = (
-                    [
-                        "time",
-                        "y",
-                        "x",
-                    ],
-                    Q,
-                    data_array_attrs,
+                data = FGOutBackendArray(fgout_grid, framenos, varname, dry_tolerance)
+                data_vars[varname] = xr.Variable(
+                    ["time", "y", "x"],
+                    indexing.LazilyIndexedArray(data),
+                    {"units": _qunits[varname], "_FillValue": nodata},
+                    encoding={"preferred_chunks": {"time": 1}},
                 )
 
         ds_attrs = {"description": "Clawpack model output"}
@@ -286,7 +368,7 @@ class FGOutBackend(BackendEntrypoint):
             coords=dict(
                 x=(["x"], x, {"units": space_unit}),
                 y=(["y"], y, {"units": space_unit}),
-                time=("time", [time], {"units": "seconds"}),
+                time=("time", time, {"units": "seconds"}),
                 reference_time=reference_time,
             ),
             attrs=ds_attrs,
@@ -312,6 +394,64 @@ class FGOutBackend(BackendEntrypoint):
     url = "https://www.clawpack.org/fgout.html"
 
 
+# fgmax variables in the dataset:
+# name: (FGmaxGrid attribute, qoi for read_output, units, long_name)
+_fgmax_vars = {
+    "arrival_time": ("arrival_time", "arrival_time", "seconds", "Wave arrival time"),
+    "h_max": ("h", "h", "meters", "Maximum water depth"),
+    "eta_max": (None, "h", "meters", "Maximum water surface elevation"),
+    "h_max_time": ("h_time", "h", "seconds", "Time of maximum water depth"),
+    "B": (
+        "B",
+        None,
+        "meters",
+        "Basal topography at the first time fgmax first monitored maximum amr level",
+    ),
+    "level": ("level", None, "(no units)", "Maximum amr level"),
+    "s_max": ("s", "s", "meters per second", "Maximum velocity"),
+    "s_max_time": ("s_time", "s", "seconds", "Time of maximum velocity"),
+    "hs_max": ("hs", "hs", "meters squared per second", "Maximum momentum"),
+    "hs_max_time": ("hs_time", "hs", "seconds", "Time of maximum momentum"),
+    "hss_max": ("hss", "hss", "meters cubed per second squared", "Maximum momentum flux"),
+    "hss_max_time": ("hss_time", "hss", "seconds", "Time of maximum momentum flux"),
+    "h_min": ("hmin", "hmin", "meters", "Minimum depth"),
+    "h_min_time": ("hmin_time", "hmin", "seconds", "Time of minimum depth"),
+}
+
+
+class FGMaxBackendArray(BackendArray):
+    """
+    Lazily masked view of fgmax output values.
+
+    The values are the sum of the arrays in the list data (only eta_max = h + B
+    uses more than one) and are set to nodata where h is not set, or where the
+    values are not set (e.g. arrival_time if the wave never arrived).  The
+    mask is only computed for the part of the array selected.
+    """
+
+    def __init__(self, data, h):
+        self.data = data
+        self.h = h
+        self.shape = h.shape
+        self.dtype = np.dtype(float)
+
+    def __getitem__(self, key):
+        return indexing.explicit_indexing_adapter(
+            key,
+            self.shape,
+            indexing.IndexingSupport.BASIC,
+            self._raw_indexing_method,
+        )
+
+    def _raw_indexing_method(self, key):
+        values = np.array(self.data[0][key], dtype=float)
+        mask = (self.h[key] < -1e50) | (values < -1e50)
+        for data in self.data[1:]:
+            values += data[key]
+        values[mask] = nodata
+        return values
+
+
 class FGMaxBackend(BackendEntrypoint):
     "Xarray Backend for Clawpack fgmax grid format."
 
@@ -334,207 +474,78 @@ class FGMaxBackend(BackendEntrypoint):
 
         fg = fgmax_tools.FGmaxGrid()
         fg.read_fgmax_grids_data(fgno=fgno, data_file=data_file)
-        if fg.point_style != 2:
-            raise ValueError("FGMaxBackend only works with fg.point_style=2")
-
-        fg.read_output(outdir=outdir)
-
-        # Construct the x and y coordinates
-        # Both come in ascending, therefore flip y so that it is ordered as expected.
-        x = fg.x
-        y = np.flipud(fg.y)
-
-        # Construct the data_vars array. To organize the
-        # data in the way expected by netcdf standards, need
-        # to both transpose and flipud the array.
-
-        data_vars = {}
-
-        data_vars["arrival_time"] = _prepare_var(
-            fg.arrival_time.data,
-            fg.arrival_time.mask,
-            [
-                "y",
-                "x",
-            ],
-            "seconds",
-            nodata,
-            "Wave arrival time",
-        )
+        if fg.point_style not in [0, 1, 2, 4]:
+            raise ValueError("FGMaxBackend only works with fg.point_style = 0, 1, 2, or 4")
 
-        data_vars["h_max"] = _prepare_var(
-            fg.h.data,
-            fg.h.mask,
-            [
-                "y",
-                "x",
-            ],
-            "meters",
-            nodata,
-            "Maximum water depth",
-        )
+        # only parse the columns needed for the variables not dropped:
+        varnames = [name for name in _fgmax_vars if name not in drop_variables]
+        qois = set(_fgmax_vars[name][1] for name in varnames) - set([None])
+        if clip:
+            qois.add("arrival_time")
 
-        data_vars["eta_max"] = _prepare_var(
-            fg.h.data + fg.B.data,
-            fg.h.mask,
-            [
-                "y",
-                "x",
-            ],
-            "meters",
-            nodata,
-            "Maximum water surface elevation",
+        # indexing='xy' gives arrays that are views of the columns read,
+        # with shape (ny, nx), and 1d arrays for point_style 0, 1 or 4.
+        # No cache, which would be written in outdir:
+        fg.read_output(
+            outdir=outdir, indexing="xy", qois=list(qois), cache=False, ps4_map=False
         )
 
-        data_vars["h_max_time"] = _prepare_var(
-            fg.h_time.data,
-            fg.h_time.mask,
-            [
-                "y",
-                "x",
-            ],
-            "seconds",
-            nodata,
-            "Time of maximum water depth",
-        )
+        if fg.point_style == 2:
+            # Both come in ascending, therefore flip y so that it is ordered
+            # as expected, using views rather than copies.
+            dims = ["y", "x"]
+            coords = dict(
+                x=(["x"], fg.x, {"units": "meters"}),
+                y=(["y"], fg.y[::-1], {"units": "meters"}),
+            )
 
-        data_vars["B"] = _prepare_var(
-            fg.B,
-            None,
-            [
-                "y",
-                "x",
-            ],
-            "meters",
-            nodata,
-            "Basal topography at the first time fgmax first monitored maximum amr level",
-        )
+            def view(a):
+                return np.ma.getdata(a)[::-1, :]
 
-        data_vars["level"] = _prepare_var(
-            fg.level,
-            None,
-            [
-                "y",
-                "x",
-            ],
-            "(no units)",
-            -1,
-            "Maximum amr level",
-        )
+        else:
+            dims = ["point"]
+            coords = dict(
+                x=(["point"], fg.X, {"units": "meters"}),
+                y=(["point"], fg.Y, {"units": "meters"}),
+            )
 
-        if hasattr(fg, "s"):
-            if hasattr(fg.s, "data"):
-                data_vars["s_max"] = _prepare_var(
-                    fg.s.data,
-                    fg.s.mask,
-                    [
-                        "y",
-                        "x",
-                    ],
-                    "meters per second",
-                    nodata,
-                    "Maximum velocity",
-                )
-                data_vars["s_max_time"] = _prepare_var(
-                    fg.s_time.data,
-                    fg.s_time.mask,
-                    [
-                        "y",
-                        "x",
-                    ],
-                    "seconds",
-                    nodata,
-                    "Time of maximum velocity",
-                )
-        if hasattr(fg, "hs"):
-            if hasattr(fg.hs, "data"):
-                data_vars["hs_max"] = _prepare_var(
-                    fg.hs.data,
-                    fg.hs.mask,
-                    [
-                        "y",
-                        "x",
-                    ],
-                    "meters squared per second",
-                    nodata,
-                    "Maximum momentum",
-                )
-                data_vars["hs_max_time"] = _prepare_var(
-                    fg.hs_time.data,
-                    fg.hs_time.mask,
-                    [
-                        "y",
-                        "x",
-                    ],
-                    "seconds",
-                    nodata,
-                    "Time of maximum momentum",
-                )
+            def view(a):
+                return np.ma.getdata(a)
 
-                data_vars["hss_max"] = _prepare_var(
-                    fg.hss.data,
-                    fg.hss.mask,
-                    [
-                        "y",
-                        "x",
-                    ],
-                    "meters cubed per second squared",
-                    nodata,
-                    "Maximum momentum flux",
-                )
-                data_vars["hss_max_time"] = _prepare_var(
-                    fg.hss_time.data,
-                    fg.hss_time.mask,
-                    [
-                        "y",
-                        "x",
-                    ],
-                    "seconds",
-                    nodata,
-                    "Time of maximum momentum flux",
-                )
+        h = view(fg.h)
 
-                data_vars["h_min"] = _prepare_var(
-                    fg.hmin.data,
-                    fg.hmin.mask,
-                    [
-                        "y",
-                        "x",
-                    ],
-                    "meters",
-                    nodata,
-                    "Minimum depth",
-                )
-                data_vars["h_min_time"] = _prepare_var(
-                    fg.hmin_time.data,
-                    fg.hmin_time.mask,
-                    [
-                        "y",
-                        "x",
-                    ],
-                    "seconds",
-                    nodata,
-                    "Time of minimum depth",
+        data_vars = {}
+        for name in varnames:
+            attr, qoi, units, long_name = _fgmax_vars[name]
+            if name == "level":
+                data_vars[name] = (
+                    dims,
+                    view(fg.level),
+                    {"units": units, "_FillValue": -1, "long_name": long_name},
                 )
-
-        # drop requested variables
-        for var in drop_variables:
-            if var in data_vars.keys():
-                del data_vars[var]
+                continue
+            if name == "eta_max":
+                data = [h, view(fg.B)]
+            elif getattr(fg, attr, None) is None:
+                continue  # not in fgmax output for this num_fgmax_val
+            else:
+                data = [view(getattr(fg, attr))]
+            data_vars[name] = xr.Variable(
+                dims,
+                indexing.LazilyIndexedArray(FGMaxBackendArray(data, h)),
+                {"units": units, "_FillValue": nodata, "long_name": long_name},
+            )
 
         # Construct the values from
         ds_attrs = {"description": "D-Claw model output"}
 
         ds = xr.Dataset(
             data_vars=data_vars,
-            coords=dict(
-                x=(["x"], x, {"units": "meters"}),
-                y=(["y"], y, {"units": "meters"}),
-            ),
+            coords=coords,
             attrs=ds_attrs,
         )
 
-        if epsg is not None:
+        if epsg is not None and fg.point_style == 2:
 
             ds.rio.write_crs(
                 epsg,
@@ -548,10 +559,8 @@ class FGMaxBackend(BackendEntrypoint):
             # https://gis.stackexchange.com/questions/470207/how-to-write-crs-info-to-netcdf-in-a-way-qgis-can-read-python-xarray
 
         # clip
-        if clip:
-            clip_data = fg.arrival_time.data >= 0
-            clip_data = clip_data.T
-            clip_data = np.flipud(clip_data)
+        if clip and fg.point_style == 2:
+            clip_data = view(fg.arrival_time) >= 0
             ds = _clip(ds, clip_data)
 
         return ds
@@ -581,3 +590,256 @@ def _clip(ds, clip_data):
 
     ds = ds.isel(y=np.arange(first_row, last_row), x=np.arange(first_col, last_col))
     return ds
+
+
+# names of the components of q in AMR output, including eta:
+_amr_qmaps = {
+    "geoclaw": ["h", "hu", "hv", "eta"],
+    "geoclaw-bouss": ["h", "hu", "hv", "huc", "hvc", "eta"],
+}
+
+
+class AMRBackendArray(BackendArray):
+    """
+    Lazily regridded array of one component of q (or the AMR level used)
+    over a sequence of AMR output frames, with dimensions (time, y, x).
+
+    The patch headers of a frame are only read when the frame is first
+    accessed, and only the patches intersecting the part of the grid
+    selected are read, see amr_tools.PatchIndex.sample.
+    """
+
+    def __init__(
+        self,
+        outdir,
+        patch_indices,
+        framenos,
+        x,
+        y,
+        component,
+        h_component=None,
+        dry_tolerance=None,
+    ):
+        self.outdir = outdir
+        self.patch_indices = patch_indices  # PatchIndex cache shared by variables
+        self.framenos = np.asarray(framenos)
+        self.x = x
+        self.y = y
+        self.component = component  # index in q, or "level"
+        if dry_tolerance is None or h_component is None:
+            h_component = None
+        self.h_component = h_component
+        self.dry_tolerance = dry_tolerance
+
+        self.shape = (len(self.framenos), len(y), len(x))
+        if component == "level":
+            self.dtype = np.dtype(int)
+        else:
+            self.dtype = np.dtype(float)
+
+    def __getitem__(self, key):
+        return indexing.explicit_indexing_adapter(
+            key,
+            self.shape,
+            indexing.IndexingSupport.BASIC,
+            self._raw_indexing_method,
+        )
+
+    def _raw_indexing_method(self, key):
+        tkey, ykey, xkey = key
+        ykey, y_scalar = _int_to_slice(ykey, self.shape[1])
+        xkey, x_scalar = _int_to_slice(xkey, self.shape[2])
+
+        framenos = self.framenos[tkey]
+        data = np.stack(
+            [self._read(frameno, ykey, xkey) for frameno in np.atleast_1d(framenos)]
+        )
+        if np.ndim(framenos) == 0:
+            data = data[0]
+        squeeze = tuple(0 if scalar else slice(None) for scalar in (y_scalar, x_scalar))
+        return data[(Ellipsis,) + squeeze]
+
+    def _read(self, frameno, ykey, xkey):
+        "Sample one frame at the points selected by ykey, xkey, as (ny, nx)."
+        if frameno not in self.patch_indices:
+            self.patch_indices[frameno] = amr_tools.PatchIndex(self.outdir, frameno)
+        pindex = self.patch_indices[frameno]
+        x = self.x[xkey]
+        y = self.y[ykey]
+
+        if self.component == "level":
+            q, level = pindex.sample(x, y, components=[], return_level=True)
+            return level
+
+        components = [self.component]
+        if self.h_component is not None:
+            components.append(self.h_component)
+        q = pindex.sample(x, y, components=components)
+        values = q[..., 0]
+        if self.h_component is not None:
+            values[q[..., 1] < self.dry_tolerance] = nodata
+        return values
+
+
+class AMRBackend(BackendEntrypoint):
+    "Xarray Backend for Clawpack AMR output frames, on a uniform grid."
+
+    def open_dataset(
+        self,
+        filename,  # path to fort.qXXXX, fort.bXXXX or fort.tXXXX, or outdir for all frames.
+        qmap="geoclaw",  # 'geoclaw', 'geoclaw-bouss', or a list of names of the components of q
+        extent=None,  # [x1, x2, y1, y2] of the grid, default the domain.
+        level=1,  # AMR level whose resolution is used for the grid.
+        dx=None,  # cell size of the grid, overrides level.
+        dy=None,  # default dy = dx.
+        dry_tolerance=0.001,
+        # dry tolerance used for masking all components of q except eta,
+        # if h is available. If dry_tolerance = None, no masking is applied.
+        drop_variables=None,  # names of any components of q (or 'level') to drop.
+        framenos=None,
+        # frame numbers to include when filename is a directory, default is
+        # all frames found in the directory.
+        epsg=None,  # epsg code
+    ):
+
+        if drop_variables is None:
+            drop_variables = []
+
+        full_path = os.path.abspath(filename)
+        if os.path.isdir(full_path):
+            outdir = full_path
+            if framenos is None:
+                framenos = amr_tools.output_framenos(outdir)
+        else:
+            # filename has the format fort.qXXXX, fort.bXXXX or fort.tXXXX
+            # where XXXX is the frame number.
+            outdir = os.path.dirname(full_path)
+            suffix = os.path.basename(full_path)[len("fort.") :]
+            if suffix[:1] not in ("q", "b", "t") or not suffix[1:].isdigit():
+                raise ValueError("Invalid AMR output file name %s" % filename)
+            framenos = [int(suffix[1:])]
+        if len(framenos) == 0:
+            raise ValueError("No AMR output frames found in %s" % outdir)
+
+        # the headers of the first frame give the domain and resolution,
+        # other frames are only indexed when they are accessed:
+        pindex = amr_tools.PatchIndex(outdir, framenos[0])
+        patch_indices = {framenos[0]: pindex}
+
+        if extent is None:
+            extent = pindex.extent(level=min(pindex.levels))
+        if dx is None:
+            dx, dy = pindex.resolution(level)
+        x, y = amr_tools.uniform_grid(extent, dx, dy)
+        # y decreasing, as for the other backends:
+        y = y[::-1]
+
+        # only the small fort.t files are read here:
+        time = np.array([amr_tools.read_frame_info(outdir, frameno)["t"]
+                         for frameno in framenos])
+
+        if isinstance(qmap, str):
+            qmap = _amr_qmaps[qmap]
+        if len(qmap) != pindex.meqn:
+            raise ValueError(
+                "qmap has %i components but the output has meqn = %i"
+                % (len(qmap), pindex.meqn)
+            )
+        h_component = qmap.index("h") if "h" in qmap else None
+
+        data_vars = {}
+        for component, varname in enumerate(qmap):
+            if varname in drop_variables:
+                continue
+            data = AMRBackendArray(
+                outdir,
+                patch_indices,
+                framenos,
+                x,
+                y,
+                component,
+                h_component=None if varname == "eta" else h_component,
+                dry_tolerance=dry_tolerance,
+            )
+            data_vars[varname] = xr.Variable(
+                ["time", "y", "x"],
+                indexing.LazilyIndexedArray(data),
+                {"units": _qunits.get(varname, "varies"), "_FillValue": nodata},
+                encoding={"preferred_chunks": {"time": 1}},
+            )
+
+        if "level" not in drop_variables:
+            data = AMRBackendArray(outdir, patch_indices, framenos, x, y, "level")
+            data_vars["level"] = xr.Variable(
+                ["time", "y", "x"],
+                indexing.LazilyIndexedArray(data),
+                {
+                    "units": "(no units)",
+                    "_FillValue": 0,
+                    "long_name": "AMR level used",
+                },
+                encoding={"preferred_chunks": {"time": 1}},
+            )
+
+        ds_attrs = {"description": "Clawpack model output"}
+
+        ds = xr.Dataset(
+            data_vars=data_vars,
+            coords=dict(
+                x=(["x"], x, {"units": space_unit}),
+                y=(["y"], y, {"units": space_unit}),
+                time=("time", time, {"units": "seconds"}),
+                reference_time=reference_time,
+            ),
+            attrs=ds_attrs,
+        )
+
+        if epsg is not None:
+            ds.rio.write_crs(
+                epsg,
+                inplace=True,
+            ).rio.set_spatial_dims(
+                x_dim="x",
+                y_dim="y",
+                inplace=True,
+            ).rio.write_coordinate_system(inplace=True)
+
+        return ds
+
+    open_dataset_parameters = ["filename", "drop_variables"]
+
+    description = "Use Clawpack AMR output frames in Xarray"
+    url = "https://www.clawpack.org/output_styles.html"
+
+
+class GaugeBackend(BackendEntrypoint):
+    "Xarray Backend for Clawpack gauge output."
+
+    def open_dataset(
+        self,
+        filename,  # output directory, or path to one gaugeXXXXX.txt file.
+        gaugenos="all",  # gauge numbers to include when filename is a directory.
+        ragged=False,  # if True, use a CF contiguous ragged array, see GaugeData.to_xarray
+        nprocs=1,  # number of processes used to read gauges.
+        cache=True,  # use and update the cache outdir/gauges_cache.npz
+        drop_variables=None,
+    ):
+
+        full_path = os.path.abspath(filename)
+        if os.path.isdir(full_path):
+            outdir = full_path
+        else:
+            # filename has the format gaugeXXXXX.txt
+            outdir = os.path.dirname(full_path)
+            gaugenos = [int(os.path.basename(full_path)[len("gauge") : -len(".txt")])]
+
+        gauges = gauge_tools.load_gauges(outdir, gaugenos, nprocs=nprocs, cache=cache)
+        ds = gauges.to_xarray(ragged=ragged)
+        if drop_variables:
+            ds = ds.drop_vars(drop_variables, errors="ignore")
+        return ds
+
+    open_dataset_parameters = ["filename", "drop_variables"]
+
+    description = "Use Clawpack gauge output in Xarray"
+    url = "https://www.clawpack.org/gauges.html"
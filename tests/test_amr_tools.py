@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Tests for amr_tools using AMR output files written as valout.f90 does"""
+
+import os
+import tempfile
+import shutil
+
+import numpy
+
+from clawpack.geoclaw import amr_tools
+
+
+def qfun(x, y):
+    """Values of the 4 output components at points (x,y)"""
+    h = numpy.maximum(1. + x - 0.5*y, 0.)
+    return numpy.array([h, h*x, -h*y, h + 0.1*x*y])
+
+
+# patches as (level, xlow, ylow, mx, my, dx, dy):
+patches = [(1, 0., 0., 10, 8, 1., 1.),
+           (2, 2., 1., 8, 6, 0.5, 0.5),
+           (2, 6.5, 4., 4, 4, 0.5, 0.5),
+           (3, 3., 2., 6, 3, 0.25, 0.25)]
+
+
+def write_frame(outdir, frameno, t, file_format, nghost=2):
+    """Write fort.q, fort.b (if binary) and fort.t files for patches, with
+    the values of each level offset by level so they can be distinguished"""
+
+    meqn = 4
+    fname = os.path.join(outdir, 'fort.q%s' % str(frameno).zfill(4))
+    qfile = open(fname, 'w')
+    bdata = []
+    for p, (level, xlow, ylow, mx, my, dx, dy) in enumerate(patches):
+        qfile.write('%6i                 grid_number\n' % (p+1))
+        qfile.write('%6i                 AMR_level\n' % level)
+        qfile.write('%6i                 mx\n' % mx)
+        qfile.write('%6i                 my\n' % my)
+        qfile.write('%26.16e    xlow\n' % xlow)
+        qfile.write('%26.16e    ylow\n' % ylow)
+        qfile.write('%26.16e    dx\n' % dx)
+        qfile.write('%26.16e    dy\n\n' % dy)
+        if file_format == 'ascii':
+            ng = 0
+        else:
+            ng = nghost
+        x = xlow + (numpy.arange(-ng, mx+ng) + 0.5) * dx
+        y = ylow + (numpy.arange(-ng, my+ng) + 0.5) * dy
+        X, Y = numpy.meshgrid(x, y)
+        q = qfun(X, Y) + level   # shape (meqn, my+2ng, mx+2ng)
+        if file_format == 'ascii':
+            for j in range(my):
+                for i in range(mx):
+                    qfile.write(''.join('%26.16e' % v for v in q[:,j,i]))
+                    qfile.write('\n')
+                qfile.write('  \n')
+        else:
+            bdata.append(numpy.moveaxis(q, 0, -1).ravel())
+    qfile.close()
+
+    if file_format != 'ascii':
+        dtype = numpy.float32 if file_format == 'binary32' else numpy.float64
+        fname = os.path.join(outdir, 'fort.b%s' % str(frameno).zfill(4))
+        numpy.hstack(bdata).astype(dtype).tofile(fname)
+
+    fname = os.path.join(outdir, 'fort.t%s' % str(frameno).zfill(4))
+    with open(fname, 'w') as tfile:
+        tfile.write('%18.8e    time\n' % t)
+        tfile.write('%6i                 meqn\n' % meqn)
+        tfile.write('%6i                 ngrids\n' % len(patches))
+        tfile.write('%6i                 naux\n' % 3)
+        tfile.write('%6i                 ndim\n' % 2)
+        tfile.write('%6i                 nghost\n' % nghost)
+        tfile.write('%10s             format\n\n' % file_format)
+
+
+def expected_sample(x, y):
+    """Values and level from the finest patch containing each point"""
+    X, Y = numpy.meshgrid(x, y)
+    level = numpy.zeros(X.shape, dtype=int)
+    for (lev, xlow, ylow, mx, my, dx, dy) in patches:
+        inside = (X >= xlow) & (X < xlow + mx*dx) \
+                 & (Y >= ylow) & (Y < ylow + my*dy)
+        level = numpy.where(inside & (lev > level), lev, level)
+    q = numpy.full((4,) + X.shape, numpy.nan)
+    for (lev, xlow, ylow, mx, my, dx, dy) in patches:
+        on_lev = (level == lev)
+        # value at the center of the cell containing each point:
+        xc = xlow + (numpy.floor((X - xlow) / dx) + 0.5) * dx
+        yc = ylow + (numpy.floor((Y - ylow) / dy) + 0.5) * dy
+        q[:, on_lev] = (qfun(xc, yc) + lev)[:, on_lev]
+    return numpy.moveaxis(q, 0, -1), level
+
+
+def test_patch_index():
+    r"""PatchIndex headers, patch data and sampling for all formats"""
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        for frameno, file_format in enumerate(['ascii', 'binary64',
+                                               'binary32'], start=1):
+            write_frame(temp_path, frameno, 10.*frameno, file_format)
+
+        assert amr_tools.output_framenos(temp_path) == [1, 2, 3]
+        x = numpy.linspace(-0.3, 10.2, 37)
+        y = numpy.linspace(7.9, 0.1, 23)   # decreasing
+        q_expected, level_expected = expected_sample(x, y)
+
+        for frameno in [1, 2, 3]:
+            pindex = amr_tools.PatchIndex(temp_path, frameno)
+            assert pindex.t == 10.*frameno
+            assert pindex.npatches == len(patches)
+            numpy.testing.assert_array_equal(pindex.level, [1, 2, 2, 3])
+            assert pindex.levels == [1, 2, 3]
+            assert pindex.extent(level=1) == [0., 10., 0., 8.]
+            assert pindex.resolution(2) == (0.5, 0.5)
+            numpy.testing.assert_array_equal(
+                pindex.patches([6., 7., 4.5, 5.]), [0, 2])
+
+            rtol = 1e-6 if frameno == 3 else 1e-12
+            q = pindex.read_patch(3)
+            assert q.shape == (3, 6, 4)
+            xc = 3. + 0.125 + 0.25*numpy.arange(6)
+            yc = 2. + 0.125 + 0.25*numpy.arange(3)
+            numpy.testing.assert_allclose(
+                q, numpy.moveaxis(qfun(*numpy.meshgrid(xc, yc)) + 3, 0, -1),
+                rtol=rtol)
+
+            q, level = pindex.sample(x, y, components=[3, 0],
+                                     return_level=True)
+            numpy.testing.assert_array_equal(level, level_expected)
+            numpy.testing.assert_allclose(q, q_expected[..., [3, 0]],
+                                          rtol=rtol)
+
+        x, y = amr_tools.uniform_grid([0., 10., 0., 8.], 0.5)
+        assert len(x) == 20 and len(y) == 16
+        numpy.testing.assert_allclose(x[:2], [0.25, 0.75])
+    finally:
+        shutil.rmtree(temp_path)
@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Tests for fgmax_tools that do not require running GeoClaw"""
+
+import os
+import tempfile
+import shutil
+
+import numpy
+
+from clawpack.geoclaw import fgmax_tools
+
+
+def make_fgmax_output(outdir, nx=6, ny=4, fgno=1):
+    """
+    Write a fgmax output file with 15 columns for a point_style 2 grid,
+    in the format used by fgmax_finalize.f90, and return the data array.
+    """
+    x = numpy.linspace(0., 1., nx)
+    y = numpy.linspace(2., 3., ny)
+    X, Y = numpy.meshgrid(x, y, indexing='ij')
+    npts = nx*ny
+    d = numpy.empty((npts, 15))
+    d[:,0] = X.ravel(order='F')
+    d[:,1] = Y.ravel(order='F')
+    d[:,2] = 2
+    d[:,3] = d[:,0] - 0.5                   # B
+    d[:,4:9] = numpy.random.rand(npts, 5)   # h, s, hs, hss, hmin
+    d[:,9:14] = numpy.random.rand(npts, 5)  # times
+    d[:,14] = numpy.random.rand(npts)       # arrival time
+    d[3,4:] = -0.99999e99                   # a point never set
+    d[5,14] = -0.99999e99                   # no arrival
+    fname = os.path.join(outdir, 'fgmax%s.txt' % str(fgno).zfill(4))
+    numpy.savetxt(fname, d, fmt='%20.11e%20.11e%4i' + 12*'%17.8e')
+    return d
+
+
+def make_fgmax_grid(nx=6, ny=4):
+    fg = fgmax_tools.FGmaxGrid()
+    fg.point_style = 2
+    fg.fgno = 1
+    fg.nx = nx
+    fg.ny = ny
+    return fg
+
+
+def test_read_output_cache():
+    r"""read_output gives the same results from text and from cache,
+    and reads only the qois requested"""
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        numpy.random.seed(1)
+        d = make_fgmax_output(temp_path)
+        fname = os.path.join(temp_path, 'fgmax0001.txt')
+
+        fg_text = make_fgmax_grid()
+        fg_text.read_output(outdir=temp_path, cache=False, verbose=False)
+        assert not os.path.isfile(fname + '.npz')
+        numpy.testing.assert_allclose(fg_text.h.data.ravel(order='F'),
+                                      d[:,4], rtol=1e-7)
+        assert fg_text.h.mask.sum() == 1
+        assert fg_text.arrival_time.mask.sum() == 2
+        numpy.testing.assert_allclose(fg_text.x, d[:6,0])
+
+        # the fields do not share their masks:
+        fg_text.h[0,0] = numpy.ma.masked
+        assert fg_text.h.mask.sum() == 2
+        for attr in ['B', 'h_time', 's', 'hss_time', 'hmin']:
+            assert getattr(fg_text, attr).mask.sum() == 1
+        assert fg_text.arrival_time.mask.sum() == 2
+        fg_text.read_output(outdir=temp_path, cache=False, verbose=False)
+
+        # no cache by default:
+        fg0 = make_fgmax_grid()
+        fg0.read_output(outdir=temp_path, qois=['h'], verbose=False)
+        assert not os.path.isfile(fname + '.npz')
+
+        # the cache only has the columns read, others are added when needed:
+        cols = fgmax_tools.read_fgmax_columns(fname, [0, 4], cache=True,
+                                              verbose=False)
+        with numpy.load(fname + '.npz') as npz:
+            assert sorted(npz.files) == ['col0', 'col4', 'key']
+        numpy.testing.assert_allclose(cols[4], d[:,4], rtol=1e-7)
+
+        fg1 = make_fgmax_grid()
+        fg1.read_output(outdir=temp_path, cache=True, verbose=False)
+        with numpy.load(fname + '.npz') as npz:
+            assert len(npz.files) == 16
+        fg2 = make_fgmax_grid()
+        fg2.read_output(outdir=temp_path, cache=True, verbose=False)
+        for attr in ['X', 'Y', 'level', 'B', 'h', 'h_time', 's', 'hss_time',
+                     'hmin', 'arrival_time']:
+            for fg in [fg1, fg2]:
+                numpy.testing.assert_array_equal(getattr(fg, attr),
+                                                 getattr(fg_text, attr))
+
+        fg3 = make_fgmax_grid()
+        fg3.read_output(outdir=temp_path, qois=['s'], indexing='xy',
+                        cache=True, verbose=False)
+        assert fg3.hss is None and fg3.arrival_time is None
+        assert fg3.s.shape == (4, 6)
+        numpy.testing.assert_array_equal(fg3.s, fg_text.s.T)
+
+        # modifying the text file invalidates the cache:
+        d[:,4] = 7.
+        numpy.savetxt(fname, d, fmt='%20.11e%20.11e%4i' + 12*'%17.8e')
+        os.utime(fname, ns=(0, 10**9))
+        cols = fgmax_tools.read_fgmax_columns(fname, [4], cache=True,
+                                              verbose=False)
+        numpy.testing.assert_allclose(cols[4], 7.)
+    finally:
+        shutil.rmtree(temp_path)
+
+
+def test_ps4_to_arrays():
+    r"""point_style 4 output is mapped onto the grid of xy_fname, either
+    as 2d masked arrays or as 1d arrays with an index map"""
+
+    from clawpack.geoclaw import topotools
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        # points to use on a 5 by 7 grid:
+        x = numpy.linspace(-1., 1., 5)
+        y = numpy.linspace(3., 4.5, 7)
+        topo = topotools.Topography()
+        topo.set_xyZ(x, y, numpy.zeros((7,5)))
+        Z = numpy.zeros((7,5))
+        Z[1:4,2:] = 1
+        Z[6,0] = 1
+        topo.Z = Z
+        xy_fname = os.path.join(temp_path, 'fgmax_pts.data')
+        topo.write(xy_fname, topo_type=3, Z_format='%1i')
+
+        j, i = numpy.nonzero(Z)
+        npts = len(i)
+        d = numpy.zeros((npts, 7))
+        d[:,0] = x[i]
+        d[:,1] = y[j]
+        d[:,2] = 1
+        d[:,3] = -2.
+        d[:,4] = numpy.arange(npts) + 1.    # h
+        d[:,5] = 10.
+        d[:,6] = 20.
+        d[2,4:] = -0.99999e99
+        numpy.savetxt(os.path.join(temp_path, 'fgmax0001.txt'), d,
+                      fmt='%20.11e%20.11e%4i' + 4*'%17.8e')
+
+        fg = fgmax_tools.FGmaxGrid()
+        fg.point_style = 4
+        fg.fgno = 1
+        fg.xy_fname = xy_fname
+        fg.read_output(outdir=temp_path, verbose=False, cache=False)
+        assert fg.h.shape == (7,5)
+        assert fg.X.shape == (7,5)
+        mask = ~Z.astype(bool)
+        mask[j[2],i[2]] = True   # point never set
+        numpy.testing.assert_array_equal(fg.h.mask, mask)
+        numpy.testing.assert_allclose(fg.h[j,i][[0,1,3]], [1.,2.,4.])
+        assert fg.level.dtype.kind == 'i'
+
+        fg1 = fgmax_tools.FGmaxGrid()
+        fg1.point_style = 4
+        fg1.fgno = 1
+        fg1.xy_fname = xy_fname
+        fg1.read_output(outdir=temp_path, verbose=False, cache=False,
+                        ps4_sparse=True)
+        assert fg1.h.shape == (npts,)
+        assert fg1.ps4_shape == (7,5)
+        numpy.testing.assert_array_equal(fg1.ps4_index[0], j)
+        numpy.testing.assert_array_equal(fg1.ps4_index[1], i)
+        numpy.testing.assert_array_equal(fg1.ps4_to_2d(fg1.h), fg.h)
+        numpy.testing.assert_array_equal(fg1.ps4_to_2d(fg1.h).mask, fg.h.mask)
+    finally:
+        shutil.rmtree(temp_path)
+
+
+def test_interp_dz():
+    r"""interp_dz agrees with interpolating the full final dtopo, for
+    each dtopo_type and for fgmax grids and lists of points"""
+
+    from scipy.interpolate import RegularGridInterpolator
+    from clawpack.geoclaw import dtopotools
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        dtopo = dtopotools.DTopography()
+        dtopo.x = numpy.linspace(-2., 2., 41)
+        dtopo.y = numpy.linspace(-1., 3., 33)
+        dtopo.X, dtopo.Y = numpy.meshgrid(dtopo.x, dtopo.y)
+        dtopo.times = [0., 1., 2.]
+        dtopo.dZ = numpy.array([t * numpy.sin(dtopo.X) * numpy.cos(dtopo.Y)
+                                for t in dtopo.times])
+        dZ_final = numpy.round(dtopo.dZ[-1], 6)
+        func = RegularGridInterpolator((dtopo.x, dtopo.y), dZ_final.T,
+                        method='linear', bounds_error=False, fill_value=0.)
+
+        x = numpy.linspace(-0.73, 2.5, 12)    # extends outside dtopo
+        y = numpy.linspace(0.21, 1.32, 7)
+        for dtopo_type in [1, 3, 2]:
+            path = os.path.join(temp_path, 'dtopo%i.tt%i' \
+                                % (dtopo_type, dtopo_type))
+            if dtopo_type == 2:
+                # DTopography.write does not support type 2, convert the
+                # type 3 file to one value per line:
+                with open(os.path.join(temp_path, 'dtopo3.tt3')) as f:
+                    lines = f.readlines()
+                with open(path, 'w') as f:
+                    f.writelines(lines[:9])
+                    f.write('\n'.join(' '.join(lines[9:]).split()) + '\n')
+            else:
+                dtopo.write(path, dtopo_type=dtopo_type, dZ_format='%.6f')
+
+            xw, yw, dZw = dtopotools.read_dtopo_final(path, dtopo_type,
+                                            extent=[x[0], 2., y[0], y[-1]])
+            assert xw[0] < x[0] and yw[0] < y[0] and yw[-1] > y[-1]
+            assert len(xw) < len(dtopo.x) and len(yw) < len(dtopo.y)
+
+            for indexing in ['ij', 'xy']:
+                fg = fgmax_tools.FGmaxGrid()
+                fg.X, fg.Y = numpy.meshgrid(x, y, indexing=indexing)
+                fg.interp_dz(path, dtopo_type)
+                dz_expected = func(numpy.vstack((fg.X.ravel(),
+                                                 fg.Y.ravel())).T)
+                numpy.testing.assert_allclose(fg.dz.ravel(), dz_expected,
+                                              atol=1e-12)
+
+            fg = fgmax_tools.FGmaxGrid()
+            fg.X = numpy.array([-0.5, 0.3, 1.9, 2.2])
+            fg.Y = numpy.array([0.2, 2.9, -0.4, 1.])
+            fg.interp_dz(path, dtopo_type)
+            numpy.testing.assert_allclose(fg.dz,
+                                  func(numpy.vstack((fg.X, fg.Y)).T),
+                                  atol=1e-12)
+    finally:
+        shutil.rmtree(temp_path)
+
+
+def test_binary_points():
+    r"""Binary fgmax point files for point_style 0 and 4 give the same
+    points and fgmax results as the text files"""
+
+    from clawpack.geoclaw import topotools
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        # point_style 0, written via write_to_fgmax_data:
+        numpy.random.seed(5)
+        X = numpy.random.uniform(-1., 1., 50)
+        Y = numpy.random.uniform(2., 3., 50)
+        fgs = {}
+        for xy_binary in [False, True]:
+            fg = fgmax_tools.FGmaxGrid()
+            fg.point_style = 0
+            fg.fgno = 1
+            fg.min_level_check = 1
+            fg.X = X
+            fg.Y = Y
+            fg.npts = len(X)
+            fg.xy_fname = os.path.join(temp_path, 'fgmax_pts%i.data' \
+                                       % xy_binary)
+            fg.write_xy_fname = True
+            fg.xy_binary = xy_binary
+            data_file = os.path.join(temp_path, 'fgmax_grids%i.data' \
+                                     % xy_binary)
+            with open(data_file, 'w') as fid:
+                fg.write_to_fgmax_data(fid)
+            fgs[xy_binary] = fgmax_tools.FGmaxGrid()
+            fgs[xy_binary].read_fgmax_grids_data(1, data_file)
+
+        assert fgmax_tools.fgmax_file_magic(fgs[True].xy_fname) \
+               == fgmax_tools.fgmax_points_magic
+        numpy.testing.assert_array_equal(fgs[True].X, X)
+        numpy.testing.assert_array_equal(fgs[True].Y, Y)
+        numpy.testing.assert_allclose(fgs[False].X, X, rtol=1e-13)
+        assert fgs[True].npts == fgs[False].npts == 50
+
+        # point_style 4, mask as topo_type 3 file and as binary:
+        x = numpy.linspace(-1., 1., 9)
+        y = numpy.linspace(3., 4., 6)
+        Z = (numpy.random.rand(6, 9) > 0.6).astype(int)
+        topo = topotools.Topography()
+        topo.set_xyZ(x, y, Z)
+        fname_txt = os.path.join(temp_path, 'fgmax_mask.data')
+        fname_bin = os.path.join(temp_path, 'fgmax_mask.bin')
+        topo.write(fname_txt, topo_type=3, Z_format='%1i')
+        fgmax_tools.write_fgmax_mask_binary(fname_bin, topo.x, topo.y, topo.Z)
+
+        Xt, Yt, Zt = fgmax_tools.read_fgmax_mask(fname_txt)
+        Xb, Yb, Zb = fgmax_tools.read_fgmax_mask(fname_bin)
+        numpy.testing.assert_allclose(Xb, Xt, atol=1e-12)
+        numpy.testing.assert_allclose(Yb, Yt, atol=1e-12)
+        numpy.testing.assert_array_equal(Zb, Zt)
+
+        # fgmax output with points ordered as in fgmax_read.f90,
+        # rows from N to S:
+        jj, ii = numpy.nonzero(numpy.flipud(Z))
+        jj = len(y) - 1 - jj
+        npts = len(ii)
+        d = numpy.zeros((npts, 7))
+        d[:,0] = x[ii]
+        d[:,1] = y[jj]
+        d[:,4] = numpy.random.rand(npts)
+        numpy.savetxt(os.path.join(temp_path, 'fgmax0001.txt'), d,
+                      fmt='%20.11e%20.11e%4i' + 4*'%17.8e')
+        results = []
+        for fname in [fname_txt, fname_bin]:
+            fg = fgmax_tools.FGmaxGrid()
+            fg.point_style = 4
+            fg.fgno = 1
+            fg.xy_fname = fname
+            fg.read_output(outdir=temp_path, verbose=False, cache=False)
+            results.append(fg)
+        numpy.testing.assert_array_equal(results[0].h, results[1].h)
+        numpy.testing.assert_array_equal(results[0].h.mask, Z == 0)
+    finally:
+        shutil.rmtree(temp_path)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Tests for fgout_tools that do not require running GeoClaw"""
+
+import numpy
+
+from clawpack.geoclaw import fgout_tools
+
+
+def make_fgout_grid(nx=20, ny=15):
+    """Create an FGoutGrid without reading fgout_grids.data"""
+    fgout_grid = fgout_tools.FGoutGrid(fgno=1, output_format='binary')
+    fgout_grid.nx = nx
+    fgout_grid.ny = ny
+    fgout_grid.x1 = -2.
+    fgout_grid.x2 = 3.
+    fgout_grid.y1 = 1.
+    fgout_grid.y2 = 4.
+    fgout_grid.q_out_vars = [1,2,3,4]
+    return fgout_grid
+
+
+def make_fgout_frame(fgout_grid, t=0.):
+    """Create an FGoutFrame with smooth data for h,hu,hv,eta"""
+    X = fgout_grid.X
+    Y = fgout_grid.Y
+    fgframe = fgout_tools.FGoutFrame(fgout_grid, frameno=0)
+    fgframe.t = t
+    h = numpy.maximum(X + 0.5*Y - 1. + 0.1*t, 0.)
+    fgframe.q = numpy.array([h, h*numpy.cos(Y + t), h*numpy.sin(X - t),
+                             h - 2.])
+    return fgframe
+
+
+def test_interp_plan():
+    r"""FGoutInterpPlan agrees with make_fgout_fcn_xy"""
+
+    fgout_grid = make_fgout_grid()
+    fgframe = make_fgout_frame(fgout_grid)
+
+    numpy.random.seed(12345)
+    x = numpy.random.uniform(-2.5, 3.5, 200)
+    y = numpy.random.uniform(0.5, 4.5, 200)
+
+    for method in ['nearest', 'linear']:
+        plan = fgout_tools.FGoutInterpPlan(fgout_grid, x, y, method=method)
+        for qoi in ['h', 'u', 'eta']:
+            fcn = fgout_tools.make_fgout_fcn_xy(fgframe, qoi, method=method)
+            q_expected = fcn(x, y)
+            q_plan = plan.interp(fgframe, qoi)
+            if method == 'nearest':
+                # ties may be broken differently, only compare off ties
+                xi = (x - fgout_grid.x[0]) / fgout_grid.delta[0]
+                yj = (y - fgout_grid.y[0]) / fgout_grid.delta[1]
+                ok = (abs(xi % 1 - 0.5) > 1e-8) & (abs(yj % 1 - 0.5) > 1e-8)
+            else:
+                ok = numpy.ones(x.shape, dtype=bool)
+            numpy.testing.assert_array_equal(numpy.isnan(q_plan),
+                                             numpy.isnan(q_expected))
+            numpy.testing.assert_allclose(q_plan[ok], q_expected[ok],
+                                          rtol=1e-12, atol=1e-12)
+
+    # full q array and multiple qois at once:
+    qall = plan.interp_array(fgframe.q)
+    assert qall.shape == (4, len(x))
+    h, eta = plan.interp(fgframe, ['h', 'eta'])
+    numpy.testing.assert_allclose(qall[0], h)
+    numpy.testing.assert_allclose(qall[3], eta)
+
+
+def test_interp_plan_update():
+    r"""Incremental update of FGoutInterpPlan matches a new plan"""
+
+    fgout_grid = make_fgout_grid()
+    fgframe = make_fgout_frame(fgout_grid)
+
+    numpy.random.seed(2)
+    x = numpy.random.uniform(-1.5, 2.5, 100)
+    y = numpy.random.uniform(1.5, 3.5, 100)
+    plan = fgout_tools.FGoutInterpPlan(fgout_grid, x, y)
+
+    moved = numpy.zeros(x.shape, dtype=bool)
+    moved[::3] = True
+    xnew = x.copy()
+    ynew = y.copy()
+    xnew[moved] += 0.2
+    ynew[moved] -= 0.15
+    plan.update(xnew, ynew, moved=moved)
+
+    plan_new = fgout_tools.FGoutInterpPlan(fgout_grid, xnew, ynew)
+    numpy.testing.assert_allclose(plan.interp(fgframe, 'hu'),
+                                  plan_new.interp(fgframe, 'hu'))
+
+
+def test_extract_points():
+    r"""Point extraction from binary fgout files and gauge file output"""
+
+    import os
+    import tempfile
+    import shutil
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        fgout_grid = make_fgout_grid()
+        fgout_grid.outdir = temp_path
+        frames = [make_fgout_frame(fgout_grid, t) for t in [0., 5., 10.]]
+        for frameno, fgframe in enumerate(frames, start=1):
+            # same layout as written by fgout_module.f90 for binary64:
+            fname = os.path.join(temp_path, 'fgout0001.b%s' \
+                                 % str(frameno).zfill(4))
+            fgframe.q.ravel(order='F').tofile(fname)
+            fname = os.path.join(temp_path, 'fgout0001.t%s' \
+                                 % str(frameno).zfill(4))
+            with open(fname, 'w') as tfile:
+                tfile.write('%18.8e    time\n' % fgframe.t)
+
+        x = numpy.array([-1.3, 0.2, 2.7])
+        y = numpy.array([3.1, 1.6, 2.2])
+        qois = ['h', 'hu', 'hv', 'eta', 's']
+        t, qoi_arrays = fgout_grid.extract_points(x, y, framenos=[1,2,3],
+                                       qois=qois, method='linear',
+                                       verbose=False)
+        numpy.testing.assert_allclose(t, [0., 5., 10.])
+        plan = fgout_tools.FGoutInterpPlan(fgout_grid, x, y, method='linear')
+        for qoi in qois:
+            assert qoi_arrays[qoi].shape == (3, 3)
+            for k, fgframe in enumerate(frames):
+                numpy.testing.assert_allclose(qoi_arrays[qoi][:,k],
+                                              plan.interp(fgframe, qoi))
+
+        fgout_tools.write_fgout_gauges(t, x, y, qoi_arrays, outdir=temp_path,
+                                       qois=['h','hu','hv','eta'],
+                                       verbose=False)
+        d = numpy.loadtxt(os.path.join(temp_path, 'gauge00002.txt'))
+        numpy.testing.assert_allclose(d[:,1], t)
+        numpy.testing.assert_allclose(d[:,5], qoi_arrays['eta'][1,:],
+                                      rtol=1e-6)
+    finally:
+        shutil.rmtree(temp_path)
+
+
+def test_max_reducer():
+    r"""FGoutMaxReducer agrees with max over stacked frames, and merging
+    reducers for disjoint frame ranges gives the same result"""
+
+    fgout_grid = make_fgout_grid()
+    frames = [make_fgout_frame(fgout_grid, t) for t in numpy.linspace(0,8,9)]
+    qois = ['h', 's', 'hss', 'eta', 'hmin']
+    extent = [-1., 2., 1.5, 3.5]
+
+    reducer = fgout_tools.FGoutMaxReducer(fgout_grid, qois=qois,
+                                          extent=extent)
+    for fgframe in frames:
+        reducer.update(fgframe)
+
+    reducer1 = fgout_tools.FGoutMaxReducer(fgout_grid, qois=qois,
+                                           extent=extent)
+    reducer2 = fgout_tools.FGoutMaxReducer(fgout_grid, qois=qois,
+                                           extent=extent)
+    for fgframe in frames[:4]:
+        reducer2.update(fgframe)
+    for fgframe in frames[4:]:
+        reducer1.update(fgframe)
+    reducer1.merge(reducer2)
+
+    ii = (fgout_grid.x >= extent[0]) & (fgout_grid.x <= extent[1])
+    jj = (fgout_grid.y >= extent[2]) & (fgout_grid.y <= extent[3])
+    t = numpy.array([fgframe.t for fgframe in frames])
+    for qoi in qois:
+        if qoi == 'hmin':
+            q = numpy.array([fgframe.h[ii,:][:,jj] for fgframe in frames])
+            k = q.argmin(axis=0)
+            qmax = q.min(axis=0)
+        else:
+            q = numpy.array([getattr(fgframe,qoi)[ii,:][:,jj]
+                             for fgframe in frames])
+            k = q.argmax(axis=0)
+            qmax = q.max(axis=0)
+        for r in [reducer, reducer1]:
+            numpy.testing.assert_allclose(r.qmax[qoi], qmax)
+            numpy.testing.assert_allclose(r.tmax[qoi], t[k])
+
+    numpy.testing.assert_allclose(reducer.arrival_time,
+                                  reducer1.arrival_time)
+
+    fg = reducer1.to_fgmax_grid()
+    assert fg.h.shape == (ii.sum(), jj.sum())
+    assert fg.X.shape == fg.h.shape
+    numpy.testing.assert_allclose(fg.x, fgout_grid.x[ii])
+    numpy.testing.assert_allclose(fg.hss_time, reducer.tmax['hss'])
+
+
+def test_compute():
+    r"""FGoutFrame.compute agrees with the individual properties"""
+
+    fgout_grid = make_fgout_grid()
+    qois = ['u', 'v', 's', 'hs', 'hss', 'eta']
+
+    fgframe = make_fgout_frame(fgout_grid, t=1.)
+    expected = make_fgout_frame(fgout_grid, t=1.)
+    u, v, s, hs, hss, eta = fgframe.compute(qois)
+    numpy.testing.assert_allclose(u, expected.u)
+    numpy.testing.assert_allclose(v, expected.v)
+    numpy.testing.assert_allclose(s, expected.s)
+    numpy.testing.assert_allclose(hs, expected.h * expected.s)
+    numpy.testing.assert_allclose(hss, expected.hss)
+    numpy.testing.assert_allclose(eta, expected.eta)
+    assert fgframe.s is s   # stored for later use
+
+    # float32 results written into preallocated arrays:
+    out = {qoi: numpy.empty(expected.h.shape, dtype=numpy.float32)
+           for qoi in ['s', 'hss']}
+    fgframe = make_fgout_frame(fgout_grid, t=1.)
+    s, hss, h = fgframe.compute(['s', 'hss', 'h'], dtype=numpy.float32,
+                                out=out)
+    assert s is out['s'] and hss is out['hss']
+    assert h.dtype == numpy.float32
+    numpy.testing.assert_allclose(s, expected.s, rtol=1e-6, atol=1e-6)
+    numpy.testing.assert_allclose(hss, expected.hss, rtol=1e-5, atol=1e-6)
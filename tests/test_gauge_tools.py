@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Tests for gauge_tools using gauge files written as gauges_module.f90 does"""
+
+import os
+import tempfile
+import shutil
+
+import numpy
+import pytest
+
+from clawpack.geoclaw import gauge_tools
+
+
+def write_gauge(outdir, gaugeno, x, y, t, file_format='ascii'):
+    """Write gaugeXXXXX.txt (and .bin) with h,hu,hv,eta at times t"""
+    level = numpy.where(t > t.mean(), 2, 1)
+    q = numpy.array([1. + numpy.sin(t + gaugeno), t * gaugeno, -t,
+                     numpy.cos(t) - gaugeno])
+    fname = os.path.join(outdir, 'gauge%s.txt' % str(gaugeno).zfill(5))
+    with open(fname, 'w') as gfile:
+        gfile.write('# gauge_id= %i location=( %17.10e %17.10e ) num_var=  4\n'
+                    % (gaugeno, x, y))
+        gfile.write('# Stationary gauge\n')
+        gfile.write('# level, time, q[  1  2  3], eta, aux[]\n')
+        if file_format == 'ascii':
+            gfile.write('# file format ascii, time series follow in this file\n')
+            for k in range(len(t)):
+                gfile.write('%5.2i' % level[k]
+                            + ''.join(' %18.10e' % v for v in
+                                      [t[k]] + list(q[:,k])) + '\n')
+        else:
+            gfile.write('# file format binary64, time series in .bin file\n')
+    if file_format != 'ascii':
+        fname = os.path.join(outdir, 'gauge%s.bin' % str(gaugeno).zfill(5))
+        data = numpy.vstack([level, t, q])   # Fortran array (nvals+1, ntimes)
+        data.T.astype(numpy.float64).tofile(fname)
+
+
+def test_load_gauges():
+    r"""load_gauges agrees with pyclaw's GaugeSolution, in serial, parallel
+    and from the cache, and converts to xarray"""
+
+    from clawpack.pyclaw.gauges import GaugeSolution
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        gaugenos = [1, 7, 32, 1001]
+        for k, gaugeno in enumerate(gaugenos):
+            t = numpy.linspace(0., 100., 11 + 5*k)
+            write_gauge(temp_path, gaugeno, -120. + k, 40. - k, t,
+                        file_format=['ascii', 'binary'][k % 2])
+
+        assert gauge_tools.gauge_numbers(temp_path) == gaugenos
+        for nprocs in [1, 2]:
+            gauges = gauge_tools.load_gauges(temp_path, nprocs=nprocs,
+                                             cache=False)
+            assert gauges.varnames == ['h', 'hu', 'hv', 'eta']
+            numpy.testing.assert_array_equal(gauges.gaugenos, gaugenos)
+            for gaugeno in gaugenos:
+                expected = GaugeSolution(gaugeno, path=temp_path)
+                gauge = gauges.gauge(gaugeno)
+                numpy.testing.assert_allclose(gauge.t, expected.t)
+                numpy.testing.assert_allclose(gauge.q, expected.q)
+                numpy.testing.assert_array_equal(gauge.level, expected.level)
+                numpy.testing.assert_allclose(gauge.location,
+                                              expected.location)
+        assert not os.path.isfile(os.path.join(temp_path,
+                                               gauge_tools.cache_name))
+
+        # cache a subset, then add gauges and change one:
+        gauges = gauge_tools.load_gauges(temp_path, gaugenos=[1, 7])
+        gauges = gauge_tools.load_gauges(temp_path)
+        write_gauge(temp_path, 7, 0., 0., numpy.linspace(0., 10., 3))
+        gauges = gauge_tools.load_gauges(temp_path, gaugenos=[32, 7])
+        numpy.testing.assert_array_equal(gauges.gaugenos, [32, 7])
+        numpy.testing.assert_allclose(gauges.gauge(7).t, [0., 5., 10.])
+        cached = gauge_tools.GaugeData.load(os.path.join(temp_path,
+                                            gauge_tools.cache_name))
+        numpy.testing.assert_array_equal(cached.gaugenos, gaugenos)
+        numpy.testing.assert_allclose(cached.gauge(7).t, [0., 5., 10.])
+        numpy.testing.assert_allclose(cached.gauge(1001).q,
+                          GaugeSolution(1001, path=temp_path).q)
+
+        xarray = pytest.importorskip('xarray')
+        gauges = gauge_tools.load_gauges(temp_path)
+        ds = gauges.to_xarray()
+        assert ds.sizes['gauge'] == 4
+        g = gauges.gauge(32)
+        eta = ds.eta.sel(gauge=32).sel(time=g.t).values
+        numpy.testing.assert_allclose(eta, g.q[3])
+        assert numpy.isnan(ds.h.sel(gauge=7).values).sum() \
+               == ds.sizes['time'] - 3
+        ds = gauges.to_xarray(ragged=True)
+        assert ds.sizes['obs'] == len(gauges.t)
+        numpy.testing.assert_array_equal(ds.row_size, gauges.row_size)
+    finally:
+        shutil.rmtree(temp_path)
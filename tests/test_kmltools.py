@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Tests for the png files made for kml overlays"""
+
+import os
+import tempfile
+import shutil
+
+import numpy
+import pytest
+
+from clawpack.geoclaw import kmltools
+
+
+def test_rgbacells_for_kml():
+    r"""rgbacells_for_kml gives the same png file as pcolorcells_for_kml"""
+
+    matplotlib = pytest.importorskip("matplotlib")
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import matplotlib.image as image
+    from matplotlib import colors
+
+    cmap = plt.get_cmap("terrain")
+    norm = colors.Normalize(vmin=-20., vmax=20.)
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        # cell centers, and edges with decreasing y
+        x = numpy.linspace(-120., -119., 37)
+        y = numpy.linspace(40., 40.7, 23)
+        X, Y = numpy.meshgrid(x, y)
+        Z = 30. * numpy.sin(7. * X) * numpy.cos(9. * Y)
+        Z = numpy.ma.masked_where(Z < -5., Z)
+        Z[3, 4] = numpy.nan
+        dy = y[1] - y[0]
+        yedge = numpy.linspace(y[-1] + 0.5*dy, y[0] - 0.5*dy, len(y) + 1)
+        grids = [(X, Y, Z), (x, yedge, Z[::-1, :])]
+
+        for (n, (X, Y, Z)) in enumerate(grids):
+            for dpc in [1, 3]:
+                fig_path = os.path.join(temp_path, "fig%s.png" % n)
+                fig, ax, fig_extent, fig_dpi = kmltools.pcolorcells_for_kml(
+                    X, Y, Z, png_filename=fig_path, dpc=dpc, cmap=cmap,
+                    norm=norm, verbose=False)
+                plt.close(fig)
+
+                png_path = os.path.join(temp_path, "rgba%s.png" % n)
+                rgba, png_extent, kml_dpi = kmltools.rgbacells_for_kml(
+                    X, Y, Z, png_filename=png_path, dpc=dpc, cmap=cmap,
+                    norm=norm, verbose=False)
+
+                assert kml_dpi == fig_dpi
+                numpy.testing.assert_allclose(png_extent, fig_extent)
+                png = image.imread(png_path)
+                numpy.testing.assert_array_equal(
+                    numpy.round(png * 255).astype(numpy.uint8),
+                    numpy.repeat(numpy.repeat(rgba, dpc, axis=0), dpc, axis=1))
+                # colors may differ by rounding
+                numpy.testing.assert_allclose(png, image.imread(fig_path),
+                                              atol=1.5/255)
+
+                # masked and NaN cells are transparent, rows are north first
+                north = Z[::-1, :] if n == 0 else Z
+                missing = numpy.ma.getmaskarray(north) | numpy.isnan(north.data)
+                assert missing.sum() > 1
+                numpy.testing.assert_array_equal(rgba[..., 3] == 0, missing)
+    finally:
+        shutil.rmtree(temp_path)
+
+
+def test_cells2superoverlay():
+    r"""Tiles of a super-overlay and their links"""
+
+    matplotlib = pytest.importorskip("matplotlib")
+    matplotlib.use("Agg")
+    import matplotlib.image as image
+    import zipfile
+    import xml.dom.minidom
+
+    x = numpy.linspace(0., 3., 300)
+    y = numpy.linspace(1., 3., 200)
+    X, Y = numpy.meshgrid(x, y)
+    Z = numpy.sin(3. * X) * numpy.cos(4. * Y)
+    # no data in the north east corner:
+    Z = numpy.ma.masked_where((X > 2.) & (Y > 2.), Z)
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        for nprocs in [1, 2]:
+            kml_dir = os.path.join(temp_path, "kml%s" % nprocs)
+            os.mkdir(kml_dir)
+            fname = kmltools.cells2superoverlay(X, Y, Z, name="test",
+                                                kml_dir=kml_dir,
+                                                tile_cells=64, dpc=2,
+                                                cmap="viridis", vmin=-1.,
+                                                vmax=1., nprocs=nprocs,
+                                                kmz=True, verbose=False)
+            assert fname == os.path.join(kml_dir, "test.kmz")
+            tile_dir = os.path.join(kml_dir, "test_files")
+
+            # 300 x 200 cells in tiles of 64 cells: 4 levels with 1, 2x1,
+            # 3x2 and 5x4 tiles, less the masked ones in the north east
+            tiles = sorted(os.path.splitext(f)[0]
+                           for f in os.listdir(tile_dir) if f.endswith('png'))
+            levels = [int(tile.split('_')[0]) for tile in tiles]
+            assert [levels.count(level) for level in range(4)] == [1, 2, 5, 18]
+            assert "3_4_3" not in tiles and "3_3_3" in tiles
+
+            for tile in tiles:
+                png = image.imread(os.path.join(tile_dir, tile + ".png"))
+                assert max(png.shape[:2]) <= 128
+                kml = xml.dom.minidom.parse(os.path.join(tile_dir,
+                                                         tile + ".kml"))
+                links = [node.firstChild.data for node in
+                         kml.getElementsByTagName("href")][1:]
+                for link in links:
+                    assert os.path.splitext(link)[0] in tiles
+                    level, i, j = [int(n) for n in tile.split('_')]
+                    child = [int(n) for n in link[:-4].split('_')]
+                    assert child[0] == level + 1
+                    assert child[1] // 2 == i and child[2] // 2 == j
+
+            # finest tiles have the colors of the cells, north first
+            png = image.imread(os.path.join(tile_dir, "3_1_2.png"))
+            rgba, extent, dpi = kmltools.rgbacells_for_kml(
+                x[64:128], y[128:192], Z[128:192, 64:128], dpc=2,
+                cmap="viridis", vmin=-1., vmax=1., verbose=False)
+            numpy.testing.assert_array_equal(
+                numpy.round(png * 255).astype(numpy.uint8),
+                numpy.repeat(numpy.repeat(rgba, 2, axis=0), 2, axis=1))
+
+            with zipfile.ZipFile(fname) as kmz:
+                names = kmz.namelist()
+            assert names[0] == "test.kml"
+            assert len(names) == 1 + 2 * len(tiles)
+
+        # a norm without limits is scaled to Z, but the caller's is unchanged
+        from matplotlib import colors
+        norm = colors.Normalize()
+        kml_dir = os.path.join(temp_path, "norm")
+        os.mkdir(kml_dir)
+        kmltools.cells2superoverlay(X, Y, Z, name="test", kml_dir=kml_dir,
+                                    tile_cells=64, norm=norm, verbose=False)
+        assert norm.vmin is None and norm.vmax is None
+        png = image.imread(os.path.join(kml_dir, "test_files", "3_1_2.png"))
+        rgba, extent, dpi = kmltools.rgbacells_for_kml(
+            x[64:128], y[128:192], Z[128:192, 64:128], dpc=2, cmap=None,
+            vmin=Z.min(), vmax=Z.max(), verbose=False)
+        numpy.testing.assert_array_equal(
+            numpy.round(png * 255).astype(numpy.uint8),
+            numpy.repeat(numpy.repeat(rgba, 2, axis=0), 2, axis=1))
+    finally:
+        shutil.rmtree(temp_path)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Tests for particle tracking through fgout frames"""
+
+import tempfile
+import shutil
+
+import numpy
+
+from clawpack.geoclaw import fgout_tools, particle_tracking
+
+
+def make_frames(u0=0.1, v0=-0.05, nframes=6):
+    """Frames with uniform depth 2 and uniform velocity (u0,v0), except
+    dry for x > 2.5"""
+    fgout_grid = fgout_tools.FGoutGrid(fgno=1, output_format='binary')
+    fgout_grid.nx = 40
+    fgout_grid.ny = 30
+    fgout_grid.x1 = 0.
+    fgout_grid.x2 = 4.
+    fgout_grid.y1 = 0.
+    fgout_grid.y2 = 3.
+    fgout_grid.q_out_vars = [1,2,3,4]
+    X = fgout_grid.X
+
+    frames = []
+    for k in range(nframes):
+        fgframe = fgout_tools.FGoutFrame(fgout_grid, frameno=k)
+        fgframe.t = 2.*k
+        h = numpy.where(X < 2.5, 2., 0.)
+        fgframe.q = numpy.array([h, u0*h, v0*h, h-1.])
+        frames.append(fgframe)
+    return fgout_grid, frames
+
+
+def test_uniform_flow():
+    r"""Particles in uniform flow move exactly, stop when dry or leaving"""
+
+    u0 = 0.1
+    v0 = -0.05
+    fgout_grid, frames = make_frames(u0, v0)
+
+    x0 = numpy.array([0.5, 1.0, 2.42, 1.0, 3.0])
+    y0 = numpy.array([1.5, 2.0, 1.0, 0.1, 1.0])
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        for method in ['RK2', 'RK4']:
+            tracker = particle_tracking.ParticleTracker(fgout_grid, x0, y0,
+                                        method=method, nsubsteps=2)
+            traj = tracker.run(frames=frames, path=temp_path, verbose=False)
+            traj = particle_tracking.ParticleTrajectories.load(temp_path)
+
+            assert traj.x.shape == (len(frames), len(x0))
+            t = traj.t - traj.t[0]
+            # first two particles stay in the wet region:
+            numpy.testing.assert_allclose(traj.x[:,:2], x0[:2] + u0*t[:,None])
+            numpy.testing.assert_allclose(traj.y[:,:2], y0[:2] + v0*t[:,None])
+            assert (traj.status[:,:2] == particle_tracking.ACTIVE).all()
+
+            # third particle slows down approaching the shoreline:
+            assert 2.42 < traj.x[-1,2] < 2.55
+
+            # fifth particle starts on dry land and does not move:
+            assert (traj.status[:,4] == particle_tracking.DRY).all()
+            numpy.testing.assert_allclose(traj.x[:,4], x0[4])
+
+            # fourth particle leaves the grid through the bottom:
+            assert traj.status[-1,3] == particle_tracking.OUT
+            assert traj.y[-1,3] >= fgout_grid.y[0] - 1e-8
+    finally:
+        shutil.rmtree(temp_path)
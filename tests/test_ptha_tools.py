@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Tests for probabilistic hazard aggregation of fgmax results"""
+
+import os
+import tempfile
+import shutil
+
+import numpy
+from numpy import ma
+
+from clawpack.geoclaw import fgmax_tools, ptha_tools
+
+
+def make_fgmax_grid(h, s):
+    """FGmaxGrid with output arrays set directly"""
+    fg = fgmax_tools.FGmaxGrid()
+    fg.point_style = 2
+    fg.nx, fg.ny = h.shape
+    x = numpy.linspace(0., 1., fg.nx)
+    y = numpy.linspace(0., 1., fg.ny)
+    fg.X, fg.Y = numpy.meshgrid(x, y, indexing='ij')
+    mask = (h == 0)
+    fg.h = ma.masked_array(h, mask=mask)
+    fg.s = ma.masked_array(s, mask=mask)
+    return fg
+
+
+def test_hazard_accumulator():
+    r"""Exceedance probabilities and percentiles agree with direct
+    computation over all runs, also after merging"""
+
+    numpy.random.seed(3)
+    nruns = 40
+    H = numpy.random.exponential(1., (nruns, 5, 3))
+    H[H < 0.3] = 0.   # dry points
+    S = numpy.where(H > 0, numpy.random.rand(nruns, 5, 3), 0.)
+    weights = numpy.random.rand(nruns)
+    levels = numpy.linspace(0.1, 4., 40)
+
+    hazard = ptha_tools.HazardAccumulator(['h','s'], levels)
+    hazard1 = ptha_tools.HazardAccumulator(['h','s'], levels)
+    hazard2 = ptha_tools.HazardAccumulator(['h','s'], levels)
+    for r in range(nruns):
+        fg = make_fgmax_grid(H[r], S[r])
+        hazard.update(fg, weights[r])
+        if r < 15:
+            hazard1.update(fg, weights[r])
+        else:
+            hazard2.update(fg, weights[r])
+    hazard1.merge(hazard2)
+
+    W = weights.sum()
+    for qoi, Q in [('h', H), ('s', S)]:
+        P = numpy.array([(weights[:,None,None] * (Q > level)).sum(axis=0)
+                         for level in levels]) / W
+        for hz in [hazard, hazard1]:
+            lev, Pacc = hz.hazard_curves(qoi)
+            assert Pacc.shape == (len(levels), 5, 3)
+            numpy.testing.assert_allclose(Pacc, P, atol=1e-12)
+            numpy.testing.assert_allclose(hz.mean(qoi),
+                (weights[:,None,None] * Q).sum(axis=0) / W)
+            numpy.testing.assert_allclose(hz.max(qoi), Q.max(axis=0))
+
+    # hazard map value lies between the levels where the hazard curve
+    # crosses the given probability:
+    prob = 0.2
+    hmap = hazard.hazard_map('h', prob)
+    P = hazard.exceedance('h')
+    for i in range(5):
+        for j in range(3):
+            k = numpy.searchsorted(levels, hmap[i,j])
+            assert P[k,i,j] <= prob + 1e-12
+            assert k == 0 or P[k-1,i,j] >= prob - 1e-12
+    numpy.testing.assert_allclose(hazard.percentile('h', 100.),
+                                  H.max(axis=0),
+                                  atol=levels[1] - levels[0])
+
+
+def test_aggregate_fgmax_runs():
+    r"""Aggregation of fgmax output files, serially and in parallel"""
+
+    numpy.random.seed(4)
+    nx, ny = 4, 3
+    temp_path = tempfile.mkdtemp()
+    try:
+        outdirs = []
+        for r in range(6):
+            outdir = os.path.join(temp_path, 'run%i' % r)
+            os.mkdir(outdir)
+            x = numpy.linspace(0., 1., nx)
+            y = numpy.linspace(0., 1., ny)
+            X, Y = numpy.meshgrid(x, y, indexing='ij')
+            d = numpy.zeros((nx*ny, 9))
+            d[:,0] = X.ravel(order='F')
+            d[:,1] = Y.ravel(order='F')
+            d[:,2] = 1
+            d[:,4] = numpy.random.exponential(1., nx*ny)
+            d[:,5] = numpy.random.rand(nx*ny)
+            numpy.savetxt(os.path.join(outdir, 'fgmax0001.txt'), d,
+                          fmt='%20.11e%20.11e%4i' + 6*'%17.8e')
+            outdirs.append(outdir)
+
+        fg = fgmax_tools.FGmaxGrid()
+        fg.point_style = 2
+        fg.fgno = 1
+        fg.nx = nx
+        fg.ny = ny
+        weights = numpy.linspace(1., 2., 6)
+        hazard = ptha_tools.aggregate_fgmax_runs(fg, outdirs, weights,
+                                                 qois=['h','s'], cache=False)
+        hazard2 = ptha_tools.aggregate_fgmax_runs(fg, outdirs, weights,
+                                                  qois=['h','s'], nprocs=2,
+                                                  cache=False)
+        assert hazard.nruns == hazard2.nruns == 6
+        numpy.testing.assert_allclose(hazard.exceedance('h'),
+                                      hazard2.exceedance('h'))
+
+        fname = os.path.join(temp_path, 'hazard.npz')
+        hazard2.save(fname)
+        hazard3 = ptha_tools.HazardAccumulator.load(fname)
+        numpy.testing.assert_allclose(hazard3.hazard_map('s', 0.1),
+                                      hazard.hazard_map('s', 0.1))
+        assert hazard3.shape == (nx, ny)
+    finally:
+        shutil.rmtree(temp_path)
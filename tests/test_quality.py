@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Tests for the storm surge output quality checks"""
+
+import os
+import re
+import tempfile
+import shutil
+
+import numpy
+import pytest
+
+import clawpack.geoclaw.surge.quality as quality
+from .test_amr_tools import patches, qfun, write_frame
+
+
+def patch_centers(levels):
+    """Cell centers and values of the patches on the given levels"""
+    for (level, xlow, ylow, mx, my, dx, dy) in patches:
+        if level in levels:
+            x = xlow + (numpy.arange(mx) + 0.5) * dx
+            y = ylow + (numpy.arange(my) + 0.5) * dy
+            X, Y = numpy.meshgrid(x, y)
+            yield (level, xlow, ylow, mx, my, dx, dy), X, Y, qfun(X, Y) + level
+
+
+def test_quality():
+    r"""Test quality_check and get_max_boundary_fluxes on all formats"""
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        for frameno, file_format in enumerate(['ascii', 'binary64',
+                                               'binary32'], start=1):
+            write_frame(temp_path, frameno, 10.*frameno, file_format)
+        sea_level = 2.0
+        with open(os.path.join(temp_path, 'geoclaw.data'), 'w') as data_file:
+            data_file.write("%s  =: sea_level\n" % sea_level)
+        with open(os.path.join(temp_path, 'claw.data'), 'w') as data_file:
+            data_file.write("0.0  0.0  =: lower\n10.0  8.0  =: upper\n")
+
+        # Cells with topo = 0.1*x*y < 4 are deep, by level and region
+        regions = [[0., 0., 4., 3.], [5., 4., 10., 8.]]
+        for max_level in [1, 2]:
+            means = []
+            for r in regions:
+                values = []
+                for patch, X, Y, q in patch_centers(range(1, max_level+1)):
+                    inside = (X >= r[0]) & (X <= r[2]) \
+                             & (Y >= r[1]) & (Y <= r[3]) \
+                             & (q[3] - q[0] < 4.)
+                    values.append(q[3][inside])
+                means.append(numpy.hstack(values).mean() - sea_level)
+            largest = numpy.argmax(numpy.abs(means))
+            for nprocs in [1, 2]:
+                kwargs = {'regions_to_check': regions, 'frames_to_check': 3,
+                          'min_depth': -4., 'max_level': max_level,
+                          'nprocs': nprocs}
+                quality.quality_check(temp_path,
+                                      mean_tol_abs=numpy.abs(means).max()+1e-4,
+                                      **kwargs)
+                message = "%.1f cm in region %s" % (means[largest]*100,
+                                                    regions[largest])
+                with pytest.raises(quality.InstabilityError,
+                                   match=re.escape(message)):
+                    quality.quality_check(
+                        temp_path,
+                        mean_tol_abs=numpy.abs(means).max()-1e-4, **kwargs)
+
+        # Only the level 1 patch touches the W, E and N boundaries
+        patch, X, Y, q = next(patch_centers([1]))
+        boundary = {'W': (q[1][:, 0], q[0][:, 0]),
+                    'E': (q[1][:, -1], q[0][:, -1]),
+                    'N': (q[2][-1, :], q[0][-1, :]),
+                    'S': (q[2][0, :], q[0][0, :])}
+        values = [q for (patch, X, Y, q) in patch_centers([1, 2, 3])]
+        domain = {'hu': max(numpy.abs(q[1]).max() for q in values),
+                  'hv': max(numpy.abs(q[2]).max() for q in values),
+                  'u': max(numpy.abs(q[1] / q[0]).max() for q in values),
+                  'v': max(numpy.abs(q[2] / q[0]).max() for q in values)}
+        for nprocs in [1, 2]:
+            for boundary_only in [False, True]:
+                maxes = quality.get_max_boundary_fluxes(
+                    temp_path, frames_to_check=3, nprocs=nprocs,
+                    boundary_only=boundary_only)
+                for (side, (flux, h)) in boundary.items():
+                    numpy.testing.assert_allclose(
+                        maxes['max_normal_fluxes'][side],
+                        numpy.abs(flux).max(), rtol=1e-6)
+                    numpy.testing.assert_allclose(
+                        maxes['max_normal_currents'][side],
+                        numpy.abs(flux / h).max(), rtol=1e-6)
+                if boundary_only:
+                    assert 'domain_maxs' not in maxes
+                else:
+                    for (name, value) in domain.items():
+                        numpy.testing.assert_allclose(
+                            maxes['domain_maxs'][name], value, rtol=1e-6)
+
+        # Level 1 only
+        maxes = quality.get_max_boundary_fluxes(
+            temp_path, max_refinement_depth_to_check=1, frames_to_check=3)
+        numpy.testing.assert_allclose(maxes['domain_maxs']['hu'],
+                                      numpy.abs(values[0][1]).max(),
+                                      rtol=1e-6)
+    finally:
+        shutil.rmtree(temp_path)
@@ -13,6 +13,7 @@ import sys
 import datetime
 
 import numpy
+import pytest
 
 import clawpack.clawutil.test as test
 import clawpack.geoclaw.surge.storm as storm
@@ -170,6 +171,441 @@ def test_storm_IO(save=False):
         shutil.rmtree(temp_path)
 
 
+def test_atcf_storms():
+    r"""Test splitting an ATCF archive with several storms and cycles"""
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        atcf_path = os.path.join(testdir, "data", "storm", "atcf.txt")
+        with open(atcf_path, 'r') as data_file:
+            lines = data_file.readlines()
+
+        # Two storms, the second one with a different cyclone number:
+        storm_paths = [os.path.join(temp_path, "storm%s.txt" % n)
+                       for n in range(2)]
+        with open(storm_paths[0], 'w') as data_file:
+            data_file.writelines(lines[:80])
+        with open(storm_paths[1], 'w') as data_file:
+            data_file.writelines([line.replace("AL, 09,", "AL, 10,")
+                                  for line in lines[80:]])
+        archive_path = os.path.join(temp_path, "archive.txt")
+        with open(archive_path, 'w') as data_file:
+            for path in storm_paths:
+                with open(path, 'r') as storm_file:
+                    data_file.write(storm_file.read())
+
+        storms = storm.read_atcf_storms(archive_path)
+        assert list(storms.keys()) == [("AL", 9), ("AL", 10)]
+        for key, path in zip(storms.keys(), storm_paths):
+            expected = storm.Storm(path, file_format='ATCF')
+            assert storms[key].ID == key[1]
+            numpy.testing.assert_array_equal(storms[key].t, expected.t)
+            numpy.testing.assert_allclose(storms[key].eye_location,
+                                          expected.eye_location)
+            numpy.testing.assert_allclose(storms[key].max_wind_radius,
+                                          expected.max_wind_radius)
+
+        # Forecast cycles, without writing any files:
+        cwd = os.getcwd()
+        os.chdir(temp_path)
+        try:
+            storm_dict = storm.make_multi_structure(archive_path)
+        finally:
+            os.chdir(cwd)
+        assert not os.path.exists(os.path.join(temp_path, "Clipped_ATCFs"))
+        assert len(storm_dict) == 62
+        assert list(storm_dict["2008090106"].keys()) == ["BEST"]
+
+    finally:
+        shutil.rmtree(temp_path)
+
+
+def test_ibtracs_index():
+    r"""Test lookups and batched reads from an open IBTrACS file"""
+
+    try:
+        import xarray
+    except ImportError as e:
+        print("Skipping IBTrACS index test, missing xarray.")
+        return
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        # Three copies of Ike, shifted in time, the last one unnamed
+        ibtracs_path = os.path.join(testdir, "data", "storm", "ibtracs.nc")
+        with xarray.open_dataset(ibtracs_path) as ds:
+            copies = []
+            for n, name in enumerate([b'IKE', b'IKE', b'NOT_NAMED']):
+                copy = ds.assign_coords(time=ds.time
+                                        + numpy.timedelta64(400 * n, 'D'))
+                copy['sid'] = copy.sid.copy(
+                                    data=[('2008245N1732%s' % n).encode()])
+                copy['name'] = copy.name.copy(data=[name])
+                copies.append(copy)
+            multi_path = os.path.join(temp_path, "ibtracs.nc")
+            xarray.concat(copies, dim='storm').to_netcdf(multi_path)
+
+        agency_pref = ['wmo', 'usa']
+        with storm.IBTrACS(multi_path) as ibtracs:
+            assert len(ibtracs) == 3
+            numpy.testing.assert_array_equal(ibtracs.find_all('ike'), [0, 1])
+            numpy.testing.assert_array_equal(
+                            ibtracs.find_all(year=[2009, 2010]), [1, 2])
+            assert ibtracs.find(storm_name='IKE', year=2009) == 1
+            assert ibtracs.find(sid='2008245N17322') == 2
+            try:
+                ibtracs.find(storm_name='IKE')
+                assert False, "Expected ambiguous storm name to fail"
+            except ValueError:
+                pass
+
+            expected = storm.Storm(ibtracs_path, file_format='ibtracs',
+                                   sid='2008245N17323',
+                                   agency_pref=agency_pref)
+            storms = ibtracs.read_storms(ibtracs.find_all(),
+                                         agency_pref=agency_pref,
+                                         batch_size=2)
+            for n, this_storm in enumerate(storms):
+                assert this_storm.ID == '2008245N1732%s' % n
+                offset = numpy.timedelta64(400 * n, 'D')
+                numpy.testing.assert_array_equal(this_storm.t,
+                                                 expected.t + offset)
+                numpy.testing.assert_allclose(this_storm.eye_location,
+                                              expected.eye_location)
+                numpy.testing.assert_allclose(this_storm.max_wind_speed,
+                                              expected.max_wind_speed)
+                numpy.testing.assert_allclose(this_storm.storm_radius,
+                                              expected.storm_radius)
+
+            # Reading through an open handle gives the same storm
+            this_storm = storm.Storm()
+            this_storm.read_ibtracs(ibtracs, storm_name='IKE', year=2008,
+                                    agency_pref=agency_pref)
+            numpy.testing.assert_array_equal(this_storm.t, expected.t)
+            assert this_storm.ID == '2008245N17320'
+
+    finally:
+        shutil.rmtree(temp_path)
+
+
+def test_model_fields():
+    r"""Test the parametric wind and pressure models"""
+
+    storm_path = os.path.join(testdir, "data", "storm", "atcf_geoclaw.txt")
+    test_storm = storm.Storm(storm_path, file_format="geoclaw")
+    x = numpy.linspace(-100.0, -46.0, 37)
+    y = numpy.linspace(5.0, 40.0, 29)
+    t = numpy.array([0.0, 3600.0 * 5.5, 86400.0 * 3 + 1234.0])
+
+    # Holland 1980 computed point by point as in model_storm_module.f90
+    params = storm.storm_parameters(test_storm, t)
+    wind_u, wind_v, pressure = storm.holland_1980(test_storm, x, y, t)
+    for n in range(len(t)):
+        sloc = params["location"][n]
+        tv = params["velocity"][n].copy()
+        mws = params["max_wind_speed"][n]
+        mwr = params["max_wind_radius"][n]
+        Pc = params["central_pressure"][n]
+        mod_mws = mws - numpy.sqrt(tv[0]**2 + tv[1]**2)
+        if mod_mws < 0:
+            tv *= mws / numpy.sqrt(tv[0]**2 + tv[1]**2)
+            mod_mws = 0.0
+        mod_mws /= 0.9
+        dp = max(101.3e3 - Pc, 100.0)
+        B = min(max(1.15 * numpy.exp(1.0) * mod_mws**2 / dp, 1.0), 2.5)
+        for (i, j) in [(0, 0), (20, 14), (36, 28), (11, 25)]:
+            r = storm._spherical_distance(x[i], y[j], sloc[0], sloc[1],
+                                          6367.5e3)
+            theta = numpy.arctan2(y[j] - sloc[1], x[i] - sloc[0])
+            f = abs(storm.coriolis(y[j]))
+            p = Pc + dp * numpy.exp(-(mwr / r)**B)
+            wind = numpy.sqrt((mwr / r)**B * numpy.exp(1.0 - (mwr / r)**B)
+                              * mod_mws**2 + (r * f)**2 / 4.0) - r * f / 2.0
+            trans = abs(wind) / mod_mws * tv
+            wind *= 0.9 * 0.88
+            ramp = 0.5 * (1.0 - numpy.tanh((r - params["storm_radius"][n])
+                                           / 100e3))
+            numpy.testing.assert_allclose(
+                [wind_u[n, j, i], wind_v[n, j, i], pressure[n, j, i]],
+                [(-wind * numpy.sin(theta) + trans[0]) * ramp,
+                 (wind * numpy.cos(theta) + trans[1]) * ramp,
+                 101.3e3 + (p - 101.3e3) * ramp], rtol=1e-10)
+
+    # All models, evaluated in chunks of times
+    for model in storm._supported_models.keys():
+        fields = storm.construct_fields(test_storm, x, y, t, model=model)
+        chunked = storm.construct_fields(test_storm, x, y, t, model=model,
+                                         chunk_size=2)
+        for (field, field_chunked) in zip(fields, chunked):
+            assert field.shape == (len(t), len(y), len(x))
+            assert numpy.all(numpy.isfinite(field))
+            numpy.testing.assert_allclose(field, field_chunked)
+        pressure = fields[2]
+        assert pressure.min() > params["central_pressure"].min() - 1.0
+        assert pressure.max() < 101.3e3 + 1.0
+
+    try:
+        storm.construct_fields(test_storm, x, y, t, model="not_a_model")
+        assert False, "Expected unknown model to fail"
+    except ValueError:
+        pass
+
+
+def test_storm_fields():
+    r"""Test writing and reading gridded storm forcing"""
+
+    storm_path = os.path.join(testdir, "data", "storm", "atcf_geoclaw.txt")
+    test_storm = storm.Storm(storm_path, file_format="geoclaw")
+    x = numpy.linspace(-100.0, -46.0, 37)
+    y = numpy.linspace(5.0, 40.0, 29)
+    t = numpy.linspace(0.0, 86400.0, 5)
+    wind_u, wind_v, pressure = storm.holland_1980(test_storm, x, y, t)
+    location = storm.storm_parameters(test_storm, t)["location"]
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        for (file_format, rtol) in [("binary32", 1e-6), ("binary64", 1e-14),
+                                    ("netcdf", 1e-6)]:
+            if file_format == "netcdf":
+                pytest.importorskip("netCDF4")
+            path = os.path.join(temp_path, "%s.storm" % file_format)
+            storm.write_storm_fields(path, test_storm, x, y, t,
+                                     file_format=file_format, chunk_size=2)
+            fields = storm.StormFields(path)
+            assert fields.file_format == file_format
+            numpy.testing.assert_allclose(fields.x, x)
+            numpy.testing.assert_allclose(fields.y, y)
+            numpy.testing.assert_allclose(fields.t, t)
+            numpy.testing.assert_allclose(fields.eye_location, location)
+            for n in [0, 3, 4]:
+                for (field, expected) in zip(fields.read(n),
+                                             (wind_u, wind_v, pressure)):
+                    numpy.testing.assert_allclose(field, expected[n],
+                                                  rtol=rtol, atol=1e-4)
+
+            # Linear interpolation between the bracketing times
+            for (field, expected) in zip(fields.fields(0.25 * t[1]),
+                                         (wind_u, wind_v, pressure)):
+                numpy.testing.assert_allclose(field,
+                        0.75 * expected[0] + 0.25 * expected[1],
+                        rtol=rtol, atol=1e-4)
+
+        # Eye location defaults to the minimum pressure
+        path = os.path.join(temp_path, "eye.storm")
+        with storm.StormFieldWriter(path, x, y) as writer:
+            writer.write(0.0, wind_u[0], wind_v[0], pressure[0])
+            try:
+                writer.write(0.0, wind_u[1], wind_v[1], pressure[1])
+                assert False, "Expected repeated time to fail"
+            except ValueError:
+                pass
+        j, i = numpy.unravel_index(numpy.argmin(pressure[0]), pressure[0].shape)
+        numpy.testing.assert_allclose(storm.StormFields(path).eye_location,
+                                      [[x[i], y[j]]])
+    finally:
+        shutil.rmtree(temp_path)
+
+
+def test_storm_ensemble():
+    r"""Test perturbing and writing an ensemble of storms"""
+
+    from clawpack.geoclaw.surge.ensemble import StormEnsemble
+
+    storm_path = os.path.join(testdir, "data", "storm", "atcf_geoclaw.txt")
+    test_storm = storm.Storm(storm_path, file_format="geoclaw")
+    ensemble = StormEnsemble.from_storm(test_storm, 4)
+    assert len(ensemble) == 4
+
+    perturbed = ensemble.perturb(cross_track=[0.0, 50e3, -50e3, 0.0],
+                                 forward_speed=[1.0, 1.0, 1.0, 1.25],
+                                 max_wind_speed=[1.0, 1.1, 1.0, 1.0],
+                                 pressure_deficit=[1.0, 1.0, 0.5, 1.0])
+    numpy.testing.assert_allclose(perturbed.eye_location[0],
+                                  ensemble.eye_location[0])
+    for member in [1, 2]:
+        distance = storm._spherical_distance(
+                        perturbed.eye_location[member, :, 0],
+                        perturbed.eye_location[member, :, 1],
+                        ensemble.eye_location[member, :, 0],
+                        ensemble.eye_location[member, :, 1], 6367.5e3)
+        numpy.testing.assert_allclose(distance, 50e3, rtol=1e-2)
+    numpy.testing.assert_allclose(perturbed.max_wind_speed[1],
+                                  1.1 * ensemble.max_wind_speed[1])
+    numpy.testing.assert_allclose(101.3e3 - perturbed.central_pressure[2],
+                        0.5 * (101.3e3 - ensemble.central_pressure[2]))
+    # Faster storm reaches the end of its track earlier
+    t_end = ensemble.t[-1] / 1.25
+    assert numpy.all(numpy.isnan(perturbed.max_wind_speed[3,
+                                                ensemble.t > t_end]))
+    expected = [numpy.interp(1.25 * ensemble.t[ensemble.t <= t_end],
+                             ensemble.t, ensemble.eye_location[3, :, k])
+                for k in range(2)]
+    numpy.testing.assert_allclose(
+                perturbed.eye_location[3, ensemble.t <= t_end],
+                numpy.array(expected).T)
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        # Unperturbed members are written as Storm.write_geoclaw does
+        test_storm.write(os.path.join(temp_path, "storm.storm"),
+                         file_format="geoclaw")
+        for nprocs in [1, 2]:
+            paths = perturbed.write(os.path.join(temp_path, str(nprocs),
+                                                 "member_{:02d}.storm"),
+                                    nprocs=nprocs)
+            with open(os.path.join(temp_path, "storm.storm")) as data_file:
+                expected = data_file.read()
+            with open(paths[0]) as data_file:
+                assert data_file.read() == expected
+            for (member, path) in enumerate(paths):
+                member_storm = storm.Storm(path, file_format="geoclaw")
+                valid = ~numpy.isnan(perturbed.max_wind_speed[member])
+                numpy.testing.assert_allclose(member_storm.eye_location,
+                        perturbed.eye_location[member, valid], rtol=1e-7)
+                numpy.testing.assert_allclose(member_storm.max_wind_speed,
+                        perturbed.max_wind_speed[member, valid], rtol=1e-7)
+
+        paths = perturbed.write(os.path.join(temp_path, "member_{:02d}.atcf"),
+                                file_format="atcf")
+        member_storm = storm.Storm(paths[1], file_format="atcf")
+        numpy.testing.assert_allclose(member_storm.eye_location,
+                                      perturbed.eye_location[1], atol=0.051)
+        numpy.testing.assert_allclose(member_storm.max_wind_speed,
+                                      perturbed.max_wind_speed[1], atol=0.26)
+    finally:
+        shutil.rmtree(temp_path)
+
+
+def test_fill_radii():
+    r"""Test filling missing radii from another source"""
+
+    targ = storm.Storm()
+    targ.t = numpy.arange(6) * 3600.0
+    targ.max_wind_radius = numpy.array([numpy.nan, numpy.nan, numpy.nan,
+                                        -1.0, 40e3, numpy.nan])
+    targ.storm_radius = numpy.array([numpy.nan, 300e3, numpy.nan, 400e3,
+                                     numpy.nan, numpy.nan])
+    fill = storm.Storm()
+    fill.t = numpy.array([1800.0, 1800.0, 5400.0, 9000.0])
+    fill.max_wind_radius = numpy.array([numpy.nan, 10e3, 30e3, -1.0])
+    fill.storm_radius = numpy.array([-1.0, -1.0, -1.0, -1.0])
+
+    # Per time filling
+    expected = {"max_wind_radius": [-1.0, 20e3, -1.0, -1.0, 40e3, -1.0],
+                "storm_radius": [-1.0, 300e3, 350e3, 400e3, -1.0, -1.0]}
+    for (var, values) in expected.items():
+        for (n, t) in enumerate(targ.t):
+            if numpy.isnan(getattr(targ, var)[n]):
+                numpy.testing.assert_allclose(
+                    storm.fill_rad_w_other_source(t, targ, fill, var),
+                    values[n])
+
+    # All at once, in place
+    filled = storm.fill_radii_w_other_source(targ, fill)
+    for (var, values) in expected.items():
+        numpy.testing.assert_allclose(getattr(targ, var), values)
+    numpy.testing.assert_allclose(filled["storm_radius"],
+                                  [-1.0, 350e3, -1.0, -1.0])
+
+
+def test_storm_writers():
+    r"""Test the times and writing out every format that can be read back"""
+
+    # Lists of datetimes are stored as datetime64
+    test_storm = storm.Storm()
+    test_storm.t = [datetime.datetime(2008, 9, 1, 6),
+                    datetime.datetime(2008, 9, 1, 12)]
+    assert test_storm.t.dtype == numpy.dtype('datetime64[us]')
+    test_storm.time_offset = numpy.datetime64('2008-09-01T06')
+    assert test_storm.time_offset == datetime.datetime(2008, 9, 1, 6)
+
+    atcf_path = os.path.join(testdir, "data", "storm", "atcf.txt")
+    test_storm = storm.Storm(atcf_path, file_format='ATCF')
+    tolerance = {"atcf": 0.0, "hurdat": 0.0, "jma": 0.0, "tcvitals": 0.5}
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        for (file_format, wind_tolerance) in tolerance.items():
+            out_path = os.path.join(temp_path, "storm.%s" % file_format)
+            test_storm.write(out_path, file_format=file_format)
+            read_storm = storm.Storm(out_path, file_format=file_format)
+
+            assert len(read_storm.t) == len(test_storm.t)
+            if file_format != "jma":
+                # JMA only stores the last two digits of the year
+                numpy.testing.assert_array_equal(read_storm.t, test_storm.t)
+            numpy.testing.assert_allclose(read_storm.eye_location,
+                                          test_storm.eye_location)
+            numpy.testing.assert_allclose(read_storm.max_wind_speed,
+                                          test_storm.max_wind_speed,
+                                          atol=wind_tolerance)
+            numpy.testing.assert_allclose(read_storm.central_pressure,
+                                          test_storm.central_pressure)
+    finally:
+        shutil.rmtree(temp_path)
+
+
+def test_track_data():
+    r"""Test reading fort.track incrementally as it is appended to"""
+
+    surgeplot = pytest.importorskip("clawpack.geoclaw.surge.plot")
+
+    track = numpy.array([[3600.0 * n, -90.0 + 0.5 * n, 25.0 + 0.25 * n,
+                          0.1 * n] for n in range(100)])
+    line = "%26.16e" * 4 + "\n"
+    temp_path = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_path, "fort.track")
+        track_data = surgeplot.track_data(path)
+        assert track_data.get_track(0) == (None, None, None)
+
+        # Write the first rows and part of a line being written
+        with open(path, "w") as track_file:
+            track_file.writelines([line % tuple(row) for row in track[:3]])
+            track_file.write((line % tuple(track[3]))[:30])
+        numpy.testing.assert_allclose(track_data.get_track(2), track[2, 1:])
+        with pytest.warns(UserWarning):
+            assert track_data.get_track(3) == (None, None, None)
+
+        # Finish the line and append the rest, objects for the same file
+        # share the data read
+        with open(path, "a") as track_file:
+            track_file.write((line % tuple(track[3]))[30:])
+            track_file.writelines([line % tuple(row) for row in track[4:]])
+        offset = track_data._track_file.offset
+        numpy.testing.assert_allclose(track_data.get_track(99),
+                                      track[99, 1:])
+        numpy.testing.assert_allclose(track_data._data, track)
+        other = surgeplot.track_data(path)
+        assert other._track_file is track_data._track_file
+        assert other._track_file.offset == os.path.getsize(path) > offset
+
+        # A new run replaces the file
+        with open(path, "w") as track_file:
+            track_file.write(line % tuple(track[5]))
+        numpy.testing.assert_allclose(surgeplot.track_data(path).get_track(0),
+                                      track[5, 1:])
+
+        # A new run that is already longer than what was read, in place and
+        # in a new file with the same size
+        other_track = track.copy()
+        other_track[:, 1:] += 1.0
+        for n, rows in enumerate([other_track[:3], track[-3:]]):
+            if n == 0:
+                with open(path, "w") as track_file:
+                    track_file.writelines([line % tuple(row) for row in rows])
+            else:
+                new_path = os.path.join(temp_path, "new.track")
+                with open(new_path, "w") as track_file:
+                    track_file.writelines([line % tuple(row) for row in rows])
+                os.replace(new_path, path)
+            track_data = surgeplot.track_data(path)
+            assert track_data._track_file.num_rows == 3
+            numpy.testing.assert_allclose(track_data._data, rows)
+    finally:
+        shutil.rmtree(temp_path)
+
+
 if __name__ == '__main__':
     # Currently does not support only saving one of the format's data
     save = False
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Tests for the xarray backends, using output files written as GeoClaw does"""
+
+import os
+import tempfile
+import shutil
+
+import numpy
+import pytest
+
+from clawpack.geoclaw import fgout_tools
+
+
+def write_fgout_frames(outdir, times, file_format, nx=7, ny=5):
+    """
+    Write fgout_grids.data and the fgout0001 frames at the given times as
+    fgout_module.f90 does, with q_out_vars h, hu, hv, eta, B and a dry
+    region where x < 0.  Returns the FGoutGrid.
+    """
+    fgout_grid = fgout_tools.FGoutGrid(fgno=1, outdir=outdir,
+                                       output_format=file_format)
+    fgout_grid.x1, fgout_grid.x2 = -1., 2.5
+    fgout_grid.y1, fgout_grid.y2 = 3., 5.
+    fgout_grid.nx, fgout_grid.ny = nx, ny
+    fgout_grid.tstart, fgout_grid.tend = times[0], times[-1]
+    fgout_grid.nout = len(times)
+    fgout_grid.q_out_vars = [1, 2, 3, 4, 5]
+    with open(os.path.join(outdir, 'fgout_grids.data'), 'w') as data_file:
+        fgout_grid.write_to_fgout_data(data_file)
+
+    X, Y = fgout_grid.X.T, fgout_grid.Y.T   # shape (ny, nx), y increasing
+    B = X - 0.5 * Y
+    for frameno, t in enumerate(times, start=1):
+        h = numpy.where(X < 0., 0., 1. + 0.1 * t + X * Y)
+        q = numpy.array([h, h * (X + t), -h * Y, h + B, B])
+        prefix = os.path.join(outdir, 'fgout0001.%s' + str(frameno).zfill(4))
+        with open(prefix % 'q', 'w') as qfile:
+            qfile.write('%6i                 grid_number\n' % 1)
+            qfile.write('%6i                 AMR_level\n' % 0)
+            qfile.write('%6i                 mx\n' % nx)
+            qfile.write('%6i                 my\n' % ny)
+            qfile.write('%26.16e    xlow\n' % fgout_grid.x1)
+            qfile.write('%26.16e    ylow\n' % fgout_grid.y1)
+            qfile.write('%26.16e    dx\n' % fgout_grid.delta[0])
+            qfile.write('%26.16e    dy\n\n' % fgout_grid.delta[1])
+            if file_format == 'ascii':
+                for j in range(ny):
+                    for i in range(nx):
+                        qfile.write(''.join('%26.16e' % v for v in q[:,j,i]))
+                        qfile.write('\n')
+                    qfile.write('  \n')
+        if file_format != 'ascii':
+            numpy.moveaxis(q, 0, -1).tofile(prefix % 'b')
+        with open(prefix % 't', 'w') as tfile:
+            tfile.write('%18.8e    time\n' % t)
+            tfile.write('%6i                 meqn\n' % 5)
+            tfile.write('%6i                 ngrids\n' % 1)
+            tfile.write('%6i                 naux\n' % 0)
+            tfile.write('%6i                 ndim\n' % 2)
+            tfile.write('%6i                 nghost\n' % 0)
+            tfile.write('%10s             format\n\n' % file_format)
+    return fgout_grid
+
+
+def test_fgout_backend():
+    r"""FGOutBackend opens all frames lazily, with y decreasing"""
+
+    pytest.importorskip("rioxarray")
+    import xarray
+    from clawpack.geoclaw.xarray_backends import FGOutBackend
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        for file_format in ['binary', 'ascii']:
+            outdir = os.path.join(temp_path, file_format)
+            os.mkdir(outdir)
+            times = [0., 10., 20.]
+            write_fgout_frames(outdir, times, file_format)
+
+            fgout_grid = fgout_tools.FGoutGrid(fgno=1, outdir=outdir)
+            fgout_grid.read_fgout_grids_data()
+            frames = [fgout_grid.read_frame(frameno) for frameno in [1, 2, 3]]
+
+            ds = xarray.open_dataset(os.path.join(outdir, 'fgout0001'),
+                                     engine=FGOutBackend,
+                                     drop_variables=['hv'])
+            assert sorted(ds.data_vars) == ['B', 'eta', 'h', 'hu']
+            numpy.testing.assert_allclose(ds.time, times)
+            numpy.testing.assert_allclose(ds.x, fgout_grid.x)
+            numpy.testing.assert_allclose(ds.y, fgout_grid.y[::-1])
+            assert ds.h.shape == (3, 5, 7)
+
+            # read_frame gives arrays indexed [i,j] with y increasing:
+            sub = ds.isel(time=slice(1, 3), x=slice(1, 5), y=3)
+            for n, frame in enumerate(frames[1:]):
+                for name in ['eta', 'B']:
+                    numpy.testing.assert_allclose(
+                        sub[name].values[n], getattr(frame, name)[1:5, 1])
+                # dry cells are masked except in eta and B:
+                hu = frame.hu[1:5, 1]
+                expected = numpy.where(frame.h[1:5, 1] < 0.001, numpy.nan, hu)
+                numpy.testing.assert_allclose(sub.hu.values[n], expected)
+                assert numpy.isnan(sub.hu.values[n]).sum() > 0
+
+            # scalar indices and a whole frame:
+            point = ds.h.isel(time=0, x=-1, y=0)
+            numpy.testing.assert_allclose(point, frames[0].h[-1, -1])
+            numpy.testing.assert_allclose(ds.eta.isel(time=2).values,
+                                          frames[2].eta.T[::-1, :])
+
+            # a single frame, from the .q or .b file:
+            ext = 'q0002' if file_format == 'ascii' else 'b0002'
+            ds1 = xarray.open_dataset(os.path.join(outdir, 'fgout0001.' + ext),
+                                      engine=FGOutBackend, dry_tolerance=None)
+            numpy.testing.assert_allclose(ds1.time, [10.])
+            numpy.testing.assert_allclose(ds1.hv.values[0],
+                                          frames[1].hv.T[::-1, :])
+    finally:
+        shutil.rmtree(temp_path)
+
+
+def test_fgmax_backend(monkeypatch):
+    r"""FGMaxBackend gives masked values with y decreasing, and does not
+    parse the columns of dropped variables"""
+
+    pytest.importorskip("rioxarray")
+    import xarray
+    from clawpack.geoclaw import fgmax_tools
+    from clawpack.geoclaw.xarray_backends import FGMaxBackend
+    from .test_fgmax_tools import make_fgmax_output
+
+    # record the columns parsed:
+    parsed = []
+    read_fgmax_columns = fgmax_tools.read_fgmax_columns
+    def read_columns(fname, usecols=None, cache=False, **kwargs):
+        parsed.append((usecols, cache))
+        return read_fgmax_columns(fname, usecols, cache=cache, **kwargs)
+    monkeypatch.setattr(fgmax_tools, 'read_fgmax_columns', read_columns)
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        numpy.random.seed(3)
+        d = make_fgmax_output(temp_path)   # 6 by 4 points on [0,1] x [2,3]
+        with open(os.path.join(temp_path, 'fgmax_grids.data'), 'w') as f:
+            f.write("1  # fgno\n0.  # tstart_max\n1e9  # tend_max\n"
+                    "1.  # dt_check\n1  # min_level_check\n"
+                    "0.01  # arrival_tol\n0  # interp_method\n"
+                    "2  # point_style\n6 4  # nx,ny\n0. 2.  # x1,y1\n"
+                    "1. 3.  # x2,y2\n")
+        fname = os.path.join(temp_path, 'fgmax0001.txt')
+
+        dropped = ['hss_max', 'hss_max_time', 'h_min', 'h_min_time',
+                   'arrival_time']
+        ds = xarray.open_dataset(fname, engine=FGMaxBackend,
+                                 drop_variables=dropped)
+        assert not set(dropped) & set(ds.data_vars)
+        assert sorted(ds.data_vars) == ['B', 'eta_max', 'h_max', 'h_max_time',
+                                        'hs_max', 'hs_max_time', 'level',
+                                        's_max', 's_max_time']
+        # columns of hss, hmin and arrival times are not parsed or cached:
+        assert len(parsed) == 1
+        usecols, cache = parsed[0]
+        assert sorted(set(usecols)) == [0, 1, 2, 3, 4, 5, 6, 9, 10, 11]
+        assert not cache
+        assert not os.path.isfile(fname + '.npz')
+
+        def grid(col):
+            # values by row, y decreasing:
+            return d[:, col].reshape((4, 6))[::-1, :]
+
+        numpy.testing.assert_allclose(ds.x, d[:6, 0])
+        numpy.testing.assert_allclose(ds.y, grid(1)[:, 0])
+        h = numpy.where(grid(4) < -1e50, numpy.nan, grid(4))
+        assert numpy.isnan(h).sum() == 1
+        numpy.testing.assert_allclose(ds.h_max, h, rtol=1e-7)
+        numpy.testing.assert_allclose(ds.eta_max, h + grid(3), rtol=1e-7)
+        sub = ds.isel(x=slice(1, 4), y=slice(2, 4))
+        numpy.testing.assert_allclose(sub.s_max_time,
+                                      numpy.where(numpy.isnan(h), numpy.nan,
+                                                  grid(10))[2:4, 1:4],
+                                      rtol=1e-7)
+        numpy.testing.assert_array_equal(ds.level, grid(2))
+    finally:
+        shutil.rmtree(temp_path)
+
+
+def test_amr_backend():
+    r"""AMRBackend samples each point of the uniform grid from the finest
+    patch covering it"""
+
+    pytest.importorskip("rioxarray")
+    import xarray
+    from clawpack.geoclaw.xarray_backends import AMRBackend
+    from .test_amr_tools import write_frame, expected_sample
+
+    temp_path = tempfile.mkdtemp()
+    try:
+        for frameno, file_format in enumerate(['ascii', 'binary64'],
+                                              start=1):
+            write_frame(temp_path, frameno, 10.*frameno, file_format)
+
+        # level 2 resolution over the domain, y decreasing:
+        ds = xarray.open_dataset(temp_path, engine=AMRBackend, level=2,
+                                 drop_variables=['hv'])
+        assert sorted(ds.data_vars) == ['eta', 'h', 'hu', 'level']
+        numpy.testing.assert_allclose(ds.time, [10., 20.])
+        numpy.testing.assert_allclose(ds.x, 0.25 + 0.5*numpy.arange(20))
+        numpy.testing.assert_allclose(ds.y, 7.75 - 0.5*numpy.arange(16))
+
+        q_expected, level_expected = expected_sample(ds.x.values,
+                                                     ds.y.values)
+        # the level 3 patch covers some of the grid:
+        assert (level_expected == 3).sum() > 0
+        assert (level_expected == 1).sum() > 0
+        numpy.testing.assert_array_equal(ds.level.isel(time=0),
+                                         level_expected)
+        for n, name in enumerate(['h', 'hu']):
+            for k in range(2):
+                numpy.testing.assert_allclose(ds[name].isel(time=k),
+                                              q_expected[..., n], rtol=1e-12)
+        numpy.testing.assert_allclose(ds.eta.isel(time=1),
+                                      q_expected[..., 3], rtol=1e-12)
+
+        # only part of the grid of one frame, given by a single file:
+        ds = xarray.open_dataset(os.path.join(temp_path, 'fort.b0002'),
+                                 engine=AMRBackend, extent=[2., 6., 1., 4.],
+                                 dx=0.25)
+        numpy.testing.assert_allclose(ds.time, [20.])
+        sub = ds.isel(time=0, x=slice(3, 9), y=slice(5, 10))
+        q_expected, level_expected = expected_sample(sub.x.values,
+                                                     sub.y.values)
+        assert set(numpy.unique(level_expected)) == set([2, 3])
+        numpy.testing.assert_array_equal(sub.level, level_expected)
+        numpy.testing.assert_allclose(sub.hv, q_expected[..., 2],
+                                      rtol=1e-12)
+    finally:
+        shutil.rmtree(temp_path)